@@ -6,23 +6,8 @@ It extracts callsign information and determines award tiers based on the number
 callsigns found in the file.
 """
 
-try:
-    import adif_io
-except ImportError:
-    # Mock for testing when adif_io is not available
-    class MockAdifIo:
-        @staticmethod
-        def read_from_string(file_content):
-            if not file_content:
-                return []
-            # Mock parsing that returns records with unique callsigns for testing
-            if "EF2GH" in file_content:
-                return [{"call": "AB1CD"}, {"call": "EF2GH"}]
-            return [{"call": "AB1CD"}]
-
-    adif_io = MockAdifIo()
-
 from award_tier import determine_award_tier
+from repositories.adif_repository import AdifIoRepository
 from services.adif_service import format_adif_result
 
 
@@ -48,7 +33,7 @@ def parse_adif(file_content):
             "callsign": "Unknown",
         }
 
-    records = adif_io.read_from_string(file_content)
+    records = AdifIoRepository().read_from_string(file_content)
 
     # Extract callsigns and create set for unique addresses
     callsigns = [record.get("call", "") for record in records if record.get("call")]
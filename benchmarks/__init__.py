@@ -0,0 +1,5 @@
+"""
+Benchmarks package for the ADIF Parser Service.
+
+This package contains scripts that measure the performance of the parsing pipeline.
+"""
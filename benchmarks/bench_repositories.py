@@ -0,0 +1,130 @@
+"""
+Repository Benchmark
+
+This script measures the throughput of the ADIF repository backends on a generated
+log, and of the ADX repository on the same log in ADX form. Run it from the
+repository root:
+
+    python -m benchmarks.bench_repositories --records 200000
+"""
+
+import argparse
+import time
+from io import BytesIO
+
+from repositories.adif_repository import AdifIoRepository, adif_io
+from repositories.adx_repository import AdxRepository
+from repositories.scanner_repository import CallsignScannerRepository
+
+
+def build_adif(record_count):
+    """
+    Build an ADIF log with a header and the given number of records.
+
+    Args:
+        record_count (int): The number of QSO records to generate.
+
+    Returns:
+        bytes: The generated ADIF data.
+    """
+    lines = ["Generated for benchmarking\n<adif_ver:5>3.1.0 <programid:5>bench <EOH>\n"]
+    for index in range(record_count):
+        call = f"K{index % 50000:05d}"
+        lines.append(
+            f"<call:{len(call)}>{call} <band:3>20m <mode:3>FT8 "
+            f"<qso_date:8>20220101 <time_on:6>010101 "
+            f"<comment:22>Thanks for the contact! <eor>\n"
+        )
+    return "".join(lines).encode("utf-8")
+
+
+def build_adx(record_count):
+    """
+    Build an ADX log with a header and the given number of records.
+
+    The records hold the same fields as those of build_adif.
+
+    Args:
+        record_count (int): The number of QSO records to generate.
+
+    Returns:
+        bytes: The generated ADX data.
+    """
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>\n<ADX>\n<HEADER><ADIF_VER>3.1.0'
+        "</ADIF_VER><PROGRAMID>bench</PROGRAMID></HEADER>\n<RECORDS>\n"
+    ]
+    for index in range(record_count):
+        lines.append(
+            f"<RECORD><CALL>K{index % 50000:05d}</CALL><BAND>20m</BAND>"
+            f"<MODE>FT8</MODE><QSO_DATE>20220101</QSO_DATE><TIME_ON>010101</TIME_ON>"
+            f"<COMMENT>Thanks for the contact!</COMMENT></RECORD>\n"
+        )
+    lines.append("</RECORDS>\n</ADX>\n")
+    return "".join(lines).encode("utf-8")
+
+
+def time_backend(name, parse, repeats):
+    """
+    Time a parse callable and print its best throughput.
+
+    Args:
+        name (str): The label to print for the backend.
+        parse (callable): A callable that performs one full parse and returns the
+            number of bytes processed.
+        repeats (int): The number of timed runs; the fastest one is reported.
+    """
+    best = None
+    size = 0
+    for _ in range(repeats):
+        start = time.perf_counter()
+        size = parse()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{name:<24} {best:8.3f}s {size / best / 1e6:10.1f} MB/s")
+
+
+def main():
+    """Run the repository benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--records", type=int, default=100000)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    data = build_adif(args.records)
+    text = data.decode("utf-8")
+    print(f"{args.records} records, {len(data) / 1e6:.1f} MB")
+
+    scanner = CallsignScannerRepository()
+    time_backend(
+        "scanner (bytes)",
+        lambda: len(scanner.read_from_bytes(data)) and len(data),
+        args.repeats,
+    )
+    time_backend(
+        "scanner (stream)",
+        lambda: sum(1 for _ in scanner.read_from_stream(BytesIO(data))) and len(data),
+        args.repeats,
+    )
+    adx_data = build_adx(args.records)
+    adx_repository = AdxRepository()
+    print(f"ADX form: {len(adx_data) / 1e6:.1f} MB")
+    time_backend(
+        "adx (stream)",
+        lambda: sum(1 for _ in adx_repository.read_from_stream(BytesIO(adx_data)))
+        and len(adx_data),
+        args.repeats,
+    )
+    if adif_io is None:
+        print("adif_io is not installed; skipping the adif_io backend")
+        return
+    adif_io_repository = AdifIoRepository()
+    time_backend(
+        "adif_io (string)",
+        lambda: adif_io_repository.read_from_string(text) and len(data),
+        args.repeats,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""
+Benchmark Suite
+
+This script measures every ADIF repository backend, and the whole of
+AdifService.process_adif_content, on synthetic logs of several sizes. For each case
+it reports the p50 and p99 latency of a parse, the throughput at the p50 latency,
+and the peak memory traced while parsing. Run it from the repository root:
+
+    python -m benchmarks.bench_suite --sizes 100,10000,100000 --output results.json
+
+Results are written as JSON. Given a baseline, a results file from an earlier run
+on the same machine, the script exits with status 1 when the p50 latency or peak
+memory of any case has grown by more than the tolerance:
+
+    python -m benchmarks.bench_suite --baseline baseline.json --tolerance 0.2
+"""
+
+import argparse
+import functools
+import json
+import math
+import platform
+import sys
+import time
+import tracemalloc
+from io import BytesIO
+
+from benchmarks.synthetic import build_adif, build_adx
+from dependencies import ADIF_BACKENDS
+from repositories.adif_repository import adif_io
+from repositories.adx_repository import AdxRepository
+from services.adif_service import AdifService
+from services.award_service import AwardService
+
+# Metrics compared with the baseline, all of which get worse as they grow
+GATED_METRICS = ("p50_seconds", "peak_memory_bytes")
+
+DEFAULT_SIZES = (100, 10000, 100000)
+
+# Shortest timed run: faster parses are repeated within a run to reach it
+MIN_RUN_SECONDS = 0.05
+
+
+def percentile(values, fraction):
+    """
+    Get a percentile of some values by the nearest-rank method.
+
+    With few values the high percentiles are the largest value: the p99 of five
+    runs is the slowest of them.
+
+    Args:
+        values (list): The values.
+        fraction (float): The percentile as a fraction, such as 0.99.
+
+    Returns:
+        float: The value at that rank.
+    """
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(len(ordered) * fraction)) - 1]
+
+
+def measure(parse, size, records, runs, memory=True):
+    """
+    Measure a parse.
+
+    The parse runs once untimed to warm up, then ``runs`` times timed, then once
+    more under tracemalloc for its peak memory, since tracing allocations slows it
+    down too much to be timed. A parse faster than MIN_RUN_SECONDS is repeated
+    within each timed run, and the latency of the run is its mean, so that small
+    logs are not timed at the resolution of the clock.
+
+    Args:
+        parse (callable): A callable that parses the log once.
+        size (int): The size of the log in bytes.
+        records (int): The number of records in the log.
+        runs (int): The number of timed runs.
+        memory (bool): Whether to measure the peak memory.
+
+    Returns:
+        dict: The latencies and throughput of the parse, and its peak memory or
+        None if not measured.
+    """
+    start = time.perf_counter()
+    parse()
+    repeats = max(1, math.ceil(MIN_RUN_SECONDS / (time.perf_counter() - start)))
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        for _ in range(repeats):
+            parse()
+        latencies.append((time.perf_counter() - start) / repeats)
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            parse()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    p50 = percentile(latencies, 0.5)
+    return {
+        "bytes": size,
+        "records": records,
+        "runs": runs,
+        "repeats": repeats,
+        "p50_seconds": p50,
+        "p99_seconds": percentile(latencies, 0.99),
+        "throughput_mb_per_second": size / p50 / 1e6,
+        "records_per_second": records / p50,
+        "peak_memory_bytes": peak,
+    }
+
+
+def _read_stream(repository, data):
+    """
+    Parse a log with a repository as a stream, and exhaust the records.
+
+    Args:
+        repository (AdifRepository): The repository.
+        data (bytes): The log.
+
+    Returns:
+        int: The number of records.
+    """
+    return sum(1 for _ in repository.read_from_stream(BytesIO(data)))
+
+
+def build_cases(qso_count, seed=0):
+    """
+    Build the parses measured for one log size.
+
+    Args:
+        qso_count (int): The number of QSOs in the log.
+        seed (int): The seed of the synthetic log.
+
+    Returns:
+        list: ``(name, parse, size)`` tuples, where ``parse`` parses the log once.
+    """
+    adi = build_adif(qso_count, seed)
+    adi_text = adi.decode("utf-8")
+    adx = build_adx(qso_count, seed)
+    adx_text = adx.decode("utf-8")
+    backends = {
+        backend.name: (backend.factory(), adi, adi_text)
+        for backend in sorted(ADIF_BACKENDS.available(), key=lambda item: item.name)
+    }
+    backends["adx"] = (AdxRepository(), adx, adx_text)
+
+    cases = []
+    for name, (repository, data, text) in backends.items():
+        service = AdifService(repository, AwardService())
+        cases.extend(
+            [
+                (
+                    f"{qso_count}/repository/{name}/string",
+                    functools.partial(repository.read_from_string, text),
+                    len(data),
+                ),
+                (
+                    f"{qso_count}/repository/{name}/stream",
+                    functools.partial(_read_stream, repository, data),
+                    len(data),
+                ),
+                (
+                    f"{qso_count}/service/{name}/process_adif_content",
+                    functools.partial(service.process_adif_content, text),
+                    len(data),
+                ),
+            ]
+        )
+    return cases
+
+
+def run_suite(sizes, runs, seed=0, memory=True, select=None):
+    """
+    Run the benchmark suite.
+
+    Args:
+        sizes (list): The numbers of QSOs of the logs.
+        runs (int): The number of timed runs of each case.
+        seed (int): The seed of the synthetic logs.
+        memory (bool): Whether to measure peak memory.
+        select (str, optional): Only run the cases whose name contains this.
+
+    Returns:
+        dict: ``environment``, describing the run, and ``results``, the
+        measurements of each case by name.
+    """
+    results = {}
+    for qso_count in sizes:
+        for name, parse, size in build_cases(qso_count, seed):
+            if select and select not in name:
+                continue
+            results[name] = measure(parse, size, qso_count, runs, memory)
+            print(_format_result(name, results[name]), flush=True)
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "adif_io": adif_io is not None,
+            "seed": seed,
+            "runs": runs,
+        },
+        "results": results,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Find the cases that regressed against a baseline.
+
+    Cases missing from either side, and metrics not measured in both, are skipped.
+
+    Args:
+        results (dict): The ``results`` of this run.
+        baseline (dict): The ``results`` of the baseline run.
+        tolerance (float): The growth allowed, as a fraction of the baseline.
+
+    Returns:
+        list: A description of each regression.
+    """
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        for metric in GATED_METRICS:
+            value, limit = result.get(metric), expected.get(metric)
+            if value is None or not limit:
+                continue
+            if value > limit * (1 + tolerance):
+                regressions.append(
+                    f"{name}: {metric} {value:.6g} is {value / limit - 1:+.0%} "
+                    f"over the baseline {limit:.6g}"
+                )
+    return regressions
+
+
+def _format_result(name, result):
+    """
+    Describe the measurements of a case on one line.
+
+    Args:
+        name (str): The name of the case.
+        result (dict): The measurements.
+
+    Returns:
+        str: The line.
+    """
+    peak = result["peak_memory_bytes"]
+    memory = "" if peak is None else f" {peak / 1e6:9.1f} MB peak"
+    return (
+        f"{name:<50} p50 {result['p50_seconds'] * 1e3:9.2f} ms "
+        f"p99 {result['p99_seconds'] * 1e3:9.2f} ms "
+        f"{result['throughput_mb_per_second']:8.1f} MB/s{memory}"
+    )
+
+
+def main(argv=None):
+    """
+    Run the benchmark suite from the command line.
+
+    Args:
+        argv (list, optional): The command-line arguments. Defaults to sys.argv.
+
+    Returns:
+        int: The exit status: 1 if a case regressed against the baseline.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--sizes",
+        default=",".join(str(size) for size in DEFAULT_SIZES),
+        help="comma-separated numbers of QSOs, from 100 to 2000000",
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--select", help="only run cases whose name contains this")
+    parser.add_argument(
+        "--no-memory", action="store_true", help="skip measuring peak memory"
+    )
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="a results file to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    report = run_suite(
+        sizes, args.runs, args.seed, memory=not args.no_memory, select=args.select
+    )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(report, output, indent=2, sort_keys=True)
+    if not args.baseline:
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as baseline:
+        regressions = compare(
+            report["results"], json.load(baseline)["results"], args.tolerance
+        )
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        return 1
+    print(f"No regressions beyond {args.tolerance:.0%} of the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
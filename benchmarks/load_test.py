@@ -0,0 +1,547 @@
+"""
+Load Test
+
+This script drives ``POST /upload_adif/`` of the service with synthetic logs to
+measure the capacity of one pod. Each scenario runs a number of concurrent clients
+for a while, each uploading logs drawn from a mix of sizes, and reports the
+throughput, latency percentiles, error rate by status, peak RSS and CPU time of
+the service. Run it from the repository root:
+
+    python -m benchmarks.load_test --scenario small=1000@8 \\
+        --scenario mixed=100:6,10000:3,100000:1@16 --duration 30
+
+A scenario is ``name=sizes@concurrency``, where sizes are numbers of QSOs, each
+optionally weighted with ``:weight``. By default the application runs in this
+process through an ASGI transport, configured by the same environment variables
+as the service. ``--target uvicorn`` starts it in a local uvicorn instead, so that
+the memory and CPU measured are those of the server alone, as in a pod, and
+``--url`` load-tests a server that is already running.
+
+Every upload gets a line of its own in its header, so the result cache never
+answers for the parse being measured. CPU time and RSS cover the service process
+and its parse workers, and are read from ``/proc`` on Linux.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from benchmarks.bench_suite import percentile
+from benchmarks.synthetic import build_adif
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+DEFAULT_SCENARIOS = ("small=1000@4", "mixed=100:6,10000:3,100000:1@8")
+
+# Seconds between two samples of the memory of the service
+RSS_SAMPLE_SECONDS = 0.1
+
+# Seconds to wait for a local uvicorn to answer its health check
+STARTUP_TIMEOUT_SECONDS = 30
+
+
+class Scenario:
+    """
+    A load to apply: concurrent clients uploading logs from a mix of sizes.
+
+    Attributes:
+        name (str): The name of the scenario.
+        sizes (list): ``(qso_count, weight)`` pairs.
+        concurrency (int): The number of clients uploading at once.
+    """
+
+    def __init__(self, name, sizes, concurrency):
+        """
+        Initialize the scenario.
+
+        Args:
+            name (str): The name of the scenario.
+            sizes (list): ``(qso_count, weight)`` pairs.
+            concurrency (int): The number of clients uploading at once.
+        """
+        self.name = name
+        self.sizes = sizes
+        self.concurrency = concurrency
+
+    @classmethod
+    def parse(cls, spec):
+        """
+        Read a scenario from its ``name=sizes@concurrency`` form.
+
+        Args:
+            spec (str): The scenario, such as ``mixed=100:6,10000:1@8``.
+
+        Returns:
+            Scenario: The scenario.
+
+        Raises:
+            ValueError: If the scenario is malformed.
+        """
+        try:
+            name, rest = spec.split("=", 1)
+            sizes_spec, concurrency = rest.rsplit("@", 1)
+            sizes = []
+            for item in sizes_spec.split(","):
+                size, _, weight = item.partition(":")
+                sizes.append((int(size), float(weight or 1)))
+            scenario = cls(name.strip(), sizes, int(concurrency))
+        except ValueError as exc:
+            raise ValueError(
+                f"Scenario '{spec}' is not of the form name=sizes@concurrency"
+            ) from exc
+        if not scenario.name or scenario.concurrency < 1:
+            raise ValueError(f"Scenario '{spec}' needs a name and a concurrency")
+        return scenario
+
+
+def _process_tree(pid):
+    """
+    List a process and all its descendants.
+
+    Args:
+        pid (int): The process id of the root.
+
+    Returns:
+        list: The process ids.
+    """
+    pids = [pid]
+    for parent in pids:
+        for task in _listdir(f"/proc/{parent}/task"):
+            try:
+                with open(f"/proc/{parent}/task/{task}/children") as children:
+                    pids.extend(int(child) for child in children.read().split())
+            except OSError:
+                continue
+    return pids
+
+
+def _listdir(path):
+    """
+    List a directory, or nothing if it is gone.
+
+    Args:
+        path (str): The directory.
+
+    Returns:
+        list: The names in the directory.
+    """
+    try:
+        return os.listdir(path)
+    except OSError:
+        return []
+
+
+def tree_rss(pid):
+    """
+    Get the resident memory of a process and its descendants.
+
+    Args:
+        pid (int): The process id of the root.
+
+    Returns:
+        int: The sum of their resident set sizes in bytes, or None where ``/proc``
+        is not available.
+    """
+    if not os.path.isdir(f"/proc/{pid}"):
+        return None
+    total = 0
+    for member in _process_tree(pid):
+        try:
+            with open(f"/proc/{member}/statm") as statm:
+                total += int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except OSError:
+            continue
+    return total
+
+
+def tree_cpu_seconds(pid):
+    """
+    Get the CPU time used so far by a process and its descendants.
+
+    Args:
+        pid (int): The process id of the root.
+
+    Returns:
+        float: Their user and system CPU time in seconds, or None where ``/proc``
+        is not available.
+    """
+    if not os.path.isdir(f"/proc/{pid}"):
+        return None
+    ticks = 0
+    for member in _process_tree(pid):
+        try:
+            with open(f"/proc/{member}/stat") as stat:
+                # The command name may hold spaces, so count fields from its end
+                fields = stat.read().rsplit(")", 1)[1].split()
+            ticks += int(fields[11]) + int(fields[12])
+        except (OSError, IndexError):
+            continue
+    return ticks / os.sysconf("SC_CLK_TCK")
+
+
+class ResourceMonitor:
+    """
+    Follow the peak memory and the CPU time of a process and its descendants.
+    """
+
+    def __init__(self, pid):
+        """
+        Initialize the monitor.
+
+        Args:
+            pid (int): The process id of the service, or None not to monitor.
+        """
+        self.pid = pid
+        self.peak_rss = None
+        self.cpu_seconds = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._cpu_start = None
+
+    def _run(self):
+        """Sample the memory of the process tree until stopped."""
+        while True:
+            rss = tree_rss(self.pid)
+            if rss is not None:
+                self.peak_rss = max(self.peak_rss or 0, rss)
+            if self._stop.wait(RSS_SAMPLE_SECONDS):
+                return
+
+    def __enter__(self):
+        """
+        Start monitoring.
+
+        Returns:
+            ResourceMonitor: The monitor.
+        """
+        if self.pid is not None:
+            self._cpu_start = tree_cpu_seconds(self.pid)
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        """Stop monitoring, and work out the CPU time used meanwhile."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        cpu_end = tree_cpu_seconds(self.pid)
+        if self._cpu_start is not None and cpu_end is not None:
+            self.cpu_seconds = cpu_end - self._cpu_start
+
+
+def unique_upload(log, index):
+    """
+    Make a log unique to one upload, so that no cached result is returned for it.
+
+    Args:
+        log (bytes): A log whose header starts with a line of free text.
+        index (int): The number of the upload.
+
+    Returns:
+        bytes: The log with a line naming the upload before its header.
+    """
+    return f"Load test upload {index}\n".encode("ascii") + log
+
+
+def summarize(scenario, samples, duration, monitor):
+    """
+    Summarize the uploads made in a scenario.
+
+    Args:
+        scenario (Scenario): The scenario.
+        samples (list): ``(status, seconds, size)`` for each upload, where status
+            is the HTTP status or the name of the exception raised.
+        duration (float): The wall-clock time of the scenario in seconds.
+        monitor (ResourceMonitor): The monitor of the service during the scenario.
+
+    Returns:
+        dict: The throughput, latency, errors and resources of the scenario.
+    """
+    statuses = {}
+    for status, _, _ in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    successes = [sample for sample in samples if sample[0] == 200]
+    latencies = [seconds for status, seconds, _ in successes]
+    requests = len(samples)
+    summary = {
+        "scenario": scenario.name,
+        "sizes": [list(size) for size in scenario.sizes],
+        "concurrency": scenario.concurrency,
+        "duration_seconds": duration,
+        "requests": requests,
+        "statuses": statuses,
+        "error_rate": (requests - len(successes)) / requests if requests else 0.0,
+        "throughput_per_second": len(successes) / duration,
+        "throughput_mb_per_second": sum(size for _, _, size in successes)
+        / duration
+        / 1e6,
+        "latency_seconds": None,
+        "peak_rss_bytes": monitor.peak_rss,
+        "cpu_seconds": monitor.cpu_seconds,
+        "cpu_cores": None,
+        "uploads_per_cpu_second": None,
+    }
+    if latencies:
+        summary["latency_seconds"] = {
+            "p50": percentile(latencies, 0.5),
+            "p90": percentile(latencies, 0.9),
+            "p99": percentile(latencies, 0.99),
+            "max": max(latencies),
+        }
+    if monitor.cpu_seconds:
+        summary["cpu_cores"] = monitor.cpu_seconds / duration
+        summary["uploads_per_cpu_second"] = len(successes) / monitor.cpu_seconds
+    return summary
+
+
+async def run_scenario(client, scenario, logs, *, duration, rng, pid=None):
+    """
+    Apply the load of a scenario for a while.
+
+    Each client uploads a log as soon as its previous upload is answered, or
+    after the ``Retry-After`` delay of an upload shed with status 503.
+
+    Args:
+        client (httpx.AsyncClient): The client for the service.
+        scenario (Scenario): The scenario.
+        logs (dict): The log of each size, by number of QSOs.
+        duration (float): How long to apply the load, in seconds.
+        rng (random.Random): The source of the size of each upload.
+        pid (int, optional): The process id of the service to monitor.
+
+    Returns:
+        dict: The summary of the scenario.
+    """
+    sizes = [size for size, _ in scenario.sizes]
+    weights = [weight for _, weight in scenario.sizes]
+    samples = []
+    uploads = iter(range(sys.maxsize))
+
+    async def upload_until(deadline):
+        while time.perf_counter() < deadline:
+            data = unique_upload(logs[rng.choices(sizes, weights)[0]], next(uploads))
+            start = time.perf_counter()
+            retry_after = 0
+            try:
+                response = await client.post(
+                    "/upload_adif/", files={"file": ("load.adi", data)}
+                )
+                status = response.status_code
+                if status == 503:
+                    retry_after = float(response.headers.get("Retry-After", 0))
+            except httpx.HTTPError as exc:
+                status = type(exc).__name__
+            samples.append((status, time.perf_counter() - start, len(data)))
+            # Like a well-behaved client, wait before retrying a shed upload
+            await asyncio.sleep(min(retry_after, deadline - time.perf_counter()))
+
+    with ResourceMonitor(pid) as monitor:
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(upload_until(start + duration) for _ in range(scenario.concurrency))
+        )
+        elapsed = time.perf_counter() - start
+    return summarize(scenario, samples, elapsed, monitor)
+
+
+def _free_port():
+    """
+    Find a free TCP port on the loopback interface.
+
+    Returns:
+        int: The port.
+    """
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+async def _wait_until_healthy(client, server):
+    """
+    Wait for a local uvicorn to answer its health check.
+
+    Args:
+        client (httpx.AsyncClient): The client for the server.
+        server (subprocess.Popen): The server process.
+
+    Raises:
+        RuntimeError: If the server exits or does not answer in time.
+    """
+    deadline = time.perf_counter() + STARTUP_TIMEOUT_SECONDS
+    while time.perf_counter() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with status {server.returncode}")
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("uvicorn did not become healthy in time")
+
+
+async def run_load_test(scenarios, duration, target="asgi", url=None, seed=0):
+    """
+    Run scenarios one after another against the service.
+
+    Args:
+        scenarios (list): The Scenarios.
+        duration (float): How long to run each scenario, in seconds.
+        target (str): ``asgi`` to run the application in this process, or
+            ``uvicorn`` to start a local server. Ignored when ``url`` is given.
+        url (str, optional): The base URL of a running server.
+        seed (int): The seed of the synthetic logs and of the upload sizes.
+
+    Returns:
+        list: The summary of each scenario.
+
+    Raises:
+        RuntimeError: If httpx is not installed, or uvicorn fails to start.
+    """
+    if httpx is None:
+        raise RuntimeError("The load test needs httpx: pip install httpx")
+    logs = {
+        size: build_adif(size, seed, header="adif3")
+        for size in sorted(
+            {size for scenario in scenarios for size, _ in scenario.sizes}
+        )
+    }
+    rng = random.Random(seed)
+    timeout = httpx.Timeout(None)
+
+    async def run_all(client, pid):
+        summaries = []
+        for scenario in scenarios:
+            summary = await run_scenario(
+                client, scenario, logs, duration=duration, rng=rng, pid=pid
+            )
+            print(_format_summary(summary), flush=True)
+            summaries.append(summary)
+        return summaries
+
+    if url is not None:
+        async with httpx.AsyncClient(base_url=url, timeout=timeout) as client:
+            return await run_all(client, None)
+
+    if target == "uvicorn":
+        port = _free_port()
+        server = subprocess.Popen(  # pylint: disable=consider-using-with
+            [
+                sys.executable,
+                "-m",
+                "uvicorn",
+                "main:app",
+                "--host",
+                "127.0.0.1",
+                "--port",
+                str(port),
+                "--log-level",
+                "warning",
+            ]
+        )
+        try:
+            async with httpx.AsyncClient(
+                base_url=f"http://127.0.0.1:{port}", timeout=timeout
+            ) as client:
+                await _wait_until_healthy(client, server)
+                return await run_all(client, server.pid)
+        finally:
+            server.terminate()
+            server.wait()
+
+    from main import app  # pylint: disable=import-outside-toplevel
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://load-test", timeout=timeout
+        ) as client:
+            return await run_all(client, os.getpid())
+
+
+def _format_summary(summary):
+    """
+    Describe the summary of a scenario on one line.
+
+    Args:
+        summary (dict): The summary.
+
+    Returns:
+        str: The line.
+    """
+    latency = summary["latency_seconds"] or {}
+    line = (
+        f"{summary['scenario']:<12} c={summary['concurrency']:<3} "
+        f"{summary['throughput_per_second']:8.2f} uploads/s "
+        f"p50 {latency.get('p50', 0) * 1e3:8.1f} ms "
+        f"p99 {latency.get('p99', 0) * 1e3:8.1f} ms "
+        f"errors {summary['error_rate']:6.1%}"
+    )
+    if summary["peak_rss_bytes"] is not None:
+        line += f" rss {summary['peak_rss_bytes'] / 2**20:7.1f} MiB"
+    if summary["cpu_cores"] is not None:
+        line += f" cpu {summary['cpu_cores']:5.2f} cores"
+    return line
+
+
+def main(argv=None):
+    """
+    Run the load test from the command line.
+
+    Args:
+        argv (list, optional): The command-line arguments. Defaults to sys.argv.
+
+    Returns:
+        int: The exit status: 1 if a scenario's error rate is over the limit.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        help="name=sizes@concurrency, such as mixed=100:6,10000:1@8; repeatable",
+    )
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--target", choices=("asgi", "uvicorn"), default="asgi")
+    parser.add_argument("--url", help="load-test a running server instead")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the summaries to this JSON file")
+    parser.add_argument(
+        "--max-error-rate",
+        type=float,
+        help="exit with status 1 if a scenario has more errors than this fraction",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        scenarios = [
+            Scenario.parse(spec) for spec in args.scenario or DEFAULT_SCENARIOS
+        ]
+    except ValueError as exc:
+        parser.error(str(exc))
+    summaries = asyncio.run(
+        run_load_test(scenarios, args.duration, args.target, args.url, args.seed)
+    )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump({"scenarios": summaries}, output, indent=2)
+    if args.max_error_rate is not None and any(
+        summary["error_rate"] > args.max_error_rate for summary in summaries
+    ):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
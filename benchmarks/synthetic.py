@@ -0,0 +1,379 @@
+"""
+Synthetic ADIF Logs
+
+This module generates realistic ADIF logs for benchmarks and tests, from a hundred
+to millions of QSOs. A log is fully determined by its arguments and seed, so a
+benchmark parses the same bytes on every run and every machine.
+
+Logs cover what real logging programs write: no header, a bare ``<EOH>``, or a
+preamble with ADIF 3 header fields and user-defined fields; tag names in lower,
+upper or mixed case, some with a data type; long comments, some over several
+lines; and callsigns worked more than once, including true duplicate QSOs logged
+again minutes later. Values are ASCII so that every backend agrees on field
+lengths.
+"""
+
+import datetime
+import random
+import string
+
+# Header variants: none, a bare <EOH>, ADIF 3 header fields, or a long preamble
+HEADER_VARIANTS = ("none", "minimal", "adif3", "verbose")
+
+# Tag case variants: all lower, all upper, or mixed between and within tags
+TAG_CASES = ("lower", "upper", "mixed")
+
+# Callsign prefixes, weighted roughly by how often they appear in real logs
+_PREFIXES = (
+    ("K", 12),
+    ("W", 12),
+    ("N", 6),
+    ("AA", 2),
+    ("KD", 3),
+    ("VE", 3),
+    ("DL", 6),
+    ("G", 4),
+    ("M0", 2),
+    ("F", 3),
+    ("I", 3),
+    ("EA", 3),
+    ("ON", 1),
+    ("PA", 2),
+    ("OK", 2),
+    ("SP", 2),
+    ("UA", 3),
+    ("JA", 5),
+    ("BV", 1),
+    ("VK", 2),
+    ("ZL", 1),
+    ("PY", 2),
+    ("LU", 1),
+    ("ZS", 1),
+    ("9A", 1),
+)
+
+# Bands with a frequency in MHz within each of them
+_BANDS = (
+    ("160m", 1.840),
+    ("80m", 3.573),
+    ("40m", 7.074),
+    ("30m", 10.136),
+    ("20m", 14.074),
+    ("17m", 18.100),
+    ("15m", 21.074),
+    ("12m", 24.915),
+    ("10m", 28.074),
+    ("6m", 50.313),
+    ("2m", 144.174),
+)
+
+# Modes, weighted, with the reports exchanged in them
+_MODES = (
+    ("FT8", 50, "-10"),
+    ("FT4", 8, "-05"),
+    ("SSB", 20, "59"),
+    ("CW", 15, "599"),
+    ("RTTY", 4, "599"),
+    ("FM", 3, "59"),
+)
+
+_COMMENT_WORDS = (
+    "thanks",
+    "for",
+    "the",
+    "QSO",
+    "nice",
+    "signal",
+    "into",
+    "Europe",
+    "antenna",
+    "dipole",
+    "yagi",
+    "at",
+    "metres",
+    "running",
+    "watts",
+    "weather",
+    "is",
+    "sunny",
+    "contest",
+    "pileup",
+    "73",
+    "and",
+    "good",
+    "DX",
+    "QSL",
+    "via",
+    "bureau",
+    "LoTW",
+)
+
+_NAMES = ("John", "Maria", "Hans", "Yuki", "Pierre", "Anna", "Bob", "Ivan", "Lars")
+
+# Start of the generated logs
+_EPOCH = datetime.datetime(2020, 1, 1, 0, 0, 0)
+
+
+def _callsign(rng):
+    """
+    Make up a callsign.
+
+    Args:
+        rng (random.Random): The source of randomness.
+
+    Returns:
+        str: A callsign such as ``DL4ABC``.
+    """
+    prefix = rng.choices(
+        [prefix for prefix, _ in _PREFIXES], [weight for _, weight in _PREFIXES]
+    )[0]
+    suffix = "".join(rng.choices(string.ascii_uppercase, k=rng.randint(1, 3)))
+    return f"{prefix}{rng.randint(0, 9)}{suffix}"
+
+
+def _comment(rng, length):
+    """
+    Make up a comment of about the given length.
+
+    Args:
+        rng (random.Random): The source of randomness.
+        length (int): The length to reach.
+
+    Returns:
+        str: Words separated by spaces, with a line break now and then.
+    """
+    words = []
+    size = 0
+    while size < length:
+        word = rng.choice(_COMMENT_WORDS)
+        words.append(word)
+        size += len(word) + 1
+        if rng.random() < 0.02:
+            words.append("\r\n")
+    return " ".join(words)[:length].strip()
+
+
+def synthetic_qsos(
+    qso_count,
+    seed=0,
+    *,
+    unique_ratio=0.6,
+    duplicate_rate=0.02,
+    comment_rate=0.3,
+    comment_length=300,
+):
+    """
+    Generate the QSOs of a log as dictionaries of ADIF fields.
+
+    Args:
+        qso_count (int): The number of QSOs.
+        seed (int): The seed of the generator.
+        unique_ratio (float): The number of distinct callsigns worked, as a
+            fraction of the number of QSOs.
+        duplicate_rate (float): The fraction of QSOs that repeat the previous QSO
+            with a station, on the same band and mode, a few minutes later.
+        comment_rate (float): The fraction of QSOs with a comment.
+        comment_length (int): The longest comment, in characters.
+
+    Yields:
+        dict: The fields of each QSO by lowercase ADIF field name.
+    """
+    rng = random.Random(seed)
+    pool = [_callsign(rng) for _ in range(max(1, int(qso_count * unique_ratio)))]
+    mode_weights = [weight for _, weight, _ in _MODES]
+    moment = _EPOCH
+    previous = None
+    for index in range(qso_count):
+        moment += datetime.timedelta(seconds=rng.randint(15, 600))
+        if previous is not None and rng.random() < duplicate_rate:
+            qso = dict(previous)
+        else:
+            # The first pass over the pool works every callsign at least once
+            call = pool[index] if index < len(pool) else rng.choice(pool)
+            band, frequency = rng.choice(_BANDS)
+            mode, _, report = rng.choices(_MODES, mode_weights)[0]
+            qso = {
+                "call": call,
+                "band": band,
+                "freq": f"{frequency + rng.randint(0, 2500) / 1e6:.6f}",
+                "mode": mode,
+                "rst_sent": report,
+                "rst_rcvd": report,
+            }
+            if rng.random() < 0.3:
+                qso["gridsquare"] = (
+                    rng.choice("ABCDEFGHIJKLMNOPQR")
+                    + rng.choice("ABCDEFGHIJKLMNOPQR")
+                    + f"{rng.randint(0, 99):02d}"
+                )
+            if rng.random() < 0.2:
+                qso["name"] = rng.choice(_NAMES)
+        qso["qso_date"] = moment.strftime("%Y%m%d")
+        qso["time_on"] = moment.strftime("%H%M%S")
+        qso.pop("comment", None)
+        if rng.random() < comment_rate:
+            qso["comment"] = _comment(rng, rng.randint(10, comment_length))
+        qso["station_callsign"] = "W1AW"
+        previous = qso
+        yield qso
+
+
+def _tag(name, rng, tag_case):
+    """
+    Write a tag name in the requested case.
+
+    Args:
+        name (str): The lowercase tag name.
+        rng (random.Random): The source of randomness, for mixed case.
+        tag_case (str): One of TAG_CASES.
+
+    Returns:
+        str: The tag name.
+    """
+    if tag_case == "upper":
+        return name.upper()
+    if tag_case == "lower":
+        return name
+    variant = rng.random()
+    if variant < 0.4:
+        return name.upper()
+    if variant < 0.7:
+        return name
+    if variant < 0.9:
+        return name.capitalize()
+    return "".join(rng.choice((char.lower(), char.upper())) for char in name)
+
+
+def _adif_header(header, rng, tag_case):
+    """
+    Write the header of an ADI log.
+
+    Args:
+        header (str): One of HEADER_VARIANTS.
+        rng (random.Random): The source of randomness, for mixed case.
+        tag_case (str): One of TAG_CASES.
+
+    Returns:
+        str: The header, ending with ``<EOH>``, or an empty string for no header.
+    """
+    if header == "none":
+        return ""
+    if header == "minimal":
+        return f"<{_tag('eoh', rng, tag_case)}>\n"
+    # Header fields as (name, data type, value)
+    fields = [
+        ("adif_ver", None, "3.1.4"),
+        ("programid", None, "SyntheticLog"),
+        ("programversion", None, "1.0"),
+        ("created_timestamp", None, "20240101 120000"),
+    ]
+    preamble = "Generated by the ADIF parser service benchmarks\n"
+    if header == "verbose":
+        preamble += (
+            "This log was exported for testing. Fields are written in the order\n"
+            "the logging program keeps them, and some carry a data type.\n" * 5
+        )
+        fields.append(("userdef1", "N", "EPC"))
+        fields.append(("userdef2", "S", "SOTA_REF"))
+    tags = "".join(
+        f"<{_tag(name, rng, tag_case)}:{len(value)}"
+        f"{'' if data_type is None else ':' + data_type}>{value}\n"
+        for name, data_type, value in fields
+    )
+    return f"{preamble}{tags}<{_tag('eoh', rng, tag_case)}>\n"
+
+
+def iter_adif(qso_count, seed=0, header="adif3", tag_case="mixed", **qso_options):
+    """
+    Generate an ADI log a record at a time.
+
+    Args:
+        qso_count (int): The number of QSOs.
+        seed (int): The seed of the generator.
+        header (str): One of HEADER_VARIANTS.
+        tag_case (str): One of TAG_CASES.
+        **qso_options: Options for synthetic_qsos.
+
+    Yields:
+        str: The header, then one record per QSO.
+
+    Raises:
+        ValueError: If the header variant or tag case is not known.
+    """
+    if header not in HEADER_VARIANTS:
+        raise ValueError(f"header must be one of: {', '.join(HEADER_VARIANTS)}")
+    if tag_case not in TAG_CASES:
+        raise ValueError(f"tag_case must be one of: {', '.join(TAG_CASES)}")
+    # Formatting has its own generator, so the QSOs do not depend on the tag case
+    rng = random.Random(seed + 1)
+    yield _adif_header(header, rng, tag_case)
+    for qso in synthetic_qsos(qso_count, seed, **qso_options):
+        fields = []
+        for name, value in qso.items():
+            if name == "qso_date" and rng.random() < 0.1:
+                fields.append(f"<{_tag(name, rng, tag_case)}:{len(value)}:D>{value}")
+            else:
+                fields.append(f"<{_tag(name, rng, tag_case)}:{len(value)}>{value}")
+        yield " ".join(fields) + f" <{_tag('eor', rng, tag_case)}>\n"
+
+
+def build_adif(qso_count, seed=0, **options):
+    """
+    Generate an ADI log in memory.
+
+    Args:
+        qso_count (int): The number of QSOs.
+        seed (int): The seed of the generator.
+        **options: Options for iter_adif.
+
+    Returns:
+        bytes: The log, UTF-8 encoded.
+    """
+    return "".join(iter_adif(qso_count, seed, **options)).encode("utf-8")
+
+
+def write_adif(path, qso_count, seed=0, **options):
+    """
+    Generate an ADI log into a file without holding it in memory.
+
+    Args:
+        path (str): The path of the file to write.
+        qso_count (int): The number of QSOs.
+        seed (int): The seed of the generator.
+        **options: Options for iter_adif.
+
+    Returns:
+        int: The size of the file in bytes.
+    """
+    size = 0
+    with open(path, "wb") as log:
+        for chunk in iter_adif(qso_count, seed, **options):
+            data = chunk.encode("utf-8")
+            log.write(data)
+            size += len(data)
+    return size
+
+
+def build_adx(qso_count, seed=0, **qso_options):
+    """
+    Generate an ADX (XML) log in memory, with the same QSOs as build_adif.
+
+    Args:
+        qso_count (int): The number of QSOs.
+        seed (int): The seed of the generator.
+        **qso_options: Options for synthetic_qsos.
+
+    Returns:
+        bytes: The log, UTF-8 encoded.
+    """
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8"?>\n<ADX>\n<HEADER><ADIF_VER>3.1.4'
+        "</ADIF_VER><PROGRAMID>SyntheticLog</PROGRAMID></HEADER>\n<RECORDS>\n"
+    ]
+    for qso in synthetic_qsos(qso_count, seed, **qso_options):
+        fields = "".join(
+            f"<{name.upper()}>{value}</{name.upper()}>" for name, value in qso.items()
+        )
+        parts.append(f"<RECORD>{fields}</RECORD>\n")
+    parts.append("</RECORDS>\n</ADX>\n")
+    return "".join(parts).encode("utf-8")
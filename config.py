@@ -0,0 +1,345 @@
+"""
+Configuration Module
+
+This module provides the runtime settings for the ADIF Parser Service. Settings are
+read from environment variables so that they can be changed per deployment without
+modifying the code.
+
+The settings of each part of the service, such as the parse executor or admission
+control, are grouped in an object of their own, available as an attribute of
+Settings.
+"""
+
+import os
+
+from repositories.adif_repository import DEFAULT_CHUNK_SIZE, DEFAULT_FALLBACK_ENCODING
+from services.memory_budget import derive_memory_budget
+
+
+def _read_flag(environ, name, default):
+    """
+    Read a boolean environment variable.
+
+    Args:
+        environ (dict): The environment to read from.
+        name (str): The name of the variable.
+        default (str): The value used when the variable is not set.
+
+    Returns:
+        bool: True for ``1``, ``true``, ``yes`` or ``on``, in any case.
+    """
+    return environ.get(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+
+class BackendSettings:
+    """
+    Settings of the ADIF repository backends.
+
+    Attributes:
+        name (str): The name of the ADIF repository backend to use, or ``auto`` to
+            choose one for each upload by its size and by how fast each backend has
+            parsed uploads of that size (``ADIF_BACKEND``, default ``adif_io``).
+        candidates (list): The backends ``auto`` chooses from, in order of
+            preference (``ADIF_BACKEND_CANDIDATES``, default ``scanner,adif_io``).
+        min_samples (int): The number of timings of a backend in a size class
+            before ``auto`` trusts them (``ADIF_BACKEND_MIN_SAMPLES``, default 5).
+        explore_rate (float): The fraction of uploads ``auto`` sends to the backend
+            with the fewest timings for their size (``ADIF_BACKEND_EXPLORE_RATE``,
+            default 0.05).
+        fallback_encoding (str): The encoding for field values that are not valid
+            UTF-8; empty rejects such files (``ADIF_FALLBACK_ENCODING``, default
+            ``latin-1``).
+    """
+
+    def __init__(self, environ):
+        """
+        Initialize the settings from environment variables.
+
+        Args:
+            environ (dict): The environment to read from.
+        """
+        self.name = environ.get("ADIF_BACKEND", "adif_io").strip().lower()
+        self.candidates = [
+            name.strip().lower()
+            for name in environ.get("ADIF_BACKEND_CANDIDATES", "scanner,adif_io").split(
+                ","
+            )
+            if name.strip()
+        ]
+        self.min_samples = int(environ.get("ADIF_BACKEND_MIN_SAMPLES", 5))
+        self.explore_rate = float(environ.get("ADIF_BACKEND_EXPLORE_RATE", 0.05))
+        self.fallback_encoding = environ.get(
+            "ADIF_FALLBACK_ENCODING", DEFAULT_FALLBACK_ENCODING
+        ).strip()
+
+
+class ParsingSettings:
+    """
+    Settings of how an upload is parsed and counted.
+
+    Attributes:
+        chunk_size (int): The number of bytes read from an upload per call
+            (``ADIF_STREAM_CHUNK_SIZE``).
+        counting_mode (str): The default engine for counting distinct callsigns,
+            ``exact`` or ``approximate`` (``ADIF_COUNTING_MODE``, default ``exact``).
+        packed_callsigns (bool): Whether exact counting keeps callsigns packed into
+            64-bit integers rather than as strings (``ADIF_PACKED_CALLSIGNS``,
+            default ``true``).
+        memory_budget_bytes (int): The most memory parsing one request may use
+            before it is aborted; 0 disables the budget. Set directly with
+            ``ADIF_MEMORY_BUDGET_BYTES``, or derived as ``ADIF_MEMORY_BUDGET_FRACTION``
+            (default 0.5) of the container memory limit divided by the number of
+            concurrent parses.
+        max_decompression_ratio (float): How many times its compressed size a
+            gzip or zstd upload may expand to before it is rejected as a
+            decompression bomb; 0 disables the guard
+            (``ADIF_MAX_DECOMPRESSION_RATIO``, default 50).
+        duplicate_window_minutes (int): How close in time two QSOs with the same
+            callsign, band and mode must be for the later one to count as a
+            duplicate; 0 compares them by date only
+            (``ADIF_DUPLICATE_WINDOW_MINUTES``, default 10).
+    """
+
+    def __init__(self, environ, max_concurrent_parses):
+        """
+        Initialize the settings from environment variables.
+
+        Args:
+            environ (dict): The environment to read from.
+            max_concurrent_parses (int): The number of uploads parsed at once, which
+                share the memory the budget is derived from.
+        """
+        self.chunk_size = int(environ.get("ADIF_STREAM_CHUNK_SIZE", DEFAULT_CHUNK_SIZE))
+        self.counting_mode = environ.get("ADIF_COUNTING_MODE", "exact").strip().lower()
+        self.packed_callsigns = _read_flag(environ, "ADIF_PACKED_CALLSIGNS", "true")
+        self.memory_budget_bytes = derive_memory_budget(environ, max_concurrent_parses)
+        self.max_decompression_ratio = float(
+            environ.get("ADIF_MAX_DECOMPRESSION_RATIO", 50)
+        )
+        self.duplicate_window_minutes = int(
+            environ.get("ADIF_DUPLICATE_WINDOW_MINUTES", 10)
+        )
+
+
+class ExecutorSettings:
+    """
+    Settings of the parse executor.
+
+    Attributes:
+        kind (str): Where parsing runs, ``process`` or ``thread``
+            (``ADIF_EXECUTOR``, default ``process``).
+        workers (int): The number of parse workers; 0 uses the available CPUs
+            (``ADIF_EXECUTOR_WORKERS``).
+        queue_depth (int): The number of parse jobs that may wait for a worker
+            before uploads are rejected (``ADIF_EXECUTOR_QUEUE_DEPTH``).
+        parallel_threshold_bytes (int): The upload size from which a file is split
+            into chunks parsed in parallel by the process pool; 0 disables it
+            (``ADIF_PARALLEL_THRESHOLD_BYTES``, default 64 MiB).
+    """
+
+    def __init__(self, environ):
+        """
+        Initialize the settings from environment variables.
+
+        Args:
+            environ (dict): The environment to read from.
+        """
+        self.kind = environ.get("ADIF_EXECUTOR", "process").strip().lower()
+        self.workers = int(environ.get("ADIF_EXECUTOR_WORKERS", 0))
+        self.queue_depth = int(environ.get("ADIF_EXECUTOR_QUEUE_DEPTH", 16))
+        self.parallel_threshold_bytes = int(
+            environ.get("ADIF_PARALLEL_THRESHOLD_BYTES", 64 * 1024 * 1024)
+        )
+
+
+class CacheSettings:
+    """
+    Settings of the result cache.
+
+    Attributes:
+        max_bytes (int): The size budget of the in-process result cache; 0 disables
+            the cache (``ADIF_RESULT_CACHE_BYTES``).
+        path (str): The path of a SQLite database shared by the workers on a node as
+            a second cache tier; empty disables it (``ADIF_RESULT_CACHE_PATH``).
+        disk_max_bytes (int): The size budget of the SQLite tier; 0 disables the
+            limit (``ADIF_RESULT_CACHE_DISK_BYTES``).
+    """
+
+    def __init__(self, environ):
+        """
+        Initialize the settings from environment variables.
+
+        Args:
+            environ (dict): The environment to read from.
+        """
+        self.max_bytes = int(environ.get("ADIF_RESULT_CACHE_BYTES", 16 * 1024 * 1024))
+        self.path = environ.get("ADIF_RESULT_CACHE_PATH", "")
+        self.disk_max_bytes = int(
+            environ.get("ADIF_RESULT_CACHE_DISK_BYTES", 256 * 1024 * 1024)
+        )
+
+
+class AdmissionSettings:
+    """
+    Settings of admission control.
+
+    Attributes:
+        max_concurrent_parses (int): The number of uploads parsed at once before
+            further uploads are rejected; 0 disables the limit
+            (``ADIF_MAX_CONCURRENT_PARSES``, default 4).
+        max_inflight_bytes (int): The total size of the uploads parsed at once
+            before further uploads are rejected; 0 disables the limit
+            (``ADIF_MAX_INFLIGHT_BYTES``, default 256 MiB).
+        max_upload_bytes (int): The size of the largest upload accepted; 0 disables
+            the limit (``ADIF_MAX_UPLOAD_BYTES``, default 200 MiB).
+        retry_after_seconds (int): The ``Retry-After`` sent with rejected uploads
+            (``ADIF_RETRY_AFTER_SECONDS``, default 2).
+    """
+
+    def __init__(self, environ):
+        """
+        Initialize the settings from environment variables.
+
+        Args:
+            environ (dict): The environment to read from.
+        """
+        self.max_concurrent_parses = int(environ.get("ADIF_MAX_CONCURRENT_PARSES", 4))
+        self.max_inflight_bytes = int(
+            environ.get("ADIF_MAX_INFLIGHT_BYTES", 256 * 1024 * 1024)
+        )
+        self.max_upload_bytes = int(
+            environ.get("ADIF_MAX_UPLOAD_BYTES", 200 * 1024 * 1024)
+        )
+        self.retry_after_seconds = int(environ.get("ADIF_RETRY_AFTER_SECONDS", 2))
+
+
+class JobSettings:
+    """
+    Settings of the background jobs.
+
+    Attributes:
+        workers (int): The number of background jobs processed at once
+            (``ADIF_JOB_WORKERS``, default 2).
+        queue_limit (int): The number of background jobs that may wait for a worker
+            before new jobs are rejected (``ADIF_JOB_QUEUE_LIMIT``, default 64).
+        storage_path (str): The directory background job uploads are stored in;
+            empty uses the system temporary directory (``ADIF_JOB_STORAGE_PATH``).
+        retention (int): The number of finished jobs kept for lookup
+            (``ADIF_JOB_RETENTION``, default 1000).
+        busy_timeout (float): How many seconds a job may wait for room to parse
+            before it fails (``ADIF_JOB_BUSY_TIMEOUT_SECONDS``, default 300).
+    """
+
+    def __init__(self, environ):
+        """
+        Initialize the settings from environment variables.
+
+        Args:
+            environ (dict): The environment to read from.
+        """
+        self.workers = int(environ.get("ADIF_JOB_WORKERS", 2))
+        self.queue_limit = int(environ.get("ADIF_JOB_QUEUE_LIMIT", 64))
+        self.storage_path = environ.get("ADIF_JOB_STORAGE_PATH", "")
+        self.retention = int(environ.get("ADIF_JOB_RETENTION", 1000))
+        self.busy_timeout = float(environ.get("ADIF_JOB_BUSY_TIMEOUT_SECONDS", 300))
+
+
+class TracingSettings:
+    """
+    Settings of upload tracing.
+
+    Attributes:
+        export (str): Where sampled traces are written as OTLP JSON, one trace per
+            line: a file path, or ``-`` for standard output; empty disables tracing
+            (``ADIF_TRACE_EXPORT``).
+        sample_rate (float): The fraction of uploads traced, decided when an upload
+            arrives (``ADIF_TRACE_SAMPLE_RATE``, default 0.01).
+    """
+
+    def __init__(self, environ):
+        """
+        Initialize the settings from environment variables.
+
+        Args:
+            environ (dict): The environment to read from.
+        """
+        self.export = environ.get("ADIF_TRACE_EXPORT", "").strip()
+        self.sample_rate = float(environ.get("ADIF_TRACE_SAMPLE_RATE", 0.01))
+
+
+class ProfilingSettings:
+    """
+    Settings of upload profiling.
+
+    Attributes:
+        token (str): The secret sent in the ``X-Profile-Token`` header to profile an
+            upload or download profiles; empty disables profiling
+            (``ADIF_PROFILE_TOKEN``).
+        sample_rate (float): The fraction of uploads profiled at random while
+            profiling is enabled (``ADIF_PROFILE_SAMPLE_RATE``, default 0).
+        retention (int): The number of recent profiles kept for download
+            (``ADIF_PROFILE_RETENTION``, default 20).
+    """
+
+    def __init__(self, environ):
+        """
+        Initialize the settings from environment variables.
+
+        Args:
+            environ (dict): The environment to read from.
+        """
+        self.token = environ.get("ADIF_PROFILE_TOKEN", "").strip()
+        self.sample_rate = float(environ.get("ADIF_PROFILE_SAMPLE_RATE", 0))
+        self.retention = int(environ.get("ADIF_PROFILE_RETENTION", 20))
+
+
+class Settings:
+    """
+    Runtime settings for the ADIF Parser Service.
+
+    Attributes:
+        backend (BackendSettings): The ADIF repository backends.
+        parsing (ParsingSettings): How an upload is parsed and counted.
+        executor (ExecutorSettings): The parse executor.
+        cache (CacheSettings): The result cache.
+        admission (AdmissionSettings): Admission control.
+        jobs (JobSettings): The background jobs.
+        tracing (TracingSettings): Upload tracing.
+        profiling (ProfilingSettings): Upload profiling.
+        callsign_store_path (str): The path of the SQLite database holding each
+            operator's cumulative callsigns; empty disables cumulative uploads
+            (``ADIF_CALLSIGN_STORE_PATH``).
+        batch_max_files (int): The most ADIF files a batch upload may hold, counting
+            each member of a ZIP archive; 0 disables the limit
+            (``ADIF_BATCH_MAX_FILES``, default 100).
+    """
+
+    def __init__(self, environ=None):
+        """
+        Initialize the settings from environment variables.
+
+        Args:
+            environ (dict, optional): The environment to read from. Defaults to
+                ``os.environ``.
+        """
+        environ = os.environ if environ is None else environ
+        self.backend = BackendSettings(environ)
+        self.executor = ExecutorSettings(environ)
+        self.cache = CacheSettings(environ)
+        self.admission = AdmissionSettings(environ)
+        self.parsing = ParsingSettings(environ, self.admission.max_concurrent_parses)
+        self.jobs = JobSettings(environ)
+        self.tracing = TracingSettings(environ)
+        self.profiling = ProfilingSettings(environ)
+        self.callsign_store_path = environ.get("ADIF_CALLSIGN_STORE_PATH", "")
+        self.batch_max_files = int(environ.get("ADIF_BATCH_MAX_FILES", 100))
+
+
+def get_settings():
+    """
+    Get the settings for the current environment.
+
+    Returns:
+        Settings: The runtime settings.
+    """
+    return Settings()
@@ -5,6 +5,7 @@ This module sets up the test environment, including mocking dependencies
 that might not be available during testing.
 """
 
+import importlib.util
 import sys
 from unittest.mock import MagicMock
 
@@ -18,14 +19,14 @@ def pytest_configure(config):
 
         @staticmethod
         def read_from_string(content):
-            """Mock read_from_string method."""
+            """Mock read_from_string method, returning the QSOs and the header."""
             if not content:
-                return []
+                return [], {}
             # Check for multiple callsigns in the content
             if "EF2GH" in content:
-                return [{"call": "AB1CD"}, {"call": "EF2GH"}]
+                return [{"CALL": "AB1CD"}, {"CALL": "EF2GH"}], {}
             # Simple mock parsing that returns a list with a single record
-            return [{"call": "AB1CD"}]
+            return [{"CALL": "AB1CD"}], {}
 
     class MockFastAPI:
         """Mock for FastAPI class."""
@@ -49,6 +50,9 @@ def pytest_configure(config):
 
             return decorator
 
+        def add_middleware(self, middleware, **kwargs):
+            """Mock middleware registration."""
+
     class MockFile:
         """Mock for File class."""
 
@@ -67,9 +71,10 @@ def pytest_configure(config):
     class MockHTTPException(Exception):
         """Mock for HTTPException class."""
 
-        def __init__(self, status_code=400, detail="Error"):
+        def __init__(self, status_code=400, detail="Error", headers=None):
             self.status_code = status_code
             self.detail = detail
+            self.headers = headers
 
     class MockJSONResponse:
         """Mock for JSONResponse class."""
@@ -144,6 +149,10 @@ def pytest_configure(config):
         "fastapi.testclient": MagicMock(TestClient=MockTestClient),
     }
 
+    # The real adif_io is used when it is installed, so its tests run against it
+    if importlib.util.find_spec("adif_io") is not None:
+        del mock_modules["adif_io"]
+
     for mod_name, mock in mock_modules.items():
         if mod_name not in sys.modules:
             sys.modules[mod_name] = mock
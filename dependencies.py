@@ -4,19 +4,134 @@ Dependencies module for the ADIF Parser Service.
 This module provides dependency injection functions for FastAPI.
 """
 
-from repositories.adif_repository import AdifIoRepository
+import codecs
+
+from config import get_settings
+from repositories.registry import AUTO, BackendSelector, default_registry
 from services.adif_service import AdifService
+from services.admission import AdmissionController
 from services.award_service import AwardService
+from services.batch_service import BatchService
+from services.callsign_store import CallsignStore
+from services.executor import ParseExecutor
+from services.job_scheduler import JobScheduler
+from services.metrics import add_parse_listener
+from services.profiling import Profiler
+from services.result_cache import ResultCache
+from services.tracing import JsonSpanExporter, Tracer
+
+# ADIF repository backends selectable through the ADIF_BACKEND setting
+ADIF_BACKENDS = default_registry()
+
+_parse_executor = None
+_result_cache = None
+_job_scheduler = None
+_admission_controller = None
+_callsign_store = None
+_tracer = None
+_profiler = None
+_backend_selector = None
+
+
+def _fallback_encoding(settings):
+    """
+    Get the configured fallback encoding of the ADIF repositories.
+
+    Args:
+        settings (Settings): The runtime settings.
+
+    Returns:
+        str: The encoding, or None if the fallback is disabled.
+
+    Raises:
+        ValueError: If the encoding is not known.
+    """
+    fallback_encoding = settings.backend.fallback_encoding or None
+    if fallback_encoding:
+        try:
+            codecs.lookup(fallback_encoding)
+        except LookupError as exc:
+            raise ValueError(
+                f"Unknown fallback encoding '{settings.backend.fallback_encoding}'"
+            ) from exc
+    return fallback_encoding
+
+
+def get_adif_repository(settings=None):
+    """
+    Get an instance of the configured ADIF repository.
+
+    With the ``auto`` backend, this is the preferred available candidate, which
+    parses the uploads the backend selector does not choose for.
+
+    Args:
+        settings (Settings, optional): The runtime settings. Defaults to the
+            settings read from the environment.
+
+    Returns:
+        AdifRepository: A repository for ADIF data.
+
+    Raises:
+        ValueError: If the configured backend or fallback encoding is not known.
+    """
+    settings = settings or get_settings()
+    name = settings.backend.name
+    if name == AUTO:
+        name = BackendSelector(ADIF_BACKENDS, settings.backend.candidates).candidates[0]
+    backend = ADIF_BACKENDS.get(name)
+    return backend.factory(fallback_encoding=_fallback_encoding(settings))
+
+
+def get_adif_backends(settings=None):
+    """
+    Get an instance of every available ADIF repository backend.
 
+    Args:
+        settings (Settings, optional): The runtime settings. Defaults to the
+            settings read from the environment.
+
+    Returns:
+        dict: The repositories by backend name.
 
-def get_adif_repository():
+    Raises:
+        ValueError: If the fallback encoding is not known.
     """
-    Get an instance of the ADIF repository.
+    settings = settings or get_settings()
+    fallback_encoding = _fallback_encoding(settings)
+    return {
+        backend.name: backend.factory(fallback_encoding=fallback_encoding)
+        for backend in ADIF_BACKENDS.available()
+    }
+
+
+def get_backend_selector(settings=None):
+    """
+    Get the backend selector shared by the application.
+
+    The selector learns from the timing of every parse, including parses in process
+    workers, through the metrics observations.
+
+    Args:
+        settings (Settings, optional): The runtime settings. Defaults to the
+            settings read from the environment.
 
     Returns:
-        AdifIoRepository: A repository for ADIF data.
+        BackendSelector: The selector, or None unless the backend is ``auto``.
+
+    Raises:
+        ValueError: If a candidate backend is not known, or none is available.
     """
-    return AdifIoRepository()
+    global _backend_selector  # pylint: disable=global-statement
+    settings = settings or get_settings()
+    if _backend_selector is None and settings.backend.name == AUTO:
+        _backend_selector = BackendSelector(
+            ADIF_BACKENDS,
+            settings.backend.candidates,
+            min_samples=settings.backend.min_samples,
+            explore_rate=settings.backend.explore_rate,
+        )
+        add_parse_listener(_backend_selector.observe_parse)
+    return _backend_selector
 
 
 def get_award_service():
@@ -29,12 +144,175 @@ def get_award_service():
     return AwardService()
 
 
+def get_parse_executor(settings=None):
+    """
+    Get the parse executor shared by the application.
+
+    The executor is created on first use; its workers are started by the
+    application lifespan.
+
+    Args:
+        settings (Settings, optional): The runtime settings. Defaults to the
+            settings read from the environment.
+
+    Returns:
+        ParseExecutor: The executor used to run parsing off the event loop.
+    """
+    global _parse_executor  # pylint: disable=global-statement
+    if _parse_executor is None:
+        settings = settings or get_settings()
+        _parse_executor = ParseExecutor(
+            kind=settings.executor.kind,
+            max_workers=settings.executor.workers or None,
+            max_queue_depth=settings.executor.queue_depth,
+            chunk_size=settings.parsing.chunk_size,
+        )
+    return _parse_executor
+
+
+def get_result_cache(settings=None):
+    """
+    Get the result cache shared by the application.
+
+    Args:
+        settings (Settings, optional): The runtime settings. Defaults to the
+            settings read from the environment.
+
+    Returns:
+        ResultCache: The result cache, or None if caching is disabled.
+    """
+    global _result_cache  # pylint: disable=global-statement
+    settings = settings or get_settings()
+    if _result_cache is None and settings.cache.max_bytes > 0:
+        _result_cache = ResultCache(
+            settings.cache.max_bytes,
+            settings.cache.path or None,
+            settings.cache.disk_max_bytes,
+        )
+    return _result_cache
+
+
+def get_job_scheduler(settings=None):
+    """
+    Get the background job scheduler shared by the application.
+
+    Args:
+        settings (Settings, optional): The runtime settings. Defaults to the
+            settings read from the environment.
+
+    Returns:
+        JobScheduler: The scheduler for uploads processed as background jobs.
+    """
+    global _job_scheduler  # pylint: disable=global-statement
+    if _job_scheduler is None:
+        settings = settings or get_settings()
+        _job_scheduler = JobScheduler(
+            storage_dir=settings.jobs.storage_path or None,
+            max_workers=settings.jobs.workers,
+            max_queue=settings.jobs.queue_limit,
+            retention=settings.jobs.retention,
+            chunk_size=settings.parsing.chunk_size,
+            busy_timeout=settings.jobs.busy_timeout,
+        )
+    return _job_scheduler
+
+
+def get_admission_controller(settings=None):
+    """
+    Get the admission controller shared by the application.
+
+    Args:
+        settings (Settings, optional): The runtime settings. Defaults to the
+            settings read from the environment.
+
+    Returns:
+        AdmissionController: The controller bounding concurrent parsing work.
+    """
+    global _admission_controller  # pylint: disable=global-statement
+    if _admission_controller is None:
+        settings = settings or get_settings()
+        _admission_controller = AdmissionController(
+            max_concurrent=settings.admission.max_concurrent_parses,
+            max_inflight_bytes=settings.admission.max_inflight_bytes,
+            max_upload_bytes=settings.admission.max_upload_bytes,
+            retry_after=settings.admission.retry_after_seconds,
+        )
+    return _admission_controller
+
+
+def get_callsign_store(settings=None):
+    """
+    Get the per-operator callsign store shared by the application.
+
+    Args:
+        settings (Settings, optional): The runtime settings. Defaults to the
+            settings read from the environment.
+
+    Returns:
+        CallsignStore: The callsign store, or None if cumulative uploads are
+        disabled.
+    """
+    global _callsign_store  # pylint: disable=global-statement
+    settings = settings or get_settings()
+    if _callsign_store is None and settings.callsign_store_path:
+        _callsign_store = CallsignStore(settings.callsign_store_path)
+    return _callsign_store
+
+
+def get_tracer(settings=None):
+    """
+    Get the tracer shared by the application.
+
+    Args:
+        settings (Settings, optional): The runtime settings. Defaults to the
+            settings read from the environment.
+
+    Returns:
+        Tracer: The tracer, which traces nothing unless a trace export is set.
+    """
+    global _tracer  # pylint: disable=global-statement
+    if _tracer is None:
+        settings = settings or get_settings()
+        exporter = None
+        if settings.tracing.export:
+            exporter = JsonSpanExporter(settings.tracing.export)
+        _tracer = Tracer(exporter, settings.tracing.sample_rate)
+    return _tracer
+
+
+def get_profiler(settings=None):
+    """
+    Get the profiler shared by the application.
+
+    Args:
+        settings (Settings, optional): The runtime settings. Defaults to the
+            settings read from the environment.
+
+    Returns:
+        Profiler: The profiler, which profiles nothing unless a token is set.
+    """
+    global _profiler  # pylint: disable=global-statement
+    if _profiler is None:
+        settings = settings or get_settings()
+        _profiler = Profiler(
+            settings.profiling.token,
+            settings.profiling.sample_rate,
+            settings.profiling.retention,
+        )
+    return _profiler
+
+
 def get_adif_service(
     repository=get_adif_repository(), award_service=get_award_service()
 ):
     """
     Get an instance of the ADIF service.
 
+    The service runs its parsing on the shared parse executor, keeps results in
+    the shared result cache and accumulates callsigns in the shared store. Uploads
+    may ask for any available backend, and with the ``auto`` backend the shared
+    selector chooses one for the others.
+
     Args:
         repository: A repository for ADIF data.
         award_service: A service for determining award tiers.
@@ -42,4 +320,36 @@ def get_adif_service(
     Returns:
         AdifService: A service for processing ADIF files.
     """
-    return AdifService(repository, award_service)
+    settings = get_settings()
+    return AdifService(
+        repository,
+        award_service,
+        get_parse_executor(),
+        get_result_cache(),
+        packed_callsigns=settings.parsing.packed_callsigns,
+        parallel_threshold=settings.executor.parallel_threshold_bytes,
+        memory_budget=settings.parsing.memory_budget_bytes,
+        callsign_store=get_callsign_store(),
+        max_decompression_ratio=settings.parsing.max_decompression_ratio,
+        duplicate_window_minutes=settings.parsing.duplicate_window_minutes,
+        backends=get_adif_backends(),
+        backend_selector=get_backend_selector(),
+    )
+
+
+def get_batch_service():
+    """
+    Get an instance of the batch service.
+
+    Batches are parsed with the repositories, executor and settings of the ADIF
+    service.
+
+    Returns:
+        BatchService: A service for processing batch uploads.
+    """
+    settings = get_settings()
+    return BatchService(
+        get_adif_service(),
+        settings.batch_max_files,
+        settings.admission.max_upload_bytes,
+    )
@@ -6,9 +6,14 @@ callsign data. The application provides endpoints for uploading and processing
 ADIF files, checking service health, and displaying welcome information.
 """
 
+import functools
+from collections.abc import Mapping
+from contextlib import asynccontextmanager
+from typing import List
+
 try:
-    from fastapi import Depends, FastAPI, File, HTTPException, UploadFile
-    from fastapi.responses import JSONResponse
+    from fastapi import Depends, FastAPI, File, Header, HTTPException, UploadFile
+    from fastapi.responses import JSONResponse, Response
 except ImportError:
     # Mock for testing when fastapi is not available
     class MockClass:
@@ -26,30 +31,450 @@ except ImportError:
         def post(self, *args, **kwargs):
             return self
 
+        def add_middleware(self, *args, **kwargs):
+            """Mock middleware registration."""
+
     class MockException(Exception):
         """Base exception class for mock exceptions."""
 
     class MockHTTPException(MockException):
         """Mock exception class for HTTPException."""
 
-        def __init__(self, status_code=400, detail="Error"):
+        def __init__(self, status_code=400, detail="Error", headers=None):
             self.status_code = status_code
             self.detail = detail
+            self.headers = headers
             super().__init__(f"{status_code}: {detail}")
 
-    FastAPI = File = UploadFile = MockClass
+    FastAPI = File = Header = UploadFile = MockClass
     HTTPException = MockHTTPException
-    JSONResponse = MockClass
+    JSONResponse = Response = MockClass
 
 # Third party imports
-from dependencies import get_adif_service
-from services.adif_service import AdifService
+from config import get_settings
+from dependencies import (
+    ADIF_BACKENDS,
+    get_adif_service,
+    get_admission_controller,
+    get_award_service,
+    get_backend_selector,
+    get_batch_service,
+    get_callsign_store,
+    get_job_scheduler,
+    get_parse_executor,
+    get_profiler,
+    get_result_cache,
+    get_tracer,
+)
+from repositories.adx_repository import AdxFormatError
+from repositories.registry import UnknownBackendError
+from services.adif_service import (
+    ADI,
+    AdifService,
+    file_format_for,
+    format_adif_result,
+    stream_size,
+)
+from services.admission import (
+    AdmissionBusyError,
+    AdmissionMiddleware,
+    UploadTooLargeError,
+)
+from services.aggregators import UnknownAggregateError, parse_aggregates
+from services.batch_service import BatchService, BatchTooLargeError
+from services.callsign_store import MissingOperatorError
+from services.counting import COUNTING_MODES
+from services.decompression import (
+    CorruptCompressedDataError,
+    DecompressionBombError,
+    UnsupportedCompressionError,
+    compression_for,
+)
+from services.executor import ExecutorBusyError
+from services.job_scheduler import JobQueueFullError
+from services.memory_budget import MemoryBudgetExceededError
+from services.metrics import CONTENT_TYPE, REGISTRY, Gauge
+from services.profiling import ProfileAuthError
+from services.result_cache import DigestMismatchError, is_sha256_digest
+from services.tracing import current_span, traced
+
+# Upload modes: a one-off result, or a merge into the operator's cumulative set
+UPLOAD_MODES = ("single", "cumulative")
+
+
+@asynccontextmanager
+async def lifespan(_app):
+    """
+    Start the parse workers with the application and stop them, and any background
+    jobs, on shutdown.
+
+    Args:
+        _app: The FastAPI application.
+    """
+    executor = get_parse_executor()
+    executor.start()
+    try:
+        yield
+    finally:
+        await get_job_scheduler().shutdown()
+        executor.shutdown()
+        get_tracer().close()
+
 
 app = FastAPI(
     title="ADIF Parser Service",
     description="Service to parse ADIF files and extract callsign data",
     version="1.0.0",
+    lifespan=lifespan,
 )
+# Turn uploads away on their declared size and the load before their bodies are read
+app.add_middleware(
+    AdmissionMiddleware,
+    get_controller=get_admission_controller,
+    parse_paths=("/upload_adif/", "/upload_adif/batch"),
+    size_paths=("/jobs",),
+)
+
+
+REGISTRY.register(
+    Gauge(
+        "adif_parses_in_flight",
+        "Uploads being parsed, as admitted by admission control.",
+        lambda: get_admission_controller().stats()["active"],
+    )
+)
+REGISTRY.register(
+    Gauge(
+        "adif_inflight_bytes",
+        "Bytes of the uploads being parsed.",
+        lambda: get_admission_controller().stats()["inflight_bytes"],
+    )
+)
+REGISTRY.register(
+    Gauge(
+        "adif_executor_jobs_in_flight",
+        "Jobs running on the parse executor or waiting for a worker.",
+        lambda: get_parse_executor().in_flight,
+    )
+)
+REGISTRY.register(
+    Gauge(
+        "adif_jobs_queued",
+        "Background jobs waiting for a worker or being stored.",
+        lambda: get_job_scheduler().queued,
+    )
+)
+
+
+def _validate_upload(file, adif_service):
+    """
+    Check that an upload is present and named like an ADIF file.
+
+    Args:
+        file (UploadFile): The uploaded file.
+        adif_service (AdifService): The service for processing ADIF files.
+
+    Raises:
+        HTTPException: If the file is missing or is not an ADIF file.
+    """
+    if not file:
+        raise HTTPException(status_code=400, detail="No file provided")
+
+    if not adif_service.is_valid_adif_file(file.filename):
+        raise HTTPException(
+            status_code=400,
+            detail="File must be an ADIF file (.adi, .adif or .adx), optionally "
+            "compressed with gzip (.gz) or zstd (.zst)",
+        )
+
+
+def _upload_compression(file):
+    """
+    Work out how an upload is compressed, from its Content-Encoding or file name.
+
+    Args:
+        file (UploadFile): The uploaded file.
+
+    Returns:
+        str: ``gzip`` or ``zstd``, or None if the upload is not compressed.
+
+    Raises:
+        HTTPException: If the Content-Encoding is not supported.
+    """
+    headers = getattr(file, "headers", None)
+    content_encoding = None
+    if isinstance(headers, Mapping):
+        content_encoding = headers.get("content-encoding")
+    try:
+        return compression_for(file.filename, content_encoding)
+    except UnsupportedCompressionError as exc:
+        raise HTTPException(status_code=415, detail=str(exc)) from exc
+
+
+def _busy_exception(detail, retry_after):
+    """
+    Build the response for an upload turned away for lack of capacity.
+
+    Args:
+        detail (str): The message for the client.
+        retry_after (int): The number of seconds the client should wait.
+
+    Returns:
+        HTTPException: A 503 response carrying a ``Retry-After`` header.
+    """
+    return HTTPException(
+        status_code=503, detail=detail, headers={"Retry-After": str(retry_after)}
+    )
+
+
+def _too_large_exception(exc):
+    """
+    Build the response for an upload over the size cap.
+
+    Args:
+        exc (UploadTooLargeError): The admission error.
+
+    Returns:
+        HTTPException: A 413 response carrying a ``Retry-After`` header.
+    """
+    return HTTPException(
+        status_code=413,
+        detail=f"The file is too large. {exc}",
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+async def _process_admitted(
+    adif_service, counting_mode, compression, file_format, stream
+):
+    """
+    Process an ADIF stream once admission control lets it through.
+
+    Args:
+        adif_service (AdifService): The service for processing ADIF files.
+        counting_mode (str): The engine for counting distinct callsigns.
+        compression (str): ``gzip`` or ``zstd`` if the file is compressed.
+        file_format (str): ``adi``, or ``adx`` for an ADX (XML) file.
+        stream: A seekable binary stream holding the ADIF file.
+
+    Returns:
+        dict: The result of parsing the ADIF file.
+
+    Raises:
+        UploadTooLargeError: If the file is larger than the size cap.
+        AdmissionBusyError: If the replica is already parsing as much as it may.
+    """
+    with get_admission_controller().admit(stream_size(stream)):
+        return await adif_service.process_adif_stream_async(
+            stream,
+            counting_mode=counting_mode,
+            compression=compression,
+            file_format=file_format,
+        )
+
+
+def _authorize_profiling(profile_token):
+    """
+    Check the profiling token sent by a client.
+
+    Args:
+        profile_token (str): The ``X-Profile-Token`` header. Anything but a string,
+            such as None when the header is missing, means it was not sent.
+
+    Returns:
+        bool: True if the client sent the token, False if it sent none.
+
+    Raises:
+        HTTPException: If profiling is disabled or the token is wrong.
+    """
+    if not isinstance(profile_token, str):
+        return False
+    try:
+        get_profiler().authorize(profile_token)
+    except ProfileAuthError as exc:
+        raise HTTPException(status_code=403, detail=str(exc)) from exc
+    return True
+
+
+def _get_profile(profile_id, profile_token):
+    """
+    Get a kept profile for an authorized client.
+
+    Args:
+        profile_id (str): The identifier of the profile.
+        profile_token (str): The ``X-Profile-Token`` header.
+
+    Returns:
+        Profile: The profile.
+
+    Raises:
+        HTTPException: If the client did not send the profiling token, or the
+            profile is not kept.
+    """
+    if not _authorize_profiling(profile_token):
+        raise HTTPException(status_code=403, detail="Missing profiling token")
+    profile = get_profiler().get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
+
+def _resolve_counting_mode(counting):
+    """
+    Resolve the requested counting engine, defaulting to the configured one.
+
+    Args:
+        counting (str): The requested engine, or None.
+
+    Returns:
+        str: The counting mode to use.
+
+    Raises:
+        HTTPException: If the engine is not known.
+    """
+    counting_mode = (counting or get_settings().parsing.counting_mode).lower()
+    if counting_mode not in COUNTING_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"counting must be one of: {', '.join(COUNTING_MODES)}",
+        )
+    return counting_mode
+
+
+def _resolve_upload_mode(mode, adif_service):
+    """
+    Resolve the requested upload mode, defaulting to a single upload.
+
+    Args:
+        mode (str): The requested mode, or None.
+        adif_service (AdifService): The service for processing ADIF files.
+
+    Returns:
+        str: The upload mode to use.
+
+    Raises:
+        HTTPException: If the mode is not known, or is cumulative while cumulative
+            uploads are not enabled.
+    """
+    upload_mode = (mode or "single").lower()
+    if upload_mode not in UPLOAD_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"mode must be one of: {', '.join(UPLOAD_MODES)}",
+        )
+    if upload_mode == "cumulative" and adif_service.callsign_store is None:
+        raise HTTPException(
+            status_code=400, detail="Cumulative uploads are not enabled"
+        )
+    return upload_mode
+
+
+def _resolve_aggregates(aggregates):
+    """
+    Resolve the requested statistics.
+
+    Args:
+        aggregates (str): A comma-separated list of statistics, or None.
+
+    Returns:
+        tuple: The names of the statistics to compute.
+
+    Raises:
+        HTTPException: If a statistic is not known.
+    """
+    try:
+        return parse_aggregates(aggregates)
+    except UnknownAggregateError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
+def _check_cumulative_options(aggregate_names, backend, compression, file_format):
+    """
+    Check that a cumulative upload asks for nothing only single uploads support.
+
+    Args:
+        aggregate_names (tuple): The statistics requested.
+        backend (str): The backend requested, or None.
+        compression (str): ``gzip`` or ``zstd`` if the file is compressed.
+        file_format (str): ``adi``, or ``adx`` for an ADX (XML) file.
+
+    Raises:
+        HTTPException: If statistics or a backend are requested, or the file is
+            not an uncompressed ADI file.
+    """
+    if aggregate_names:
+        raise HTTPException(
+            status_code=400,
+            detail="aggregates are not available for cumulative uploads",
+        )
+    if backend:
+        raise HTTPException(
+            status_code=400,
+            detail="backend cannot be chosen for cumulative uploads",
+        )
+    if compression or file_format != ADI:
+        raise HTTPException(
+            status_code=400,
+            detail="Cumulative uploads must be uncompressed ADI files",
+        )
+
+
+# Errors of a parse that are the client's to fix, or to retry later
+_UPLOAD_ERRORS = (
+    UploadTooLargeError,
+    AdmissionBusyError,
+    MemoryBudgetExceededError,
+    DecompressionBombError,
+    UnsupportedCompressionError,
+    CorruptCompressedDataError,
+    AdxFormatError,
+    UnknownBackendError,
+    MissingOperatorError,
+    DigestMismatchError,
+    UnicodeDecodeError,
+    ExecutorBusyError,
+)
+
+
+def _upload_error_exception(exc, retry_after):
+    """
+    Build the response for an upload that could not be parsed.
+
+    Args:
+        exc (Exception): One of the errors in _UPLOAD_ERRORS.
+        retry_after (int): The number of seconds a client turned away for lack of
+            workers should wait.
+
+    Returns:
+        HTTPException: The response for the error.
+    """
+    if isinstance(exc, UploadTooLargeError):
+        return _too_large_exception(exc)
+    if isinstance(exc, (AdmissionBusyError, ExecutorBusyError)):
+        return _busy_exception(
+            "The service is busy processing other files. Please try again later",
+            getattr(exc, "retry_after", retry_after),
+        )
+    if isinstance(exc, (MemoryBudgetExceededError, DecompressionBombError)):
+        return HTTPException(status_code=413, detail=exc.to_dict())
+    if isinstance(exc, UnsupportedCompressionError):
+        return HTTPException(status_code=415, detail=str(exc))
+    if isinstance(exc, MissingOperatorError):
+        return HTTPException(
+            status_code=400,
+            detail="The log has no callsign. Please provide an operator",
+        )
+    if isinstance(exc, DigestMismatchError):
+        return HTTPException(
+            status_code=400,
+            detail="The uploaded file does not match the announced sha256 digest",
+        )
+    if isinstance(exc, UnicodeDecodeError):
+        return HTTPException(
+            status_code=400,
+            detail="File encoding is not supported. Please provide a UTF-8 encoded file",
+        )
+    return HTTPException(status_code=400, detail=str(exc))
 
 
 @app.get("/")
@@ -77,15 +502,145 @@ def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/ready")
+def readiness_check():
+    """
+    Report whether the replica should receive more uploads.
+
+    The replica reports not-ready while admission control or the parse executor is
+    saturated, so that load balancers send new uploads to less busy replicas.
+
+    Returns:
+        dict: The readiness status and the current parsing load, with status 503
+        while saturated.
+    """
+    admission = get_admission_controller()
+    if admission.saturated or get_parse_executor().saturated:
+        return JSONResponse(
+            status_code=503, content={"status": "saturated", **admission.stats()}
+        )
+    return {"status": "ready", **admission.stats()}
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    """
+    Report the result cache counters.
+
+    Returns:
+        dict: The hit, miss and eviction counts of the result cache, and whether
+        the cache is enabled.
+    """
+    result_cache = get_result_cache()
+    if result_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **result_cache.stats()}
+
+
+@app.get("/metrics")
+def metrics():
+    """
+    Export the service metrics in the Prometheus text format.
+
+    Returns:
+        Response: The time spent in each stage of parsing, the bytes, records and
+        unique callsigns parsed, and the uploads and jobs in flight.
+    """
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+@app.post("/upload_adif/negotiate")
+def negotiate_upload(
+    sha256: str, size: int, adif_service: AdifService = Depends(get_adif_service)
+):
+    """
+    Check whether an ADIF file needs to be uploaded, given its digest and size.
+
+    Clients send the SHA-256 digest of their log before the log itself. If the
+    service already has a result for that digest it is returned straight away;
+    otherwise the client should upload the file to ``/upload_adif/`` with the same
+    digest, which is verified while the upload is read.
+
+    Args:
+        sha256 (str): The hexadecimal SHA-256 digest of the file.
+        size (int): The size of the file in bytes.
+        adif_service (AdifService): The service for processing ADIF files.
+
+    Returns:
+        dict: ``{"status": "known", "result": ...}`` if the file has been processed
+        before, or ``{"status": "upload_required", "upload_url": ...}`` otherwise.
+
+    Raises:
+        HTTPException: If the digest or size is malformed, or the size is over the
+            upload size cap.
+    """
+    if not is_sha256_digest(sha256):
+        raise HTTPException(
+            status_code=400, detail="sha256 must be a hexadecimal SHA-256 digest"
+        )
+    if size < 0:
+        raise HTTPException(status_code=400, detail="size must not be negative")
+    # A file that could not be uploaded is turned away before its digest is looked up
+    try:
+        get_admission_controller().check_size(size)
+    except UploadTooLargeError as exc:
+        raise _too_large_exception(exc) from exc
+
+    digest = sha256.lower()
+    result = adif_service.lookup_result(digest)
+    if result is not None:
+        return {"status": "known", "result": result}
+    return {"status": "upload_required", "upload_url": f"/upload_adif/?sha256={digest}"}
+
+
 @app.post("/upload_adif/")
+@traced("upload_adif", get_tracer)
 async def upload_adif(
-    file: UploadFile = File(...), adif_service: AdifService = Depends(get_adif_service)
+    file: UploadFile = File(...),
+    *,
+    sha256: str = None,
+    counting: str = None,
+    mode: str = None,
+    operator: str = None,
+    aggregates: str = None,
+    backend: str = None,
+    x_profile_token: str = Header(None),
+    adif_service: AdifService = Depends(get_adif_service),
 ):
     """
     Asynchronously uploads and processes an ADIF (Amateur Data Interchange Format) file.
 
+    The file may be in the tagged ADI format or in ADX, its XML form. It may be
+    compressed with gzip or zstd, as shown by a ``.gz`` or ``.zst``
+    suffix or by the ``Content-Encoding`` of its form part. It is decompressed as it
+    is parsed, and rejected if it expands suspiciously far.
+
     Args:
         file (UploadFile): The ADIF file to be uploaded.
+        sha256 (str, optional): The SHA-256 digest announced for the file through
+            ``/upload_adif/negotiate``. The upload is rejected if it does not match.
+        counting (str, optional): The engine for counting distinct callsigns,
+            ``exact`` or ``approximate``. Defaults to the configured mode. The
+            approximate engine reports the mode it used in ``counting_mode``.
+        mode (str, optional): ``single`` (the default) for a result for this file
+            alone, or ``cumulative`` to merge the file into the operator's stored
+            callsigns and award the tier for the cumulative count. A cumulative
+            upload of a log that has only grown since the last one parses just
+            the new records.
+        operator (str, optional): The station callsign a cumulative upload is
+            stored under. Defaults to the ``callsign`` of the log.
+        aggregates (str, optional): A comma-separated list of statistics computed
+            in the same pass over the log and returned under ``aggregates``:
+            ``band``, ``mode`` and ``date`` for the unique callsigns per band, mode
+            and QSO date, ``totals`` for the QSO counts, and ``duplicates`` for
+            the QSOs repeating an earlier one with a sample of them.
+        backend (str, optional): The backend to parse an ADI file with, such as
+            ``adif_io`` for a log the faster backends misread. Defaults to the
+            configured backend, or the one chosen for the size of the file.
+        x_profile_token (str, optional): The ``X-Profile-Token`` header. With the
+            configured profiling token, the parse is profiled, bypassing the result
+            cache, and the ``X-Profile-Id`` response header names the profile to
+            download from ``/profiles/{profile_id}``.
         adif_service (AdifService): The service for processing ADIF files.
 
     Returns:
@@ -95,24 +650,65 @@ async def upload_adif(
         HTTPException: If there's an error processing the file.
     """
     try:
-        if not file:
-            raise HTTPException(status_code=400, detail="No file provided")
+        _validate_upload(file, adif_service)
+        profile_requested = _authorize_profiling(x_profile_token)
 
-        if not adif_service.is_valid_adif_file(file.filename):
+        if sha256 is not None and not is_sha256_digest(sha256):
             raise HTTPException(
-                status_code=400, detail="File must be an ADIF file (.adi or .adif)"
+                status_code=400, detail="sha256 must be a hexadecimal SHA-256 digest"
             )
 
-        content = await file.read()
+        counting_mode = _resolve_counting_mode(counting)
+        upload_mode = _resolve_upload_mode(mode, adif_service)
+        compression = _upload_compression(file)
+        file_format = file_format_for(file.filename)
+        current_span().set_attributes(
+            {
+                "adif.upload_mode": upload_mode,
+                "adif.counting_mode": counting_mode,
+                "adif.compression": compression,
+                "adif.file_format": file_format,
+            }
+        )
+        aggregate_names = _resolve_aggregates(aggregates)
+        if upload_mode == "cumulative":
+            _check_cumulative_options(
+                aggregate_names, backend, compression, file_format
+            )
+        admission = get_admission_controller()
+
+        # Parse straight from the spooled upload rather than reading it into memory
+        upload_size = stream_size(file.file)
+        current_span().set_attribute("adif.upload_bytes", upload_size)
         try:
-            file_content = content.decode("utf-8")
-        except UnicodeDecodeError as exc:
-            raise HTTPException(
-                status_code=400,
-                detail="File encoding is not supported. Please provide a UTF-8 encoded file",
-            ) from exc
+            with admission.admit(upload_size), get_profiler().session(
+                profile_requested, file.filename
+            ) as profile:
+                if upload_mode == "cumulative":
+                    result = await adif_service.process_adif_delta_async(
+                        file.file, operator
+                    )
+                else:
+                    result = await adif_service.process_adif_stream_async(
+                        file.file,
+                        expected_digest=sha256,
+                        counting_mode=counting_mode,
+                        compression=compression,
+                        file_format=file_format,
+                        aggregates=aggregate_names,
+                        backend=backend.lower() if backend else None,
+                    )
+        except _UPLOAD_ERRORS as exc:
+            raise _upload_error_exception(exc, admission.retry_after) from exc
 
-        result = adif_service.process_adif_content(file_content)
+        current_span().set_attributes(
+            {
+                "adif.unique_callsigns": result.get("unique_addresses"),
+                "adif.award_tier": result.get("award_tier"),
+            }
+        )
+        if profile_requested:
+            return JSONResponse(content=result, headers={"X-Profile-Id": profile.id})
         return JSONResponse(content=result)
     except HTTPException:
         raise
@@ -121,3 +717,247 @@ async def upload_adif(
             status_code=500,
             detail=f"An error occurred while processing the file: {str(exc)}",
         ) from exc
+
+
+@app.get("/backends")
+def list_backends():
+    """
+    Describe the ADIF parser backends and how the selector chooses among them.
+
+    Returns:
+        dict: The configured ``backend``, every registered backend with its
+        capabilities and availability, and with the ``auto`` backend, the
+        ``selector`` candidates and their timings per upload size class.
+    """
+    selector = get_backend_selector()
+    return {
+        "backend": get_settings().backend.name,
+        "backends": [
+            ADIF_BACKENDS.get(name).to_dict() for name in ADIF_BACKENDS.names()
+        ],
+        "selector": selector.stats() if selector is not None else None,
+    }
+
+
+@app.get("/profiles")
+def list_profiles(x_profile_token: str = Header(None)):
+    """
+    List the kept profiles, most recent first.
+
+    Args:
+        x_profile_token (str): The ``X-Profile-Token`` header.
+
+    Returns:
+        dict: ``profiles``, a summary of each kept profile.
+
+    Raises:
+        HTTPException: If the client did not send the profiling token.
+    """
+    if not _authorize_profiling(x_profile_token):
+        raise HTTPException(status_code=403, detail="Missing profiling token")
+    return {
+        "profiles": [
+            profile.to_dict(detail=False) for profile in get_profiler().profiles()
+        ]
+    }
+
+
+@app.get("/profiles/{profile_id}")
+def get_profile(profile_id: str, x_profile_token: str = Header(None)):
+    """
+    Report a kept profile: its summary and the source lines that held the most
+    memory while parsing.
+
+    Args:
+        profile_id (str): The identifier of the profile.
+        x_profile_token (str): The ``X-Profile-Token`` header.
+
+    Returns:
+        dict: The profile, with the URL of its collapsed stacks.
+
+    Raises:
+        HTTPException: If the client did not send the profiling token, or the
+            profile is not kept.
+    """
+    profile = _get_profile(profile_id, x_profile_token)
+    return {
+        **profile.to_dict(),
+        "collapsed_url": f"/profiles/{profile.id}/collapsed",
+    }
+
+
+@app.get("/profiles/{profile_id}/collapsed")
+def get_profile_stacks(profile_id: str, x_profile_token: str = Header(None)):
+    """
+    Download the sampled stacks of a kept profile in the collapsed stack format,
+    as read by flame graph tools.
+
+    Args:
+        profile_id (str): The identifier of the profile.
+        x_profile_token (str): The ``X-Profile-Token`` header.
+
+    Returns:
+        Response: One ``frame;frame;frame count`` line per stack, as plain text.
+
+    Raises:
+        HTTPException: If the client did not send the profiling token, or the
+            profile is not kept.
+    """
+    profile = _get_profile(profile_id, x_profile_token)
+    return Response(content=profile.collapsed(), media_type="text/plain")
+
+
+@app.post("/upload_adif/batch")
+async def upload_adif_batch(
+    files: List[UploadFile] = File(...),
+    batch_service: BatchService = Depends(get_batch_service),
+):
+    """
+    Upload several ADIF files, or ZIP archives of them, and process them as a batch.
+
+    The files are parsed concurrently across the worker pool; archive members are
+    decompressed as they are parsed, without being extracted to disk.
+
+    Args:
+        files (List[UploadFile]): The ADIF files (.adi, .adif or .adx) and ZIP
+            archives.
+        batch_service (BatchService): The service for processing batch uploads.
+
+    Returns:
+        dict: ``files``, the result or ``error`` for each ADIF file, and
+        ``combined``, the result for the unique callsigns of the whole batch.
+
+    Raises:
+        HTTPException: If a file is neither an ADIF file nor a ZIP archive, the
+            batch is too large, or the service is busy.
+    """
+    if not files:
+        raise HTTPException(status_code=400, detail="No file provided")
+    for upload in files:
+        if not batch_service.is_valid_batch_file(upload.filename):
+            raise HTTPException(
+                status_code=400,
+                detail="Files must be ADIF files (.adi, .adif or .adx, optionally "
+                "compressed with gzip or zstd) or ZIP archives",
+            )
+
+    admission = get_admission_controller()
+    total_size = sum(stream_size(upload.file) for upload in files)
+    try:
+        with admission.admit(total_size):
+            result = await batch_service.process_batch_async(
+                [(upload.filename, upload.file) for upload in files]
+            )
+    except BatchTooLargeError as exc:
+        raise HTTPException(status_code=413, detail=str(exc)) from exc
+    except _UPLOAD_ERRORS as exc:
+        raise _upload_error_exception(exc, admission.retry_after) from exc
+
+    return JSONResponse(content=result)
+
+
+@app.get("/operators/{operator}")
+def get_operator(operator: str):
+    """
+    Report an operator's cumulative callsign count and award tier.
+
+    Args:
+        operator (str): The station callsign the cumulative uploads are stored under.
+
+    Returns:
+        dict: The cumulative result for the operator.
+
+    Raises:
+        HTTPException: If cumulative uploads are disabled or the operator is not
+            known.
+    """
+    callsign_store = get_callsign_store()
+    if callsign_store is None:
+        raise HTTPException(
+            status_code=404, detail="Cumulative uploads are not enabled"
+        )
+    operator = operator.upper()
+    if callsign_store.checkpoint(operator) is None:
+        raise HTTPException(status_code=404, detail="Operator not found")
+    unique_addresses = callsign_store.count(operator)
+    award_tier = get_award_service().determine_award_tier(unique_addresses)
+    return format_adif_result(unique_addresses, award_tier, [operator])
+
+
+@app.post("/jobs")
+async def create_job(
+    file: UploadFile = File(...),
+    counting: str = None,
+    adif_service: AdifService = Depends(get_adif_service),
+):
+    """
+    Accept an ADIF file for processing in the background.
+
+    The upload is stored on local disk and queued, and a job id is returned
+    straight away; poll ``/jobs/{job_id}`` for the result. Smaller files are
+    processed first.
+
+    Args:
+        file (UploadFile): The ADIF file to be processed.
+        counting (str, optional): The engine for counting distinct callsigns,
+            ``exact`` or ``approximate``. Defaults to the configured mode.
+        adif_service (AdifService): The service for processing ADIF files.
+
+    Returns:
+        dict: The job id, its status and the URL to poll, with status 202.
+
+    Raises:
+        HTTPException: If the file is not an ADIF file or is too large, or the job
+            queue is full.
+    """
+    _validate_upload(file, adif_service)
+    counting_mode = _resolve_counting_mode(counting)
+    compression = _upload_compression(file)
+    file_format = file_format_for(file.filename)
+    admission = get_admission_controller()
+
+    try:
+        admission.check_size(stream_size(file.file))
+        job = await get_job_scheduler().submit(
+            file.file,
+            functools.partial(
+                _process_admitted,
+                adif_service,
+                counting_mode,
+                compression,
+                file_format,
+            ),
+        )
+    except UploadTooLargeError as exc:
+        raise _too_large_exception(exc) from exc
+    except JobQueueFullError as exc:
+        raise _busy_exception(
+            "Too many files are waiting to be processed. Please try again later",
+            admission.retry_after,
+        ) from exc
+
+    return JSONResponse(
+        status_code=202,
+        content={**job.to_dict(), "status_url": f"/jobs/{job.id}"},
+    )
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """
+    Report the status of a background job.
+
+    Args:
+        job_id (str): The id returned when the job was created.
+
+    Returns:
+        dict: The job status, with the same result as ``/upload_adif/`` once the
+        job is done, or the error if it failed.
+
+    Raises:
+        HTTPException: If the job is not known or has expired.
+    """
+    job = get_job_scheduler().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
@@ -4,12 +4,236 @@ ADIF Repository Module
 This module provides repositories for accessing ADIF data.
 """
 
+import contextlib
+import itertools
+import re
+
 try:
     import adif_io
 except ImportError:
     # Mock for testing when adif_io is not available
     adif_io = None
 
+# Number of bytes pulled from an upload stream per read.
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+# Encoding applied to field bytes that are not valid UTF-8, unless configured
+DEFAULT_FALLBACK_ENCODING = "latin-1"
+
+# Number of records pulled from a record generator at a time while it is timed
+TIMED_BATCH_RECORDS = 1024
+
+# Groups: EOR marker, value length
+_FIELD_TAG_PATTERN = re.compile(
+    rb"<(?:(eor)|\w+)(?::(\d+)(?::[^>]*)?)?>", re.IGNORECASE
+)
+
+
+def timed(stage_timer, stage):
+    """
+    Time a block as a stage of parsing, if a timer is given.
+
+    Args:
+        stage_timer (StageTimer, optional): The timer of the parse, or None.
+        stage (str): The stage, such as ``read`` or ``parse``.
+
+    Returns:
+        A context manager timing the block.
+    """
+    if stage_timer is None:
+        return contextlib.nullcontext()
+    return stage_timer.stage(stage)
+
+
+def read_chunk(stream, chunk_size, stage_timer=None):
+    """
+    Read a chunk from a stream, timing it as the ``read`` stage.
+
+    Args:
+        stream: A binary file-like object providing ``read(size)``.
+        chunk_size (int): The number of bytes to read.
+        stage_timer (StageTimer, optional): The timer the read time and the number
+            of bytes read are added to.
+
+    Returns:
+        bytes: The chunk, empty at the end of the stream.
+    """
+    if stage_timer is None:
+        return stream.read(chunk_size)
+    with stage_timer.stage("read"):
+        chunk = stream.read(chunk_size)
+    stage_timer.bytes += len(chunk)
+    return chunk
+
+
+def timed_records(records, stage_timer=None):
+    """
+    Pass records through from a generator, timing it as the ``parse`` stage.
+
+    Records are pulled a batch at a time, so the clock is read once per batch rather
+    than once per record.
+
+    Args:
+        records (iterable): The records.
+        stage_timer (StageTimer, optional): The timer the parse time and the number
+            of records are added to.
+
+    Yields:
+        dict: The records, unchanged.
+    """
+    if stage_timer is None:
+        yield from records
+        return
+    records = iter(records)
+    while True:
+        with stage_timer.stage("parse"):
+            batch = list(itertools.islice(records, TIMED_BATCH_RECORDS))
+        if not batch:
+            return
+        stage_timer.records += len(batch)
+        yield from batch
+
+
+def decode_text(data, fallback_encoding=None):
+    """
+    Decode ADIF bytes as UTF-8, falling back to another encoding where they are not.
+
+    ADIF files are nominally UTF-8, but many legacy logs carry Latin-1 bytes in free
+    text fields such as comments. Valid UTF-8 is always decoded as UTF-8; each run of
+    invalid bytes is decoded with the fallback encoding instead, so a single stray
+    byte does not change how the rest of the data is read.
+
+    Args:
+        data (bytes): The bytes to decode.
+        fallback_encoding (str, optional): The encoding for bytes that are not valid
+            UTF-8. If not given, such bytes are an error.
+
+    Returns:
+        str: The decoded text.
+
+    Raises:
+        UnicodeDecodeError: If the data is not valid UTF-8 and there is no fallback
+            encoding, or the fallback encoding cannot decode it either.
+    """
+    parts = []
+    position = 0
+    while True:
+        try:
+            parts.append(data[position:].decode("utf-8"))
+            return "".join(parts)
+        except UnicodeDecodeError as exc:
+            if not fallback_encoding:
+                raise
+            start, end = position + exc.start, position + exc.end
+        parts.append(data[position:start].decode("utf-8"))
+        parts.append(data[start:end].decode(fallback_encoding))
+        position = end
+
+
+def scan_record_end(buffer, position=0, stop=None):
+    """
+    Find the end of the last complete record in a buffer of ADIF bytes.
+
+    Field values are skipped using the length in their tags, as the scanner does, so
+    an ``<EOR>`` inside a value such as a comment does not end a record. Lengths are
+    taken as bytes; a length counted in characters skips no further than the value.
+
+    Args:
+        buffer (bytes): The ADIF bytes, or a memory map of them.
+        position (int): The offset to scan from. It may lie past the end of the
+            buffer while still inside a field value.
+        stop (int, optional): Stop at the first record ending at or past this
+            offset, rather than scanning to the end of the buffer.
+
+    Returns:
+        tuple: A tuple containing:
+            - int: The offset to resume scanning from once more bytes are appended
+            - int: The offset just past the last ``<EOR>`` marker, or None if there
+              is none
+    """
+    last_eor = None
+    while position < len(buffer):
+        tag = _FIELD_TAG_PATTERN.search(buffer, position)
+        if tag is None:
+            # A tag cut off by the end of the buffer starts at its last "<"
+            cut = buffer.rfind(b"<", position)
+            return (len(buffer) if cut < 0 else cut), last_eor
+        if tag.group(1):
+            last_eor = position = tag.end()
+            if stop is not None and last_eor >= stop:
+                break
+        else:
+            position = tag.end() + int(tag.group(2) or 0)
+    return position, last_eor
+
+
+def iter_record_batches(
+    stream,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    fallback_encoding=None,
+    memory_budget=None,
+    stage_timer=None,
+):
+    """
+    Split a binary ADIF stream into text batches that end on record boundaries.
+
+    The stream is split into records as bytes, so only the current chunk plus any
+    incomplete trailing record is held in memory, and each batch is decoded on its
+    own. Each batch ends with an ``<EOR>`` marker, except possibly the last one. The
+    first batch keeps any ADIF header; later batches have leading whitespace removed
+    so that they are not mistaken for a header by adif_io. Records are delimited as
+    by scan_record_end, so field values containing ``<EOR>`` do not split them.
+
+    Args:
+        stream: A binary file-like object providing ``read(size)``.
+        chunk_size (int): The number of bytes to read per call.
+        fallback_encoding (str, optional): The encoding for bytes that are not valid
+            UTF-8. If not given, such bytes are an error.
+        memory_budget (MemoryBudget, optional): A budget the bytes buffered for an
+            incomplete record are reported to as ``buffered``.
+        stage_timer (StageTimer, optional): A timer the time spent reading and
+            decoding is added to.
+
+    Yields:
+        str: A batch of ADIF text containing zero or more complete records.
+
+    Raises:
+        UnicodeDecodeError: If the stream is not valid UTF-8 and there is no
+            fallback encoding.
+        MemoryBudgetExceededError: If the buffered bytes go over the budget.
+    """
+    pending = b""
+    position = 0
+    first_batch = True
+
+    while True:
+        chunk = read_chunk(stream, chunk_size, stage_timer)
+        if not chunk:
+            break
+        pending += chunk
+        if memory_budget is not None:
+            memory_budget.set("buffered", len(pending))
+
+        position, last_eor = scan_record_end(pending, position)
+        if last_eor is None:
+            continue
+
+        batch, pending = pending[:last_eor], pending[last_eor:]
+        position -= last_eor
+        if not first_batch:
+            batch = batch.lstrip()
+        with timed(stage_timer, "decode"):
+            text = decode_text(batch, fallback_encoding)
+        yield text
+        first_batch = False
+
+    if pending.strip():
+        if not first_batch:
+            pending = pending.lstrip()
+        with timed(stage_timer, "decode"):
+            text = decode_text(pending, fallback_encoding)
+        yield text
+
 
 class AdifRepository:
     """
@@ -31,6 +255,33 @@ class AdifRepository:
         """
         raise NotImplementedError
 
+    def read_from_stream(
+        self,
+        stream,
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        memory_budget=None,
+        fields=None,
+        stage_timer=None,
+    ):
+        """
+        Parse ADIF data incrementally from a binary stream.
+
+        Args:
+            stream: A binary file-like object providing ``read(size)``.
+            chunk_size (int): The number of bytes to read per call.
+            memory_budget (MemoryBudget, optional): A budget the bytes buffered
+                while parsing are reported to.
+            fields (tuple, optional): The lower-case names of the fields the caller
+                reads, which backends that extract only some fields must include.
+                Defaults to ``("call",)``.
+            stage_timer (StageTimer, optional): A timer the time spent in each
+                stage of parsing, and the bytes and records parsed, are added to.
+
+        Yields:
+            dict: Records parsed from the ADIF data, one at a time.
+        """
+        raise NotImplementedError
+
 
 class AdifIoRepository(AdifRepository):
     """
@@ -40,6 +291,16 @@ class AdifIoRepository(AdifRepository):
     implementing the AdifRepository interface.
     """
 
+    def __init__(self, fallback_encoding=None):
+        """
+        Initialize the repository.
+
+        Args:
+            fallback_encoding (str, optional): The encoding for stream bytes that
+                are not valid UTF-8. If not given, such bytes are an error.
+        """
+        self.fallback_encoding = fallback_encoding
+
     def read_from_string(self, file_content):
         """
         Parse ADIF data from a string using adif_io.
@@ -48,7 +309,8 @@ class AdifIoRepository(AdifRepository):
             file_content (str): The ADIF data as a string.
 
         Returns:
-            list: A list of records parsed from the ADIF data.
+            list: A list of records parsed from the ADIF data, each a dictionary
+            keyed by lower-case field name like the records of the other backends.
         """
         if adif_io is None:
             # Mock behavior if adif_io is not available
@@ -56,4 +318,51 @@ class AdifIoRepository(AdifRepository):
                 return []
             return [{"call": "AB1CD"}]
 
-        return adif_io.read_from_string(file_content)
+        # adif_io cannot parse an empty string, and returns the header alongside
+        # the QSOs, keyed by upper-case field name
+        if not file_content.strip():
+            return []
+        qsos, _ = adif_io.read_from_string(file_content)
+        return [{name.lower(): value for name, value in qso.items()} for qso in qsos]
+
+    def read_from_stream(
+        self,
+        stream,
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        memory_budget=None,
+        fields=None,
+        stage_timer=None,
+    ):
+        """
+        Parse ADIF data incrementally from a binary stream using adif_io.
+
+        adif_io only parses whole strings, so the stream is cut into batches of
+        complete records and each batch is parsed on its own. Memory use is
+        bounded by the chunk size rather than by the size of the upload.
+
+        Args:
+            stream: A binary file-like object providing ``read(size)``.
+            chunk_size (int): The number of bytes to read per call.
+            memory_budget (MemoryBudget, optional): A budget the bytes buffered
+                for an incomplete record are reported to.
+            fields (tuple, optional): Ignored; adif_io always parses every field.
+            stage_timer (StageTimer, optional): A timer the time spent reading,
+                decoding and parsing, and the bytes and records parsed, are added to.
+
+        Yields:
+            dict: Records parsed from the ADIF data, one at a time.
+
+        Raises:
+            UnicodeDecodeError: If the stream is not valid UTF-8 and there is no
+                fallback encoding.
+            MemoryBudgetExceededError: If the buffered bytes go over the budget.
+        """
+        batches = iter_record_batches(
+            stream, chunk_size, self.fallback_encoding, memory_budget, stage_timer
+        )
+        for batch in batches:
+            with timed(stage_timer, "parse"):
+                records = self.read_from_string(batch)
+            if stage_timer is not None:
+                stage_timer.records += len(records)
+            yield from records
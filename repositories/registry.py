@@ -0,0 +1,377 @@
+"""
+Backend Registry Module
+
+This module keeps the ADIF repository backends the service can parse with, and
+what each of them can do, and chooses a backend for each upload.
+
+With automatic selection, uploads are grouped into size classes, each four times
+larger than the previous one. Every parse reports how long its backend took per
+byte, and each upload goes to the backend that has been fastest so far for its size
+class. A few uploads are sent to the backend with the fewest timings in their class,
+so that every backend keeps being measured as the mix of uploads changes.
+"""
+
+import random
+import threading
+
+from repositories.adif_repository import AdifIoRepository, adif_io
+from repositories.scanner_repository import CallsignScannerRepository
+
+# Capabilities: reading a stream incrementally, reading bytes without decoding them
+# first, extracting only the fields asked for, and splitting a file into ranges
+# parsed in parallel
+STREAMING = "streaming"
+BYTES_INPUT = "bytes_input"
+FIELD_PROJECTION = "field_projection"
+PARALLEL = "parallel"
+CAPABILITIES = (STREAMING, BYTES_INPUT, FIELD_PROJECTION, PARALLEL)
+
+# The backend setting that chooses a backend for each upload
+AUTO = "auto"
+
+# Size of the smallest size class in bytes: smaller uploads all share it
+SMALLEST_SIZE_CLASS = 4096
+
+
+class UnknownBackendError(ValueError):
+    """Raised when a backend is not registered, or not available."""
+
+
+class Backend:
+    """
+    A repository backend and what it can do.
+
+    Attributes:
+        name (str): The name the backend is selected by.
+        factory (callable): Creates a repository, given its options.
+        capabilities (frozenset): The capabilities of the backend.
+        available (bool): Whether the backend can run here, as opposed to relying
+            on a library that is not installed.
+    """
+
+    def __init__(self, name, factory, capabilities=(), available=True):
+        """
+        Initialize the backend.
+
+        Args:
+            name (str): The name the backend is selected by.
+            factory (callable): Creates a repository, given its options.
+            capabilities (iterable): The capabilities of the backend, from
+                CAPABILITIES.
+            available (bool): Whether the backend can run here.
+
+        Raises:
+            ValueError: If a capability is not known.
+        """
+        unknown = set(capabilities) - set(CAPABILITIES)
+        if unknown:
+            raise ValueError(f"Unknown backend capabilities: {', '.join(unknown)}")
+        self.name = name
+        self.factory = factory
+        self.capabilities = frozenset(capabilities)
+        self.available = available
+
+    def supports(self, *capabilities):
+        """
+        Check whether the backend has some capabilities.
+
+        Args:
+            *capabilities (str): The capabilities, from CAPABILITIES.
+
+        Returns:
+            bool: True if the backend has all of them.
+        """
+        return self.capabilities.issuperset(capabilities)
+
+    def to_dict(self):
+        """
+        Describe the backend.
+
+        Returns:
+            dict: The name, capabilities and availability of the backend.
+        """
+        return {
+            "name": self.name,
+            "capabilities": sorted(self.capabilities),
+            "available": self.available,
+        }
+
+
+class BackendRegistry:
+    """
+    The repository backends known to the service, by name.
+    """
+
+    def __init__(self):
+        """Initialize the registry with no backends."""
+        self._backends = {}
+
+    def register(self, name, factory, capabilities=(), available=True):
+        """
+        Add a backend.
+
+        Args:
+            name (str): The name the backend is selected by, in lower case.
+            factory (callable): Creates a repository, given its options.
+            capabilities (iterable): The capabilities of the backend.
+            available (bool): Whether the backend can run here.
+
+        Returns:
+            Backend: The backend.
+
+        Raises:
+            ValueError: If the name is taken or a capability is not known.
+        """
+        if name in self._backends:
+            raise ValueError(f"ADIF backend '{name}' is already registered")
+        backend = Backend(name, factory, capabilities, available)
+        self._backends[name] = backend
+        return backend
+
+    def get(self, name):
+        """
+        Get a backend by name.
+
+        Args:
+            name (str): The name of the backend.
+
+        Returns:
+            Backend: The backend.
+
+        Raises:
+            UnknownBackendError: If no backend has that name.
+        """
+        try:
+            return self._backends[name]
+        except KeyError as exc:
+            raise UnknownBackendError(
+                f"Unknown ADIF backend '{name}'. "
+                f"Choose one of: {', '.join(sorted(self._backends))}"
+            ) from exc
+
+    def names(self):
+        """
+        List the names of the backends.
+
+        Returns:
+            list: The names, in the order the backends were registered.
+        """
+        return list(self._backends)
+
+    def available(self):
+        """
+        List the backends that can run here.
+
+        Returns:
+            list: The available Backends, in the order they were registered.
+        """
+        return [backend for backend in self._backends.values() if backend.available]
+
+    def create(self, name, **options):
+        """
+        Create a repository of a backend.
+
+        Args:
+            name (str): The name of the backend.
+            **options: The options of the repository, such as
+                ``fallback_encoding``.
+
+        Returns:
+            AdifRepository: The repository.
+
+        Raises:
+            UnknownBackendError: If no backend has that name.
+        """
+        return self.get(name).factory(**options)
+
+
+def default_registry():
+    """
+    Build the registry of the backends shipped with the service.
+
+    adif_io is the reference parser and returns every field, but needs the adif_io
+    library. The scanner extracts only the fields asked for straight from the bytes,
+    and can split a file for parsing in parallel.
+
+    Returns:
+        BackendRegistry: The registry.
+    """
+    registry = BackendRegistry()
+    registry.register(
+        "adif_io", AdifIoRepository, (STREAMING,), available=adif_io is not None
+    )
+    registry.register(
+        "scanner",
+        CallsignScannerRepository,
+        (STREAMING, BYTES_INPUT, FIELD_PROJECTION, PARALLEL),
+    )
+    return registry
+
+
+def size_class(size):
+    """
+    Get the size class of an upload.
+
+    Args:
+        size (int): The size of the upload in bytes.
+
+    Returns:
+        int: 0 for uploads up to SMALLEST_SIZE_CLASS bytes, then one more for every
+        fourfold increase in size.
+    """
+    return ((size // SMALLEST_SIZE_CLASS).bit_length() + 1) // 2
+
+
+class BackendSelector:
+    """
+    Choose the backend of each upload by its size and by how fast each backend has
+    parsed uploads of that size.
+
+    Attributes:
+        candidates (list): The names of the backends to choose from, in order of
+            preference. The first is chosen until timings show a faster one.
+        min_samples (int): The number of timings in a size class before they are
+            trusted.
+        explore_rate (float): The fraction of uploads sent to the backend with the
+            fewest timings in their size class.
+        smoothing (float): The weight of each new timing in the moving average of a
+            backend's time per byte.
+    """
+
+    def __init__(
+        self,
+        registry,
+        candidates,
+        *,
+        min_samples=5,
+        explore_rate=0.05,
+        smoothing=0.2,
+        sampler=random.random,
+    ):
+        """
+        Initialize the selector.
+
+        Args:
+            registry (BackendRegistry): The registry of the backends.
+            candidates (list): The names of the backends to choose from, in order
+                of preference. Backends that are not available are left out.
+            min_samples (int): The number of timings in a size class before they
+                are trusted.
+            explore_rate (float): The fraction of uploads sent to the backend with
+                the fewest timings in their size class.
+            smoothing (float): The weight of each new timing in the moving average.
+            sampler (callable): Returns a number in [0, 1) to decide whether an
+                upload explores.
+
+        Raises:
+            UnknownBackendError: If a candidate is not registered, or none is
+                available.
+        """
+        self.registry = registry
+        self.candidates = [name for name in candidates if registry.get(name).available]
+        if not self.candidates:
+            raise UnknownBackendError(
+                f"None of the ADIF backends {', '.join(candidates)} is available"
+            )
+        self.min_samples = min_samples
+        self.explore_rate = explore_rate
+        self.smoothing = smoothing
+        self._sampler = sampler
+        # (backend, size class) -> [timings, moving average of seconds per byte]
+        self._timings = {}
+        self._lock = threading.Lock()
+
+    def select(self, size=None, prefer=()):
+        """
+        Choose the backend for an upload.
+
+        Args:
+            size (int, optional): The size of the upload in bytes, if known.
+                Without it the first candidate is chosen.
+            prefer (tuple): Capabilities to choose among the backends that have,
+                if any candidate has them all.
+
+        Returns:
+            str: The name of the backend.
+        """
+        candidates = [
+            name
+            for name in self.candidates
+            if self.registry.get(name).supports(*prefer)
+        ] or self.candidates
+        if size is None or len(candidates) == 1:
+            return candidates[0]
+
+        upload_class = size_class(size)
+        with self._lock:
+            timings = {
+                name: self._timings.get((name, upload_class), (0, 0.0))
+                for name in candidates
+            }
+        if self._sampler() < self.explore_rate:
+            # Ties go to the preferred backend, as min keeps the first one
+            return min(candidates, key=lambda name: timings[name][0])
+        measured = [name for name in candidates if timings[name][0] >= self.min_samples]
+        if not measured:
+            return candidates[0]
+        return min(measured, key=lambda name: timings[name][1])
+
+    def observe(self, name, size, seconds):
+        """
+        Record how long a backend took to parse an upload.
+
+        Args:
+            name (str): The name of the backend.
+            size (int): The size of the upload in bytes.
+            seconds (float): The time the parse took.
+        """
+        if name not in self.candidates or size <= 0:
+            return
+        per_byte = seconds / size
+        key = (name, size_class(size))
+        with self._lock:
+            timing = self._timings.get(key)
+            if timing is None:
+                self._timings[key] = [1, per_byte]
+            else:
+                timing[0] += 1
+                timing[1] += self.smoothing * (per_byte - timing[1])
+
+    def observe_parse(self, observation):
+        """
+        Record the timing of a parse from its metrics observation.
+
+        This is the listener the selector registers with the metrics, so parses in
+        process workers are recorded once their observations reach the parent.
+
+        Args:
+            observation (dict): The snapshot of the StageTimer of the parse.
+        """
+        name = observation.get("backend")
+        if name is not None:
+            self.observe(
+                name, observation["bytes"], sum(observation["seconds"].values())
+            )
+
+    def stats(self):
+        """
+        Describe what the selector has measured.
+
+        Returns:
+            dict: The candidates, and for each of them the timings per size class,
+            keyed by the smallest size of the class in bytes.
+        """
+        with self._lock:
+            timings = {key: list(timing) for key, timing in self._timings.items()}
+        backends = {}
+        for (name, upload_class), (samples, per_byte) in sorted(timings.items()):
+            smallest = (
+                0
+                if upload_class == 0
+                else SMALLEST_SIZE_CLASS * 4 ** (upload_class - 1)
+            )
+            backends.setdefault(name, {})[str(smallest)] = {
+                "samples": samples,
+                "seconds_per_mb": per_byte * 1e6,
+            }
+        return {"candidates": list(self.candidates), "timings": backends}
@@ -0,0 +1,426 @@
+"""
+Scanner Repository Module
+
+This module provides a repository that scans raw ADIF bytes and extracts only the
+CALL field of each record. ADIF fields are length-prefixed (``<CALL:5>AB1CD``), so the
+scanner can jump over every other field without decoding it.
+"""
+
+import io
+import mmap
+import os
+import re
+import tempfile
+
+from repositories.adif_repository import (
+    DEFAULT_CHUNK_SIZE,
+    AdifRepository,
+    decode_text,
+    read_chunk,
+    scan_record_end,
+    timed,
+    timed_records,
+)
+
+# Groups: EOR marker, EOH marker, extracted field name, value length
+_TAG_TEMPLATE = rb"<(?:(eor)|(eoh)|(%s)|\w+)(?::(\d+)(?::[^>]*)?)?>"
+_TAG_PATTERN = re.compile(_TAG_TEMPLATE % rb"call", re.IGNORECASE)
+_EOH_PATTERN = re.compile(rb"<eoh>", re.IGNORECASE)
+_NON_BLANK_PATTERN = re.compile(rb"\S")
+
+
+def _tag_pattern(fields):
+    """
+    Get the tag pattern that extracts the given fields.
+
+    Args:
+        fields (tuple): The lower-case names of the fields to extract.
+
+    Returns:
+        re.Pattern: The compiled pattern; compiled patterns are cached by ``re``.
+    """
+    if fields == ("call",):
+        return _TAG_PATTERN
+    names = b"|".join(re.escape(field.encode("ascii")) for field in fields)
+    return re.compile(_TAG_TEMPLATE % names, re.IGNORECASE)
+
+
+def map_stream(stream):
+    """
+    Memory-map the file behind a binary stream, if it has one on disk.
+
+    A ``SpooledTemporaryFile`` that is still held in memory is not mapped, since
+    asking for its file descriptor would force it to disk. It has no public way to
+    tell whether it has rolled over, so its ``_rolled`` flag is read; should the flag
+    ever go away, such a file is treated as on disk and mapped.
+
+    Args:
+        stream: A binary file-like object.
+
+    Returns:
+        mmap.mmap: A read-only map of the whole file, or None if the stream is not
+        backed by a non-empty file on disk.
+    """
+    if isinstance(stream, tempfile.SpooledTemporaryFile) and not getattr(
+        stream, "_rolled", True
+    ):
+        return None
+    try:
+        fileno = stream.fileno()
+        if os.fstat(fileno).st_size == 0:
+            return None
+        return mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+    except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+        return None
+
+
+class CallsignScanner:
+    """
+    Incremental scanner that extracts CALL values, or a chosen set of fields, from
+    ADIF bytes.
+
+    Data is either fed in chunks of any size, or scanned in place from a complete
+    buffer such as a memory-mapped file. Tags are matched case-insensitively, an ADIF
+    header (any file whose first non-blank character is not ``<``) is skipped up to
+    ``<EOH>``, and a record is emitted on every ``<EOR>``. Values of fields that are
+    not extracted are skipped without being buffered or copied, however long they are. As with
+    adif_io, a trailing record without an ``<EOR>`` marker is discarded.
+    """
+
+    def __init__(self, header=True, fallback_encoding=None, fields=None):
+        """
+        Initialize the scanner state.
+
+        Args:
+            header (bool): Whether the data may start with an ADIF header. Pass False
+                when scanning from a record boundary in the middle of a file.
+            fallback_encoding (str, optional): The encoding for extracted values
+                that are not valid UTF-8. If not given, such values are an error.
+            fields (tuple, optional): The lower-case names of the fields to extract.
+                Defaults to ``("call",)``.
+        """
+        self._fallback_encoding = fallback_encoding
+        self._tag_pattern = _tag_pattern(tuple(fields or ("call",)))
+        self._pending = b""
+        self._skip = 0
+        self._in_header = None if header else False
+        self._record = {}
+
+    @property
+    def buffered(self):
+        """int: The number of bytes held back for the next chunk."""
+        return len(self._pending)
+
+    def feed(self, data):
+        """
+        Scan the next chunk of ADIF data.
+
+        Args:
+            data (bytes): The next chunk of the ADIF file.
+
+        Returns:
+            list: The records completed by this chunk, as dictionaries holding each
+            extracted field the record has a value for, such as ``call``.
+
+        Raises:
+            UnicodeDecodeError: If a CALL value is not valid UTF-8 and there is no
+                fallback encoding.
+        """
+        if self._skip:
+            # Still inside the value of a field we do not need
+            skipped = min(self._skip, len(data))
+            self._skip -= skipped
+            data = data[skipped:]
+            if self._skip:
+                return []
+
+        buffer = self._pending + data if self._pending else data
+        self._pending = b""
+        position = self._skip_header(buffer, 0, len(buffer))
+        if position is None:
+            return []
+        return list(self._scan(buffer, position, len(buffer)))
+
+    def scan(self, buffer, start=0, end=None):
+        """
+        Scan a complete buffer in place.
+
+        Only CALL values are copied out of the buffer, so a memory-mapped file can
+        be scanned without reading it into memory.
+
+        Args:
+            buffer: A bytes-like object supporting ``find``, such as ``bytes`` or an
+                ``mmap.mmap``.
+            start (int): The offset to start scanning at.
+            end (int, optional): The offset to stop scanning at. Defaults to the end
+                of the buffer.
+
+        Yields:
+            dict: Records parsed from the buffer, one at a time.
+
+        Raises:
+            UnicodeDecodeError: If a CALL value is not valid UTF-8 and there is no
+                fallback encoding.
+        """
+        end = len(buffer) if end is None else end
+        position = self._skip_header(buffer, start, end)
+        if position is not None:
+            yield from self._scan(buffer, position, end)
+
+    def _skip_header(self, buffer, position, end):
+        """
+        Skip an ADIF header at the start of the data, if there is one.
+
+        Args:
+            buffer: The data being scanned.
+            position (int): The offset to start at.
+            end (int): The offset of the end of the data.
+
+        Returns:
+            int: The offset of the first record, or None if the header has not ended
+            yet, in which case its tail is kept for the next chunk.
+        """
+        if self._in_header is None:
+            first = _NON_BLANK_PATTERN.search(buffer, position, end)
+            if first is None:
+                self._pending = buffer[position:end]
+                return None
+            self._in_header = buffer[first.start() : first.start() + 1] != b"<"
+
+        if self._in_header:
+            eoh = _EOH_PATTERN.search(buffer, position, end)
+            if eoh is None:
+                # Keep enough bytes to match an <EOH> split across chunks
+                self._pending = buffer[max(end - 4, position) : end]
+                return None
+            self._in_header = False
+            position = eoh.end()
+        return position
+
+    def _scan(self, buffer, position, end):
+        """
+        Scan records, keeping any incomplete tail for the next chunk.
+
+        Args:
+            buffer: The data being scanned.
+            position (int): The offset to start at.
+            end (int): The offset of the end of the data.
+
+        Yields:
+            dict: The records completed within the data.
+        """
+        search = self._tag_pattern.search
+        while True:
+            tag = search(buffer, position, end)
+            if tag is None:
+                partial = buffer.rfind(b"<", position, end)
+                self._pending = buffer[partial:end] if partial != -1 else b""
+                return
+
+            eor, eoh, field, length = tag.groups()
+            if length is None:
+                if eor is not None:
+                    record, self._record = self._record, {}
+                    yield record
+                elif eoh is not None:
+                    self._record = {}
+                position = tag.end()
+                continue
+
+            value_start = tag.end()
+            value_end = value_start + int(length)
+            if value_end > end:
+                # The value continues in the next chunk. Only an extracted value needs
+                # to be buffered; any other value is skipped without being held.
+                if field is not None:
+                    self._pending = buffer[tag.start() : end]
+                else:
+                    self._skip = value_end - end
+                return
+
+            if field is not None:
+                value = buffer[value_start:value_end]
+                try:
+                    value = value.decode("utf-8")
+                except UnicodeDecodeError:
+                    value = decode_text(value, self._fallback_encoding)
+                name = field.decode("ascii").lower()
+                if value:
+                    self._record[name] = value
+                else:
+                    self._record.pop(name, None)
+            position = value_end
+
+
+class CallsignScannerRepository(AdifRepository):
+    """
+    Repository implementation that scans raw bytes for CALL values.
+
+    Only the ``call`` field is extracted from each record, which is all the service
+    layer uses unless statistics that read other fields are requested. Records are
+    returned as ``{"call": value}`` dictionaries, or empty dictionaries for records
+    without a callsign. Only extracted values are decoded, so bytes in other fields
+    never need to be valid in any encoding.
+    """
+
+    def __init__(self, fallback_encoding=None):
+        """
+        Initialize the repository.
+
+        Args:
+            fallback_encoding (str, optional): The encoding for CALL values that are
+                not valid UTF-8. If not given, such values are an error.
+        """
+        self.fallback_encoding = fallback_encoding
+
+    def read_from_string(self, file_content):
+        """
+        Parse ADIF data from a string.
+
+        Args:
+            file_content (str): The ADIF data as a string.
+
+        Returns:
+            list: A list of records parsed from the ADIF data.
+        """
+        return self.read_from_bytes(file_content.encode("utf-8"))
+
+    def read_from_bytes(self, data):
+        """
+        Parse ADIF data from bytes.
+
+        Args:
+            data (bytes): The raw ADIF data.
+
+        Returns:
+            list: A list of records parsed from the ADIF data.
+        """
+        return CallsignScanner(fallback_encoding=self.fallback_encoding).feed(data)
+
+    def read_from_stream(
+        self,
+        stream,
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        memory_budget=None,
+        fields=None,
+        stage_timer=None,
+    ):
+        """
+        Parse ADIF data incrementally from a binary stream.
+
+        A stream backed by a file on disk, such as an upload that Starlette has
+        spooled to a temporary file, is memory-mapped and scanned in place from its
+        current position, so it is neither read into memory nor decoded as a whole.
+        Other streams are read in chunks.
+
+        Args:
+            stream: A binary file-like object providing ``read(size)``.
+            chunk_size (int): The number of bytes to read per call, for streams that
+                cannot be memory-mapped.
+            memory_budget (MemoryBudget, optional): A budget the bytes buffered for
+                a value split across chunks are reported to.
+            fields (tuple, optional): The lower-case names of the fields to extract.
+                Defaults to ``("call",)``.
+            stage_timer (StageTimer, optional): A timer the time spent reading and
+                parsing, and the bytes and records parsed, are added to. Values are
+                decoded as they are parsed, so there is no separate decode stage.
+
+        Yields:
+            dict: Records parsed from the ADIF data, one at a time.
+
+        Raises:
+            MemoryBudgetExceededError: If the buffered bytes go over the budget.
+        """
+        scanner = CallsignScanner(
+            fallback_encoding=self.fallback_encoding, fields=fields
+        )
+        mapped = map_stream(stream)
+        if mapped is not None:
+            with mapped:
+                start = stream.tell()
+                if stage_timer is not None:
+                    stage_timer.bytes += len(mapped) - start
+                yield from timed_records(scanner.scan(mapped, start), stage_timer)
+            return
+
+        while True:
+            chunk = read_chunk(stream, chunk_size, stage_timer)
+            if not chunk:
+                break
+            with timed(stage_timer, "parse"):
+                records = scanner.feed(chunk)
+            if stage_timer is not None:
+                stage_timer.records += len(records)
+            if memory_budget is not None:
+                memory_budget.set("buffered", scanner.buffered)
+            yield from records
+
+    def split_file(self, path, parts):
+        """
+        Split an ADIF file into byte ranges that each hold whole records.
+
+        The header is skipped up to ``<EOH>`` and the remainder is cut into roughly
+        equal ranges, each ending just after an ``<EOR>`` marker. Records are
+        delimited as by scan_record_end, so a field value that itself contains
+        ``<EOR>`` does not split a record.
+
+        Args:
+            path (str): The path of the ADIF file.
+            parts (int): The number of ranges wanted.
+
+        Returns:
+            list: ``(start, end)`` byte offsets of at most ``parts`` ranges; empty if
+            the file holds no records.
+        """
+        with open(path, "rb") as adif_file, mmap.mmap(
+            adif_file.fileno(), 0, access=mmap.ACCESS_READ
+        ) as data:
+            size = len(data)
+            first = _NON_BLANK_PATTERN.search(data)
+            start = size
+            if first is not None and data[first.start()] == ord("<"):
+                start = first.start()
+            elif first is not None:
+                eoh = _EOH_PATTERN.search(data, first.start())
+                start = eoh.end() if eoh else size
+
+            step = max((size - start) // max(parts, 1), 1)
+            boundaries = [start]
+            position = start
+            for index in range(1, parts):
+                target = start + index * step
+                position, eor = scan_record_end(data, position, stop=target)
+                if eor is None or eor < target:
+                    break
+                if eor > boundaries[-1]:
+                    boundaries.append(eor)
+            boundaries.append(size)
+
+        return [
+            (range_start, range_end)
+            for range_start, range_end in zip(boundaries, boundaries[1:])
+            if range_start < range_end
+        ]
+
+    def read_from_file_range(self, path, start, end):
+        """
+        Parse the records in a byte range of an ADIF file.
+
+        The file is memory-mapped and scanned in place, so the range is not copied
+        into memory. The range must start at a record boundary, as returned by
+        split_file.
+
+        Args:
+            path (str): The path of the ADIF file.
+            start (int): The offset of the first byte of the range.
+            end (int): The offset just past the last byte of the range.
+
+        Yields:
+            dict: Records parsed from the range, one at a time.
+        """
+        with open(path, "rb") as adif_file, mmap.mmap(
+            adif_file.fileno(), 0, access=mmap.ACCESS_READ
+        ) as data:
+            yield from CallsignScanner(
+                header=False, fallback_encoding=self.fallback_encoding
+            ).scan(data, start, end)
@@ -4,6 +4,42 @@ ADIF Service Module
 This module provides the service layer for processing ADIF files.
 """
 
+import asyncio
+import functools
+import hashlib
+import os
+import re
+
+from repositories.adif_repository import timed_records
+from repositories.adx_repository import AdxRepository
+from repositories.registry import PARALLEL, UnknownBackendError
+from services.aggregators import (
+    DEFAULT_DUPLICATE_WINDOW_MINUTES,
+    accumulator_fields,
+    build_accumulators,
+    feed_accumulators,
+)
+from services.callsign_set import PackedCallsignSet
+from services.callsign_store import MissingOperatorError, plan_delta
+from services.counting import (
+    APPROXIMATE,
+    EXACT,
+    estimate_callsign_data,
+    fold_callsign_data,
+)
+from services.decompression import open_decompressed, strip_compression_suffix
+from services.memory_budget import RECORD_BYTES, MemoryBudget, callsign_set_nbytes
+from services.metrics import StageTimer, record_parse
+from services.profiling import profiling
+from services.result_cache import DigestMismatchError, hash_stream
+from services.tracing import current_span, span
+
+_EOR_PATTERN = re.compile(r"<eor>", re.IGNORECASE)
+
+# File formats: the tagged ADIF format, and its XML form
+ADI = "adi"
+ADX = "adx"
+
 
 def extract_callsign_data(records):
     """
@@ -23,6 +59,77 @@ def extract_callsign_data(records):
     return unique_addresses, callsigns
 
 
+def fold_file_range(
+    adif_repository, path, start, end, *, packed_callsigns=True, memory_budget=0
+):
+    """
+    Collect the unique callsigns in a byte range of an ADIF file, and count its
+    records.
+
+    This runs in a pool worker for one chunk of a parallel parse. The worker opens
+    the file itself, so the chunk is never pickled.
+
+    Args:
+        adif_repository: A repository providing ``read_from_file_range``.
+        path (str): The path of the ADIF file.
+        start (int): The offset of the first byte of the range.
+        end (int): The offset just past the last byte of the range.
+        packed_callsigns (bool): Whether to collect callsigns in a PackedCallsignSet.
+        memory_budget (int): The most memory in bytes the set of the range may use,
+            its share of the budget of the request; 0 for no limit.
+
+    Returns:
+        tuple: A tuple containing:
+            - The set of unique callsigns in the range
+            - list: A list holding the first callsign found, or empty if there is none
+            - int: The number of records in the range
+
+    Raises:
+        MemoryBudgetExceededError: If the set goes over the budget.
+    """
+    unique_callsigns = PackedCallsignSet() if packed_callsigns else set()
+    stage_timer = StageTimer()
+    records = timed_records(
+        adif_repository.read_from_file_range(path, start, end), stage_timer
+    )
+    _, callsigns = fold_callsign_data(
+        records,
+        unique_callsigns,
+        MemoryBudget(memory_budget) if memory_budget else None,
+    )
+    return unique_callsigns, callsigns, stage_timer.records
+
+
+def stream_size(stream):
+    """
+    Get the size of a seekable binary stream and rewind it.
+
+    Args:
+        stream: A seekable binary file-like object.
+
+    Returns:
+        int: The size of the stream in bytes.
+    """
+    size = stream.seek(0, 2)
+    stream.seek(0)
+    return size
+
+
+def file_format_for(filename):
+    """
+    Work out the format of an ADIF file from its name.
+
+    Args:
+        filename (str): The file name, optionally with a compression suffix.
+
+    Returns:
+        str: ``adx`` for an ADX (XML) file, otherwise ``adi``.
+    """
+    if strip_compression_suffix(filename or "").lower().endswith(".adx"):
+        return ADX
+    return ADI
+
+
 def format_adif_result(unique_addresses, award_tier, callsigns):
     """
     Format the ADIF parsing result as a standardized dictionary.
@@ -44,7 +151,7 @@ def format_adif_result(unique_addresses, award_tier, callsigns):
     }
 
 
-class AdifService:
+class AdifService:  # pylint: disable=too-many-instance-attributes
     """
     Service for processing ADIF files.
 
@@ -52,21 +159,185 @@ class AdifService:
     the business logic for processing ADIF files.
     """
 
-    def __init__(self, adif_repository, award_service):
+    def __init__(
+        self,
+        adif_repository,
+        award_service,
+        executor=None,
+        result_cache=None,
+        *,
+        packed_callsigns=True,
+        parallel_threshold=0,
+        memory_budget=0,
+        callsign_store=None,
+        max_decompression_ratio=0,
+        adx_repository=None,
+        duplicate_window_minutes=DEFAULT_DUPLICATE_WINDOW_MINUTES,
+        backends=None,
+        backend_selector=None,
+    ):
         """
         Initialize the ADIF service.
 
         Args:
             adif_repository: A repository for ADIF data.
             award_service: A service for determining award tiers.
+            executor (ParseExecutor, optional): The executor used to run parsing off
+                the event loop. If omitted, parsing runs inline.
+            result_cache (ResultCache, optional): A cache of results keyed by the
+                digest of the upload. If omitted, every upload is parsed.
+            packed_callsigns (bool): Whether unique callsigns are kept packed into
+                64-bit integers, which uses far less memory than a set of strings
+                at the cost of more CPU time per record.
+            parallel_threshold (int): The upload size in bytes from which a file is
+                split into chunks parsed in parallel by process workers. 0 disables
+                parallel parsing.
+            memory_budget (int): The most memory in bytes that parsing one request
+                may use, estimated as it goes. 0 disables the budget.
+            callsign_store (CallsignStore, optional): The per-operator store used by
+                cumulative uploads. If omitted, cumulative uploads are unavailable.
+            max_decompression_ratio (float): How many times its compressed size a
+                compressed upload may expand to before it is rejected as a
+                decompression bomb. 0 disables the guard.
+            adx_repository (optional): The repository for ADX (XML) files.
+                Defaults to an AdxRepository.
+            duplicate_window_minutes (int): How close in time two QSOs with the same
+                station, band and mode must be for the ``duplicates`` statistic to
+                count the later one. 0 or less compares them by date only.
+            backends (dict, optional): Repositories for ADIF data by backend name,
+                which an upload may ask for or the backend selector may choose.
+            backend_selector (BackendSelector, optional): Chooses the backend of
+                each ADI upload among ``backends``. If omitted, uploads are parsed
+                with ``adif_repository`` unless they ask for a backend.
         """
         self.adif_repository = adif_repository
         self.award_service = award_service
+        self.executor = executor
+        self.result_cache = result_cache
+        self.packed_callsigns = packed_callsigns
+        self.parallel_threshold = parallel_threshold
+        self.memory_budget = memory_budget
+        self.callsign_store = callsign_store
+        self.max_decompression_ratio = max_decompression_ratio
+        self.adx_repository = adx_repository or AdxRepository()
+        self.duplicate_window_minutes = duplicate_window_minutes
+        self.backends = dict(backends or {})
+        self.backend_selector = backend_selector
+
+    def __getstate__(self):
+        """
+        Get the state to pickle when the service is sent to a process worker.
+
+        Returns:
+            dict: The service state without the executor, result cache and backend
+            selector, which belong to the parent process.
+        """
+        state = self.__dict__.copy()
+        state["executor"] = None
+        state["result_cache"] = None
+        state["backend_selector"] = None
+        return state
+
+    def _backend_repository(self, backend=None):
+        """
+        Get the repository of a backend.
+
+        Args:
+            backend (str, optional): The name of the backend. Defaults to the
+                configured ADIF repository.
+
+        Returns:
+            The repository for ADIF data.
+
+        Raises:
+            UnknownBackendError: If the service has no backend of that name.
+        """
+        if backend is None:
+            return self.adif_repository
+        try:
+            return self.backends[backend]
+        except KeyError as exc:
+            raise UnknownBackendError(
+                f"Unknown ADIF backend '{backend}'. "
+                f"Choose one of: {', '.join(sorted(self.backends))}"
+            ) from exc
+
+    def _select_backend(self, stream, parallel=False):
+        """
+        Let the backend selector choose the backend of an upload by its size.
+
+        Args:
+            stream: The binary stream of the upload. Its size is only known if it
+                is seekable.
+            parallel (bool): Whether the upload could be split and parsed in
+                parallel, if large enough and the backend can split it.
+
+        Returns:
+            str: The name of the backend, or None without a backend selector.
+        """
+        if self.backend_selector is None:
+            return None
+        size = None
+        if getattr(stream, "seekable", lambda: False)():
+            size = stream_size(stream)
+        prefer = ()
+        if (
+            parallel
+            and size is not None
+            and self.executor.kind == "process"
+            and 0 < self.parallel_threshold <= size
+        ):
+            prefer = (PARALLEL,)
+        return self.backend_selector.select(size, prefer)
+
+    def _new_memory_budget(self):
+        """
+        Start tracking the memory of one request.
+
+        Returns:
+            MemoryBudget: A fresh budget, or None if the budget is disabled.
+        """
+        return MemoryBudget(self.memory_budget) if self.memory_budget else None
+
+    def budget_share(self, parts):
+        """
+        Split the memory budget of a request between the jobs it is parsed in.
+
+        The callsign sets of every job are held until they are merged, so each job
+        may only use its share of the budget.
+
+        Args:
+            parts (int): The number of jobs.
+
+        Returns:
+            int: The budget of each job in bytes, or 0 if the budget is disabled.
+        """
+        if not self.memory_budget:
+            return 0
+        return max(self.memory_budget // max(parts, 1), 1)
+
+    def _fold_callsign_data(self, records, memory_budget=None):
+        """
+        Fold ADIF records into callsign data using the configured set type.
+
+        Args:
+            records (iterable): An iterable of ADIF record dictionaries.
+            memory_budget (MemoryBudget, optional): The budget of the request.
+
+        Returns:
+            tuple: The number of unique callsigns and a list holding the first one.
+        """
+        unique_callsigns = PackedCallsignSet() if self.packed_callsigns else set()
+        return fold_callsign_data(records, unique_callsigns, memory_budget)
 
     def is_valid_adif_file(self, filename):
         """
         Check if a file is a valid ADIF file based on its extension.
 
+        ADX (``.adx``) files are accepted as well as ADI files, and a gzip
+        (``.gz``) or zstd (``.zst``) suffix after the extension is accepted, such
+        as ``log.adi.gz``.
+
         Args:
             filename (str): The name of the file to check.
 
@@ -75,20 +346,603 @@ class AdifService:
         """
         if not filename:
             return False
-        return filename.lower().endswith((".adi", ".adif"))
+        return (
+            strip_compression_suffix(filename)
+            .lower()
+            .endswith((".adi", ".adif", ".adx"))
+        )
+
+    def _read_records(
+        self,
+        stream,
+        *,
+        compression=None,
+        memory_budget=None,
+        file_format=ADI,
+        fields=None,
+        stage_timer=None,
+        backend=None,
+    ):
+        """
+        Parse records from a stream, decompressing it on the fly if needed.
+
+        Args:
+            stream: A binary file-like object providing ``read(size)``.
+            compression (str, optional): ``gzip`` or ``zstd`` if the stream is
+                compressed.
+            memory_budget (MemoryBudget, optional): The budget of the request.
+            file_format (str): ``adi``, or ``adx`` for an ADX (XML) stream.
+            fields (tuple, optional): The record fields to extract, if more than
+                ``call`` is needed.
+            stage_timer (StageTimer, optional): The timer of the parse.
+            backend (str, optional): The backend that parses an ADI stream.
+                Defaults to the configured ADIF repository.
+
+        Returns:
+            iterator: The ADIF record dictionaries.
+
+        Raises:
+            UnsupportedCompressionError: If the compression is not supported.
+        """
+        if compression is not None:
+            stream = open_decompressed(
+                stream, compression, self.max_decompression_ratio
+            )
+        if file_format == ADX:
+            repository = self.adx_repository
+        else:
+            repository = self._backend_repository(backend)
+        return repository.read_from_stream(
+            stream, memory_budget=memory_budget, fields=fields, stage_timer=stage_timer
+        )
 
     def process_adif_content(self, file_content):
         """
         Process the content of an ADIF file.
 
+        The whole log is parsed into records at once, so with a memory budget the
+        records are estimated from the number of ``<EOR>`` markers before parsing,
+        and oversized logs are rejected before any record is built.
+
         Args:
             file_content (str): The content of the ADIF file.
 
         Returns:
             dict: A dictionary containing information about the ADIF data.
+
+        Raises:
+            MemoryBudgetExceededError: If parsing would go over the memory budget.
+        """
+        with span("AdifService.process_adif_content") as process_span:
+            digest = None
+            if self.result_cache is not None:
+                digest = hashlib.sha256(file_content.encode("utf-8")).hexdigest()
+                cached = self.result_cache.get(digest)
+                if cached is not None:
+                    return cached
+
+            memory_budget = self._new_memory_budget()
+            if memory_budget is not None:
+                record_count = sum(1 for _ in _EOR_PATTERN.finditer(file_content))
+                memory_budget.set("content", len(file_content))
+                # Field values are copied out of the content into each record
+                memory_budget.set(
+                    "records", record_count * RECORD_BYTES + len(file_content)
+                )
+
+            with span(
+                "repository.read",
+                {
+                    "adif.backend": type(self.adif_repository).__name__,
+                    "adif.bytes": len(file_content),
+                },
+            ) as read_span:
+                records = self.adif_repository.read_from_string(file_content)
+                read_span.set_attribute("adif.records", len(records))
+            unique_addresses, callsigns = self._fold_callsign_data(
+                records, memory_budget
+            )
+            with span("AwardService.determine_award_tier"):
+                award_tier = self.award_service.determine_award_tier(unique_addresses)
+            result = format_adif_result(unique_addresses, award_tier, callsigns)
+            process_span.set_attribute("adif.unique_callsigns", unique_addresses)
+
+            if digest is not None:
+                self.result_cache.put(digest, result)
+            return result
+
+    def process_adif_stream(
+        self,
+        stream,
+        *,
+        counting_mode=EXACT,
+        compression=None,
+        file_format=ADI,
+        aggregates=(),
+        backend=None,
+    ):
+        """
+        Process an ADIF file incrementally from a binary stream.
+
+        Records are folded into the unique-callsign set as they are parsed, so peak
+        memory is bounded by the number of unique callsigns rather than the file size.
+
+        In approximate mode callsigns go into a fixed-size HyperLogLog sketch instead.
+        If the estimate lands within the error margin of a tier threshold, the stream
+        is rewound and counted exactly, so the awarded tier is always the exact one.
+        The result then reports the mode that was used in ``counting_mode``.
+
+        A compressed stream is decompressed as it is parsed, so the uncompressed log
+        is never held in memory.
+
+        Requested statistics are accumulated from the same records in the first
+        pass, and reported under ``aggregates``. Without any, the records are not
+        touched by the accumulators at all.
+
+        Args:
+            stream: A binary file-like object providing ``read(size)``. It must be
+                seekable in approximate mode.
+            counting_mode (str): ``exact`` or ``approximate``.
+            compression (str, optional): ``gzip`` or ``zstd`` if the stream is
+                compressed.
+            file_format (str): ``adi``, or ``adx`` for an ADX (XML) stream.
+            aggregates (tuple): The names of the statistics to compute, as returned
+                by parse_aggregates.
+            backend (str, optional): The backend that parses an ADI stream.
+                Defaults to the configured ADIF repository.
+
+        Returns:
+            dict: A dictionary containing information about the ADIF data.
+
+        Raises:
+            UnicodeDecodeError: If the stream is not valid UTF-8 and no fallback
+                encoding is configured.
+            AdxFormatError: If an ADX stream is not well-formed XML.
+            MemoryBudgetExceededError: If parsing goes over the memory budget.
+            UnsupportedCompressionError: If the stream cannot be decompressed.
+            DecompressionBombError: If the stream expands more than allowed.
+            UnknownBackendError: If the service has no such backend.
+        """
+        with span(
+            "AdifService.process_adif_stream",
+            {"adif.file_format": file_format, "adif.compression": compression},
+        ) as process_span:
+            memory_budget = self._new_memory_budget()
+            stage_timer = StageTimer()
+            if file_format == ADI and compression is None:
+                # Only then are the bytes parsed the size the backend was chosen by
+                stage_timer.backend = backend
+            accumulators = build_accumulators(
+                aggregates, self.packed_callsigns, self.duplicate_window_minutes
+            )
+            records = self._read_records(
+                stream,
+                compression=compression,
+                memory_budget=memory_budget,
+                file_format=file_format,
+                fields=accumulator_fields(accumulators) if accumulators else None,
+                stage_timer=stage_timer,
+                backend=backend,
+            )
+            if accumulators:
+                records = feed_accumulators(records, accumulators, memory_budget)
+
+            used_mode = None
+            repository = (
+                self.adx_repository
+                if file_format == ADX
+                else self._backend_repository(backend)
+            )
+            with span(
+                "repository.read", {"adif.backend": type(repository).__name__}
+            ) as read_span, stage_timer.stage("extract"):
+                if counting_mode != APPROXIMATE:
+                    unique_addresses, callsigns = self._fold_callsign_data(
+                        records, memory_budget
+                    )
+                else:
+                    unique_addresses, callsigns, used_mode = (
+                        self._estimate_callsign_data(
+                            records,
+                            stream,
+                            compression=compression,
+                            memory_budget=memory_budget,
+                            file_format=file_format,
+                            stage_timer=stage_timer,
+                            backend=backend,
+                        )
+                    )
+                read_span.set_attributes(
+                    {
+                        "adif.bytes": stage_timer.bytes,
+                        "adif.records": stage_timer.records,
+                    }
+                )
+            with span("AwardService.determine_award_tier"), stage_timer.stage("tier"):
+                award_tier = self.award_service.determine_award_tier(unique_addresses)
+            stage_timer.unique_callsigns = unique_addresses
+            record_parse(stage_timer)
+            process_span.set_attributes(
+                {
+                    "adif.backend": type(repository).__name__,
+                    "adif.bytes": stage_timer.bytes,
+                    "adif.records": stage_timer.records,
+                    "adif.unique_callsigns": unique_addresses,
+                    "adif.counting_mode": used_mode or counting_mode,
+                }
+            )
+
+            result = format_adif_result(unique_addresses, award_tier, callsigns)
+            if used_mode is not None:
+                result["counting_mode"] = used_mode
+            if accumulators:
+                result["aggregates"] = {
+                    name: accumulator.result()
+                    for name, accumulator in accumulators.items()
+                }
+            return result
+
+    def _estimate_callsign_data(
+        self,
+        records,
+        stream,
+        *,
+        compression,
+        memory_budget,
+        file_format,
+        stage_timer=None,
+        backend=None,
+    ):
+        """
+        Estimate the unique callsigns, counting exactly if near a tier threshold.
+
+        Args:
+            records (iterable): The records of the first pass over the stream.
+            stream: The seekable binary stream the records come from.
+            compression (str): ``gzip`` or ``zstd`` if the stream is compressed.
+            memory_budget (MemoryBudget): The budget of the request, or None.
+            file_format (str): ``adi`` or ``adx``.
+            stage_timer (StageTimer, optional): The timer of the parse.
+            backend (str, optional): The backend that parses an ADI stream.
+
+        Returns:
+            tuple: The number of unique callsigns, a list holding the first one,
+            and the counting mode that was used.
+        """
+        sketch, callsigns = estimate_callsign_data(records)
+        estimate = sketch.estimate()
+        if self.award_service.is_near_threshold(
+            estimate, sketch.error_margin(estimate)
+        ):
+            stream.seek(0)
+            records = self._read_records(
+                stream,
+                compression=compression,
+                memory_budget=memory_budget,
+                file_format=file_format,
+                stage_timer=stage_timer,
+                backend=backend,
+            )
+            unique_addresses, callsigns = self._fold_callsign_data(
+                records, memory_budget
+            )
+            used_mode = EXACT
+        else:
+            unique_addresses = round(estimate)
+            used_mode = APPROXIMATE
+        return unique_addresses, callsigns, used_mode
+
+    def _first_callsign(self, stream):
         """
-        records = self.adif_repository.read_from_string(file_content)
-        unique_addresses, callsigns = extract_callsign_data(records)
+        Find the first callsign of a log and rewind the stream.
+
+        Args:
+            stream: A seekable binary file-like object.
+
+        Returns:
+            str: The first callsign, or None if the log has none.
+        """
+        try:
+            for record in self.adif_repository.read_from_stream(stream):
+                if record.get("call"):
+                    return record["call"]
+            return None
+        finally:
+            stream.seek(0)
+
+    def process_adif_delta(self, stream, operator=None, backend=None):
+        """
+        Merge a log into its operator's cumulative callsign set.
+
+        Only the records appended since the operator's previous upload are parsed,
+        provided the earlier part of the log is unchanged; otherwise the whole log
+        is parsed and merged. The award tier is computed from the cumulative count.
+
+        Args:
+            stream: A seekable binary file-like object providing ``read(size)``.
+            operator (str, optional): The station callsign the set is kept under.
+                Defaults to the first callsign of the log, as reported in the
+                ``callsign`` field of a single upload.
+            backend (str, optional): The backend that parses the new records.
+                Defaults to the configured ADIF repository.
+
+        Returns:
+            dict: The cumulative result, with the operator as ``callsign``, plus
+            ``new_unique_addresses`` and the number of ``parsed_bytes``.
+
+        Raises:
+            ValueError: If there is no callsign store.
+            MissingOperatorError: If no operator is given and the log has no
+                callsign.
+            UnicodeDecodeError: If the stream is not valid UTF-8 and no fallback
+                encoding is configured.
+            MemoryBudgetExceededError: If parsing goes over the memory budget.
+        """
+        if self.callsign_store is None:
+            raise ValueError("Cumulative uploads need a callsign store")
+        operator = (operator or self._first_callsign(stream) or "").upper()
+        if not operator:
+            raise MissingOperatorError(
+                "The log has no callsign to identify the operator"
+            )
+
+        start, checkpoint = plan_delta(stream, self.callsign_store.checkpoint(operator))
+        memory_budget = self._new_memory_budget()
+        unique_callsigns = PackedCallsignSet() if self.packed_callsigns else set()
+        fold_callsign_data(
+            self._read_records(stream, memory_budget=memory_budget, backend=backend),
+            unique_callsigns,
+            memory_budget,
+        )
+        added, unique_addresses = self.callsign_store.merge(
+            operator, unique_callsigns, checkpoint
+        )
+
         award_tier = self.award_service.determine_award_tier(unique_addresses)
+        result = format_adif_result(unique_addresses, award_tier, [operator])
+        result["new_unique_addresses"] = added
+        result["parsed_bytes"] = checkpoint[0] - start
+        return result
+
+    async def process_adif_delta_async(self, stream, operator=None):
+        """
+        Merge a log into its operator's callsign set without blocking the event loop.
+
+        The log is parsed with the backend the backend selector chooses for its size.
+
+        Args:
+            stream: A seekable binary file-like object providing ``read(size)``.
+            operator (str, optional): The station callsign the set is kept under.
+
+        Returns:
+            dict: The cumulative result, as returned by process_adif_delta.
+
+        Raises:
+            ExecutorBusyError: If the executor has no room for another job.
+            ValueError: If there is no callsign store.
+            MissingOperatorError: If there is no operator.
+            UnicodeDecodeError: If the stream is not valid UTF-8 and no fallback
+                encoding is configured.
+            MemoryBudgetExceededError: If parsing goes over the memory budget.
+        """
+        process = functools.partial(
+            self.process_adif_delta,
+            operator=operator,
+            backend=self._select_backend(stream),
+        )
+        if self.executor is None:
+            return process(stream)
+        return await self.executor.run_stream(process, stream)
+
+    def lookup_result(self, digest):
+        """
+        Look up the result of a previous upload by its digest.
+
+        Args:
+            digest (str): The hexadecimal SHA-256 digest of the upload bytes.
+
+        Returns:
+            dict: The cached result, or None if the upload is not known.
+        """
+        if self.result_cache is None:
+            return None
+        return self.result_cache.get(digest.lower())
+
+    async def process_adif_stream_async(
+        self,
+        stream,
+        *,
+        expected_digest=None,
+        counting_mode=EXACT,
+        compression=None,
+        file_format=ADI,
+        aggregates=(),
+        backend=None,
+    ):
+        """
+        Process an ADIF stream on the executor without blocking the event loop.
+
+        With a result cache, the stream is hashed first and a cached result for the
+        same bytes is returned without decoding or parsing the stream, unless the
+        upload is being profiled. When the client announced a digest, the stream is
+        hashed and checked against it before anything is parsed or cached.
+
+        A compressed stream is hashed and cached by its compressed bytes, and is
+        decompressed by the worker as it parses, never in the event loop process.
+
+        An ADI stream is parsed with the backend it asks for, or else the one the
+        backend selector chooses for its size. Large enough uploads go to a backend
+        that can split them for parallel parsing.
+
+        Args:
+            stream: A binary file-like object providing ``read(size)``. It must be
+                seekable when a result cache or an expected digest is used.
+            expected_digest (str, optional): The SHA-256 digest the client announced
+                for the upload.
+            counting_mode (str): ``exact`` or ``approximate``.
+            compression (str, optional): ``gzip`` or ``zstd`` if the stream is
+                compressed.
+            file_format (str): ``adi``, or ``adx`` for an ADX (XML) stream.
+            aggregates (tuple): The names of the statistics to compute, as returned
+                by parse_aggregates.
+            backend (str, optional): The backend to parse an ADI stream with,
+                rather than the one the selector would choose.
+
+        Returns:
+            dict: A dictionary containing information about the ADIF data.
+
+        Raises:
+            UnknownBackendError: If the service has no such backend.
+            DigestMismatchError: If the stream does not match the expected digest.
+            ExecutorBusyError: If the executor has no room for another job.
+            UnicodeDecodeError: If the stream is not valid UTF-8 and no fallback
+                encoding is configured.
+            AdxFormatError: If an ADX stream is not well-formed XML.
+            MemoryBudgetExceededError: If parsing goes over the memory budget.
+            UnsupportedCompressionError: If the stream cannot be decompressed.
+            DecompressionBombError: If the stream expands more than allowed.
+        """
+        if backend is not None:
+            self._backend_repository(backend)
+        digest = None
+        if self.result_cache is not None or expected_digest is not None:
+            digest = await asyncio.to_thread(hash_stream, stream)
+        if expected_digest is not None and digest != expected_digest.lower():
+            raise DigestMismatchError(
+                f"Upload digest {digest} does not match the announced digest"
+            )
+
+        # Exact results are keyed by the bare digest so negotiation can find them
+        cache_key = digest if counting_mode == EXACT else f"{digest}:{counting_mode}"
+        if aggregates:
+            cache_key = f"{cache_key}:{'+'.join(aggregates)}"
+        # A backend asked for by name may be there to check another backend's result
+        if backend is not None:
+            cache_key = f"{cache_key}@{backend}"
+        # A profiled upload is always parsed, so that there is a parse to profile
+        if self.result_cache is not None and not profiling():
+            cached = await self.result_cache.get_async(cache_key)
+            current_span().set_attribute("adif.cache_hit", cached is not None)
+            if cached is not None:
+                return cached
+
+        splittable = (
+            self.executor is not None
+            and counting_mode == EXACT
+            and compression is None
+            and file_format == ADI
+            and not aggregates
+        )
+        if backend is None and file_format == ADI:
+            backend = self._select_backend(stream, splittable)
+            current_span().set_attribute("adif.selected_backend", backend)
+        process = functools.partial(
+            self.process_adif_stream,
+            counting_mode=counting_mode,
+            compression=compression,
+            file_format=file_format,
+            aggregates=aggregates,
+            backend=backend,
+        )
+        repository = self._backend_repository(backend)
+        if self.executor is None:
+            result = process(stream)
+        elif splittable and self._is_parallel_candidate(stream, repository):
+            result = await self._process_parallel(stream, backend)
+        else:
+            result = await self.executor.run_stream(process, stream)
+
+        if self.result_cache is not None:
+            await self.result_cache.put_async(cache_key, result)
+        return result
+
+    def _is_parallel_candidate(self, stream, repository=None):
+        """
+        Check if a stream should be split and parsed in parallel.
+
+        Args:
+            stream: A seekable binary file-like object.
+            repository (optional): The repository that would parse the stream.
+                Defaults to the configured ADIF repository.
+
+        Returns:
+            bool: True if parallel parsing is enabled, the executor uses processes,
+            the repository can parse file ranges and the stream is large enough.
+        """
+        return (
+            self.parallel_threshold > 0
+            and self.executor.kind == "process"
+            and hasattr(repository or self.adif_repository, "split_file")
+            and stream_size(stream) >= self.parallel_threshold
+        )
+
+    async def _process_parallel(self, stream, backend=None):
+        """
+        Parse a large stream as chunks split on record boundaries, in parallel.
+
+        The stream is spooled to a file once; each process worker memory-maps the
+        file and scans its own byte range, and the per-chunk callsign sets are merged.
+        Each chunk gets an equal share of the memory budget, and the merge is checked
+        against the whole budget together with the chunk sets it holds.
+        The parse is timed as a whole, with the fan-out to the workers as its
+        ``parse`` stage and the merge as its ``extract`` stage, and recorded once.
+
+        Args:
+            stream: A binary file-like object providing ``read(size)``.
+            backend (str, optional): The backend that parses the stream, which must
+                provide ``split_file`` and ``read_from_file_range``. Defaults to the
+                configured ADIF repository.
+
+        Returns:
+            dict: A dictionary containing information about the ADIF data.
+
+        Raises:
+            ExecutorBusyError: If the executor has no room for another job.
+            UnicodeDecodeError: If a callsign is not valid UTF-8 and no fallback
+                encoding is configured.
+            MemoryBudgetExceededError: If a chunk or the merged set goes over the
+                memory budget.
+        """
+        repository = self._backend_repository(backend)
+        stage_timer = StageTimer()
+        stage_timer.backend = backend
+        async with self.executor.spooled(stream) as path:
+            with stage_timer.stage("read"):
+                stage_timer.bytes = os.path.getsize(path)
+                ranges = await asyncio.to_thread(
+                    repository.split_file, path, self.executor.max_workers
+                )
+            with stage_timer.stage("parse"):
+                chunks = await self.executor.run_many(
+                    functools.partial(
+                        fold_file_range,
+                        packed_callsigns=self.packed_callsigns,
+                        memory_budget=self.budget_share(len(ranges)),
+                    ),
+                    [(repository, path, start, end) for start, end in ranges],
+                )
+
+        with stage_timer.stage("extract"):
+            memory_budget = self._new_memory_budget()
+            if memory_budget is not None:
+                memory_budget.set(
+                    "chunks",
+                    sum(callsign_set_nbytes(chunk[0]) for chunk in chunks),
+                )
+            unique_callsigns = PackedCallsignSet() if self.packed_callsigns else set()
+            callsigns = []
+            for chunk_callsigns, chunk_first, chunk_records in chunks:
+                unique_callsigns.update(chunk_callsigns)
+                callsigns = callsigns or chunk_first
+                stage_timer.records += chunk_records
+                if memory_budget is not None:
+                    memory_budget.set(
+                        "unique_callsigns", callsign_set_nbytes(unique_callsigns)
+                    )
+            unique_addresses = len(unique_callsigns)
+        with stage_timer.stage("tier"):
+            award_tier = self.award_service.determine_award_tier(unique_addresses)
+        stage_timer.unique_callsigns = unique_addresses
+        record_parse(stage_timer)
 
         return format_adif_result(unique_addresses, award_tier, callsigns)
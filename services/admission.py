@@ -0,0 +1,322 @@
+"""
+Admission Control Module
+
+This module bounds the parsing work a replica takes on at once. Uploads are admitted
+against a maximum number of concurrent parses, a budget of upload bytes being parsed
+and a per-upload size cap, so that a burst of large logs is turned away early
+instead of driving the pod out of memory.
+"""
+
+import contextlib
+import json
+import threading
+
+# Room left in a request body over the upload size cap for its multipart framing
+MULTIPART_ALLOWANCE_BYTES = 64 * 1024
+
+
+class AdmissionError(Exception):
+    """
+    Base class for uploads that cannot be admitted.
+
+    Attributes:
+        retry_after (int): The number of seconds the client should wait before
+            trying again.
+    """
+
+    def __init__(self, message, retry_after):
+        """
+        Initialize the error.
+
+        Args:
+            message (str): The reason the upload was not admitted.
+            retry_after (int): The number of seconds to wait before trying again.
+        """
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class UploadTooLargeError(AdmissionError):
+    """Raised when an upload is larger than the per-upload size cap."""
+
+
+class AdmissionBusyError(AdmissionError):
+    """Raised when the replica is already parsing as much as it may."""
+
+
+class AdmissionController:
+    """
+    Admission control for parsing work.
+
+    A limit of 0 disables that check. An upload larger than the remaining byte budget
+    is still admitted when nothing else is in flight, so that every upload under the
+    size cap can eventually be parsed.
+    """
+
+    def __init__(
+        self, max_concurrent=4, max_inflight_bytes=0, max_upload_bytes=0, retry_after=1
+    ):
+        """
+        Initialize the admission controller.
+
+        Args:
+            max_concurrent (int): The number of uploads parsed at once.
+            max_inflight_bytes (int): The total size of the uploads parsed at once.
+            max_upload_bytes (int): The size of the largest upload accepted.
+            retry_after (int): The number of seconds rejected clients are asked to
+                wait before trying again.
+        """
+        self.max_concurrent = max_concurrent
+        self.max_inflight_bytes = max_inflight_bytes
+        self.max_upload_bytes = max_upload_bytes
+        self.retry_after = retry_after
+        self._active = 0
+        self._inflight_bytes = 0
+        self._rejected = 0
+        self._lock = threading.Lock()
+
+    @property
+    def saturated(self):
+        """bool: True if no further upload would be admitted right now."""
+        return bool(
+            (self.max_concurrent and self._active >= self.max_concurrent)
+            or (
+                self.max_inflight_bytes
+                and self._inflight_bytes >= self.max_inflight_bytes
+            )
+        )
+
+    def check_size(self, size):
+        """
+        Check an upload against the per-upload size cap.
+
+        Args:
+            size (int): The size of the upload in bytes.
+
+        Raises:
+            UploadTooLargeError: If the upload is larger than the cap.
+        """
+        if self.max_upload_bytes and size > self.max_upload_bytes:
+            with self._lock:
+                self._rejected += 1
+            raise UploadTooLargeError(
+                f"Upload of {size} bytes exceeds the limit of "
+                f"{self.max_upload_bytes} bytes",
+                self.retry_after,
+            )
+
+    def check_declared_size(self, content_length=None):
+        """
+        Check the declared length of a request body against the size cap.
+
+        Args:
+            content_length (int, optional): The ``Content-Length`` of the request,
+                which may exceed the size of the upload by its multipart framing.
+
+        Raises:
+            UploadTooLargeError: If the body is larger than the size cap allows.
+        """
+        if content_length is None or not self.max_upload_bytes:
+            return
+        limit = self.max_upload_bytes + MULTIPART_ALLOWANCE_BYTES
+        if content_length > limit:
+            with self._lock:
+                self._rejected += 1
+            raise UploadTooLargeError(
+                f"Request of {content_length} bytes exceeds the limit of "
+                f"{limit} bytes for an upload of at most "
+                f"{self.max_upload_bytes} bytes",
+                self.retry_after,
+            )
+
+    def precheck(self, content_length=None):
+        """
+        Check a request before its body is read.
+
+        This turns an upload away without spooling it, using the length its request
+        declares and the load of the replica. The upload is still admitted, or
+        rejected, against its actual size once it has been read, which is the only
+        check a chunked request without a ``Content-Length`` gets.
+
+        Args:
+            content_length (int, optional): The declared length of the request body,
+                which may exceed the size of the upload by its multipart framing.
+
+        Raises:
+            UploadTooLargeError: If the body is larger than the size cap allows.
+            AdmissionBusyError: If the replica is already parsing as much as it may.
+        """
+        self.check_declared_size(content_length)
+        if self.saturated:
+            with self._lock:
+                self._rejected += 1
+            raise AdmissionBusyError(
+                f"Already parsing {self._active} uploads "
+                f"({self._inflight_bytes} bytes)",
+                self.retry_after,
+            )
+
+    @contextlib.contextmanager
+    def admit(self, size):
+        """
+        Admit an upload for the duration of a block.
+
+        Args:
+            size (int): The size of the upload in bytes.
+
+        Raises:
+            UploadTooLargeError: If the upload is larger than the size cap.
+            AdmissionBusyError: If the concurrency limit or byte budget is reached.
+        """
+        self.check_size(size)
+        with self._lock:
+            over_budget = (
+                self.max_inflight_bytes
+                and self._active
+                and self._inflight_bytes + size > self.max_inflight_bytes
+            )
+            if over_budget or (
+                self.max_concurrent and self._active >= self.max_concurrent
+            ):
+                self._rejected += 1
+                raise AdmissionBusyError(
+                    f"Already parsing {self._active} uploads "
+                    f"({self._inflight_bytes} bytes)",
+                    self.retry_after,
+                )
+            self._active += 1
+            self._inflight_bytes += size
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._inflight_bytes -= size
+
+    def stats(self):
+        """
+        Report the current load.
+
+        Returns:
+            dict: The uploads and bytes being parsed, their limits, and the number of
+            uploads rejected so far.
+        """
+        with self._lock:
+            return {
+                "active": self._active,
+                "max_concurrent": self.max_concurrent,
+                "inflight_bytes": self._inflight_bytes,
+                "max_inflight_bytes": self.max_inflight_bytes,
+                "rejected": self._rejected,
+            }
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware applying admission control before an upload is read.
+
+    Without it an upload is only turned away once the framework has spooled its whole
+    body, so a replica at capacity still reads every upload sent to it.
+    """
+
+    def __init__(self, app, get_controller, parse_paths=(), size_paths=()):
+        """
+        Initialize the middleware.
+
+        Args:
+            app: The ASGI application.
+            get_controller (callable): Returns the AdmissionController to apply.
+            parse_paths (tuple): The paths of POST requests parsed as they are
+                received, checked against both the size cap and the load.
+            size_paths (tuple): The paths of POST requests queued for later,
+                checked against the size cap only.
+        """
+        self.app = app
+        self.get_controller = get_controller
+        self.parse_paths = frozenset(parse_paths)
+        self.size_paths = frozenset(size_paths)
+
+    async def __call__(self, scope, receive, send):
+        """
+        Handle an ASGI request, rejecting an upload that cannot be admitted.
+
+        Args:
+            scope (dict): The ASGI connection scope.
+            receive (callable): Receives ASGI messages.
+            send (callable): Sends ASGI messages.
+        """
+        path = scope.get("path")
+        if (
+            scope["type"] != "http"
+            or scope.get("method") != "POST"
+            or (path not in self.parse_paths and path not in self.size_paths)
+        ):
+            await self.app(scope, receive, send)
+            return
+        controller = self.get_controller()
+        content_length = _content_length(scope)
+        try:
+            if path in self.parse_paths:
+                controller.precheck(content_length)
+            else:
+                controller.check_declared_size(content_length)
+        except UploadTooLargeError as exc:
+            await _send_rejection(
+                send, 413, f"The file is too large. {exc}", exc.retry_after
+            )
+            return
+        except AdmissionBusyError as exc:
+            await _send_rejection(
+                send,
+                503,
+                "The service is busy processing other files. Please try again later",
+                exc.retry_after,
+            )
+            return
+        await self.app(scope, receive, send)
+
+
+def _content_length(scope):
+    """
+    Read the declared length of a request body.
+
+    Args:
+        scope (dict): The ASGI connection scope.
+
+    Returns:
+        int: The ``Content-Length`` of the request, or None if it has none or it is
+        not a number.
+    """
+    for name, value in scope.get("headers", ()):
+        if name.lower() == b"content-length":
+            try:
+                return int(value)
+            except ValueError:
+                return None
+    return None
+
+
+async def _send_rejection(send, status, detail, retry_after):
+    """
+    Send the response for a request turned away by admission control.
+
+    Args:
+        send (callable): Sends ASGI messages.
+        status (int): The HTTP status code.
+        detail (str): The message for the client.
+        retry_after (int): The number of seconds the client should wait.
+    """
+    body = json.dumps({"detail": detail}).encode()
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(retry_after).encode()),
+                (b"connection", b"close"),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
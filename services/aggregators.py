@@ -0,0 +1,389 @@
+"""
+Aggregators Module
+
+This module provides the accumulators behind the optional statistics of an upload.
+Accumulators are fed the same record stream that the unique callsigns are counted
+from, so any number of statistics costs a single parse of the log.
+"""
+
+from datetime import date
+from hashlib import blake2b
+
+from services.callsign_set import PackedCallsignSet
+from services.memory_budget import BUDGET_CHECK_INTERVAL, callsign_set_nbytes
+
+# Initial slots of a per-group callsign set; most bands, modes and days hold few
+# callsigns, so groups start small rather than at the default table size
+_GROUP_SET_CAPACITY = 16
+
+# Minutes either side of a QSO within which a repeat counts as a duplicate
+DEFAULT_DUPLICATE_WINDOW_MINUTES = 10
+
+# Most duplicate records quoted in the result
+DUPLICATE_SAMPLE_SIZE = 20
+
+# Fields that identify a QSO for duplicate detection, and are quoted in the sample
+_DUPLICATE_FIELDS = ("call", "band", "mode", "qso_date", "time_on")
+
+
+class UnknownAggregateError(ValueError):
+    """Raised when an upload asks for a statistic that does not exist."""
+
+
+class Accumulator:
+    """
+    Base interface for accumulators.
+
+    Attributes:
+        fields (tuple): The record fields the accumulator reads, so that backends
+            that extract only some fields know which ones to extract.
+    """
+
+    fields = ()
+
+    def add(self, record):
+        """
+        Add one record to the statistic.
+
+        Args:
+            record (dict): An ADIF record.
+        """
+        raise NotImplementedError
+
+    def result(self):
+        """
+        Get the statistic.
+
+        Returns:
+            The JSON-serialisable statistic.
+        """
+        raise NotImplementedError
+
+    @property
+    def nbytes(self):
+        """int: The approximate memory held by the accumulator."""
+        return 0
+
+
+class UniqueCallsByField(Accumulator):
+    """
+    Count the unique callsigns for each value of a field, such as each band.
+
+    Values are compared case-insensitively, and records without the field or without
+    a callsign are left out.
+    """
+
+    def __init__(self, field, packed_callsigns=True):
+        """
+        Initialize the accumulator.
+
+        Args:
+            field (str): The record field to group by, such as ``band``.
+            packed_callsigns (bool): Whether each group keeps its callsigns in a
+                PackedCallsignSet rather than a set of strings.
+        """
+        self.field = field
+        self.fields = ("call", field)
+        self.packed_callsigns = packed_callsigns
+        self._groups = {}
+
+    def add(self, record):
+        """
+        Add one record to the statistic.
+
+        Args:
+            record (dict): An ADIF record.
+        """
+        call = record.get("call")
+        value = record.get(self.field)
+        if not call or not value:
+            return
+        key = value.strip().upper()
+        group = self._groups.get(key)
+        if group is None:
+            group = (
+                PackedCallsignSet(_GROUP_SET_CAPACITY)
+                if self.packed_callsigns
+                else set()
+            )
+            self._groups[key] = group
+        group.add(call)
+
+    def result(self):
+        """
+        Get the unique callsign count of each group.
+
+        Returns:
+            dict: The number of unique callsigns per field value, ordered by value.
+        """
+        return {value: len(self._groups[value]) for value in sorted(self._groups)}
+
+    @property
+    def nbytes(self):
+        """int: The approximate memory held by the groups."""
+        return sum(callsign_set_nbytes(group) for group in self._groups.values())
+
+
+class QsoTotals(Accumulator):
+    """
+    Count the records of a log, and those with and without a callsign.
+    """
+
+    fields = ("call",)
+
+    def __init__(self):
+        """Initialize the counters."""
+        self.qsos = 0
+        self.with_call = 0
+
+    def add(self, record):
+        """
+        Add one record to the totals.
+
+        Args:
+            record (dict): An ADIF record.
+        """
+        self.qsos += 1
+        if record.get("call"):
+            self.with_call += 1
+
+    def result(self):
+        """
+        Get the totals.
+
+        Returns:
+            dict: The number of ``qsos``, and of those ``with_call`` and
+            ``without_call``.
+        """
+        return {
+            "qsos": self.qsos,
+            "with_call": self.with_call,
+            "without_call": self.qsos - self.with_call,
+        }
+
+
+class DuplicateQsos(Accumulator):
+    """
+    Count the QSOs that repeat an earlier one with the same station, band and mode.
+
+    A QSO is a duplicate of an earlier one with the same callsign, band and mode
+    (compared case-insensitively) whose start time falls in the same or an adjacent
+    slot of ``window_minutes``, so repeats less than one window apart are always
+    found and those up to two windows apart may be. Records whose date or time is
+    missing or malformed are compared on the raw QSO date instead.
+
+    Records are not kept: each QSO is reduced to a 64-bit BLAKE2b hash held in a
+    PackedCallsignSet table, 8 bytes per slot. Unrelated QSOs are taken for
+    duplicates only on a hash collision, which is negligibly rare.
+    """
+
+    fields = _DUPLICATE_FIELDS
+
+    def __init__(self, window_minutes=DEFAULT_DUPLICATE_WINDOW_MINUTES):
+        """
+        Initialize the accumulator.
+
+        Args:
+            window_minutes (int): The width of a time slot in minutes. 0 or less
+                compares QSOs by date only.
+        """
+        self.window_minutes = window_minutes
+        self.duplicates = 0
+        self.sample = []
+        self._hashes = PackedCallsignSet()
+
+    def add(self, record):
+        """
+        Add one record, counting it if it duplicates an earlier one.
+
+        Args:
+            record (dict): An ADIF record.
+        """
+        call = record.get("call")
+        if not call:
+            return
+        key = "\x1f".join(
+            (
+                call.strip().upper(),
+                (record.get("band") or "").strip().upper(),
+                (record.get("mode") or "").strip().upper(),
+            )
+        )
+        slot = self._slot(record)
+        hashes = self._hashes
+        if slot is None:
+            duplicate = not hashes.add_packed(
+                _hash_key(f"{key}\x1fD{record.get('qso_date') or ''}")
+            )
+        else:
+            # The QSO is recorded in its own slot even when it is a duplicate
+            duplicate = not hashes.add_packed(_hash_key(f"{key}\x1f{slot}"))
+            duplicate = (
+                duplicate
+                or hashes.contains_packed(_hash_key(f"{key}\x1f{slot - 1}"))
+                or hashes.contains_packed(_hash_key(f"{key}\x1f{slot + 1}"))
+            )
+        if duplicate:
+            self.duplicates += 1
+            if len(self.sample) < DUPLICATE_SAMPLE_SIZE:
+                self.sample.append(
+                    {field: record[field] for field in self.fields if record.get(field)}
+                )
+
+    def _slot(self, record):
+        """
+        Get the time slot a record falls in.
+
+        Args:
+            record (dict): An ADIF record.
+
+        Returns:
+            int: The slot number counted from the start of the calendar, or None if
+            QSOs are compared by date only or the record has no valid date and time.
+        """
+        if self.window_minutes <= 0:
+            return None
+        qso_date = record.get("qso_date") or ""
+        time_on = record.get("time_on") or ""
+        if not (len(qso_date) == 8 and qso_date.isdigit()):
+            return None
+        if not (len(time_on) in (4, 6) and time_on.isdigit()):
+            return None
+        try:
+            day = date(int(qso_date[:4]), int(qso_date[4:6]), int(qso_date[6:]))
+        except ValueError:
+            return None
+        minutes = day.toordinal() * 1440 + int(time_on[:2]) * 60 + int(time_on[2:4])
+        return minutes // self.window_minutes
+
+    def result(self):
+        """
+        Get the duplicate count.
+
+        Returns:
+            dict: The number of ``duplicates``, the ``window_minutes`` used, and a
+            ``sample`` of at most DUPLICATE_SAMPLE_SIZE duplicate records.
+        """
+        return {
+            "duplicates": self.duplicates,
+            "window_minutes": self.window_minutes,
+            "sample": self.sample,
+        }
+
+    @property
+    def nbytes(self):
+        """int: The approximate memory held by the hash table."""
+        return self._hashes.nbytes
+
+
+def _hash_key(key):
+    """
+    Hash a QSO key into a non-zero 64-bit integer.
+
+    Args:
+        key (str): The key.
+
+    Returns:
+        int: The hash.
+    """
+    digest = blake2b(key.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") or 1
+
+
+# Statistics selectable per upload, by name. Each factory takes whether callsigns
+# are packed and the duplicate window in minutes.
+AGGREGATES = {
+    "band": lambda packed, _window: UniqueCallsByField("band", packed),
+    "mode": lambda packed, _window: UniqueCallsByField("mode", packed),
+    "date": lambda packed, _window: UniqueCallsByField("qso_date", packed),
+    "totals": lambda _packed, _window: QsoTotals(),
+    "duplicates": lambda _packed, window: DuplicateQsos(window),
+}
+
+
+def parse_aggregates(value):
+    """
+    Parse a comma-separated list of statistic names.
+
+    Args:
+        value (str): The names, such as ``band,mode``, or None.
+
+    Returns:
+        tuple: The distinct names in a canonical order, empty if none were given.
+
+    Raises:
+        UnknownAggregateError: If a name is not known.
+    """
+    names = {name.strip().lower() for name in (value or "").split(",")} - {""}
+    unknown = names - AGGREGATES.keys()
+    if unknown:
+        raise UnknownAggregateError(
+            f"Unknown aggregates: {', '.join(sorted(unknown))}. "
+            f"Choose from: {', '.join(AGGREGATES)}"
+        )
+    return tuple(name for name in AGGREGATES if name in names)
+
+
+def build_accumulators(
+    names,
+    packed_callsigns=True,
+    duplicate_window_minutes=DEFAULT_DUPLICATE_WINDOW_MINUTES,
+):
+    """
+    Build the accumulators for a list of statistics.
+
+    Args:
+        names (iterable): The statistic names, as returned by parse_aggregates.
+        packed_callsigns (bool): Whether callsigns are kept in PackedCallsignSets.
+        duplicate_window_minutes (int): The time window of duplicate detection.
+
+    Returns:
+        dict: The accumulator for each name.
+    """
+    return {
+        name: AGGREGATES[name](packed_callsigns, duplicate_window_minutes)
+        for name in names
+    }
+
+
+def accumulator_fields(accumulators):
+    """
+    Collect the record fields a set of accumulators reads.
+
+    Args:
+        accumulators (dict): The accumulators by name.
+
+    Returns:
+        tuple: The field names, starting with ``call``.
+    """
+    fields = ["call"]
+    for accumulator in accumulators.values():
+        fields.extend(field for field in accumulator.fields if field not in fields)
+    return tuple(fields)
+
+
+def feed_accumulators(records, accumulators, memory_budget=None):
+    """
+    Pass records through while adding each one to every accumulator.
+
+    Args:
+        records (iterable): An iterable of ADIF record dictionaries.
+        accumulators (dict): The accumulators by name.
+        memory_budget (MemoryBudget, optional): A budget the size of the
+            accumulators is reported to as ``aggregates`` every few thousand records.
+
+    Yields:
+        dict: The records, unchanged.
+
+    Raises:
+        MemoryBudgetExceededError: If the accumulators go over the budget.
+    """
+    adders = [accumulator.add for accumulator in accumulators.values()]
+    for count, record in enumerate(records, 1):
+        for add in adders:
+            add(record)
+        if memory_budget is not None and not count % BUDGET_CHECK_INTERVAL:
+            memory_budget.set(
+                "aggregates", sum(acc.nbytes for acc in accumulators.values())
+            )
+        yield record
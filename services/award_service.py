@@ -48,3 +48,23 @@ class AwardService:
 
         # Default case (should never reach here given the 0 threshold above)
         return AwardTier.PARTICIPANT
+
+    def is_near_threshold(self, count, margin):
+        """
+        Check if a count lies within a margin of any tier threshold.
+
+        Approximate counts are only trusted to pick a tier when no threshold lies
+        within their error margin.
+
+        Parameters:
+            count (float): The (estimated) count of unique addresses.
+            margin (float): The error margin around the count.
+
+        Returns:
+            bool: True if a threshold lies within the margin of the count.
+        """
+        return any(
+            abs(count - threshold) <= margin
+            for threshold, _ in self.tier_thresholds
+            if threshold > 0
+        )
@@ -0,0 +1,397 @@
+"""
+Batch Service Module
+
+This module provides the service layer for batch uploads: several ADIF files, or ZIP
+archives of them, parsed as separate jobs and combined into one result.
+"""
+
+import asyncio
+import contextlib
+import functools
+import io
+import zipfile
+
+from services.adif_service import ADX, file_format_for, format_adif_result
+from services.callsign_set import PackedCallsignSet
+from services.counting import fold_callsign_data
+from services.decompression import (
+    RATIO_GRACE_BYTES,
+    DecompressionBombError,
+    RatioGuardedReader,
+    compression_for,
+    open_decompressed,
+)
+from services.memory_budget import MemoryBudget, callsign_set_nbytes
+
+
+class BatchTooLargeError(ValueError):
+    """Raised when a batch upload holds more ADIF files than allowed."""
+
+
+class MemberTooLargeError(ValueError):
+    """Raised when a file within a ZIP archive is larger than an upload may be."""
+
+
+def _describe_error(exc):
+    """
+    Describe why one file of a batch could not be parsed.
+
+    Args:
+        exc (Exception): The error raised while parsing the file.
+
+    Returns:
+        The error as a structured dictionary if it provides one, or its message.
+    """
+    to_dict = getattr(exc, "to_dict", None)
+    if to_dict is not None:
+        return to_dict()
+    if isinstance(exc, UnicodeDecodeError):
+        return "File encoding is not supported. Please provide a UTF-8 encoded file"
+    return str(exc) or type(exc).__name__
+
+
+def fold_batch_member(
+    adif_repository,
+    source,
+    member=None,
+    compression=None,
+    *,
+    packed_callsigns=True,
+    memory_budget=0,
+    max_decompression_ratio=0,
+):
+    """
+    Collect the unique callsigns of one file of a batch upload.
+
+    This runs in a pool worker. The worker opens the file itself, and a member of a
+    ZIP archive, or a gzip or zstd file, is decompressed as it is parsed rather than
+    extracted to disk.
+
+    Args:
+        adif_repository: A repository providing ``read_from_stream``.
+        source: The path of the uploaded ADIF file or ZIP archive, or the upload
+            itself as a seekable binary stream when parsing inline.
+        member (str, optional): The name of the ADIF file within the archive, or
+            None if the upload is itself an ADIF file.
+        compression (str, optional): ``gzip`` or ``zstd`` if the file is
+            compressed.
+        packed_callsigns (bool): Whether to collect callsigns in a PackedCallsignSet.
+        memory_budget (int): The most memory in bytes parsing the file may use,
+            its share of the budget of the request; 0 for no limit.
+        max_decompression_ratio (float): How many times its compressed size the
+            file may expand to; 0 for no limit.
+
+    Returns:
+        tuple: A tuple containing:
+            - The set of unique callsigns in the file
+            - list: A list holding the first callsign found, or empty if there is none
+
+    Raises:
+        UnicodeDecodeError: If the file is not valid UTF-8 and no fallback encoding
+            is configured.
+        MemoryBudgetExceededError: If parsing goes over the memory budget.
+        UnsupportedCompressionError: If the file cannot be decompressed.
+        DecompressionBombError: If the file expands more than allowed.
+    """
+    budget = MemoryBudget(memory_budget) if memory_budget else None
+    unique_callsigns = PackedCallsignSet() if packed_callsigns else set()
+    with contextlib.ExitStack() as stack:
+        stream = source
+        if isinstance(source, str):
+            stream = stack.enter_context(open(source, "rb"))
+        if member is not None:
+            archive = stack.enter_context(zipfile.ZipFile(stream))
+            # The archive reads the member from the position of its own stream,
+            # which measures how much of the compressed data has been consumed
+            stream = stack.enter_context(
+                io.BufferedReader(
+                    RatioGuardedReader(
+                        archive.open(member), stream, max_decompression_ratio
+                    )
+                )
+            )
+        if compression is not None:
+            stream = stack.enter_context(
+                open_decompressed(stream, compression, max_decompression_ratio)
+            )
+        records = adif_repository.read_from_stream(stream, memory_budget=budget)
+        _, callsigns = fold_callsign_data(records, unique_callsigns, budget)
+    return unique_callsigns, callsigns
+
+
+class BatchService:
+    """
+    Service for processing batch uploads of ADIF files and ZIP archives.
+
+    Files are parsed with the repositories and settings of an ADIF service, on its
+    executor.
+    """
+
+    def __init__(self, adif_service, max_files=0, max_member_bytes=0):
+        """
+        Initialize the batch service.
+
+        Args:
+            adif_service (AdifService): The service whose repositories, executor and
+                settings parse each file.
+            max_files (int): The most ADIF files a batch may hold, counting each
+                archive member; 0 for no limit.
+            max_member_bytes (int): The largest size a ZIP archive may declare for
+                one of its files; 0 for no limit.
+        """
+        self.adif_service = adif_service
+        self.max_files = max_files
+        self.max_member_bytes = max_member_bytes
+
+    def _check_member(self, info):
+        """
+        Check the sizes a ZIP archive declares for one of its files.
+
+        The declared sizes are checked before the file is opened, and the
+        decompressed size is then guarded again while the file is parsed, since an
+        archive may understate it.
+
+        Args:
+            info (zipfile.ZipInfo): The entry of the file in the archive.
+
+        Returns:
+            Exception: The reason the file must not be parsed, or None if it may be.
+        """
+        if self.max_member_bytes and info.file_size > self.max_member_bytes:
+            return MemberTooLargeError(
+                f"The file is {info.file_size} bytes once extracted, over the limit "
+                f"of {self.max_member_bytes} bytes"
+            )
+        max_ratio = self.adif_service.max_decompression_ratio
+        if (
+            max_ratio
+            and info.file_size > RATIO_GRACE_BYTES
+            and info.file_size > max(info.compress_size, 1) * max_ratio
+        ):
+            return DecompressionBombError(info.compress_size, info.file_size, max_ratio)
+        return None
+
+    def is_valid_batch_file(self, filename):
+        """
+        Check if a file can be part of a batch, based on its extension.
+
+        Args:
+            filename (str): The name of the file to check.
+
+        Returns:
+            bool: True for an ADIF file or a ZIP archive, False otherwise.
+        """
+        return self.adif_service.is_valid_adif_file(filename) or (
+            filename or ""
+        ).lower().endswith(".zip")
+
+    def _repository_for(self, filename):
+        """
+        Get the repository that parses a file, based on its name.
+
+        Args:
+            filename (str): The name of the file.
+
+        Returns:
+            The ADX repository for ADX files, otherwise the ADIF repository.
+        """
+        if file_format_for(filename) == ADX:
+            return self.adif_service.adx_repository
+        return self.adif_service.adif_repository
+
+    def _list_members(self, filename, source):
+        """
+        List the ADIF files of one upload of a batch.
+
+        Args:
+            filename (str): The name of the upload.
+            source: The path or stream of the upload.
+
+        Returns:
+            list: ``(name, member)`` pairs, where ``member`` is the name of an ADIF
+            file within a ZIP archive, or None for a plain ADIF upload. An archive
+            that cannot be read yields a single ``(name, error)`` pair whose member
+            is a BadZipFile error, and a file whose declared sizes fail
+            _check_member is paired with that error instead of its name.
+        """
+        if not filename.lower().endswith(".zip"):
+            return [(filename, None)]
+        try:
+            with zipfile.ZipFile(source) as archive:
+                infos = [
+                    info
+                    for info in archive.infolist()
+                    if not info.is_dir()
+                    and self.adif_service.is_valid_adif_file(info.filename)
+                ]
+        except zipfile.BadZipFile as exc:
+            return [(filename, exc)]
+        return [
+            (f"{filename}/{info.filename}", self._check_member(info) or info.filename)
+            for info in infos
+        ]
+
+    async def _collect_members(self, uploads, stack):
+        """
+        List every ADIF file of a batch, spooling the uploads for process workers.
+
+        Args:
+            uploads (list): ``(filename, stream)`` pairs for the uploaded files.
+            stack (contextlib.AsyncExitStack): The stack the spooled files are
+                removed by when it closes.
+
+        Returns:
+            list: ``(name, source, member)`` triples, as listed by _list_members,
+            with the path or stream of the upload as ``source``.
+
+        Raises:
+            BatchTooLargeError: If the batch holds more than ``max_files`` files.
+        """
+        executor = self.adif_service.executor
+        members = []
+        for filename, source in uploads:
+            if executor is not None:
+                source = await stack.enter_async_context(executor.spooled(source))
+            listed = await asyncio.to_thread(self._list_members, filename, source)
+            members.extend((name, source, member) for name, member in listed)
+        if self.max_files and len(members) > self.max_files:
+            raise BatchTooLargeError(
+                f"The batch holds {len(members)} ADIF files, over the limit "
+                f"of {self.max_files}"
+            )
+        return members
+
+    async def _fold_members(self, members):
+        """
+        Parse the ADIF files of a batch as separate jobs.
+
+        Args:
+            members (list): ``(name, source, member)`` triples, as returned by
+                _collect_members.
+
+        Returns:
+            list: For each member, its callsign set and a list holding its first
+            callsign, or the error that kept it from being parsed.
+
+        Raises:
+            ExecutorBusyError: If the executor has no room for another job.
+        """
+        # Archives that could not be read carry their error instead of a member
+        outcomes = [member for _, _, member in members]
+        pending = [
+            index
+            for index, outcome in enumerate(outcomes)
+            if not isinstance(outcome, Exception)
+        ]
+        service = self.adif_service
+        fold = functools.partial(
+            fold_batch_member,
+            packed_callsigns=service.packed_callsigns,
+            memory_budget=service.budget_share(len(pending)),
+            max_decompression_ratio=service.max_decompression_ratio,
+        )
+        arguments = [
+            (self._repository_for(name), source, member, compression_for(name))
+            for name, source, member in (members[index] for index in pending)
+        ]
+        if service.executor is None:
+            folded = []
+            for argument_list in arguments:
+                try:
+                    folded.append(fold(*argument_list))
+                except Exception as exc:  # pylint: disable=broad-except
+                    folded.append(exc)
+        else:
+            folded = await service.executor.run_many(
+                fold, arguments, return_exceptions=True
+            )
+        for index, outcome in zip(pending, folded):
+            outcomes[index] = outcome
+        return outcomes
+
+    def _combine(self, members, outcomes):
+        """
+        Report the result of each file of a batch, and of the whole batch.
+
+        Args:
+            members (list): ``(name, source, member)`` triples.
+            outcomes (list): The outcome of each member, as returned by
+                _fold_members.
+
+        Returns:
+            dict: ``files``, the result or ``error`` for each ADIF file, and
+            ``combined``, the result for the union of their callsigns.
+
+        Raises:
+            MemoryBudgetExceededError: If the sets of the files and their union go
+                over the memory budget.
+        """
+        service = self.adif_service
+        award_service = service.award_service
+        memory_budget = None
+        if service.memory_budget:
+            memory_budget = MemoryBudget(service.memory_budget)
+            memory_budget.set(
+                "files",
+                sum(
+                    callsign_set_nbytes(outcome[0])
+                    for outcome in outcomes
+                    if not isinstance(outcome, Exception)
+                ),
+            )
+        unique_callsigns = PackedCallsignSet() if service.packed_callsigns else set()
+        callsigns = []
+        files = []
+        for (name, _, _), outcome in zip(members, outcomes):
+            if isinstance(outcome, Exception):
+                files.append({"filename": name, "error": _describe_error(outcome)})
+                continue
+            file_callsigns, file_first = outcome
+            file_count = len(file_callsigns)
+            file_tier = award_service.determine_award_tier(file_count)
+            files.append(
+                {
+                    "filename": name,
+                    **format_adif_result(file_count, file_tier, file_first),
+                }
+            )
+            unique_callsigns.update(file_callsigns)
+            callsigns = callsigns or file_first
+            if memory_budget is not None:
+                memory_budget.set(
+                    "unique_callsigns", callsign_set_nbytes(unique_callsigns)
+                )
+
+        unique_addresses = len(unique_callsigns)
+        award_tier = award_service.determine_award_tier(unique_addresses)
+        return {
+            "files": files,
+            "combined": format_adif_result(unique_addresses, award_tier, callsigns),
+        }
+
+    async def process_batch_async(self, uploads):
+        """
+        Process several ADIF files, or ZIP archives of them, as one batch.
+
+        Every ADIF or ADX file is parsed as a separate job spread across the worker
+        pool, with ZIP members and gzip or zstd files decompressed as they are
+        parsed. A file that cannot be parsed is reported on its own without failing
+        the rest of the batch. Each file gets an equal share of the memory budget,
+        and the combined result is checked against the whole budget.
+
+        Args:
+            uploads (list): ``(filename, stream)`` pairs for the uploaded files. Each
+                stream must be seekable.
+
+        Returns:
+            dict: ``files``, the result or ``error`` for each ADIF file, and
+            ``combined``, the result for the union of their callsigns.
+
+        Raises:
+            BatchTooLargeError: If the batch holds more than ``max_files`` files.
+            ExecutorBusyError: If the executor has no room for another job.
+        """
+        async with contextlib.AsyncExitStack() as stack:
+            members = await self._collect_members(uploads, stack)
+            outcomes = await self._fold_members(members)
+        return self._combine(members, outcomes)
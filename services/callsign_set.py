@@ -0,0 +1,252 @@
+"""
+Callsign Set Module
+
+This module provides a compact set of callsigns for counting distinct callsigns.
+Callsigns are short strings over the alphabet A-Z, 0-9 and ``/``, so nearly all of
+them can be packed into a single 64-bit integer and stored in a flat ``array('Q')``
+hash table instead of as individual Python strings.
+"""
+
+from array import array
+
+# Callsign characters map to digits 1..37; every other byte maps to 0
+CALLSIGN_ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ/"
+_DIGITS = bytes(
+    CALLSIGN_ALPHABET.find(chr(code)) + 1 if code < 128 else 0 for code in range(256)
+)
+_RADIX = len(CALLSIGN_ALPHABET) + 1
+# Up to 8 characters pack one digit per byte, which leaves the top bit clear. Longer
+# callsigns pack in base 38 (38 ** 12 < 2 ** 63) and are tagged with the top bit.
+_BYTE_PACKED_LENGTH = 8
+MAX_PACKED_LENGTH = 12
+_LONG_TAG = 1 << 63
+_MASK_64 = (1 << 64) - 1
+# Fibonacci hashing multiplier (2 ** 64 divided by the golden ratio)
+_HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+
+
+def pack_callsign(callsign):
+    """
+    Pack a callsign into a non-zero 64-bit integer.
+
+    Args:
+        callsign (str): The callsign to pack.
+
+    Returns:
+        int: The packed callsign, or None if it is empty, longer than 12 characters
+        or has characters outside the callsign alphabet (including lower case).
+    """
+    if not callsign or len(callsign) > MAX_PACKED_LENGTH or not callsign.isascii():
+        return None
+    digits = callsign.encode("ascii").translate(_DIGITS)
+    if 0 in digits:
+        return None
+    if len(digits) <= _BYTE_PACKED_LENGTH:
+        return int.from_bytes(digits, "big")
+    packed = 0
+    for digit in digits:
+        packed = packed * _RADIX + digit
+    return packed | _LONG_TAG
+
+
+def unpack_callsign(packed):
+    """
+    Unpack a callsign packed by pack_callsign.
+
+    Args:
+        packed (int): The packed callsign.
+
+    Returns:
+        str: The callsign.
+    """
+    if packed & _LONG_TAG:
+        packed ^= _LONG_TAG
+        digits = []
+        while packed:
+            packed, digit = divmod(packed, _RADIX)
+            digits.append(digit)
+        digits.reverse()
+    else:
+        digits = packed.to_bytes(_BYTE_PACKED_LENGTH, "big").lstrip(b"\0")
+    return "".join(CALLSIGN_ALPHABET[digit - 1] for digit in digits)
+
+
+class PackedCallsignSet:
+    """
+    Set of callsigns stored as packed 64-bit integers.
+
+    Packed callsigns live in an open-addressed hash table with linear probing over an
+    ``array('Q')``, costing 8 bytes per slot instead of a Python string per callsign.
+    The rare callsigns that cannot be packed are kept in an ordinary side set.
+    Callsigns are compared exactly, as with a set of strings.
+    """
+
+    def __init__(self, capacity=1024):
+        """
+        Initialize an empty set.
+
+        Args:
+            capacity (int): The initial number of slots, rounded up to a power of two.
+        """
+        bits = max(capacity - 1, 1).bit_length()
+        self._slots = array("Q", bytes(8 << bits))
+        self._shift = 64 - bits
+        self._used = 0
+        self._overflow = set()
+
+    def __len__(self):
+        """int: The number of distinct callsigns in the set."""
+        return self._used + len(self._overflow)
+
+    def __iter__(self):
+        """
+        Iterate over the callsigns in the set, unpacking them.
+
+        Yields:
+            str: Each callsign, in no particular order.
+        """
+        for packed in self.packed_values():
+            yield unpack_callsign(packed)
+        yield from self._overflow
+
+    def __contains__(self, callsign):
+        """
+        Check if a callsign is in the set.
+
+        Args:
+            callsign (str): The callsign to look up.
+
+        Returns:
+            bool: True if the callsign has been added.
+        """
+        packed = pack_callsign(callsign)
+        if packed is None:
+            return callsign in self._overflow
+        return self.contains_packed(packed)
+
+    def contains_packed(self, packed):
+        """
+        Check if a packed value is in the hash table.
+
+        Args:
+            packed (int): A packed callsign, or any other non-zero 64-bit key.
+
+        Returns:
+            bool: True if the value has been added.
+        """
+        slots = self._slots
+        mask = len(slots) - 1
+        mixed = (packed * _HASH_MULTIPLIER) & _MASK_64
+        index = (((mixed ^ (mixed >> 29)) * _HASH_MULTIPLIER) & _MASK_64) >> self._shift
+        while slots[index]:
+            if slots[index] == packed:
+                return True
+            index = (index + 1) & mask
+        return False
+
+    @property
+    def unpackable(self):
+        """frozenset: The callsigns that could not be packed, kept as strings."""
+        return frozenset(self._overflow)
+
+    def packed_values(self):
+        """
+        Iterate over the packed values in the hash table.
+
+        Yields:
+            int: Each packed value, in no particular order.
+        """
+        return (packed for packed in self._slots if packed)
+
+    @property
+    def nbytes(self):
+        """int: The approximate memory used by the packed hash table."""
+        return self._slots.itemsize * len(self._slots)
+
+    def add(self, callsign):
+        """
+        Add a callsign to the set.
+
+        Args:
+            callsign (str): The callsign to add.
+        """
+        packed = pack_callsign(callsign)
+        if packed is None:
+            self._overflow.add(callsign)
+            return
+        self.add_packed(packed)
+
+    def add_packed(self, packed):
+        """
+        Add a packed value to the hash table.
+
+        Besides packed callsigns, the table can hold any other non-zero 64-bit keys,
+        such as truncated hashes, as long as they are not mixed with callsigns.
+
+        Args:
+            packed (int): A packed callsign, or any other non-zero 64-bit key.
+
+        Returns:
+            bool: True if the value was not already present.
+        """
+        if not self._insert(packed):
+            return False
+        if self._used * 10 > len(self._slots) * 7:
+            self._grow()
+        return True
+
+    def update(self, callsigns):
+        """
+        Add every callsign from another collection.
+
+        Args:
+            callsigns: A PackedCallsignSet, whose packed values are merged directly,
+                or any iterable of callsigns.
+        """
+        if not isinstance(callsigns, PackedCallsignSet):
+            for callsign in callsigns:
+                self.add(callsign)
+            return
+        # Size the table for both sets first. Inserting another table's slots in
+        # order into a smaller table would pile them into long probe clusters.
+        while (self._used + len(callsigns)) * 10 > len(self._slots) * 7:
+            self._grow()
+        for packed in callsigns.packed_values():
+            self._insert(packed)
+        self._overflow.update(callsigns.unpackable)
+
+    def _insert(self, packed):
+        """
+        Insert a packed callsign into the hash table.
+
+        Args:
+            packed (int): The packed callsign.
+
+        Returns:
+            bool: True if the callsign was not already present.
+        """
+        slots = self._slots
+        mask = len(slots) - 1
+        # Packed callsigns are highly regular, so the bits are mixed twice before
+        # the top bits are taken as the home slot
+        mixed = (packed * _HASH_MULTIPLIER) & _MASK_64
+        index = (((mixed ^ (mixed >> 29)) * _HASH_MULTIPLIER) & _MASK_64) >> self._shift
+        while True:
+            current = slots[index]
+            if not current:
+                slots[index] = packed
+                self._used += 1
+                return True
+            if current == packed:
+                return False
+            index = (index + 1) & mask
+
+    def _grow(self):
+        """Double the number of slots and re-insert every packed callsign."""
+        old_slots = self._slots
+        self._slots = array("Q", bytes(16 * len(old_slots)))
+        self._shift -= 1
+        self._used = 0
+        for packed in old_slots:
+            if packed:
+                self._insert(packed)
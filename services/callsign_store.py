@@ -0,0 +1,219 @@
+"""
+Callsign Store Module
+
+This module provides a persistent store of the unique callsigns each operator has
+uploaded, so that the same ever-growing log can be uploaded again and only the
+records appended since the last upload need to be parsed. The store remembers how
+far into the log it has ingested, together with a digest of that prefix, and a
+log whose prefix is unchanged is parsed from that point on.
+"""
+
+import contextlib
+import hashlib
+import re
+import sqlite3
+
+from repositories.adif_repository import DEFAULT_CHUNK_SIZE, scan_record_end
+
+_NON_BLANK_PATTERN = re.compile(rb"\S")
+
+
+class MissingOperatorError(ValueError):
+    """Raised when a cumulative upload cannot be attributed to an operator."""
+
+
+def _complete_records(stream, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Read a stream from its start in blocks that each end on a record boundary.
+
+    Records are delimited as by scan_record_end, so an ``<EOR>`` inside a field value
+    does not end a record. Only the current chunk and any incomplete trailing record
+    are held in memory.
+
+    Args:
+        stream: A seekable binary file-like object.
+        chunk_size (int): The number of bytes to read per call.
+
+    Yields:
+        bytes: The next bytes of the stream, up to just past its last ``<EOR>``
+        marker read so far. The bytes after the last complete record are not
+        yielded.
+    """
+    stream.seek(0)
+    pending = b""
+    position = 0
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            return
+        pending += chunk
+        position, last_eor = scan_record_end(pending, position)
+        if last_eor is not None:
+            yield pending[:last_eor]
+            pending = pending[last_eor:]
+            position -= last_eor
+
+
+def last_record_end(stream, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Find the offset just past the last ``<EOR>`` marker of a stream.
+
+    Args:
+        stream: A seekable binary file-like object.
+        chunk_size (int): The number of bytes to read per call.
+
+    Returns:
+        int: The offset after the last complete record, or 0 if there is none.
+    """
+    return sum(len(block) for block in _complete_records(stream, chunk_size))
+
+
+def plan_delta(stream, checkpoint=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Work out which part of a log is new since a checkpoint.
+
+    The log is hashed up to its last complete record, in the same pass that finds
+    it. If the checkpointed prefix is unchanged, only the records after it are new;
+    otherwise the whole log is. The stream is left positioned at the first new
+    record.
+
+    Args:
+        stream: A seekable binary file-like object.
+        checkpoint (tuple, optional): The ``(offset, sha256)`` of the prefix that was
+            ingested before.
+        chunk_size (int): The number of bytes to read per call.
+
+    Returns:
+        tuple: The offset of the first new record, and the ``(offset, sha256)``
+        checkpoint covering every complete record of the log.
+    """
+    digest = hashlib.sha256()
+    prefix_sha256 = None
+    end = 0
+    for block in _complete_records(stream, chunk_size):
+        split = checkpoint[0] - end if checkpoint is not None else -1
+        if prefix_sha256 is None and 0 <= split <= len(block):
+            digest.update(block[:split])
+            prefix_sha256 = digest.hexdigest()
+            digest.update(block[split:])
+        else:
+            digest.update(block)
+        end += len(block)
+    start = 0
+    if checkpoint is not None and prefix_sha256 == checkpoint[1]:
+        start = checkpoint[0]
+
+    # Start at the next tag, so the tail is not mistaken for an ADIF header
+    stream.seek(start)
+    blank = _NON_BLANK_PATTERN.search(stream.read(chunk_size))
+    stream.seek(start + blank.start() if blank else start)
+    return start, (end, digest.hexdigest())
+
+
+class CallsignStore:
+    """
+    Per-operator store of unique callsigns, backed by SQLite.
+
+    A new connection is opened per operation, so the same database file can be
+    shared safely by every worker process on a node.
+    """
+
+    def __init__(self, path, timeout=5.0):
+        """
+        Initialize the store and create its tables if needed.
+
+        Args:
+            path (str): The path of the SQLite database file.
+            timeout (float): Seconds to wait for a lock held by another worker.
+        """
+        self.path = path
+        self.timeout = timeout
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS operators ("
+                "operator TEXT PRIMARY KEY, prefix_bytes INTEGER NOT NULL, "
+                "prefix_sha256 TEXT NOT NULL)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS callsigns ("
+                "operator TEXT NOT NULL, callsign TEXT NOT NULL, "
+                "PRIMARY KEY (operator, callsign)) WITHOUT ROWID"
+            )
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """
+        Open a connection for one transaction.
+
+        Yields:
+            sqlite3.Connection: The connection, committed and closed afterwards.
+        """
+        connection = sqlite3.connect(self.path, timeout=self.timeout)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def checkpoint(self, operator):
+        """
+        Get how far into an operator's log the store has ingested.
+
+        Args:
+            operator (str): The station callsign of the operator.
+
+        Returns:
+            tuple: The ``(offset, sha256)`` of the ingested prefix, or None if the
+            operator has not uploaded before.
+        """
+        with self._connect() as connection:
+            return connection.execute(
+                "SELECT prefix_bytes, prefix_sha256 FROM operators WHERE operator = ?",
+                (operator,),
+            ).fetchone()
+
+    def count(self, operator):
+        """
+        Count the unique callsigns an operator has uploaded.
+
+        Args:
+            operator (str): The station callsign of the operator.
+
+        Returns:
+            int: The number of unique callsigns.
+        """
+        with self._connect() as connection:
+            return connection.execute(
+                "SELECT COUNT(*) FROM callsigns WHERE operator = ?", (operator,)
+            ).fetchone()[0]
+
+    def merge(self, operator, callsigns, checkpoint):
+        """
+        Add callsigns to an operator's set and move their checkpoint.
+
+        Args:
+            operator (str): The station callsign of the operator.
+            callsigns (iterable): The callsigns found in the new records.
+            checkpoint (tuple): The ``(offset, sha256)`` of the log ingested so far.
+
+        Returns:
+            tuple: The number of callsigns that were new to the operator, and the
+            operator's cumulative number of unique callsigns.
+        """
+        with self._connect() as connection:
+            before = connection.total_changes
+            connection.executemany(
+                "INSERT OR IGNORE INTO callsigns (operator, callsign) VALUES (?, ?)",
+                ((operator, callsign) for callsign in callsigns),
+            )
+            added = connection.total_changes - before
+            connection.execute(
+                "INSERT OR REPLACE INTO operators "
+                "(operator, prefix_bytes, prefix_sha256) VALUES (?, ?, ?)",
+                (operator, *checkpoint),
+            )
+            total = connection.execute(
+                "SELECT COUNT(*) FROM callsigns WHERE operator = ?", (operator,)
+            ).fetchone()[0]
+        return added, total
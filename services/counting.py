@@ -0,0 +1,192 @@
+"""
+Counting Module
+
+This module provides the engines used to count distinct callsigns. Exact counting
+keeps a set of every callsign; approximate counting uses a HyperLogLog sketch whose
+memory use is fixed however many callsigns a log contains.
+"""
+
+import hashlib
+import math
+
+from services.callsign_set import PackedCallsignSet
+from services.memory_budget import BUDGET_CHECK_INTERVAL, callsign_set_nbytes
+
+EXACT = "exact"
+APPROXIMATE = "approximate"
+COUNTING_MODES = (EXACT, APPROXIMATE)
+
+
+class HyperLogLog:
+    """
+    HyperLogLog sketch for estimating the number of distinct strings.
+
+    With ``2 ** precision`` registers the relative standard error of the estimate is
+    ``1.04 / sqrt(2 ** precision)``, about 0.81% at the default precision of 14,
+    which needs 16 KiB of registers.
+    """
+
+    def __init__(self, precision=14):
+        """
+        Initialize an empty sketch.
+
+        Args:
+            precision (int): The number of hash bits used to pick a register,
+                between 4 and 18.
+
+        Raises:
+            ValueError: If the precision is out of range.
+        """
+        if not 4 <= precision <= 18:
+            raise ValueError("precision must be between 4 and 18")
+        self.precision = precision
+        self.register_count = 1 << precision
+        self.registers = bytearray(self.register_count)
+        self._rank_bits = 64 - precision
+        self._rank_mask = (1 << self._rank_bits) - 1
+
+    @property
+    def relative_error(self):
+        """float: The relative standard error of the estimate."""
+        return 1.04 / math.sqrt(self.register_count)
+
+    def add(self, value):
+        """
+        Add a string to the sketch.
+
+        Args:
+            value (str): The value to add.
+        """
+        hashed = int.from_bytes(
+            hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big"
+        )
+        index = hashed >> self._rank_bits
+        rank = self._rank_bits - (hashed & self._rank_mask).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def estimate(self):
+        """
+        Estimate the number of distinct values added.
+
+        Returns:
+            float: The estimated cardinality.
+        """
+        count = self.register_count
+        alpha = 0.7213 / (1 + 1.079 / count)
+        raw = alpha * count * count / sum(2.0**-rank for rank in self.registers)
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * count and zeros:
+            # Linear counting is more accurate for small cardinalities
+            return count * math.log(count / zeros)
+        return raw
+
+    def error_margin(self, estimate, sigmas=5):
+        """
+        Get the error margin around an estimate.
+
+        Args:
+            estimate (float): The estimated cardinality.
+            sigmas (float): The number of standard errors the margin spans. At 5 the
+                true count lies outside the margin with a probability below one in
+                a million.
+
+        Returns:
+            float: The margin, as an absolute number of distinct values.
+        """
+        return estimate * self.relative_error * sigmas
+
+
+def fold_callsigns(records, add):
+    """
+    Pass the callsign of every ADIF record that has one to a collector.
+
+    Args:
+        records (iterable): An iterable of ADIF record dictionaries.
+        add (callable): Called with each callsign, such as the ``add`` method of a
+            set or a sketch.
+
+    Returns:
+        list: A list holding the first callsign found, or empty if there is none.
+    """
+    callsigns = []
+    for record in records:
+        call = record.get("call")
+        if not call:
+            continue
+        if not callsigns:
+            callsigns.append(call)
+        add(call)
+    return callsigns
+
+
+def estimate_callsign_data(records, precision=14):
+    """
+    Fold ADIF records into an approximate distinct-callsign count.
+
+    Args:
+        records (iterable): An iterable of ADIF record dictionaries.
+        precision (int): The HyperLogLog precision.
+
+    Returns:
+        tuple: A tuple containing:
+            - HyperLogLog: The sketch of every callsign found
+            - list: A list holding the first callsign found, or empty if there is none
+    """
+    sketch = HyperLogLog(precision)
+    callsigns = fold_callsigns(records, sketch.add)
+    return sketch, callsigns
+
+
+def _report_set_size(records, unique_callsigns, memory_budget):
+    """
+    Pass records through, reporting the size of a callsign set every few thousand.
+
+    Args:
+        records (iterable): An iterable of ADIF record dictionaries.
+        unique_callsigns: The set the callsigns of the records are collected in.
+        memory_budget (MemoryBudget): The budget the size of the set is reported to
+            as ``unique_callsigns``.
+
+    Yields:
+        dict: The records, unchanged.
+
+    Raises:
+        MemoryBudgetExceededError: If the set goes over the budget.
+    """
+    for count, record in enumerate(records, 1):
+        if not count % BUDGET_CHECK_INTERVAL:
+            memory_budget.set("unique_callsigns", callsign_set_nbytes(unique_callsigns))
+        yield record
+
+
+def fold_callsign_data(records, unique_callsigns=None, memory_budget=None):
+    """
+    Fold ADIF records into callsign data as they arrive.
+
+    Unlike extract_callsign_data, this does not keep a list of every callsign, so it
+    can consume a lazy record iterator while holding only the set of unique callsigns.
+
+    Args:
+        records (iterable): An iterable of ADIF record dictionaries.
+        unique_callsigns (optional): An empty set-like object providing ``add`` and
+            ``len`` to collect unique callsigns in. Defaults to a PackedCallsignSet.
+        memory_budget (MemoryBudget, optional): A budget the size of the set is
+            reported to as ``unique_callsigns`` every few thousand records.
+
+    Returns:
+        tuple: A tuple containing:
+            - int: The number of unique callsigns
+            - list: A list holding the first callsign found, or empty if there is none
+
+    Raises:
+        MemoryBudgetExceededError: If the set goes over the budget.
+    """
+    if unique_callsigns is None:
+        unique_callsigns = PackedCallsignSet()
+    if memory_budget is not None:
+        records = _report_set_size(records, unique_callsigns, memory_budget)
+    callsigns = fold_callsigns(records, unique_callsigns.add)
+    if memory_budget is not None:
+        memory_budget.set("unique_callsigns", callsign_set_nbytes(unique_callsigns))
+    return len(unique_callsigns), callsigns
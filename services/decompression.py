@@ -0,0 +1,245 @@
+"""
+Decompression Module
+
+This module provides streaming decompression of gzip and zstd uploads. Compressed
+bytes are decompressed as the parser reads them, so the uncompressed log is never
+held in memory or written to disk, and a ratio guard stops decompression bombs.
+"""
+
+import gzip
+import io
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    # zstd uploads are rejected when the optional zstandard package is missing
+    zstandard = None
+
+GZIP = "gzip"
+ZSTD = "zstd"
+
+# File name suffixes of compressed uploads
+COMPRESSION_SUFFIXES = {".gz": GZIP, ".zst": ZSTD}
+
+# Content-Encoding values of compressed uploads
+CONTENT_ENCODINGS = {"gzip": GZIP, "x-gzip": GZIP, "zstd": ZSTD}
+
+# Errors raised by the decompressors for truncated or invalid data
+_CORRUPT_DATA_ERRORS = (OSError, EOFError, zlib.error)
+if zstandard is not None:
+    _CORRUPT_DATA_ERRORS += (zstandard.ZstdError,)
+
+# Output allowed before the ratio guard applies, so tiny files are never rejected
+RATIO_GRACE_BYTES = 1024 * 1024
+
+
+class UnsupportedCompressionError(ValueError):
+    """Raised when an upload uses a compression this service cannot decompress."""
+
+
+class CorruptCompressedDataError(ValueError):
+    """Raised when a compressed upload is truncated or not validly compressed."""
+
+
+class DecompressionBombError(ValueError):
+    """
+    Raised when an upload expands far more than a real ADIF log would.
+
+    The error keeps its details in ``args`` so that it survives being pickled back
+    from a process worker.
+
+    Attributes:
+        compressed_bytes (int): The compressed bytes read so far.
+        decompressed_bytes (int): The bytes they expanded to.
+        max_ratio (float): The largest expansion allowed.
+    """
+
+    def __init__(self, compressed_bytes, decompressed_bytes, max_ratio):
+        """
+        Initialize the error.
+
+        Args:
+            compressed_bytes (int): The compressed bytes read so far.
+            decompressed_bytes (int): The bytes they expanded to.
+            max_ratio (float): The largest expansion allowed.
+        """
+        super().__init__(compressed_bytes, decompressed_bytes, max_ratio)
+        self.compressed_bytes = compressed_bytes
+        self.decompressed_bytes = decompressed_bytes
+        self.max_ratio = max_ratio
+
+    def __str__(self):
+        """Describe the error."""
+        return (
+            f"{self.compressed_bytes} compressed bytes expanded to "
+            f"{self.decompressed_bytes} bytes, over the limit of "
+            f"{self.max_ratio:g} times"
+        )
+
+    def to_dict(self):
+        """
+        Describe the error for an API response.
+
+        Returns:
+            dict: The error code, message and figures.
+        """
+        return {
+            "error": "decompression_ratio_exceeded",
+            "message": str(self),
+            "compressed_bytes": self.compressed_bytes,
+            "decompressed_bytes": self.decompressed_bytes,
+            "max_ratio": self.max_ratio,
+        }
+
+
+def strip_compression_suffix(filename):
+    """
+    Remove a compression suffix from a file name.
+
+    Args:
+        filename (str): The file name, such as ``log.adi.gz``.
+
+    Returns:
+        str: The name without its compression suffix, such as ``log.adi``.
+    """
+    for suffix in COMPRESSION_SUFFIXES:
+        if filename.lower().endswith(suffix):
+            return filename[: -len(suffix)]
+    return filename
+
+
+def compression_for(filename, content_encoding=None):
+    """
+    Work out how an upload is compressed.
+
+    Args:
+        filename (str): The name of the upload.
+        content_encoding (str, optional): The Content-Encoding of the upload.
+
+    Returns:
+        str: ``gzip`` or ``zstd``, or None if the upload is not compressed.
+
+    Raises:
+        UnsupportedCompressionError: If the Content-Encoding is not supported.
+    """
+    if content_encoding and content_encoding.strip().lower() != "identity":
+        try:
+            return CONTENT_ENCODINGS[content_encoding.strip().lower()]
+        except KeyError as exc:
+            raise UnsupportedCompressionError(
+                f"Content-Encoding '{content_encoding}' is not supported"
+            ) from exc
+    for suffix, compression in COMPRESSION_SUFFIXES.items():
+        if (filename or "").lower().endswith(suffix):
+            return compression
+    return None
+
+
+class RatioGuardedReader(io.RawIOBase):
+    """
+    Read-only stream of decompressed bytes that stops at a decompression ratio.
+
+    The reader does not expose a file descriptor, so consumers such as the scanner
+    read it in chunks rather than memory-mapping the compressed file beneath it.
+    """
+
+    def __init__(self, decompressed, compressed, max_ratio):
+        """
+        Initialize the reader.
+
+        Args:
+            decompressed: A binary stream of decompressed bytes.
+            compressed: The seekable binary stream of compressed bytes it reads.
+            max_ratio (float): The largest expansion allowed; 0 disables the guard.
+        """
+        super().__init__()
+        self._decompressed = decompressed
+        self._compressed = compressed
+        self._start = compressed.tell()
+        self.max_ratio = max_ratio
+        self.decompressed_bytes = 0
+
+    def readable(self):
+        """Report that the stream can be read."""
+        return True
+
+    def tell(self):
+        """
+        Report the position in the decompressed bytes.
+
+        This lets a reader nested within this one, such as a gzip file within a ZIP
+        archive, measure its own ratio.
+
+        Returns:
+            int: The number of decompressed bytes read so far.
+        """
+        return self.decompressed_bytes
+
+    def readinto(self, buffer):
+        """
+        Read decompressed bytes into a buffer.
+
+        Args:
+            buffer: A writable bytes-like object.
+
+        Returns:
+            int: The number of bytes read, 0 at the end of the stream.
+
+        Raises:
+            DecompressionBombError: If the output has outgrown the input by more
+                than the allowed ratio.
+            CorruptCompressedDataError: If the data is not validly compressed.
+        """
+        try:
+            data = self._decompressed.read(len(buffer))
+        except _CORRUPT_DATA_ERRORS as exc:
+            raise CorruptCompressedDataError(
+                f"The upload could not be decompressed: {exc}"
+            ) from exc
+        size = len(data)
+        buffer[:size] = data
+        self.decompressed_bytes += size
+        if self.max_ratio and self.decompressed_bytes > RATIO_GRACE_BYTES:
+            compressed_bytes = max(self._compressed.tell() - self._start, 1)
+            if self.decompressed_bytes > compressed_bytes * self.max_ratio:
+                raise DecompressionBombError(
+                    compressed_bytes, self.decompressed_bytes, self.max_ratio
+                )
+        return size
+
+    def close(self):
+        """Close the decompressor, leaving the compressed stream open."""
+        if not self.closed:
+            self._decompressed.close()
+        super().close()
+
+
+def open_decompressed(stream, compression, max_ratio=0):
+    """
+    Wrap a compressed stream in a stream of its decompressed bytes.
+
+    Args:
+        stream: A binary file-like object of compressed bytes, positioned at the
+            start of the compressed data.
+        compression (str): ``gzip`` or ``zstd``.
+        max_ratio (float): The largest expansion allowed; 0 disables the guard.
+
+    Returns:
+        io.BufferedReader: A stream of the decompressed bytes.
+
+    Raises:
+        UnsupportedCompressionError: If the compression is not supported, or zstd
+            is requested without the zstandard package installed.
+    """
+    if compression == GZIP:
+        decompressed = gzip.GzipFile(fileobj=stream, mode="rb")
+    elif compression == ZSTD:
+        if zstandard is None:
+            raise UnsupportedCompressionError(
+                "zstd uploads need the zstandard package, which is not installed"
+            )
+        decompressed = zstandard.ZstdDecompressor().stream_reader(stream, closefd=False)
+    else:
+        raise UnsupportedCompressionError(f"Unknown compression '{compression}'")
+    return io.BufferedReader(RatioGuardedReader(decompressed, stream, max_ratio))
@@ -0,0 +1,508 @@
+"""
+Parse Executor Module
+
+This module provides the executor layer that runs CPU-bound ADIF parsing away from
+the event loop. Work runs on a process pool by default, or a thread pool when
+configured, with a bounded number of queued jobs.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import functools
+import math
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from concurrent.futures.thread import BrokenThreadPool
+
+from repositories.adif_repository import DEFAULT_CHUNK_SIZE
+from services.metrics import apply_observations, call_collecting
+from services.profiling import adopt_recordings, call_profiled, profiling, recording
+from services.tracing import adopt_spans, continued, current_context
+
+EXECUTOR_KINDS = ("process", "thread")
+
+# Path through which another process can open a file descriptor of this one
+_FD_PATH_TEMPLATE = "/proc/{pid}/fd/{fd}"
+
+# Errors of a pool whose worker died; the thread pool only breaks if a worker
+# cannot be initialized
+_BROKEN_POOL_ERRORS = (BrokenProcessPool, BrokenThreadPool)
+
+# Files holding the CPU quota of the container: cgroup v2 "quota period", and the
+# cgroup v1 quota and period
+_CGROUP_CPU_MAX_FILE = "/sys/fs/cgroup/cpu.max"
+_CGROUP_V1_CPU_FILES = (
+    "/sys/fs/cgroup/cpu/cpu.cfs_quota_us",
+    "/sys/fs/cgroup/cpu/cpu.cfs_period_us",
+)
+
+
+class ExecutorBusyError(Exception):
+    """Raised when the parse executor has no room for another job."""
+
+
+class WorkerCrashedError(ExecutorBusyError):
+    """
+    Raised when a pool worker died while running a job.
+
+    The pool is replaced, so the job can be retried like one turned away for lack
+    of room.
+    """
+
+
+def _read_words(path):
+    """
+    Read the whitespace-separated words of a small file.
+
+    Args:
+        path (str): The path of the file.
+
+    Returns:
+        list: The words, or None if the file cannot be read.
+    """
+    try:
+        with open(path, encoding="ascii") as cgroup_file:
+            return cgroup_file.read().split()
+    except OSError:
+        return None
+
+
+def container_cpu_limit():
+    """
+    Read the CPU quota of the container from its cgroup.
+
+    Returns:
+        float: The number of CPUs the quota allows, or 0 if there is none or it
+        cannot be read.
+    """
+    words = _read_words(_CGROUP_CPU_MAX_FILE)
+    if words is None:
+        quota, period = (_read_words(path) for path in _CGROUP_V1_CPU_FILES)
+        words = (quota or []) + (period or [])
+    if len(words) != 2 or not all(word.isdigit() for word in words):
+        # "max" for cgroup v2, and -1 for cgroup v1, mean no quota
+        return 0
+    quota, period = (int(word) for word in words)
+    return quota / period if period else 0
+
+
+def available_cpus():
+    """
+    Count the CPUs this process may use.
+
+    The CPUs the process is pinned to are counted rather than those of the host,
+    and capped by the CPU quota of the container, rounded up.
+
+    Returns:
+        int: The number of CPUs, at least 1.
+    """
+    try:
+        count = len(os.sched_getaffinity(0))
+    except AttributeError:
+        count = os.cpu_count() or 1
+    limit = container_cpu_limit()
+    if limit:
+        count = min(count, math.ceil(limit))
+    return max(count, 1)
+
+
+def _warm_up():
+    """
+    Trivial job used to start pool workers ahead of the first request.
+
+    Returns:
+        int: The process id of the worker.
+    """
+    return os.getpid()
+
+
+def _spool_to_path(stream, chunk_size):
+    """
+    Copy a binary stream to a named temporary file.
+
+    Args:
+        stream: A binary file-like object providing ``read(size)``.
+        chunk_size (int): The number of bytes to copy per call.
+
+    Returns:
+        str: The path of the temporary file. The caller must remove it.
+    """
+    with tempfile.NamedTemporaryFile(prefix="adif-", delete=False) as spool:
+        shutil.copyfileobj(stream, spool, chunk_size)
+        return spool.name
+
+
+def _disk_path(stream):
+    """
+    Get the path of the file on disk behind a stream, if it can be opened again.
+
+    An unnamed temporary file, such as an upload spooled to disk by the web
+    framework, is reached through its descriptor under ``/proc``, which a process
+    worker can open although the file has no name.
+
+    Args:
+        stream: A binary file-like object.
+
+    Returns:
+        str: The path of the file, or None if the stream is not a regular file
+        positioned at its start.
+    """
+    path = getattr(stream, "name", None)
+    if isinstance(path, int):
+        # The worker is another process, so this process's id names the descriptor
+        path = _FD_PATH_TEMPLATE.format(pid=os.getpid(), fd=path)
+    elif isinstance(path, os.PathLike):
+        path = os.fspath(path)
+    if not isinstance(path, str) or not os.path.isfile(path):
+        return None
+    try:
+        return path if stream.tell() == 0 else None
+    except (OSError, ValueError):
+        return None
+
+
+def _call_with_path(func, path):
+    """
+    Call a stream-consuming function on a file opened in a pool worker.
+
+    Args:
+        func (callable): A function taking a binary stream.
+        path (str): The path of the file to open.
+
+    Returns:
+        The return value of ``func``.
+    """
+    with open(path, "rb") as stream:
+        return func(stream)
+
+
+def _call_in_worker(trace_context, profile, func, *args):
+    """
+    Call a function in a process worker, collecting its metrics, spans and profile.
+
+    Args:
+        trace_context (tuple): The trace the call continues, as returned by
+            current_context, or None.
+        profile (bool): Whether the upload the call is for is being profiled.
+        func (callable): The function to call.
+        *args: The positional arguments for ``func``.
+
+    Returns:
+        tuple: The return value of ``func``, the metrics observations, the
+        finished spans, and the profile recordings.
+    """
+    with continued(trace_context) as spans, recording(profile) as recordings:
+        result, observations = call_collecting(func, *args)
+    return result, observations, spans, recordings
+
+
+def _collected(value):
+    """
+    Apply the metrics, spans and profile a process worker collected, and get the
+    result of its call.
+
+    Args:
+        value: The tuple returned by _call_in_worker, or an exception returned in
+            place of it.
+
+    Returns:
+        The result of the call, or the exception.
+    """
+    if isinstance(value, BaseException):
+        return value
+    result, observations, spans, recordings = value
+    apply_observations(observations)
+    adopt_spans(spans)
+    adopt_recordings(recordings)
+    return result
+
+
+class ParseExecutor:
+    """
+    Bounded executor for CPU-bound parsing work.
+
+    At most ``max_workers`` jobs run at once and at most ``max_queue_depth`` more may
+    wait for a worker; further submissions fail fast with ExecutorBusyError. Metrics,
+    trace spans and profiles recorded by calls in a process worker are sent back
+    with their results and applied in this process, which is the one that serves
+    ``/metrics``, exports traces and keeps profiles.
+    """
+
+    def __init__(
+        self,
+        kind="process",
+        max_workers=None,
+        max_queue_depth=16,
+        chunk_size=DEFAULT_CHUNK_SIZE,
+    ):
+        """
+        Initialize the parse executor.
+
+        Args:
+            kind (str): ``process`` for a process pool or ``thread`` for a thread pool.
+            max_workers (int, optional): The number of workers. Defaults to the
+                number of CPUs available to the process, as counted by
+                available_cpus.
+            max_queue_depth (int): The number of jobs that may wait for a worker.
+            chunk_size (int): The number of bytes copied per call when spooling a
+                stream for a process worker.
+
+        Raises:
+            ValueError: If the executor kind is not known.
+        """
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(
+                f"Unknown executor kind '{kind}'. Choose one of: {', '.join(EXECUTOR_KINDS)}"
+            )
+        self.kind = kind
+        self.max_workers = max_workers or available_cpus()
+        self.max_queue_depth = max_queue_depth
+        self.chunk_size = chunk_size
+        self._pool = None
+        self._in_flight = 0
+
+    def _submit(self, loop, func, *args):
+        """
+        Submit a call to the worker pool, continuing the current trace in it and
+        profiling it if the current upload is profiled.
+
+        Args:
+            loop: The running event loop.
+            func (callable): The function to run.
+            *args: The positional arguments for ``func``.
+
+        Returns:
+            asyncio.Future: The future of the call. For a process pool it resolves
+            to the tuple returned by _call_in_worker.
+        """
+        if self.kind == "process":
+            return loop.run_in_executor(
+                self._pool,
+                functools.partial(
+                    _call_in_worker, current_context(), profiling(), func, *args
+                ),
+            )
+        context = contextvars.copy_context()
+        return loop.run_in_executor(
+            self._pool, functools.partial(context.run, call_profiled, func, *args)
+        )
+
+    def _discard_pool(self, pool, exc):
+        """
+        Drop a pool whose worker died, so that the next job starts a new one.
+
+        Args:
+            pool: The pool the failed job was submitted to.
+            exc (Exception): The error the pool failed with.
+
+        Returns:
+            WorkerCrashedError: The error for the job that was in flight.
+        """
+        # Another job may already have replaced the broken pool
+        if pool is not None and self._pool is pool:
+            pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        return WorkerCrashedError(
+            f"A parse worker stopped unexpectedly and was replaced: {exc}"
+        )
+
+    async def _call(self, func, *args):
+        """
+        Run a call in the worker pool, replacing the pool if a worker dies.
+
+        Args:
+            func (callable): The function to run.
+            *args: The positional arguments for ``func``.
+
+        Returns:
+            The return value of ``func``.
+
+        Raises:
+            WorkerCrashedError: If a worker died while running the call.
+        """
+        pool = self._pool
+        try:
+            loop = asyncio.get_running_loop()
+            return self._result(await self._submit(loop, func, *args))
+        except _BROKEN_POOL_ERRORS as exc:
+            raise self._discard_pool(pool, exc) from exc
+
+    def _result(self, value):
+        """
+        Get the result of a call submitted with _submit.
+
+        Args:
+            value: The value the future of the call resolved to.
+
+        Returns:
+            The return value of the call, or an exception returned in its place.
+        """
+        return _collected(value) if self.kind == "process" else value
+
+    @property
+    def in_flight(self):
+        """int: The number of jobs running or waiting for a worker."""
+        return self._in_flight
+
+    @property
+    def saturated(self):
+        """bool: True if no further job can be accepted."""
+        return self._in_flight >= self.max_workers + self.max_queue_depth
+
+    def start(self):
+        """
+        Create the worker pool and start every worker.
+
+        Workers are pre-warmed so the first requests do not pay for process start-up.
+        Calling start on a running executor does nothing.
+        """
+        if self._pool is not None:
+            return
+        if self.kind == "process":
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        else:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="adif-parse"
+            )
+        warm_ups = [self._pool.submit(_warm_up) for _ in range(self.max_workers)]
+        for future in warm_ups:
+            future.result()
+
+    def shutdown(self):
+        """Stop the worker pool, cancelling jobs that have not started."""
+        if self._pool is None:
+            return
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        self._pool = None
+
+    def _reserve(self):
+        """
+        Reserve a slot for a new job.
+
+        Raises:
+            ExecutorBusyError: If the executor is saturated.
+        """
+        if self.saturated:
+            raise ExecutorBusyError(
+                f"Parse executor is busy ({self._in_flight} jobs in flight)"
+            )
+        if self._pool is None:
+            self.start()
+        self._in_flight += 1
+
+    async def run(self, func, *args):
+        """
+        Run a function in the worker pool.
+
+        Args:
+            func (callable): The function to run. It must be picklable for a process pool.
+            *args: The positional arguments for ``func``.
+
+        Returns:
+            The return value of ``func``.
+
+        Raises:
+            ExecutorBusyError: If the executor is saturated.
+            WorkerCrashedError: If a worker died while running the job.
+        """
+        self._reserve()
+        try:
+            return await self._call(func, *args)
+        finally:
+            self._in_flight -= 1
+
+    @contextlib.asynccontextmanager
+    async def spooled(self, stream):
+        """
+        Spool a binary stream to a temporary file for the duration of a block.
+
+        A stream that is already a file on disk, such as an upload stored by the job
+        scheduler or one the web framework has rolled over to disk, is used in place
+        rather than copied. Only streams held in memory are written out.
+
+        Args:
+            stream: A binary file-like object providing ``read(size)``.
+
+        Yields:
+            str: The path of the file. A temporary file is removed afterwards.
+        """
+        path = _disk_path(stream)
+        if path is not None:
+            yield path
+            return
+        path = await asyncio.to_thread(_spool_to_path, stream, self.chunk_size)
+        try:
+            yield path
+        finally:
+            os.unlink(path)
+
+    async def run_stream(self, func, stream):
+        """
+        Run a stream-consuming function in the worker pool.
+
+        A thread worker reads the stream directly. Streams cannot be sent to another
+        process, so for a process pool the stream is first spooled to a temporary
+        file, which the worker opens itself; the payload is never pickled.
+
+        Args:
+            func (callable): A function taking a binary stream. It must be picklable
+                for a process pool.
+            stream: A binary file-like object providing ``read(size)``.
+
+        Returns:
+            The return value of ``func``.
+
+        Raises:
+            ExecutorBusyError: If the executor is saturated.
+            WorkerCrashedError: If a worker died while running the job.
+        """
+        if self.kind == "thread":
+            return await self.run(func, stream)
+
+        self._reserve()
+        try:
+            async with self.spooled(stream) as path:
+                return await self._call(_call_with_path, func, path)
+        finally:
+            self._in_flight -= 1
+
+    async def run_many(self, func, argument_lists, return_exceptions=False):
+        """
+        Run a function once per argument list, spread across the worker pool.
+
+        The calls count as a single job against the queue depth.
+
+        Args:
+            func (callable): The function to run. It must be picklable for a process pool.
+            argument_lists (list): The positional arguments for each call.
+            return_exceptions (bool): Whether an exception raised by one call is
+                returned in place of its result rather than raised.
+
+        Returns:
+            list: The return values, in the order of ``argument_lists``.
+
+        Raises:
+            ExecutorBusyError: If the executor is saturated.
+            WorkerCrashedError: If a worker died while running the job.
+        """
+        self._reserve()
+        pool = self._pool
+        try:
+            loop = asyncio.get_running_loop()
+            values = await asyncio.gather(
+                *(self._submit(loop, func, *arguments) for arguments in argument_lists),
+                return_exceptions=return_exceptions,
+            )
+            # A dead worker fails every call, so the calls are not reported one by one
+            for value in values:
+                if isinstance(value, _BROKEN_POOL_ERRORS):
+                    raise value
+            return [self._result(value) for value in values]
+        except _BROKEN_POOL_ERRORS as exc:
+            raise self._discard_pool(pool, exc) from exc
+        finally:
+            self._in_flight -= 1
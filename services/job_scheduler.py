@@ -0,0 +1,325 @@
+"""
+Job Scheduler Module
+
+This module provides the scheduler behind the asynchronous job API. Uploads are
+stored on local disk and processed in the background by a fixed number of workers,
+smallest file first, so that a long bulk import does not hold up interactive users
+and no request has to wait for its log to be parsed.
+"""
+
+import asyncio
+import itertools
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from collections import OrderedDict
+
+from repositories.adif_repository import DEFAULT_CHUNK_SIZE
+from services.admission import AdmissionBusyError
+from services.executor import ExecutorBusyError, WorkerCrashedError
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Delay before a worker first retries a job there was no room to parse, doubled on
+# every further retry up to the maximum
+BUSY_RETRY_DELAY = 0.1
+BUSY_RETRY_MAX_DELAY = 5.0
+
+# Errors meaning a job should be retried once parsing capacity frees up
+_BUSY_ERRORS = (ExecutorBusyError, AdmissionBusyError)
+
+
+class JobQueueFullError(Exception):
+    """Raised when the job queue has no room for another upload."""
+
+
+def _store_upload(stream, directory, chunk_size):
+    """
+    Copy an upload stream to a file in the job storage directory.
+
+    Args:
+        stream: A binary file-like object providing ``read(size)``.
+        directory (str): The directory to store the file in.
+        chunk_size (int): The number of bytes to copy per call.
+
+    Returns:
+        tuple: The path of the stored file and its size in bytes.
+    """
+    with tempfile.NamedTemporaryFile(
+        prefix="job-", suffix=".adi", dir=directory, delete=False
+    ) as stored:
+        try:
+            shutil.copyfileobj(stream, stored, chunk_size)
+        except BaseException:
+            os.unlink(stored.name)
+            raise
+        return stored.name, stored.tell()
+
+
+class Job:
+    """
+    A queued upload and, once processed, its result.
+
+    Attributes:
+        id (str): The job id handed to the client.
+        path (str): The path of the stored upload, until it has been processed.
+        size (int): The size of the upload in bytes.
+        status (str): ``queued``, ``running``, ``done`` or ``failed``.
+        result (dict): The processing result, once the job is done.
+        error: The reason the job failed, if it did, as a message or a structured
+            error dictionary.
+    """
+
+    def __init__(self, path, size, process):
+        """
+        Initialize a queued job.
+
+        Args:
+            path (str): The path of the stored upload.
+            size (int): The size of the upload in bytes.
+            process (callable): A coroutine function taking a binary stream and
+                returning the result dictionary.
+        """
+        self.id = uuid.uuid4().hex
+        self.path = path
+        self.size = size
+        self.process = process
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.finished_at = None
+
+    def to_dict(self):
+        """
+        Describe the job for the API.
+
+        Returns:
+            dict: The job id, status and size, plus the result once the job is done
+            or the error if it failed.
+        """
+        description = {"job_id": self.id, "status": self.status, "size": self.size}
+        if self.status == DONE:
+            description["result"] = self.result
+        elif self.status == FAILED:
+            description["error"] = self.error
+        return description
+
+
+class JobScheduler:
+    """
+    Bounded scheduler that processes stored uploads in the background.
+
+    At most ``max_queue`` jobs may wait for one of the ``max_workers`` workers;
+    further submissions fail fast with JobQueueFullError. Waiting jobs are taken
+    smallest first, and in submission order for equal sizes. Finished jobs are
+    kept for lookup until ``retention`` newer jobs have finished.
+
+    Jobs are kept in the memory of this process only: they are lost when it
+    restarts, and a job can only be looked up through the replica that accepted it.
+    """
+
+    def __init__(
+        self,
+        storage_dir=None,
+        max_workers=2,
+        max_queue=64,
+        retention=1000,
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        *,
+        busy_timeout=300.0,
+    ):
+        """
+        Initialize the job scheduler.
+
+        Args:
+            storage_dir (str, optional): The directory uploads are stored in.
+                Defaults to the system temporary directory.
+            max_workers (int): The number of jobs processed at once.
+            max_queue (int): The number of jobs that may wait for a worker.
+            retention (int): The number of finished jobs kept for lookup.
+            chunk_size (int): The number of bytes copied per call when storing
+                an upload.
+            busy_timeout (float): How many seconds a job may keep waiting for
+                room to parse before it fails.
+        """
+        self.storage_dir = storage_dir or tempfile.gettempdir()
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retention = retention
+        self.chunk_size = chunk_size
+        self.busy_timeout = busy_timeout
+        self._jobs = {}
+        self._finished = OrderedDict()
+        self._queue = None
+        self._sequence = itertools.count()
+        self._workers = []
+        self._waiting = 0
+
+    @property
+    def queued(self):
+        """int: The number of jobs waiting for a worker or being stored."""
+        return self._waiting
+
+    def get(self, job_id):
+        """
+        Look up a job by id.
+
+        Args:
+            job_id (str): The job id.
+
+        Returns:
+            Job: The job, or None if it is not known or has expired.
+        """
+        return self._jobs.get(job_id)
+
+    async def submit(self, stream, process):
+        """
+        Store an upload and queue it for processing.
+
+        Args:
+            stream: A binary file-like object providing ``read(size)``.
+            process (callable): A coroutine function taking a binary stream and
+                returning the result dictionary.
+
+        Returns:
+            Job: The queued job.
+
+        Raises:
+            JobQueueFullError: If the queue is full.
+        """
+        if self._waiting >= self.max_queue:
+            raise JobQueueFullError(f"Job queue is full ({self._waiting} jobs waiting)")
+        self._waiting += 1
+        try:
+            os.makedirs(self.storage_dir, exist_ok=True)
+            path, size = await asyncio.to_thread(
+                _store_upload, stream, self.storage_dir, self.chunk_size
+            )
+        except BaseException:
+            self._waiting -= 1
+            raise
+
+        job = Job(path, size, process)
+        self._jobs[job.id] = job
+        self._start()
+        self._queue.put_nowait((size, next(self._sequence), job))
+        return job
+
+    def _start(self):
+        """Start the workers on the running event loop, if they are not running."""
+        if self._workers:
+            return
+        self._queue = asyncio.PriorityQueue()
+        self._workers = [
+            asyncio.create_task(self._work()) for _ in range(self.max_workers)
+        ]
+
+    async def _work(self):
+        """Process queued jobs until cancelled."""
+        while True:
+            _, _, job = await self._queue.get()
+            self._waiting -= 1
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job):
+        """
+        Process a job, recording its result or error.
+
+        Args:
+            job (Job): The job to process.
+        """
+        job.status = RUNNING
+        try:
+            job.result = await self._process_when_idle(job)
+            job.status = DONE
+        except asyncio.CancelledError:
+            job.status = FAILED
+            job.error = "The service shut down before the job finished"
+            raise
+        except Exception as exc:  # pylint: disable=broad-except
+            job.status = FAILED
+            # Errors that describe themselves in detail are reported as such
+            to_dict = getattr(exc, "to_dict", None)
+            job.error = to_dict() if to_dict else str(exc) or type(exc).__name__
+        finally:
+            self._finish(job)
+
+    async def _process_when_idle(self, job):
+        """
+        Process a job, retrying with backoff while there is no room to parse it.
+
+        Args:
+            job (Job): The job to process.
+
+        Returns:
+            dict: The result of the job.
+
+        Raises:
+            ExecutorBusyError: If there is still no room once ``busy_timeout`` has
+                passed, or AdmissionBusyError, whichever turned the job away last.
+            WorkerCrashedError: If the worker parsing the job died. The job is not
+                retried, since it may have been what killed the worker.
+        """
+        deadline = time.monotonic() + self.busy_timeout
+        delay = BUSY_RETRY_DELAY
+        while True:
+            try:
+                with open(job.path, "rb") as stream:
+                    return await job.process(stream)
+            except WorkerCrashedError:
+                raise
+            except _BUSY_ERRORS:
+                # Direct uploads are using all parsing capacity; wait for room
+                if time.monotonic() + delay > deadline:
+                    raise
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, BUSY_RETRY_MAX_DELAY)
+
+    def _finish(self, job):
+        """
+        Remove a finished job's upload and expire the oldest finished jobs.
+
+        Args:
+            job (Job): The finished job.
+        """
+        job.finished_at = time.time()
+        job.process = None
+        path, job.path = job.path, None
+        if path:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+        self._finished[job.id] = job
+        while len(self._finished) > self.retention:
+            expired, _ = self._finished.popitem(last=False)
+            self._jobs.pop(expired, None)
+
+    async def join(self):
+        """Wait until every queued job has been processed."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def shutdown(self):
+        """Stop the workers and remove the uploads of jobs that never ran."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._queue is not None:
+            while not self._queue.empty():
+                _, _, job = self._queue.get_nowait()
+                job.status = FAILED
+                job.error = "The service shut down before the job started"
+                self._finish(job)
+        self._queue = None
+        self._waiting = 0
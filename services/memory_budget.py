@@ -0,0 +1,190 @@
+"""
+Memory Budget Module
+
+This module tracks the approximate memory a single request uses while its log is
+parsed, so that a pathological upload (millions of tiny records, or one enormous
+field) is aborted with a clear error instead of growing until the kernel kills the
+worker along with every other request it is serving.
+"""
+
+import os
+import sys
+
+# Approximate size of one callsign held as a Python string in a set slot
+CALLSIGN_STRING_BYTES = 64
+
+# Approximate size of a parsed record, excluding its field values
+RECORD_BYTES = 600
+
+# Number of records folded between two checks of the unique-callsign set
+BUDGET_CHECK_INTERVAL = 4096
+
+# Files holding the memory limit of the container, for cgroup v2 and v1
+_CGROUP_LIMIT_FILES = (
+    "/sys/fs/cgroup/memory.max",
+    "/sys/fs/cgroup/memory/memory.limit_in_bytes",
+)
+
+# cgroup v1 reports "no limit" as a huge page-aligned number rather than "max"
+_UNLIMITED_THRESHOLD = 1 << 60
+
+
+class MemoryBudgetExceededError(Exception):
+    """
+    Raised when a request uses more memory than its budget allows.
+
+    The error keeps its details in ``args`` so that it survives being pickled back
+    from a process worker.
+
+    Attributes:
+        component (str): The part of the parse that went over budget.
+        used_bytes (int): The approximate memory in use, in bytes.
+        budget_bytes (int): The budget, in bytes.
+    """
+
+    def __init__(self, component, used_bytes, budget_bytes):
+        """
+        Initialize the error.
+
+        Args:
+            component (str): The part of the parse that went over budget.
+            used_bytes (int): The approximate memory in use, in bytes.
+            budget_bytes (int): The budget, in bytes.
+        """
+        super().__init__(component, used_bytes, budget_bytes)
+        self.component = component
+        self.used_bytes = used_bytes
+        self.budget_bytes = budget_bytes
+
+    def __str__(self):
+        """Describe the error."""
+        return (
+            f"Parsing needs about {self.used_bytes} bytes ({self.component}), "
+            f"over the per-request budget of {self.budget_bytes} bytes"
+        )
+
+    def to_dict(self):
+        """
+        Describe the error for an API response.
+
+        Returns:
+            dict: The error code, message and figures.
+        """
+        return {
+            "error": "memory_budget_exceeded",
+            "message": str(self),
+            "component": self.component,
+            "used_bytes": self.used_bytes,
+            "budget_bytes": self.budget_bytes,
+        }
+
+
+def container_memory_limit():
+    """
+    Read the memory limit of the container from its cgroup.
+
+    Returns:
+        int: The limit in bytes, or 0 if there is none or it cannot be read.
+    """
+    for path in _CGROUP_LIMIT_FILES:
+        try:
+            with open(path, encoding="ascii") as limit_file:
+                value = limit_file.read().strip()
+        except OSError:
+            continue
+        if value.isdigit() and int(value) < _UNLIMITED_THRESHOLD:
+            return int(value)
+        return 0
+    return 0
+
+
+def callsign_set_nbytes(unique_callsigns):
+    """
+    Estimate the memory held by a set of unique callsigns.
+
+    Args:
+        unique_callsigns: A ``set`` of strings or a PackedCallsignSet.
+
+    Returns:
+        int: The approximate size in bytes.
+    """
+    nbytes = getattr(unique_callsigns, "nbytes", None)
+    if nbytes is not None:
+        return nbytes
+    return sys.getsizeof(unique_callsigns) + CALLSIGN_STRING_BYTES * len(
+        unique_callsigns
+    )
+
+
+class MemoryBudget:
+    """
+    Running estimate of the memory used by one request, checked against a limit.
+
+    Each part of the parse reports its current size under its own name, and the
+    request is aborted as soon as the total goes over the limit.
+    """
+
+    def __init__(self, limit_bytes):
+        """
+        Initialize an empty budget.
+
+        Args:
+            limit_bytes (int): The most memory the request may use, in bytes.
+        """
+        self.limit_bytes = limit_bytes
+        self._usage = {}
+        self._used = 0
+
+    @property
+    def used(self):
+        """int: The approximate memory in use, in bytes."""
+        return self._used
+
+    def usage(self):
+        """
+        Report the memory in use per component.
+
+        Returns:
+            dict: The approximate size in bytes of each component.
+        """
+        return dict(self._usage)
+
+    def set(self, component, nbytes):
+        """
+        Record the current size of a component and check the total.
+
+        Args:
+            component (str): The part of the parse, such as ``buffered``.
+            nbytes (int): Its approximate current size in bytes.
+
+        Raises:
+            MemoryBudgetExceededError: If the total is over the limit.
+        """
+        self._used += nbytes - self._usage.get(component, 0)
+        self._usage[component] = nbytes
+        if self._used > self.limit_bytes:
+            raise MemoryBudgetExceededError(component, self._used, self.limit_bytes)
+
+
+def derive_memory_budget(environ=None, concurrency=1):
+    """
+    Derive the per-request memory budget from the environment.
+
+    ``ADIF_MEMORY_BUDGET_BYTES`` sets the budget directly, with 0 disabling it.
+    Otherwise ``ADIF_MEMORY_BUDGET_FRACTION`` of the container memory limit is
+    shared between the requests that may be parsed at once.
+
+    Args:
+        environ (dict, optional): The environment to read from. Defaults to
+            ``os.environ``.
+        concurrency (int): The number of requests parsed at once.
+
+    Returns:
+        int: The budget in bytes, or 0 for no budget.
+    """
+    environ = os.environ if environ is None else environ
+    explicit = environ.get("ADIF_MEMORY_BUDGET_BYTES", "").strip()
+    if explicit:
+        return int(explicit)
+    fraction = float(environ.get("ADIF_MEMORY_BUDGET_FRACTION", 0.5))
+    return int(container_memory_limit() * fraction / max(concurrency, 1))
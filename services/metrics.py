@@ -0,0 +1,438 @@
+"""
+Metrics Module
+
+This module collects the metrics the service exports at ``/metrics`` in the
+Prometheus text format: a latency histogram for each stage of parsing an upload,
+counters of the bytes, records and unique callsigns parsed, and gauges of the work
+in flight.
+
+Stage times are added up per parse by a StageTimer and observed once when the parse
+ends, so instrumentation costs a few clock reads per chunk of input rather than per
+record. A parse that runs in a process worker sends its observations back to the
+parent process along with its result.
+"""
+
+import bisect
+import contextlib
+import threading
+import time
+
+# Stages of parsing an upload, in pipeline order
+STAGES = ("read", "decode", "parse", "extract", "tier")
+
+# Upper bounds in seconds of the stage histogram buckets
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+# Content type of the Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Observations made in a process worker, waiting to be returned to the parent
+_collector = threading.local()
+
+# Functions called with the observation of every parse, such as the backend selector
+_parse_listeners = []
+
+
+def _format_value(value):
+    """
+    Format a sample value for the text format.
+
+    Args:
+        value (float): The value.
+
+    Returns:
+        str: The value, without a fractional part if it is a whole number.
+    """
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labels):
+    """
+    Format the labels of a sample.
+
+    Args:
+        labels (tuple): ``(name, value)`` pairs.
+
+    Returns:
+        str: The labels in braces, or an empty string if there are none.
+    """
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for name, value in labels
+    )
+    return "{" + pairs + "}"
+
+
+class Counter:
+    """
+    A value that only goes up, such as the number of bytes parsed.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name, documentation):
+        """
+        Initialize the counter at zero.
+
+        Args:
+            name (str): The metric name, ending in ``_total``.
+            documentation (str): The help text of the metric.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        """
+        Increase the counter.
+
+        Args:
+            amount (int): The amount to add.
+        """
+        with self._lock:
+            self.value += amount
+
+    def samples(self):
+        """
+        Get the samples of the metric.
+
+        Returns:
+            list: ``(name, labels, value)`` tuples.
+        """
+        return [(self.name, (), self.value)]
+
+
+class Gauge:
+    """
+    A value that goes up and down, read from a callable when metrics are scraped.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, function):
+        """
+        Initialize the gauge.
+
+        Args:
+            name (str): The metric name.
+            documentation (str): The help text of the metric.
+            function (callable): A callable returning the current value.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.function = function
+
+    def samples(self):
+        """
+        Get the samples of the metric.
+
+        Returns:
+            list: ``(name, labels, value)`` tuples.
+        """
+        return [(self.name, (), self.function())]
+
+
+class Histogram:
+    """
+    A distribution of observed values in cumulative buckets, with one series for
+    each value of a label.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, label, values, buckets=DEFAULT_BUCKETS):
+        """
+        Initialize an empty histogram.
+
+        Args:
+            name (str): The metric name.
+            documentation (str): The help text of the metric.
+            label (str): The name of the label that tells the series apart.
+            values (tuple): The label values, each of which gets a series.
+            buckets (tuple): The ascending upper bounds of the buckets.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self.buckets = tuple(buckets)
+        # Per label value: the count in each bucket (not cumulative), plus one for
+        # values above the last bound, the sum and the number of observations
+        self._series = {
+            value: [[0] * (len(self.buckets) + 1), 0.0, 0] for value in values
+        }
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, value):
+        """
+        Observe one value.
+
+        Args:
+            label_value (str): The series to observe it in.
+            value (float): The observed value.
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series[label_value]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        """
+        Get the samples of the metric.
+
+        Returns:
+            list: ``(name, labels, value)`` tuples.
+        """
+        samples = []
+        with self._lock:
+            series = {
+                value: (list(counts), total, count)
+                for value, (counts, total, count) in self._series.items()
+            }
+        for label_value, (counts, total, count) in series.items():
+            labels = ((self.label, label_value),)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                samples.append(
+                    (
+                        f"{self.name}_bucket",
+                        labels + (("le", _format_value(bound)),),
+                        cumulative,
+                    )
+                )
+            samples.append((f"{self.name}_sum", labels, total))
+            samples.append((f"{self.name}_count", labels, count))
+        return samples
+
+
+class MetricsRegistry:
+    """
+    The metrics of the service, rendered together in the Prometheus text format.
+    """
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._metrics = {}
+
+    def register(self, metric):
+        """
+        Add a metric to the registry, replacing any metric of the same name.
+
+        Args:
+            metric: A Counter, Gauge or Histogram.
+
+        Returns:
+            The metric.
+        """
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        """
+        Render every metric in the Prometheus text format.
+
+        Returns:
+            str: The exposition text.
+        """
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.register(
+    Histogram(
+        "adif_stage_duration_seconds",
+        "Time spent in each stage of parsing an upload.",
+        "stage",
+        STAGES,
+    )
+)
+BYTES_PARSED = REGISTRY.register(
+    Counter("adif_bytes_total", "Bytes of ADIF data parsed, after decompression.")
+)
+RECORDS_PARSED = REGISTRY.register(
+    Counter("adif_records_total", "ADIF records parsed.")
+)
+UNIQUE_CALLSIGNS = REGISTRY.register(
+    Counter(
+        "adif_unique_callsigns_total",
+        "Unique callsigns found, summed over every parsed upload.",
+    )
+)
+
+
+class StageTimer:
+    """
+    Add up the time one parse spends in each stage, and what it parsed.
+
+    Stages are timed exclusively: time spent in a stage that is timed within another
+    one, such as reading a chunk while records are being parsed, is counted only in
+    the inner stage.
+
+    Attributes:
+        seconds (dict): The time spent in each stage.
+        bytes (int): The number of bytes read.
+        records (int): The number of records parsed.
+        unique_callsigns (int): The number of unique callsigns found.
+        backend (str): The name of the backend that parsed, if its timing should
+            feed the backend selector.
+    """
+
+    def __init__(self):
+        """Initialize the timer with nothing timed."""
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+        self.bytes = 0
+        self.records = 0
+        self.unique_callsigns = 0
+        self.backend = None
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """
+        Time a block as one stage.
+
+        Args:
+            name (str): The stage, one of STAGES.
+        """
+        seconds = self.seconds
+        nested = sum(seconds.values())
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            seconds[name] += elapsed - (sum(seconds.values()) - nested)
+
+    def snapshot(self):
+        """
+        Get the observations of the timer.
+
+        Returns:
+            dict: The ``seconds`` per stage, the ``bytes``, ``records`` and
+            ``unique_callsigns`` counts, and the ``backend``.
+        """
+        return {
+            "seconds": dict(self.seconds),
+            "bytes": self.bytes,
+            "records": self.records,
+            "unique_callsigns": self.unique_callsigns,
+            "backend": self.backend,
+        }
+
+
+def add_parse_listener(listener):
+    """
+    Call a function with the observation of every parse from now on.
+
+    Listeners are called in the process serving the metrics, including for parses
+    that ran in process workers.
+
+    Args:
+        listener (callable): Takes the snapshot of the StageTimer of a parse.
+    """
+    _parse_listeners.append(listener)
+
+
+def remove_parse_listener(listener):
+    """
+    Stop calling a function added by add_parse_listener.
+
+    Args:
+        listener (callable): The listener.
+    """
+    _parse_listeners.remove(listener)
+
+
+def apply_observations(observations):
+    """
+    Add the observations of parses to the metrics.
+
+    Stages that a parse did not go through, such as decoding for a backend that
+    decodes while it parses, are not observed.
+
+    Args:
+        observations (list): Snapshots of StageTimers.
+    """
+    for observation in observations:
+        for stage, seconds in observation["seconds"].items():
+            if seconds > 0:
+                STAGE_SECONDS.observe(stage, seconds)
+        BYTES_PARSED.inc(observation["bytes"])
+        RECORDS_PARSED.inc(observation["records"])
+        UNIQUE_CALLSIGNS.inc(observation["unique_callsigns"])
+        for listener in _parse_listeners:
+            listener(observation)
+
+
+def record_parse(stage_timer):
+    """
+    Record the observations of a finished parse.
+
+    In a process worker running call_collecting, the observations are held to be
+    returned to the parent process; otherwise they go straight into the metrics.
+
+    Args:
+        stage_timer (StageTimer): The timer of the parse.
+    """
+    pending = getattr(_collector, "pending", None)
+    if pending is not None:
+        pending.append(stage_timer.snapshot())
+    else:
+        apply_observations([stage_timer.snapshot()])
+
+
+def call_collecting(func, *args):
+    """
+    Call a function, collecting the parses it records rather than applying them.
+
+    This runs in a process worker, whose metrics are never scraped. The parent
+    passes the returned observations to apply_observations.
+
+    Args:
+        func (callable): The function to call.
+        *args: The positional arguments for ``func``.
+
+    Returns:
+        tuple: The return value of ``func`` and the list of observations.
+    """
+    _collector.pending = []
+    try:
+        result = func(*args)
+        return result, _collector.pending
+    finally:
+        _collector.pending = None
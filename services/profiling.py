@@ -0,0 +1,504 @@
+"""
+Profiling Module
+
+This module profiles the parse of a single upload on demand, or of a random sample
+of uploads, and keeps the most recent profiles for download.
+
+A profile is made of the parse's call stacks, sampled at a fixed interval and
+collapsed into one ``frame;frame;frame count`` line per distinct stack (the input
+of flame graph tools). A requested profile also reports the source lines holding
+the most memory, from ``tracemalloc``; tracing allocations slows parsing several
+times over, so profiles picked at random only sample stacks, which costs next to
+nothing. Profiling happens in the worker that runs the parse: a process worker
+sends what it recorded back with the result of the call, to be added to the
+profile of the upload in the parent process.
+"""
+
+import collections
+import contextlib
+import contextvars
+import hmac
+import random
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+
+# Seconds between two samples of the call stack of a profiled parse
+SAMPLE_INTERVAL_SECONDS = 0.005
+
+# Number of allocation sites reported in a profile
+TOP_ALLOCATIONS = 25
+
+# Stack samples between two checks of the memory traced by tracemalloc
+ALLOCATION_CHECK_SAMPLES = 20
+
+# Growth of traced memory over the last snapshot that triggers a new one
+ALLOCATION_SNAPSHOT_GROWTH = 1.25
+
+# Why a profile was recorded: asked for by a client, or picked at random
+REQUESTED = "requested"
+SAMPLED = "sampled"
+
+# What a worker records: call stacks only, or allocations as well
+STACKS = "stacks"
+ALLOCATIONS = "allocations"
+
+# The profile of the upload being handled, that workers' recordings are added to
+_current_session = contextvars.ContextVar("profile_session", default=None)
+
+# Parses being profiled in this process, which share tracemalloc
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+
+
+class ProfileAuthError(Exception):
+    """Raised when a profile is asked for without the profiling token."""
+
+
+class StackSampler:
+    """
+    Sample the call stack of one thread from a background thread.
+
+    While tracemalloc is tracing, the sampler also snapshots allocations whenever
+    traced memory has grown well past the last snapshot, so that the largest
+    snapshot shows what held memory near the peak rather than what was left once
+    the parse had finished.
+
+    Attributes:
+        stacks (collections.Counter): The number of samples of each collapsed stack.
+        snapshot (tracemalloc.Snapshot): The largest snapshot of allocations, or
+            None if none was taken.
+        snapshot_size (int): The memory traced when the snapshot was taken.
+    """
+
+    def __init__(self, thread_id, root=None, interval=SAMPLE_INTERVAL_SECONDS):
+        """
+        Initialize the sampler.
+
+        Args:
+            thread_id (int): The identifier of the thread to sample.
+            root (frame, optional): The outermost frame of the stacks recorded.
+                Frames it was called from, such as those a process worker inherited
+                from the parent it was forked from, are left out.
+            interval (float): The number of seconds between two samples.
+        """
+        self.thread_id = thread_id
+        self.root = root
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self.snapshot = None
+        self.snapshot_size = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="adif-profile-sampler", daemon=True
+        )
+
+    def _run(self):
+        """Take a sample every interval until stopped."""
+        samples = 0
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(  # pylint: disable=protected-access
+                self.thread_id
+            )
+            if frame is not None:
+                self.stacks[_collapse(frame, self.root)] += 1
+            samples += 1
+            if samples % ALLOCATION_CHECK_SAMPLES == 0:
+                self._check_allocations()
+
+    def _check_allocations(self):
+        """Snapshot allocations if traced memory has grown enough since the last."""
+        if not tracemalloc.is_tracing():
+            return
+        size, _ = tracemalloc.get_traced_memory()
+        if size > self.snapshot_size * ALLOCATION_SNAPSHOT_GROWTH:
+            self.snapshot = tracemalloc.take_snapshot()
+            self.snapshot_size = size
+
+    def start(self):
+        """Start sampling."""
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling and wait for the sampling thread to finish."""
+        self._stop.set()
+        self._thread.join()
+
+
+def _collapse(frame, root=None):
+    """
+    Describe a call stack as one line of the collapsed stack format.
+
+    Args:
+        frame: The innermost frame of the stack.
+        root (frame, optional): The outermost frame to describe.
+
+    Returns:
+        str: The ``module:function`` of each frame from the outermost one,
+        separated by semicolons.
+    """
+    names = []
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "?")
+        names.append(f"{module}:{frame.f_code.co_name}")
+        if frame is root:
+            break
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def _start_tracemalloc():
+    """Start tracing allocations, unless another parse is already traced."""
+    global _tracemalloc_users  # pylint: disable=global-statement
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0:
+            tracemalloc.start()
+        _tracemalloc_users += 1
+
+
+def _stop_tracemalloc(snapshot, snapshot_size):
+    """
+    Stop tracing allocations after the last parse that traces them.
+
+    Args:
+        snapshot (tracemalloc.Snapshot): The largest snapshot taken while parsing,
+            or None.
+        snapshot_size (int): The memory traced when that snapshot was taken. A new
+            snapshot is taken if more is traced now.
+
+    Returns:
+        tuple: The snapshot, and the peak size of traced memory in bytes.
+    """
+    global _tracemalloc_users  # pylint: disable=global-statement
+    with _tracemalloc_lock:
+        current, peak = tracemalloc.get_traced_memory()
+        if snapshot is None or current > snapshot_size:
+            snapshot = tracemalloc.take_snapshot()
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0:
+            tracemalloc.stop()
+    return snapshot, peak
+
+
+def _top_allocations(snapshot):
+    """
+    Get the source lines holding the most memory in a snapshot.
+
+    Args:
+        snapshot (tracemalloc.Snapshot): The snapshot.
+
+    Returns:
+        list: ``{"location", "size", "count"}`` dicts, largest first.
+    """
+    # Leave out the memory of tracemalloc itself and of the stacks sampled
+    snapshot = snapshot.filter_traces(
+        (
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        )
+    )
+    return [
+        {
+            "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+            "size": stat.size,
+            "count": stat.count,
+        }
+        for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]
+    ]
+
+
+@contextlib.contextmanager
+def recording(mode):
+    """
+    Profile the calling thread for the duration of a block.
+
+    tracemalloc traces the whole process, so the allocations of parses profiled
+    at the same time in other threads of the process are reported too.
+
+    Args:
+        mode (str): STACKS, ALLOCATIONS, or None not to profile at all.
+
+    Yields:
+        list: Empty, then holding one recording once the block ends if profiling.
+        Recordings are plain data, to be handed to adopt_recordings.
+    """
+    recordings = []
+    if mode is None:
+        yield recordings
+        return
+    # The frame of the with statement, which contextlib's __enter__ called us from
+    root = sys._getframe(2)  # pylint: disable=protected-access
+    sampler = StackSampler(threading.get_ident(), root)
+    if mode == ALLOCATIONS:
+        _start_tracemalloc()
+    start = time.perf_counter()
+    sampler.start()
+    try:
+        yield recordings
+    finally:
+        sampler.stop()
+        seconds = time.perf_counter() - start
+        allocations, peak = [], 0
+        if mode == ALLOCATIONS:
+            snapshot, peak = _stop_tracemalloc(sampler.snapshot, sampler.snapshot_size)
+            allocations = _top_allocations(snapshot)
+        recordings.append(
+            {
+                "seconds": seconds,
+                "stacks": dict(sampler.stacks),
+                "allocations": allocations,
+                "peak_traced_bytes": peak,
+            }
+        )
+
+
+def profiling():
+    """
+    Tell whether the upload being handled is being profiled, and how.
+
+    Returns:
+        str: What workers record for the profile of the upload, STACKS or
+        ALLOCATIONS, or None if it is not profiled.
+    """
+    session = _current_session.get()
+    return None if session is None else session.mode
+
+
+def adopt_recordings(recordings):
+    """
+    Add recordings made in a worker to the profile of the current upload.
+
+    Args:
+        recordings (list): The recordings yielded by ``recording``.
+    """
+    session = _current_session.get()
+    if session is not None:
+        for item in recordings:
+            session.add(item)
+
+
+def call_profiled(func, *args):
+    """
+    Call a function in a thread worker, profiling it if its upload is profiled.
+
+    The call must run in a copy of the context of the upload.
+
+    Args:
+        func (callable): The function to call.
+        *args: The positional arguments for ``func``.
+
+    Returns:
+        The return value of ``func``.
+    """
+    with recording(profiling()) as recordings:
+        result = func(*args)
+    adopt_recordings(recordings)
+    return result
+
+
+class Profile:
+    """
+    The profile of the parse of one upload.
+
+    Attributes:
+        id (str): The identifier the profile is downloaded by.
+        trigger (str): ``requested`` or ``sampled``.
+        mode (str): What workers record: ALLOCATIONS for a requested profile,
+            otherwise STACKS.
+        filename (str): The name of the uploaded file.
+        created (float): When the upload arrived, in seconds since the epoch.
+        seconds (float): The time spent parsing, summed over workers.
+        stacks (collections.Counter): The number of samples of each collapsed stack.
+        allocations (list): The source lines holding the most memory.
+        peak_traced_bytes (int): The most memory traced in any worker.
+    """
+
+    def __init__(self, trigger, filename=None):
+        """
+        Initialize an empty profile.
+
+        Args:
+            trigger (str): ``requested`` or ``sampled``.
+            filename (str, optional): The name of the uploaded file.
+        """
+        self.id = uuid.uuid4().hex
+        self.trigger = trigger
+        self.mode = ALLOCATIONS if trigger == REQUESTED else STACKS
+        self.filename = filename
+        self.created = time.time()
+        self.seconds = 0.0
+        self.stacks = collections.Counter()
+        self.allocations = []
+        self.peak_traced_bytes = 0
+        self._lock = threading.Lock()
+
+    def add(self, item):
+        """
+        Add a recording made by a worker.
+
+        Args:
+            item (dict): A recording yielded by ``recording``.
+        """
+        with self._lock:
+            self.seconds += item["seconds"]
+            self.stacks.update(item["stacks"])
+            self.allocations = sorted(
+                self.allocations + item["allocations"],
+                key=lambda allocation: allocation["size"],
+                reverse=True,
+            )[:TOP_ALLOCATIONS]
+            self.peak_traced_bytes = max(
+                self.peak_traced_bytes, item["peak_traced_bytes"]
+            )
+
+    def collapsed(self):
+        """
+        Render the stacks in the collapsed stack format.
+
+        Returns:
+            str: One ``frame;frame;frame count`` line per stack, most sampled first.
+        """
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self.stacks.most_common()
+        )
+
+    def to_dict(self, detail=True):
+        """
+        Convert the profile to a dictionary.
+
+        Args:
+            detail (bool): Whether to include the allocations, or only a summary.
+
+        Returns:
+            dict: The profile.
+        """
+        data = {
+            "profile_id": self.id,
+            "trigger": self.trigger,
+            "mode": self.mode,
+            "filename": self.filename,
+            "created": self.created,
+            "seconds": round(self.seconds, 6),
+            "samples": sum(self.stacks.values()),
+            "peak_traced_bytes": self.peak_traced_bytes,
+        }
+        if detail:
+            data["allocations"] = list(self.allocations)
+        return data
+
+
+class Profiler:
+    """
+    Decide which uploads are profiled, and keep their profiles.
+
+    Profiling is disabled unless a token is configured. A client asks for a profile
+    by sending the token; in addition, a fraction of uploads is profiled at random.
+    Only the most recent profiles are kept, in memory.
+    """
+
+    def __init__(self, token="", sample_rate=0.0, retention=20, sampler=random.random):
+        """
+        Initialize the profiler.
+
+        Args:
+            token (str): The secret a client sends to ask for a profile or download
+                one; empty disables profiling.
+            sample_rate (float): The fraction of uploads profiled at random.
+            retention (int): The number of profiles kept.
+            sampler (callable): A callable returning a random float in [0, 1).
+        """
+        self.token = token
+        self.sample_rate = sample_rate
+        self.retention = retention
+        self._sampler = sampler
+        self._profiles = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        """bool: True if a profiling token is configured."""
+        return bool(self.token)
+
+    def authorize(self, token):
+        """
+        Check the token a client sent.
+
+        Args:
+            token (str): The token sent by the client.
+
+        Raises:
+            ProfileAuthError: If profiling is disabled or the token is wrong.
+        """
+        if not self.enabled:
+            raise ProfileAuthError("Profiling is not enabled")
+        if not hmac.compare_digest(token.encode(), self.token.encode()):
+            raise ProfileAuthError("Invalid profiling token")
+
+    @contextlib.contextmanager
+    def session(self, requested=False, filename=None):
+        """
+        Profile the parse of an upload, if it was asked for or is picked at random.
+
+        Parses started within the block, in this process or in a worker, are
+        profiled. The profile is kept once the block ends, even if it raised.
+
+        Args:
+            requested (bool): Whether an authorized client asked for a profile.
+            filename (str, optional): The name of the uploaded file.
+
+        Yields:
+            Profile: The profile, or None if the upload is not profiled.
+        """
+        if requested:
+            trigger = REQUESTED
+        elif (
+            self.enabled and self.sample_rate > 0 and self._sampler() < self.sample_rate
+        ):
+            trigger = SAMPLED
+        else:
+            yield None
+            return
+        profile = Profile(trigger, filename)
+        token = _current_session.set(profile)
+        try:
+            yield profile
+        finally:
+            _current_session.reset(token)
+            self._keep(profile)
+
+    def _keep(self, profile):
+        """
+        Keep a profile, dropping the oldest ones beyond the retention.
+
+        Args:
+            profile (Profile): The finished profile.
+        """
+        with self._lock:
+            self._profiles[profile.id] = profile
+            while len(self._profiles) > self.retention:
+                self._profiles.popitem(last=False)
+
+    def get(self, profile_id):
+        """
+        Get a kept profile.
+
+        Args:
+            profile_id (str): The identifier of the profile.
+
+        Returns:
+            Profile: The profile, or None if it is not known or no longer kept.
+        """
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def profiles(self):
+        """
+        List the kept profiles.
+
+        Returns:
+            list: The profiles, most recent first.
+        """
+        with self._lock:
+            return list(reversed(self._profiles.values()))
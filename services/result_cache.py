@@ -0,0 +1,358 @@
+"""
+Result Cache Module
+
+This module provides a content-addressed cache of ADIF processing results. Results
+are keyed by the SHA-256 digest of the raw upload bytes, so a repeated upload can be
+answered without decoding or parsing it again.
+"""
+
+import asyncio
+import contextlib
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from repositories.adif_repository import DEFAULT_CHUNK_SIZE
+
+_HEX_DIGITS = frozenset("0123456789abcdef")
+
+
+class DigestMismatchError(ValueError):
+    """Raised when an upload does not match the digest announced by the client."""
+
+
+def is_sha256_digest(value):
+    """
+    Check if a value is a hexadecimal SHA-256 digest.
+
+    Args:
+        value (str): The value to check.
+
+    Returns:
+        bool: True if the value is 64 hexadecimal digits, in either case.
+    """
+    return (
+        isinstance(value, str)
+        and len(value) == 64
+        and set(value.lower()) <= _HEX_DIGITS
+    )
+
+
+def hash_stream(stream, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Compute the SHA-256 digest of a binary stream and rewind it.
+
+    Args:
+        stream: A seekable binary file-like object providing ``read(size)``.
+        chunk_size (int): The number of bytes to read per call.
+
+    Returns:
+        str: The hexadecimal SHA-256 digest of the stream contents.
+    """
+    digest = hashlib.sha256()
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+class LruResultCache:
+    """
+    In-process least-recently-used cache bounded by the size of its entries.
+
+    The size of an entry is approximated by the length of its key plus its JSON
+    encoding.
+    """
+
+    def __init__(self, max_bytes):
+        """
+        Initialize the cache.
+
+        Args:
+            max_bytes (int): The total entry size above which entries are evicted.
+        """
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        """int: The number of cached entries."""
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        Get a cached result and mark it as recently used.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            dict: A copy of the cached result, or None if the key is not cached.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return dict(entry[0])
+
+    def put(self, key, result):
+        """
+        Cache a result, evicting the least recently used entries if needed.
+
+        Args:
+            key (str): The cache key.
+            result (dict): The result to cache.
+        """
+        size = len(key) + len(json.dumps(result))
+        if size > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.current_bytes -= previous[1]
+        self._entries[key] = (dict(result), size)
+        self.current_bytes += size
+        while self.current_bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.current_bytes -= evicted_size
+            self.evictions += 1
+
+
+class SqliteResultCache:
+    """
+    On-disk cache tier backed by SQLite, bounded by the size of its entries.
+
+    A new connection is opened per operation, so the same database file can be
+    shared safely by every uvicorn worker on a node. Entries are sized as in
+    LruResultCache, and the least recently used ones are deleted when they no
+    longer fit.
+    """
+
+    def __init__(self, path, max_bytes=0, timeout=5.0):
+        """
+        Initialize the cache and create its table if needed.
+
+        Args:
+            path (str): The path of the SQLite database file.
+            max_bytes (int): The total entry size above which entries are evicted;
+                0 for no limit.
+            timeout (float): Seconds to wait for a lock held by another worker.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.evictions = 0
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "digest TEXT PRIMARY KEY, result TEXT NOT NULL, "
+                "size INTEGER NOT NULL DEFAULT 0, last_used REAL NOT NULL DEFAULT 0)"
+            )
+            columns = {
+                row[1] for row in connection.execute("PRAGMA table_info(results)")
+            }
+            # Databases written before the size cap have neither column
+            if "size" not in columns:
+                connection.execute(
+                    "ALTER TABLE results ADD COLUMN size INTEGER NOT NULL DEFAULT 0"
+                )
+                connection.execute(
+                    "ALTER TABLE results ADD COLUMN last_used REAL NOT NULL DEFAULT 0"
+                )
+                connection.execute(
+                    "UPDATE results SET size = length(digest) + length(result)"
+                )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)"
+            )
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """
+        Open a connection for one transaction.
+
+        Yields:
+            sqlite3.Connection: The connection, committed and closed afterwards.
+        """
+        connection = sqlite3.connect(self.path, timeout=self.timeout)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def get(self, key):
+        """
+        Get a cached result and mark it as recently used.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            dict: The cached result, or None if the key is not cached.
+        """
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT result FROM results WHERE digest = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            connection.execute(
+                "UPDATE results SET last_used = ? WHERE digest = ?", (time.time(), key)
+            )
+        return json.loads(row[0])
+
+    def put(self, key, result):
+        """
+        Cache a result, evicting the least recently used entries if needed.
+
+        Args:
+            key (str): The cache key.
+            result (dict): The result to cache.
+        """
+        encoded = json.dumps(result)
+        size = len(key) + len(encoded)
+        if self.max_bytes and size > self.max_bytes:
+            return
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO results (digest, result, size, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                (key, encoded, size, time.time()),
+            )
+            if self.max_bytes:
+                # Keep the most recently used entries that fit within the budget
+                evicted = connection.execute(
+                    "DELETE FROM results WHERE digest IN ("
+                    "SELECT digest FROM (SELECT digest, SUM(size) OVER ("
+                    "ORDER BY last_used DESC, digest) AS kept FROM results) "
+                    "WHERE kept > ?)",
+                    (self.max_bytes,),
+                ).rowcount
+                self.evictions += evicted
+
+    def total_bytes(self):
+        """
+        Get the total size of the cached entries.
+
+        Returns:
+            int: The summed entry sizes in bytes.
+        """
+        with self._connect() as connection:
+            return connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM results"
+            ).fetchone()[0]
+
+
+class ResultCache:
+    """
+    Two-tier result cache with an in-process LRU tier and an optional disk tier.
+
+    Lookups try the memory tier first, then the disk tier; disk hits are promoted to
+    memory. Hit, miss and eviction counts are kept for monitoring.
+    """
+
+    def __init__(self, max_bytes, disk_path=None, disk_max_bytes=0):
+        """
+        Initialize the result cache.
+
+        Args:
+            max_bytes (int): The size budget of the in-process tier.
+            disk_path (str, optional): The path of a SQLite database for the disk
+                tier. If omitted, only the in-process tier is used.
+            disk_max_bytes (int): The size budget of the disk tier; 0 for no limit.
+        """
+        self.memory = LruResultCache(max_bytes)
+        self.disk = SqliteResultCache(disk_path, disk_max_bytes) if disk_path else None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Get a cached result.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            dict: The cached result, or None if the key is not cached.
+        """
+        with self._lock:
+            result = self.memory.get(key)
+            if result is None and self.disk is not None:
+                result = self.disk.get(key)
+                if result is not None:
+                    self.memory.put(key, result)
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return result
+
+    def put(self, key, result):
+        """
+        Cache a result in every tier.
+
+        Args:
+            key (str): The cache key.
+            result (dict): The result to cache.
+        """
+        with self._lock:
+            self.memory.put(key, result)
+            if self.disk is not None:
+                self.disk.put(key, result)
+
+    async def get_async(self, key):
+        """
+        Get a cached result without blocking the event loop on the disk tier.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            dict: The cached result, or None if the key is not cached.
+        """
+        if self.disk is None:
+            return self.get(key)
+        return await asyncio.to_thread(self.get, key)
+
+    async def put_async(self, key, result):
+        """
+        Cache a result without blocking the event loop on the disk tier.
+
+        Args:
+            key (str): The cache key.
+            result (dict): The result to cache.
+        """
+        if self.disk is None:
+            self.put(key, result)
+        else:
+            await asyncio.to_thread(self.put, key, result)
+
+    def stats(self):
+        """
+        Get the cache counters.
+
+        Returns:
+            dict: The hit, miss and eviction counts, the size of the memory tier and,
+            with a disk tier, its evictions in this process.
+        """
+        with self._lock:
+            stats = {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.memory.evictions,
+                "entries": len(self.memory),
+                "bytes": self.memory.current_bytes,
+            }
+            if self.disk is not None:
+                stats["disk_evictions"] = self.disk.evictions
+            return stats
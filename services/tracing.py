@@ -0,0 +1,417 @@
+"""
+Tracing Module
+
+This module records spans of the work done for an upload and exports each sampled
+trace as one line of OTLP-style JSON, to a file or to standard output.
+
+Sampling is decided once, when the root span of a trace starts. An upload that is
+not sampled creates no spans at all: every span started within it is a shared no-op
+object, so tracing costs next to nothing for the uploads that are not traced. Spans
+started in a process worker are sent back to the parent process with the result of
+the call and exported with the rest of their trace.
+"""
+
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+# Name the spans are exported under, as the service.name resource attribute
+SERVICE_NAME = "adif-parser-service"
+
+# OTLP status codes
+_STATUS_ERROR = 2
+
+# The span that new spans are children of
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+def _otlp_value(value):
+    """
+    Convert an attribute value to an OTLP ``AnyValue``.
+
+    Args:
+        value: A bool, int, float or str.
+
+    Returns:
+        dict: The value in OTLP JSON form.
+    """
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        # OTLP JSON encodes 64-bit integers as strings
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class _Trace:
+    """
+    The finished spans of one trace, in OTLP JSON form.
+    """
+
+    def __init__(self, trace_id, exporter=None):
+        """
+        Initialize a trace with no finished spans.
+
+        Args:
+            trace_id (str): The 32 hexadecimal digit trace id.
+            exporter (JsonSpanExporter, optional): The exporter the trace is written
+                to when its root span ends. None for a trace continued in a worker.
+        """
+        self.trace_id = trace_id
+        self.exporter = exporter
+        self.spans = []
+
+
+class Span:
+    """
+    A timed operation within a trace, used as a context manager.
+
+    Attributes:
+        name (str): The name of the operation.
+        span_id (str): The 16 hexadecimal digit span id.
+        attributes (dict): The attributes of the span.
+    """
+
+    def __init__(self, name, trace, parent_id=None, attributes=None):
+        """
+        Initialize a span. Its clock starts when the span is entered.
+
+        Args:
+            name (str): The name of the operation.
+            trace (_Trace): The trace the span belongs to.
+            parent_id (str, optional): The span id of the parent, or None for the
+                root span of the trace.
+            attributes (dict, optional): The initial attributes of the span.
+        """
+        self.name = name
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self._start_ns = 0
+        self._error = None
+        self._token = None
+
+    def set_attribute(self, key, value):
+        """
+        Set an attribute of the span.
+
+        Args:
+            key (str): The attribute name, such as ``adif.records``.
+            value: A bool, int, float or str. None leaves the attribute unset.
+        """
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_attributes(self, attributes):
+        """
+        Set several attributes of the span.
+
+        Args:
+            attributes (dict): The attributes by name.
+        """
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def __enter__(self):
+        """
+        Start the span and make it the parent of spans started within it.
+
+        Returns:
+            Span: The span.
+        """
+        self._start_ns = time.time_ns()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        """
+        End the span, recording any exception that ended it.
+
+        The span is added to its trace, and the trace is exported if the span is its
+        root.
+
+        Args:
+            exc_type: The type of the exception, if any.
+            exc: The exception, if any.
+            traceback: The traceback of the exception, if any.
+        """
+        end_ns = time.time_ns()
+        _current_span.reset(self._token)
+        if exc is not None:
+            self._error = f"{exc_type.__name__}: {exc}"
+            self.set_attribute("http.status_code", getattr(exc, "status_code", None))
+        self.trace.spans.append(self.to_otlp(end_ns))
+        if self.parent_id is None and self.trace.exporter is not None:
+            self.trace.exporter.export(self.trace.spans)
+
+    def to_otlp(self, end_ns):
+        """
+        Convert the span to OTLP JSON form.
+
+        Args:
+            end_ns (int): The end time of the span in nanoseconds since the epoch.
+
+        Returns:
+            dict: The span.
+        """
+        otlp_span = {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self._start_ns),
+            "endTimeUnixNano": str(end_ns),
+            "attributes": [
+                {"key": key, "value": _otlp_value(value)}
+                for key, value in self.attributes.items()
+            ],
+        }
+        if self.parent_id is not None:
+            otlp_span["parentSpanId"] = self.parent_id
+        if self._error is not None:
+            otlp_span["status"] = {"code": _STATUS_ERROR, "message": self._error}
+        return otlp_span
+
+
+class _NoopSpan:
+    """
+    The span of an upload that is not traced, which records nothing.
+    """
+
+    def set_attribute(self, key, value):
+        """Ignore an attribute."""
+
+    def set_attributes(self, attributes):
+        """Ignore attributes."""
+
+    def __enter__(self):
+        """Return the span itself."""
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        """Do nothing."""
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class _RemoteParent:
+    """
+    The span of another process that spans in a worker are children of.
+    """
+
+    def __init__(self, trace, span_id):
+        """
+        Initialize the parent.
+
+        Args:
+            trace (_Trace): The trace continued in the worker.
+            span_id (str): The span id of the parent in the other process.
+        """
+        self.trace = trace
+        self.span_id = span_id
+
+
+class JsonSpanExporter:
+    """
+    Write each trace as one line of OTLP JSON (an ``ExportTraceServiceRequest``).
+    """
+
+    def __init__(self, path, service_name=SERVICE_NAME):
+        """
+        Open the sink.
+
+        Args:
+            path (str): The file to append to, or ``-`` or ``stdout`` for standard
+                output.
+            service_name (str): The service.name resource attribute.
+        """
+        # Standard output is not closed with the sink, as it is not ours
+        self._stack = contextlib.ExitStack()
+        if path in ("-", "stdout"):
+            self._sink = sys.stdout
+        else:
+            self._sink = self._stack.enter_context(open(path, "a", encoding="utf-8"))
+        self._resource = {
+            "attributes": [{"key": "service.name", "value": _otlp_value(service_name)}]
+        }
+        self._scope = {"name": service_name}
+        self._lock = threading.Lock()
+
+    def export(self, spans):
+        """
+        Write the spans of one trace.
+
+        Args:
+            spans (list): The spans in OTLP JSON form.
+        """
+        line = json.dumps(
+            {
+                "resourceSpans": [
+                    {
+                        "resource": self._resource,
+                        "scopeSpans": [{"scope": self._scope, "spans": spans}],
+                    }
+                ]
+            },
+            separators=(",", ":"),
+        )
+        with self._lock:
+            self._sink.write(line + "\n")
+            self._sink.flush()
+
+    def close(self):
+        """Close the sink, unless it is standard output."""
+        self._stack.close()
+
+
+class Tracer:
+    """
+    Start traces, sampling a fraction of them.
+    """
+
+    def __init__(self, exporter=None, sample_rate=0.0, sampler=random.random):
+        """
+        Initialize the tracer.
+
+        Args:
+            exporter (JsonSpanExporter, optional): Where sampled traces are
+                written. Without one, nothing is traced.
+            sample_rate (float): The fraction of traces sampled, from 0 to 1.
+            sampler (callable): A callable returning a random float in [0, 1).
+        """
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self._sampler = sampler
+
+    def trace(self, name, attributes=None):
+        """
+        Start a trace, or a child span if a trace is already in progress.
+
+        Args:
+            name (str): The name of the root span.
+            attributes (dict, optional): The initial attributes of the span.
+
+        Returns:
+            The span to enter: a Span if the trace is sampled, otherwise a no-op.
+        """
+        if _current_span.get() is not None:
+            return span(name, attributes)
+        if self.exporter is None or self._sampler() >= self.sample_rate:
+            return NOOP_SPAN
+        return Span(name, _Trace(os.urandom(16).hex(), self.exporter), None, attributes)
+
+    def close(self):
+        """Close the exporter."""
+        if self.exporter is not None:
+            self.exporter.close()
+
+
+def span(name, attributes=None):
+    """
+    Start a span within the current trace.
+
+    Args:
+        name (str): The name of the operation.
+        attributes (dict, optional): The initial attributes of the span.
+
+    Returns:
+        The span to enter: a Span if a sampled trace is in progress, otherwise a
+        no-op.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return NOOP_SPAN
+    return Span(name, parent.trace, parent.span_id, attributes)
+
+
+def current_span():
+    """
+    Get the innermost span in progress.
+
+    Returns:
+        The span, or a no-op if no sampled trace is in progress.
+    """
+    return _current_span.get() or NOOP_SPAN
+
+
+def traced(name, get_tracer):
+    """
+    Decorate a coroutine function so that each call is traced.
+
+    Args:
+        name (str): The name of the root span.
+        get_tracer (callable): A callable returning the Tracer, called per call.
+
+    Returns:
+        callable: The decorator.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with get_tracer().trace(name):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def current_context():
+    """
+    Get what another process needs to continue the current trace.
+
+    Returns:
+        tuple: The trace id and the span id of the current span, or None if no
+        sampled trace is in progress.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return None
+    return parent.trace.trace_id, parent.span_id
+
+
+@contextlib.contextmanager
+def continued(context):
+    """
+    Continue a trace from another process for the duration of a block.
+
+    Args:
+        context (tuple): The trace context returned by current_context, or None.
+
+    Yields:
+        list: The spans finished within the block, in OTLP JSON form, to be handed
+        to adopt_spans in the other process.
+    """
+    if context is None:
+        yield []
+        return
+    trace_id, span_id = context
+    trace = _Trace(trace_id)
+    token = _current_span.set(_RemoteParent(trace, span_id))
+    try:
+        yield trace.spans
+    finally:
+        _current_span.reset(token)
+
+
+def adopt_spans(spans):
+    """
+    Add spans finished in another process to the current trace.
+
+    Args:
+        spans (list): The spans in OTLP JSON form.
+    """
+    parent = _current_span.get()
+    if parent is not None and spans:
+        parent.trace.spans.extend(spans)
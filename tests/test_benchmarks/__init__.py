@@ -0,0 +1,5 @@
+"""
+Test package for the benchmarks.
+
+This package contains tests for the synthetic log generator and the benchmark suite.
+"""
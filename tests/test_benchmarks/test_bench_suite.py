@@ -0,0 +1,85 @@
+"""
+Unit tests for the benchmark suite.
+
+This module contains test cases that verify percentiles, the comparison with a
+baseline, and that the suite measures each case and fails on a regression.
+"""
+
+import json
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from unittest.mock import patch
+
+from benchmarks.bench_suite import compare, main, percentile, run_suite
+
+
+class TestBenchSuite(unittest.TestCase):
+    """
+    Unit tests for the benchmark suite.
+    """
+
+    def test_percentile(self):
+        """Test nearest-rank percentiles."""
+        values = [5, 1, 4, 2, 3]
+        self.assertEqual(percentile(values, 0.5), 3)
+        self.assertEqual(percentile(values, 0.99), 5)
+        self.assertEqual(percentile([7], 0.99), 7)
+        self.assertEqual(percentile(list(range(1, 101)), 0.99), 99)
+
+    def test_compare(self):
+        """Test that only growth beyond the tolerance is a regression."""
+        baseline = {
+            "a": {"p50_seconds": 1.0, "peak_memory_bytes": 100},
+            "b": {"p50_seconds": 1.0, "peak_memory_bytes": None},
+        }
+        results = {
+            "a": {"p50_seconds": 1.1, "peak_memory_bytes": 150},
+            "b": {"p50_seconds": 0.5, "peak_memory_bytes": 100},
+            "c": {"p50_seconds": 9.0, "peak_memory_bytes": 900},
+        }
+        regressions = compare(results, baseline, 0.2)
+        self.assertEqual(len(regressions), 1)
+        self.assertTrue(regressions[0].startswith("a: peak_memory_bytes"))
+        self.assertEqual(len(compare(results, baseline, 0.05)), 2)
+
+    @patch("benchmarks.bench_suite.MIN_RUN_SECONDS", 0)
+    def test_run_suite(self):
+        """Test that each backend and the service are measured."""
+        with redirect_stdout(StringIO()):
+            report = run_suite([100], runs=2, select="scanner")
+        self.assertEqual(
+            sorted(report["results"]),
+            [
+                "100/repository/scanner/stream",
+                "100/repository/scanner/string",
+                "100/service/scanner/process_adif_content",
+            ],
+        )
+        result = report["results"]["100/repository/scanner/stream"]
+        self.assertEqual(result["records"], 100)
+        self.assertLessEqual(result["p50_seconds"], result["p99_seconds"])
+        self.assertGreater(result["peak_memory_bytes"], 0)
+
+    @patch("benchmarks.bench_suite.MIN_RUN_SECONDS", 0)
+    def test_baseline_gate(self):
+        """Test that a regression against the baseline fails the run."""
+        with tempfile.TemporaryDirectory() as directory:
+            results_path = os.path.join(directory, "results.json")
+            arguments = ["--sizes", "100", "--runs", "1", "--select", "adx/stream"]
+            with redirect_stdout(StringIO()):
+                self.assertEqual(main(arguments + ["--output", results_path]), 0)
+            with open(results_path, encoding="utf-8") as results:
+                baseline = json.load(results)
+            for result in baseline["results"].values():
+                result["peak_memory_bytes"] //= 10
+            baseline_path = os.path.join(directory, "baseline.json")
+            with open(baseline_path, "w", encoding="utf-8") as output:
+                json.dump(baseline, output)
+
+            with redirect_stdout(StringIO()) as output:
+                status = main(arguments + ["--baseline", baseline_path])
+        self.assertEqual(status, 1)
+        self.assertIn("REGRESSION 100/repository/adx/stream", output.getvalue())
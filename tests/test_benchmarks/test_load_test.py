@@ -0,0 +1,168 @@
+"""
+Unit tests for the load test.
+
+This module contains test cases that verify how scenarios are read, how uploads
+are summarized, how the memory and CPU time of a process are read, and that a
+scenario keeps its clients busy for its duration.
+"""
+
+import asyncio
+import os
+import random
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from unittest.mock import MagicMock
+
+import main
+from benchmarks.load_test import (
+    ResourceMonitor,
+    Scenario,
+    httpx,
+    run_load_test,
+    run_scenario,
+    summarize,
+    tree_cpu_seconds,
+    tree_rss,
+    unique_upload,
+)
+
+HAS_PROC = os.path.isdir("/proc/self")
+
+
+class FakeClient:
+    """
+    A client whose uploads are answered with a status after a delay.
+    """
+
+    def __init__(self, status, delay=0.01, headers=None):
+        """
+        Initialize the client.
+
+        Args:
+            status (int): The status of every response.
+            delay (float): How long each upload takes, in seconds.
+            headers (dict, optional): The headers of every response.
+        """
+        self.status = status
+        self.delay = delay
+        self.headers = headers or {}
+        self.uploads = []
+
+    async def post(self, path, files):
+        """
+        Upload a file.
+
+        Args:
+            path (str): The path of the endpoint.
+            files (dict): The file uploaded.
+
+        Returns:
+            MagicMock: The response.
+        """
+        self.uploads.append(files["file"][1])
+        await asyncio.sleep(self.delay)
+        return MagicMock(status_code=self.status, headers=self.headers)
+
+
+class TestLoadTest(unittest.TestCase):
+    """
+    Unit tests for the load test.
+    """
+
+    def test_parse_scenario(self):
+        """Test reading a scenario, with and without weights."""
+        scenario = Scenario.parse("mixed=100:3,1000@8")
+        self.assertEqual(scenario.name, "mixed")
+        self.assertEqual(scenario.sizes, [(100, 3.0), (1000, 1.0)])
+        self.assertEqual(scenario.concurrency, 8)
+        for spec in ("mixed", "mixed=100", "=100@2", "mixed=big@2", "mixed=100@0"):
+            with self.assertRaises(ValueError):
+                Scenario.parse(spec)
+
+    def test_unique_upload(self):
+        """Test that every upload of a log is different."""
+        self.assertNotEqual(unique_upload(b"<eoh>", 1), unique_upload(b"<eoh>", 2))
+        self.assertTrue(unique_upload(b"<eoh>", 1).endswith(b"\n<eoh>"))
+
+    def test_summarize(self):
+        """Test the throughput, latency and error rate of a scenario."""
+        monitor = ResourceMonitor(None)
+        monitor.peak_rss = 1000
+        monitor.cpu_seconds = 1.0
+        samples = [(200, 0.1, 1000000)] * 8 + [(503, 0.01, 10), ("ReadTimeout", 5, 10)]
+        summary = summarize(Scenario("s", [(100, 1.0)], 2), samples, 2.0, monitor)
+        self.assertEqual(summary["requests"], 10)
+        self.assertEqual(summary["statuses"], {"200": 8, "503": 1, "ReadTimeout": 1})
+        self.assertEqual(summary["error_rate"], 0.2)
+        self.assertEqual(summary["throughput_per_second"], 4.0)
+        self.assertEqual(summary["throughput_mb_per_second"], 4.0)
+        self.assertEqual(
+            summary["latency_seconds"], {"p50": 0.1, "p90": 0.1, "p99": 0.1, "max": 0.1}
+        )
+        self.assertEqual(summary["cpu_cores"], 0.5)
+        self.assertEqual(summary["uploads_per_cpu_second"], 8.0)
+        self.assertEqual(summary["peak_rss_bytes"], 1000)
+
+    def test_summarize_without_successes(self):
+        """Test that a scenario where every upload failed has no latency."""
+        summary = summarize(
+            Scenario("s", [(100, 1.0)], 1),
+            [(503, 0.01, 10)],
+            1.0,
+            ResourceMonitor(None),
+        )
+        self.assertEqual(summary["error_rate"], 1.0)
+        self.assertIsNone(summary["latency_seconds"])
+        self.assertIsNone(summary["cpu_cores"])
+
+    @unittest.skipIf(not HAS_PROC, "/proc is not available")
+    def test_process_resources(self):
+        """Test reading the memory and CPU time of this process."""
+        self.assertGreater(tree_rss(os.getpid()), 0)
+        self.assertGreater(tree_cpu_seconds(os.getpid()), 0)
+        with ResourceMonitor(os.getpid()) as monitor:
+            sum(range(1000000))
+        self.assertGreater(monitor.peak_rss, 0)
+        self.assertGreaterEqual(monitor.cpu_seconds, 0)
+
+    def test_run_scenario(self):
+        """Test that every client uploads until the scenario is over."""
+        client = FakeClient(200)
+        scenario = Scenario("s", [(1, 1.0), (2, 1.0)], 3)
+        logs = {1: b"one", 2: b"two"}
+        summary = asyncio.run(
+            run_scenario(client, scenario, logs, duration=0.2, rng=random.Random(0))
+        )
+        self.assertGreater(summary["requests"], 3)
+        self.assertEqual(summary["error_rate"], 0.0)
+        self.assertEqual(len(set(client.uploads)), len(client.uploads))
+
+    def test_retry_after(self):
+        """Test that clients wait as asked before retrying a shed upload."""
+        client = FakeClient(503, delay=0, headers={"Retry-After": "0.1"})
+        summary = asyncio.run(
+            run_scenario(
+                client,
+                Scenario("s", [(1, 1.0)], 1),
+                {1: b"x"},
+                duration=0.25,
+                rng=random.Random(0),
+            )
+        )
+        # Without the wait, the client would have retried hundreds of times
+        self.assertLessEqual(summary["requests"], 3)
+        self.assertEqual(summary["error_rate"], 1.0)
+
+    @unittest.skipIf(httpx is None, "httpx is not installed")
+    @unittest.skipIf(
+        not hasattr(main.app, "router"), "the application is not a FastAPI app"
+    )
+    def test_asgi_target(self):
+        """Test a load test of the application in this process."""
+        with redirect_stdout(StringIO()):
+            (summary,) = asyncio.run(
+                run_load_test([Scenario("small", [(10, 1.0)], 2)], 0.5, target="asgi")
+            )
+        self.assertGreater(summary["requests"], 0)
+        self.assertIn("200", summary["statuses"])
@@ -0,0 +1,85 @@
+"""
+Unit tests for the synthetic ADIF logs.
+
+This module contains test cases that verify the generated logs are deterministic,
+that every header variant and tag case parses to the generated QSOs, and that the
+ADX form holds the same QSOs.
+"""
+
+import os
+import tempfile
+import unittest
+from io import BytesIO
+
+from benchmarks.synthetic import (
+    HEADER_VARIANTS,
+    TAG_CASES,
+    build_adif,
+    build_adx,
+    synthetic_qsos,
+    write_adif,
+)
+from repositories.adx_repository import AdxRepository
+from repositories.scanner_repository import CallsignScannerRepository
+
+
+class TestSyntheticLogs(unittest.TestCase):
+    """
+    Unit tests for the synthetic log generator.
+    """
+
+    def test_deterministic(self):
+        """Test that a log depends only on its arguments and seed."""
+        self.assertEqual(build_adif(200, seed=7), build_adif(200, seed=7))
+        self.assertNotEqual(build_adif(200, seed=7), build_adif(200, seed=8))
+
+    def test_variants_parse(self):
+        """Test that every header variant and tag case parses to the same QSOs."""
+        calls = [qso["call"] for qso in synthetic_qsos(300, seed=1)]
+        repository = CallsignScannerRepository()
+        for header in HEADER_VARIANTS:
+            for tag_case in TAG_CASES:
+                data = build_adif(300, seed=1, header=header, tag_case=tag_case)
+                records = list(repository.read_from_stream(BytesIO(data)))
+                self.assertEqual(
+                    [record["call"] for record in records], calls, (header, tag_case)
+                )
+
+    def test_adx_form(self):
+        """Test that the ADX form of a log holds the same QSOs."""
+        calls = [qso["call"] for qso in synthetic_qsos(300, seed=1)]
+        records = AdxRepository().read_from_bytes(build_adx(300, seed=1))
+        self.assertEqual([record["call"] for record in records], calls)
+
+    def test_log_content(self):
+        """Test that logs have repeated callsigns, duplicates and long comments."""
+        qsos = list(
+            synthetic_qsos(2000, unique_ratio=0.5, duplicate_rate=0.1, comment_rate=1)
+        )
+        self.assertLessEqual(len({qso["call"] for qso in qsos}), 1000)
+        repeats = sum(
+            1
+            for previous, qso in zip(qsos, qsos[1:])
+            if (previous["call"], previous["band"], previous["mode"])
+            == (qso["call"], qso["band"], qso["mode"])
+        )
+        self.assertGreater(repeats, 100)
+        self.assertGreater(max(len(qso["comment"]) for qso in qsos), 250)
+        self.assertTrue(any("\n" in qso["comment"] for qso in qsos))
+
+    def test_unknown_variant(self):
+        """Test that unknown header variants and tag cases are rejected."""
+        with self.assertRaises(ValueError):
+            build_adif(10, header="fancy")
+        with self.assertRaises(ValueError):
+            build_adif(10, tag_case="title")
+
+    def test_write_adif(self):
+        """Test that a log written to a file is the same as one built in memory."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "log.adi")
+            size = write_adif(path, 500, seed=3)
+            with open(path, "rb") as log:
+                data = log.read()
+        self.assertEqual(data, build_adif(500, seed=3))
+        self.assertEqual(size, len(data))
@@ -0,0 +1,104 @@
+"""
+Unit tests for the dependencies module.
+
+This module contains tests that verify the ADIF repository backend is selected
+from the runtime settings.
+"""
+
+import unittest
+from unittest.mock import patch
+
+import dependencies
+from config import Settings
+from dependencies import get_adif_backends, get_adif_repository, get_backend_selector
+from repositories.adif_repository import AdifIoRepository
+from repositories.scanner_repository import CallsignScannerRepository
+from services.metrics import remove_parse_listener
+
+
+class TestGetAdifRepository(unittest.TestCase):
+    """
+    Unit tests for ADIF repository selection.
+    """
+
+    def test_default_backend(self):
+        """Test that adif_io is the default backend."""
+        repository = get_adif_repository(Settings({}))
+        self.assertIsInstance(repository, AdifIoRepository)
+
+    def test_scanner_backend(self):
+        """Test that the scanner backend can be selected."""
+        repository = get_adif_repository(Settings({"ADIF_BACKEND": "Scanner"}))
+        self.assertIsInstance(repository, CallsignScannerRepository)
+
+    def test_auto_backend(self):
+        """Test that the auto backend defaults to its preferred candidate."""
+        repository = get_adif_repository(Settings({"ADIF_BACKEND": "auto"}))
+        self.assertIsInstance(repository, CallsignScannerRepository)
+        repository = get_adif_repository(
+            Settings({"ADIF_BACKEND": "auto", "ADIF_BACKEND_CANDIDATES": "adif_io"})
+        )
+        self.assertIsInstance(repository, AdifIoRepository)
+
+    def test_unknown_backend(self):
+        """Test that an unknown backend is rejected."""
+        with self.assertRaises(ValueError):
+            get_adif_repository(Settings({"ADIF_BACKEND": "missing"}))
+
+    def test_fallback_encoding(self):
+        """Test that the fallback encoding is passed to the repository."""
+        repository = get_adif_repository(Settings({"ADIF_FALLBACK_ENCODING": "cp1252"}))
+        self.assertEqual(repository.fallback_encoding, "cp1252")
+        self.assertEqual(get_adif_repository(Settings({})).fallback_encoding, "latin-1")
+
+    def test_empty_fallback_encoding_is_strict(self):
+        """Test that an empty fallback encoding disables the fallback."""
+        repository = get_adif_repository(Settings({"ADIF_FALLBACK_ENCODING": ""}))
+        self.assertIsNone(repository.fallback_encoding)
+
+    def test_unknown_fallback_encoding(self):
+        """Test that an unknown fallback encoding is rejected."""
+        with self.assertRaises(ValueError):
+            get_adif_repository(Settings({"ADIF_FALLBACK_ENCODING": "missing"}))
+
+
+class TestBackendSelection(unittest.TestCase):
+    """
+    Unit tests for the backends and backend selector of the application.
+    """
+
+    def test_backends(self):
+        """Test that every available backend is built with the fallback encoding."""
+        backends = get_adif_backends(Settings({"ADIF_FALLBACK_ENCODING": "cp1252"}))
+        self.assertIsInstance(backends["scanner"], CallsignScannerRepository)
+        self.assertEqual(backends["scanner"].fallback_encoding, "cp1252")
+
+    def test_selector(self):
+        """Test that the selector is only built for the auto backend."""
+        with patch.object(dependencies, "_backend_selector", None):
+            self.assertIsNone(get_backend_selector(Settings({})))
+            selector = get_backend_selector(
+                Settings(
+                    {
+                        "ADIF_BACKEND": "auto",
+                        "ADIF_BACKEND_CANDIDATES": "scanner, ADIF_IO",
+                        "ADIF_BACKEND_EXPLORE_RATE": "0.1",
+                    }
+                )
+            )
+            try:
+                self.assertEqual(selector.candidates, ["scanner", "adif_io"])
+                self.assertEqual(selector.explore_rate, 0.1)
+                self.assertIs(get_backend_selector(), selector)
+            finally:
+                remove_parse_listener(selector.observe_parse)
+
+    def test_unknown_candidate(self):
+        """Test that an unknown candidate backend is rejected."""
+        with patch.object(dependencies, "_backend_selector", None):
+            with self.assertRaises(ValueError):
+                get_backend_selector(
+                    Settings(
+                        {"ADIF_BACKEND": "auto", "ADIF_BACKEND_CANDIDATES": "missing"}
+                    )
+                )
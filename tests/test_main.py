@@ -7,6 +7,7 @@ endpoints, including the root endpoint, health check endpoint, and the ADIF file
 
 import unittest
 from io import BytesIO
+from unittest.mock import AsyncMock, Mock, patch
 
 # Add try/except block for TestClient import
 try:
@@ -62,7 +63,30 @@ except ImportError:
 
 
 # Import app from main at the module level
+from main import (
+    HTTPException,
+)
 from main import app as fastapi_app
+from main import (
+    create_job,
+    get_job,
+    get_operator,
+    get_profile,
+    get_profile_stacks,
+    list_backends,
+    list_profiles,
+    metrics,
+    negotiate_upload,
+    readiness_check,
+    upload_adif,
+    upload_adif_batch,
+)
+from repositories.registry import UnknownBackendError
+from services.admission import AdmissionController
+from services.decompression import DecompressionBombError
+from services.job_scheduler import JobQueueFullError
+from services.memory_budget import MemoryBudgetExceededError
+from services.profiling import Profiler
 
 
 class TestEndpoints(unittest.TestCase):
@@ -157,3 +181,462 @@ class TestEndpoints(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json()["unique_addresses"], 1)
         self.assertEqual(response.json()["callsign"], "AB1CD")
+
+
+class TestNegotiateUpload(unittest.TestCase):
+    """
+    Unit tests for the hash-first upload negotiation endpoint.
+    """
+
+    DIGEST = "ab" * 32
+
+    def setUp(self):
+        """Set up a mocked ADIF service."""
+        self.adif_service = Mock()
+
+    def test_known_digest(self):
+        """Test that a known digest is answered with the stored result."""
+        self.adif_service.lookup_result.return_value = {"unique_addresses": 1}
+        response = negotiate_upload(self.DIGEST.upper(), 100, self.adif_service)
+        self.assertEqual(response["status"], "known")
+        self.assertEqual(response["result"], {"unique_addresses": 1})
+        self.adif_service.lookup_result.assert_called_once_with(self.DIGEST)
+
+    def test_unknown_digest(self):
+        """Test that an unknown digest asks the client to upload the file."""
+        self.adif_service.lookup_result.return_value = None
+        response = negotiate_upload(self.DIGEST, 100, self.adif_service)
+        self.assertEqual(response["status"], "upload_required")
+        self.assertEqual(response["upload_url"], f"/upload_adif/?sha256={self.DIGEST}")
+
+    def test_malformed_request(self):
+        """Test that malformed digests and sizes are rejected."""
+        with self.assertRaises(HTTPException):
+            negotiate_upload("not-a-digest", 100, self.adif_service)
+        with self.assertRaises(HTTPException):
+            negotiate_upload(self.DIGEST, -1, self.adif_service)
+
+    def test_size_over_cap(self):
+        """Test that a file too large to upload is rejected before it is looked up."""
+        admission = AdmissionController(max_upload_bytes=100, retry_after=3)
+        with patch("main.get_admission_controller", return_value=admission):
+            negotiate_upload(self.DIGEST, 100, self.adif_service)
+            with self.assertRaises(HTTPException) as context:
+                negotiate_upload(self.DIGEST, 101, self.adif_service)
+        self.assertEqual(context.exception.status_code, 413)
+        self.assertEqual(context.exception.headers, {"Retry-After": "3"})
+        self.adif_service.lookup_result.assert_called_once_with(self.DIGEST)
+
+
+class TestJobEndpoints(unittest.IsolatedAsyncioTestCase):
+    """
+    Unit tests for the background job endpoints.
+    """
+
+    def setUp(self):
+        """Set up a mocked ADIF service and job scheduler."""
+        self.adif_service = Mock()
+        self.adif_service.is_valid_adif_file.return_value = True
+        self.scheduler = Mock()
+        self.scheduler.submit = AsyncMock()
+        patcher = patch("main.get_job_scheduler", return_value=self.scheduler)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_create_job(self):
+        """Test that an upload is queued and its job id returned."""
+        job = Mock(id="abc")
+        job.to_dict.return_value = {"job_id": "abc", "status": "queued", "size": 4}
+        self.scheduler.submit.return_value = job
+        upload = Mock(filename="test.adi", file=BytesIO(b"data"))
+
+        response = await create_job(upload, None, self.adif_service)
+
+        self.assertEqual(response.content["job_id"], "abc")
+        self.assertEqual(response.content["status_url"], "/jobs/abc")
+        stream, process = self.scheduler.submit.call_args.args
+        self.assertIs(stream, upload.file)
+        self.assertEqual(process.args[1:], ("exact", None, "adi"))
+
+    async def test_create_job_rejects_invalid_upload(self):
+        """Test that non-ADIF files are not queued."""
+        self.adif_service.is_valid_adif_file.return_value = False
+        with self.assertRaises(HTTPException):
+            await create_job(Mock(filename="test.txt"), None, self.adif_service)
+        self.scheduler.submit.assert_not_called()
+
+    async def test_create_job_queue_full(self):
+        """Test that a full job queue is reported as unavailable."""
+        self.scheduler.submit.side_effect = JobQueueFullError("full")
+        upload = Mock(filename="test.adi", file=BytesIO(b"data"))
+        with self.assertRaises(HTTPException) as context:
+            await create_job(upload, None, self.adif_service)
+        self.assertEqual(context.exception.status_code, 503)
+        self.assertIn("Retry-After", context.exception.headers)
+
+    async def test_create_job_too_large(self):
+        """Test that uploads over the size cap are rejected before queueing."""
+        upload = Mock(filename="test.adi", file=BytesIO(b"data"))
+        with patch(
+            "main.get_admission_controller",
+            return_value=AdmissionController(max_upload_bytes=3, retry_after=5),
+        ):
+            with self.assertRaises(HTTPException) as context:
+                await create_job(upload, None, self.adif_service)
+        self.assertEqual(context.exception.status_code, 413)
+        self.assertEqual(context.exception.headers, {"Retry-After": "5"})
+        self.scheduler.submit.assert_not_called()
+
+    def test_get_job(self):
+        """Test that job status is reported and unknown jobs are not found."""
+        self.scheduler.get.return_value = Mock(
+            to_dict=Mock(return_value={"status": "running"})
+        )
+        self.assertEqual(get_job("abc"), {"status": "running"})
+        self.scheduler.get.return_value = None
+        with self.assertRaises(HTTPException) as context:
+            get_job("missing")
+        self.assertEqual(context.exception.status_code, 404)
+
+
+class TestAdmissionControl(unittest.IsolatedAsyncioTestCase):
+    """
+    Unit tests for admission control on uploads and the readiness endpoint.
+    """
+
+    def setUp(self):
+        """Set up a mocked ADIF service and a small admission controller."""
+        self.adif_service = Mock()
+        self.adif_service.is_valid_adif_file.return_value = True
+        self.adif_service.process_adif_stream_async = AsyncMock(return_value={})
+        self.admission = AdmissionController(
+            max_concurrent=1, max_upload_bytes=8, retry_after=3
+        )
+        patcher = patch("main.get_admission_controller", return_value=self.admission)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_upload_too_large(self):
+        """Test that an upload over the size cap gets 413 without being parsed."""
+        upload = Mock(filename="test.adi", file=BytesIO(b"<call:5>AB1CD <eor>"))
+        with self.assertRaises(HTTPException) as context:
+            await upload_adif(upload, adif_service=self.adif_service)
+        self.assertEqual(context.exception.status_code, 413)
+        self.assertEqual(context.exception.headers, {"Retry-After": "3"})
+        self.adif_service.process_adif_stream_async.assert_not_called()
+
+    async def test_upload_while_saturated(self):
+        """Test that an upload beyond the concurrency limit gets 503."""
+        upload = Mock(filename="test.adi", file=BytesIO(b"data"))
+        with self.admission.admit(1):
+            with self.assertRaises(HTTPException) as context:
+                await upload_adif(upload, adif_service=self.adif_service)
+        self.assertEqual(context.exception.status_code, 503)
+        self.assertEqual(context.exception.headers, {"Retry-After": "3"})
+
+        await upload_adif(upload, adif_service=self.adif_service)
+        self.adif_service.process_adif_stream_async.assert_awaited_once()
+
+    async def test_upload_over_memory_budget(self):
+        """Test that a log going over the memory budget gets a structured 413."""
+        error = MemoryBudgetExceededError("unique_callsigns", 200, 100)
+        self.adif_service.process_adif_stream_async.side_effect = error
+        upload = Mock(filename="test.adi", file=BytesIO(b"data"))
+        with self.assertRaises(HTTPException) as context:
+            await upload_adif(upload, adif_service=self.adif_service)
+        self.assertEqual(context.exception.status_code, 413)
+        self.assertEqual(context.exception.detail, error.to_dict())
+        self.assertFalse(self.admission.saturated)
+
+    async def test_compressed_upload(self):
+        """Test that the compression is taken from the part's Content-Encoding."""
+        upload = Mock(
+            filename="test.adi",
+            file=BytesIO(b"data"),
+            headers={"content-encoding": "gzip"},
+        )
+        await upload_adif(upload, adif_service=self.adif_service)
+        kwargs = self.adif_service.process_adif_stream_async.await_args.kwargs
+        self.assertEqual(kwargs["compression"], "gzip")
+
+    async def test_unsupported_content_encoding(self):
+        """Test that an unknown Content-Encoding gets 415."""
+        upload = Mock(
+            filename="test.adi",
+            file=BytesIO(b"data"),
+            headers={"content-encoding": "br"},
+        )
+        with self.assertRaises(HTTPException) as context:
+            await upload_adif(upload, adif_service=self.adif_service)
+        self.assertEqual(context.exception.status_code, 415)
+
+    async def test_decompression_bomb(self):
+        """Test that an upload expanding too far gets a structured 413."""
+        error = DecompressionBombError(1000, 2000000, 50)
+        self.adif_service.process_adif_stream_async.side_effect = error
+        upload = Mock(filename="test.adi.gz", file=BytesIO(b"data"))
+        with self.assertRaises(HTTPException) as context:
+            await upload_adif(upload, adif_service=self.adif_service)
+        self.assertEqual(context.exception.status_code, 413)
+        self.assertEqual(context.exception.detail, error.to_dict())
+
+    async def test_adx_upload(self):
+        """Test that an ADX upload is parsed as ADX and may not be cumulative."""
+        upload = Mock(filename="log.ADX", file=BytesIO(b"data"))
+        await upload_adif(upload, adif_service=self.adif_service)
+        kwargs = self.adif_service.process_adif_stream_async.await_args.kwargs
+        self.assertEqual(kwargs["file_format"], "adx")
+        with self.assertRaises(HTTPException) as context:
+            await upload_adif(upload, mode="cumulative", adif_service=self.adif_service)
+        self.assertEqual(context.exception.status_code, 400)
+
+    async def test_aggregates(self):
+        """Test that requested statistics are passed on and unknown ones refused."""
+        upload = Mock(filename="test.adi", file=BytesIO(b"data"))
+        await upload_adif(
+            upload, aggregates="mode,band", adif_service=self.adif_service
+        )
+        kwargs = self.adif_service.process_adif_stream_async.await_args.kwargs
+        self.assertEqual(kwargs["aggregates"], ("band", "mode"))
+        with self.assertRaises(HTTPException) as context:
+            await upload_adif(
+                upload, aggregates="continent", adif_service=self.adif_service
+            )
+        self.assertEqual(context.exception.status_code, 400)
+
+    async def test_backend(self):
+        """Test that a requested backend is passed on and unknown ones refused."""
+        upload = Mock(filename="test.adi", file=BytesIO(b"data"))
+        await upload_adif(upload, backend="ADIF_IO", adif_service=self.adif_service)
+        kwargs = self.adif_service.process_adif_stream_async.await_args.kwargs
+        self.assertEqual(kwargs["backend"], "adif_io")
+        self.adif_service.process_adif_stream_async.side_effect = UnknownBackendError(
+            "Unknown ADIF backend 'nope'"
+        )
+        with self.assertRaises(HTTPException) as context:
+            await upload_adif(upload, backend="nope", adif_service=self.adif_service)
+        self.assertEqual(context.exception.status_code, 400)
+        with self.assertRaises(HTTPException) as context:
+            await upload_adif(
+                upload,
+                mode="cumulative",
+                backend="scanner",
+                adif_service=self.adif_service,
+            )
+        self.assertEqual(context.exception.status_code, 400)
+
+    def test_list_backends(self):
+        """Test that the backends are listed with what the selector measured."""
+        selector = Mock()
+        selector.stats.return_value = {"candidates": ["scanner"], "timings": {}}
+        with patch("main.get_backend_selector", return_value=selector):
+            response = list_backends()
+        self.assertEqual(
+            [backend["name"] for backend in response["backends"]],
+            ["adif_io", "scanner"],
+        )
+        self.assertIn("parallel", response["backends"][1]["capabilities"])
+        self.assertEqual(response["selector"]["candidates"], ["scanner"])
+        with patch("main.get_backend_selector", return_value=None):
+            self.assertIsNone(list_backends()["selector"])
+
+    async def test_compressed_cumulative_upload(self):
+        """Test that cumulative uploads must not be compressed."""
+        upload = Mock(filename="test.adi.gz", file=BytesIO(b"data"))
+        with self.assertRaises(HTTPException) as context:
+            await upload_adif(upload, mode="cumulative", adif_service=self.adif_service)
+        self.assertEqual(context.exception.status_code, 400)
+
+    async def test_cumulative_upload_needs_store(self):
+        """Test that cumulative uploads are rejected when the store is disabled."""
+        self.adif_service.callsign_store = None
+        upload = Mock(filename="test.adi", file=BytesIO(b"data"))
+        with self.assertRaises(HTTPException) as context:
+            await upload_adif(upload, mode="cumulative", adif_service=self.adif_service)
+        self.assertEqual(context.exception.status_code, 400)
+
+    async def test_cumulative_upload(self):
+        """Test that cumulative uploads are merged into the operator's set."""
+        self.adif_service.process_adif_delta_async = AsyncMock(
+            return_value={"unique_addresses": 3}
+        )
+        upload = Mock(filename="test.adi", file=BytesIO(b"data"))
+        response = await upload_adif(
+            upload, mode="Cumulative", operator="AB1CD", adif_service=self.adif_service
+        )
+        self.assertEqual(response.content, {"unique_addresses": 3})
+        self.adif_service.process_adif_delta_async.assert_awaited_once_with(
+            upload.file, "AB1CD"
+        )
+        self.adif_service.process_adif_stream_async.assert_not_called()
+
+    def test_metrics(self):
+        """Test that the metrics include the uploads being parsed."""
+        with patch("main.Response") as response, patch(
+            "main.get_parse_executor", return_value=Mock(in_flight=1)
+        ), patch("main.get_job_scheduler", return_value=Mock(queued=0)):
+            with self.admission.admit(5):
+                metrics()
+        content = response.call_args.kwargs["content"]
+        self.assertIn("adif_parses_in_flight 1\n", content)
+        self.assertIn("adif_inflight_bytes 5\n", content)
+        self.assertIn("adif_executor_jobs_in_flight 1\n", content)
+        self.assertIn('adif_stage_duration_seconds_count{stage="tier"}', content)
+        self.assertTrue(
+            response.call_args.kwargs["media_type"].startswith("text/plain")
+        )
+
+    def test_readiness(self):
+        """Test that the replica reports not-ready while saturated."""
+        with patch("main.get_parse_executor", return_value=Mock(saturated=False)):
+            self.assertEqual(readiness_check()["status"], "ready")
+            with self.admission.admit(1):
+                response = readiness_check()
+        self.assertEqual(response.content["status"], "saturated")
+        self.assertEqual(response.content["active"], 1)
+
+
+class TestOperatorEndpoint(unittest.TestCase):
+    """
+    Unit tests for the cumulative operator endpoint.
+    """
+
+    def test_known_operator(self):
+        """Test that an operator's cumulative count and tier are reported."""
+        store = Mock()
+        store.checkpoint.return_value = (10, "ab" * 32)
+        store.count.return_value = 150
+        with patch("main.get_callsign_store", return_value=store):
+            response = get_operator("ab1cd")
+        self.assertEqual(
+            response,
+            {"unique_addresses": 150, "award_tier": "Bedsit", "callsign": "AB1CD"},
+        )
+
+    def test_unknown_operator(self):
+        """Test that unknown operators and a disabled store are not found."""
+        store = Mock()
+        store.checkpoint.return_value = None
+        for callsign_store in (store, None):
+            with patch("main.get_callsign_store", return_value=callsign_store):
+                with self.assertRaises(HTTPException) as context:
+                    get_operator("AB1CD")
+            self.assertEqual(context.exception.status_code, 404)
+
+
+class TestBatchUploadEndpoint(unittest.IsolatedAsyncioTestCase):
+    """
+    Unit tests for the batch upload endpoint.
+    """
+
+    def setUp(self):
+        """Set up a mocked batch service."""
+        self.batch_service = Mock()
+        self.batch_service.is_valid_batch_file.side_effect = lambda name: name.endswith(
+            (".adi", ".ZIP")
+        )
+        self.batch_service.process_batch_async = AsyncMock(
+            return_value={"files": [], "combined": {}}
+        )
+
+    async def test_batch(self):
+        """Test that ADIF files and archives are passed on as one batch."""
+        uploads = [
+            Mock(filename="a.adi", file=BytesIO(b"one")),
+            Mock(filename="club.ZIP", file=BytesIO(b"two")),
+        ]
+        response = await upload_adif_batch(uploads, self.batch_service)
+        self.assertEqual(response.content, {"files": [], "combined": {}})
+        batch = self.batch_service.process_batch_async.call_args.args[0]
+        self.assertEqual(
+            batch, [("a.adi", uploads[0].file), ("club.ZIP", uploads[1].file)]
+        )
+
+    async def test_batch_rejects_other_files(self):
+        """Test that files that are neither ADIF files nor archives are rejected."""
+        with self.assertRaises(HTTPException) as context:
+            await upload_adif_batch(
+                [Mock(filename="notes.txt", file=BytesIO(b""))], self.batch_service
+            )
+        self.assertEqual(context.exception.status_code, 400)
+        self.batch_service.process_batch_async.assert_not_called()
+
+    async def test_batch_over_memory_budget(self):
+        """Test that a batch over the memory budget gets 413 with the details."""
+        error = MemoryBudgetExceededError("unique_callsigns", 200, 100)
+        self.batch_service.process_batch_async.side_effect = error
+        with self.assertRaises(HTTPException) as context:
+            await upload_adif_batch(
+                [Mock(filename="a.adi", file=BytesIO(b"one"))], self.batch_service
+            )
+        self.assertEqual(context.exception.status_code, 413)
+        self.assertEqual(context.exception.detail, error.to_dict())
+
+
+class TestProfilingEndpoints(unittest.IsolatedAsyncioTestCase):
+    """
+    Unit tests for profiled uploads and the profile endpoints.
+    """
+
+    def setUp(self):
+        """Set up a mocked ADIF service and a profiler with a token."""
+        self.adif_service = Mock()
+        self.adif_service.is_valid_adif_file.return_value = True
+        self.adif_service.process_adif_stream_async = AsyncMock(return_value={})
+        self.profiler = Profiler("s3cret")
+        patcher = patch("main.get_profiler", return_value=self.profiler)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_profiled_upload(self):
+        """Test that an upload with the token is profiled and its profile kept."""
+        upload = Mock(filename="test.adi", file=BytesIO(b"<call:5>AB1CD <eor>"))
+        with patch("main.JSONResponse") as response:
+            await upload_adif(
+                upload, x_profile_token="s3cret", adif_service=self.adif_service
+            )
+        (profile,) = self.profiler.profiles()
+        self.assertEqual(profile.filename, "test.adi")
+        self.assertEqual(
+            response.call_args.kwargs["headers"], {"X-Profile-Id": profile.id}
+        )
+
+        self.assertEqual(
+            list_profiles(x_profile_token="s3cret")["profiles"][0]["profile_id"],
+            profile.id,
+        )
+        details = get_profile(profile.id, x_profile_token="s3cret")
+        self.assertEqual(details["collapsed_url"], f"/profiles/{profile.id}/collapsed")
+        with patch("main.Response") as stacks:
+            get_profile_stacks(profile.id, x_profile_token="s3cret")
+        self.assertEqual(stacks.call_args.kwargs["content"], "")
+
+    async def test_wrong_token(self):
+        """Test that an upload with a wrong token is rejected before parsing."""
+        upload = Mock(filename="test.adi", file=BytesIO(b"<call:5>AB1CD <eor>"))
+        with self.assertRaises(HTTPException) as context:
+            await upload_adif(
+                upload, x_profile_token="guess", adif_service=self.adif_service
+            )
+        self.assertEqual(context.exception.status_code, 403)
+        self.adif_service.process_adif_stream_async.assert_not_called()
+
+    async def test_upload_without_token(self):
+        """Test that an upload without the token is not profiled."""
+        upload = Mock(filename="test.adi", file=BytesIO(b"<call:5>AB1CD <eor>"))
+        await upload_adif(upload, adif_service=self.adif_service)
+        self.assertEqual(self.profiler.profiles(), [])
+
+    def test_profiles_need_token(self):
+        """Test that profiles cannot be listed or fetched without the token."""
+        for call in (
+            lambda: list_profiles(x_profile_token=None),
+            lambda: get_profile("0" * 32, x_profile_token=None),
+            lambda: get_profile("0" * 32, x_profile_token="guess"),
+        ):
+            with self.assertRaises(HTTPException) as context:
+                call()
+            self.assertEqual(context.exception.status_code, 403)
+        with self.assertRaises(HTTPException) as context:
+            get_profile("0" * 32, x_profile_token="s3cret")
+        self.assertEqual(context.exception.status_code, 404)
@@ -6,9 +6,24 @@ including the parsing of ADIF data from strings.
 """
 
 import unittest
+from io import BytesIO
 from unittest.mock import patch
 
-from repositories.adif_repository import AdifIoRepository
+from repositories.adif_repository import (
+    AdifIoRepository,
+    adif_io,
+    decode_text,
+    iter_record_batches,
+    scan_record_end,
+)
+from services.adif_service import AdifService
+from services.award_service import AwardService
+
+SAMPLE_ADIF = (
+    b"Header text\n<adif_ver:5>3.1.0\n<EOH>\n"
+    b"<call:5>AB1CD <band:3>20m <eor>\n"
+    b"<CALL:5>EF2GH <band:3>40m <EOR>\n"
+)
 
 
 class TestAdifIoRepository(unittest.TestCase):
@@ -33,13 +48,157 @@ class TestAdifIoRepository(unittest.TestCase):
     def test_read_from_string_with_adif_io(self, mock_adif_io):
         """Test reading from string with adif_io available."""
         # Set up the mock
-        mock_records = [{"call": "TEST1"}, {"call": "TEST2"}]
-        mock_adif_io.read_from_string.return_value = mock_records
+        mock_records = [{"CALL": "TEST1"}, {"CALL": "TEST2", "Band": "20m"}]
+        mock_adif_io.read_from_string.return_value = (mock_records, {})
 
         # Call the repository method
         repo = AdifIoRepository()
         result = repo.read_from_string("test content")
 
         # Check the result and that the mock was called correctly
-        self.assertEqual(result, mock_records)
+        self.assertEqual(result, [{"call": "TEST1"}, {"call": "TEST2", "band": "20m"}])
         mock_adif_io.read_from_string.assert_called_once_with("test content")
+
+    @patch("repositories.adif_repository.adif_io")
+    def test_read_from_stream_parses_record_batches(self, mock_adif_io):
+        """Test that streamed batches are handed to adif_io and records are yielded."""
+        mock_adif_io.read_from_string.side_effect = lambda batch: (
+            [{"CALL": batch}],
+            {},
+        )
+
+        repo = AdifIoRepository()
+        records = list(repo.read_from_stream(BytesIO(SAMPLE_ADIF), chunk_size=8))
+
+        # Each batch should end on a record boundary
+        self.assertTrue(records)
+        for record in records:
+            self.assertTrue(record["call"].lower().endswith("<eor>"))
+        self.assertTrue(records[0]["call"].startswith("Header text"))
+        self.assertEqual(
+            "".join(record["call"] for record in records).replace("\n", ""),
+            SAMPLE_ADIF.decode("utf-8").replace("\n", ""),
+        )
+
+
+@unittest.skipUnless(hasattr(adif_io, "QSO"), "the adif_io library is not installed")
+class TestAdifIoLibrary(unittest.TestCase):
+    """
+    Unit tests for the ADIF IO repository with the real adif_io library.
+    """
+
+    def test_read_from_stream(self):
+        """Test that QSOs are read as lower-case records, across several batches."""
+        log = SAMPLE_ADIF + b"<call:4>W1AW <comment:13>see <eor> too <eor>\n"
+        records = list(AdifIoRepository().read_from_stream(BytesIO(log), chunk_size=8))
+        self.assertEqual(
+            records,
+            [
+                {"call": "AB1CD", "band": "20m"},
+                {"call": "EF2GH", "band": "40m"},
+                {"call": "W1AW", "comment": "see <eor> too"},
+            ],
+        )
+        self.assertEqual(AdifIoRepository().read_from_string(""), [])
+
+    def test_process_adif_stream(self):
+        """Test counting the callsigns of a log parsed with adif_io."""
+        service = AdifService(AdifIoRepository(), AwardService())
+        result = service.process_adif_stream(BytesIO(SAMPLE_ADIF))
+        self.assertEqual(result["unique_addresses"], 2)
+        self.assertEqual(result["callsign"], "AB1CD")
+
+
+class TestIterRecordBatches(unittest.TestCase):
+    """
+    Unit tests for splitting ADIF streams into record batches.
+    """
+
+    def test_batches_split_on_eor(self):
+        """Test that every record boundary is preserved across small chunks."""
+        batches = list(iter_record_batches(BytesIO(SAMPLE_ADIF), chunk_size=4))
+        joined = "".join(batches)
+        self.assertEqual(joined.lower().count("<eor>"), 2)
+        self.assertTrue(batches[0].startswith("Header text"))
+        for batch in batches[1:]:
+            self.assertTrue(batch.startswith("<"))
+
+    def test_eor_inside_field_value(self):
+        """Test that an <EOR> inside a field value does not split the record."""
+        content = (
+            b"<call:5>AB1CD <comment:11>ends <eor>! <eor>\n"
+            b"<call:5>EF2GH <notes:5><EOR> <eor>\n"
+        )
+        for chunk_size in (1, 4):
+            batches = list(iter_record_batches(BytesIO(content), chunk_size))
+            self.assertEqual(
+                batches,
+                [
+                    "<call:5>AB1CD <comment:11>ends <eor>! <eor>",
+                    "<call:5>EF2GH <notes:5><EOR> <eor>",
+                ],
+            )
+
+    def test_scan_record_end(self):
+        """Test resuming a scan inside a field value and inside a tag."""
+        self.assertEqual(scan_record_end(b"<call:5>AB1CD <eor>"), (19, 19))
+        # The value runs past the end of the buffer
+        self.assertEqual(scan_record_end(b"<comment:9>ab<eor>"), (20, None))
+        # The tag is cut off by the end of the buffer
+        self.assertEqual(scan_record_end(b"<call:5>AB1CD <eo"), (14, None))
+        # The scan stops at the first record ending at or past the stop offset
+        records = b"<call:4>W1AW <eor>" * 3
+        self.assertEqual(scan_record_end(records, stop=19), (36, 36))
+
+    def test_multibyte_characters_across_chunks(self):
+        """Test that UTF-8 sequences split across chunk boundaries decode correctly."""
+        content = "<call:5>AB1CD <comment:4>Über<eor>".encode("utf-8")
+        batches = list(iter_record_batches(BytesIO(content), chunk_size=1))
+        self.assertEqual("".join(batches), content.decode("utf-8"))
+
+    def test_trailing_record_without_eor(self):
+        """Test that a final record without an <EOR> marker is still returned."""
+        batches = list(iter_record_batches(BytesIO(b"<call:5>AB1CD"), chunk_size=4))
+        self.assertEqual(batches, ["<call:5>AB1CD"])
+
+    def test_empty_stream(self):
+        """Test that an empty stream yields no batches."""
+        self.assertEqual(list(iter_record_batches(BytesIO(b""))), [])
+
+    def test_invalid_utf8_raises(self):
+        """Test that invalid UTF-8 content raises UnicodeDecodeError."""
+        with self.assertRaises(UnicodeDecodeError):
+            list(iter_record_batches(BytesIO(b"<call:5>AB1CD\xff<eor>")))
+
+    def test_fallback_encoding_for_invalid_utf8(self):
+        """Test that invalid UTF-8 is decoded with the fallback encoding."""
+        content = "<call:5>AB1CD <comment:4>Über <eor>".encode("utf-8") + (
+            b"<call:5>EF2GH <comment:4>caf\xe9<eor>"
+        )
+        batches = iter_record_batches(
+            BytesIO(content), chunk_size=3, fallback_encoding="latin-1"
+        )
+        self.assertEqual(
+            "".join(batches),
+            "<call:5>AB1CD <comment:4>Über <eor><call:5>EF2GH <comment:4>café<eor>",
+        )
+
+
+class TestDecodeText(unittest.TestCase):
+    """
+    Unit tests for decoding ADIF bytes with a fallback encoding.
+    """
+
+    def test_valid_utf8(self):
+        """Test that valid UTF-8 is decoded as UTF-8 even with a fallback."""
+        self.assertEqual(decode_text("Über".encode("utf-8"), "latin-1"), "Über")
+
+    def test_only_invalid_runs_use_fallback(self):
+        """Test that UTF-8 around invalid bytes is still decoded as UTF-8."""
+        data = b"caf\xe9 " + "Über".encode("utf-8") + b" \xff"
+        self.assertEqual(decode_text(data, "latin-1"), "café Über ÿ")
+
+    def test_without_fallback_raises(self):
+        """Test that invalid UTF-8 raises when there is no fallback encoding."""
+        with self.assertRaises(UnicodeDecodeError):
+            decode_text(b"caf\xe9")
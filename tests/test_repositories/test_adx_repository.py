@@ -0,0 +1,111 @@
+"""
+Unit tests for the ADX repository.
+
+This module contains test cases that verify CALL values are extracted from ADX
+(XML) files incrementally, independent of how the input is chunked, and that
+malformed or entity-declaring documents are rejected.
+"""
+
+import asyncio
+import unittest
+from io import BytesIO
+from unittest.mock import Mock
+
+from repositories.adx_repository import AdxFormatError, AdxRepository
+from services.adif_service import AdifService
+from services.award_service import AwardService
+from services.memory_budget import MemoryBudget, MemoryBudgetExceededError
+
+SAMPLE_ADX = (
+    b'<?xml version="1.0" encoding="UTF-8"?>\n'
+    b"<ADX>\n"
+    b"  <HEADER><ADIF_VER>3.1.4</ADIF_VER><PROGRAMID>logger</PROGRAMID></HEADER>\n"
+    b"  <RECORDS>\n"
+    b"    <RECORD><QSO_DATE>20220101</QSO_DATE><CALL>AB1CD</CALL></RECORD>\n"
+    b"    <RECORD><CALL> EF2GH </CALL><USERDEF FIELDNAME='X'>1</USERDEF></RECORD>\n"
+    b"    <RECORD><BAND>40m</BAND></RECORD>\n"
+    b"    <RECORD><APP PROGRAMID='x' FIELDNAME='CALL'>NOPE</APP>"
+    b"<CALL>AB1CD</CALL></RECORD>\n"
+    b"  </RECORDS>\n"
+    b"</ADX>\n"
+)
+
+EXPECTED = [{"call": "AB1CD"}, {"call": "EF2GH"}, {}, {"call": "AB1CD"}]
+
+
+class TestAdxRepository(unittest.TestCase):
+    """
+    Unit tests for the ADX repository.
+    """
+
+    def setUp(self):
+        """Set up the repository under test."""
+        self.repository = AdxRepository()
+
+    def test_read_from_bytes(self):
+        """Test that only CALL values directly within records are extracted."""
+        self.assertEqual(self.repository.read_from_bytes(SAMPLE_ADX), EXPECTED)
+
+    def test_read_from_string(self):
+        """Test parsing ADX text."""
+        self.assertEqual(
+            self.repository.read_from_string(SAMPLE_ADX.decode("utf-8")), EXPECTED
+        )
+
+    def test_read_from_stream_any_chunk_size(self):
+        """Test that the result does not depend on how the stream is chunked."""
+        for chunk_size in (1, 7, 64, 4096):
+            records = list(
+                self.repository.read_from_stream(BytesIO(SAMPLE_ADX), chunk_size)
+            )
+            self.assertEqual(records, EXPECTED, chunk_size)
+
+    def test_declared_encoding(self):
+        """Test that the encoding comes from the XML declaration."""
+        data = (
+            b'<?xml version="1.0" encoding="ISO-8859-1"?>'
+            b"<ADX><RECORDS><RECORD><CALL>\xc4B1CD</CALL></RECORD></RECORDS></ADX>"
+        )
+        self.assertEqual(self.repository.read_from_bytes(data), [{"call": "ÄB1CD"}])
+
+    def test_malformed_xml(self):
+        """Test that XML that is not well-formed is rejected."""
+        with self.assertRaises(AdxFormatError):
+            self.repository.read_from_bytes(b"<ADX><RECORDS><RECORD></ADX>")
+
+    def test_doctype_is_rejected(self):
+        """Test that a document type, which could declare entities, is refused."""
+        data = (
+            b'<?xml version="1.0"?><!DOCTYPE ADX [<!ENTITY a "aaaa">]>'
+            b"<ADX><RECORDS><RECORD><CALL>&a;</CALL></RECORD></RECORDS></ADX>"
+        )
+        for chunk_size in (3, 4096):
+            with self.assertRaises(AdxFormatError):
+                list(self.repository.read_from_stream(BytesIO(data), chunk_size))
+
+    def test_memory_budget(self):
+        """Test that an oversized record goes over the budget."""
+        data = (
+            b"<ADX><RECORDS><RECORD><COMMENT>"
+            + b"x" * 4096
+            + b"</COMMENT></RECORD></RECORDS></ADX>"
+        )
+        with self.assertRaises(MemoryBudgetExceededError):
+            list(
+                self.repository.read_from_stream(
+                    BytesIO(data), 512, memory_budget=MemoryBudget(1024)
+                )
+            )
+
+    def test_service_result_matches_adi(self):
+        """Test that an ADX upload gets the same result as the same log in ADI."""
+        adi_repository = Mock()
+        service = AdifService(adi_repository, AwardService())
+        result = asyncio.run(
+            service.process_adif_stream_async(BytesIO(SAMPLE_ADX), file_format="adx")
+        )
+        self.assertEqual(
+            result,
+            {"unique_addresses": 2, "award_tier": "Participant", "callsign": "AB1CD"},
+        )
+        adi_repository.read_from_stream.assert_not_called()
@@ -0,0 +1,198 @@
+"""
+Unit tests for the backend registry.
+
+This module contains test cases that verify how backends are registered and looked
+up, how uploads are grouped by size, and how the selector chooses a backend from
+its timings.
+"""
+
+import unittest
+
+from repositories.registry import (
+    BYTES_INPUT,
+    PARALLEL,
+    STREAMING,
+    BackendRegistry,
+    BackendSelector,
+    UnknownBackendError,
+    default_registry,
+    size_class,
+)
+from repositories.scanner_repository import CallsignScannerRepository
+
+
+class FakeRepository:
+    """
+    A repository that only keeps its options.
+    """
+
+    def __init__(self, fallback_encoding=None):
+        """
+        Initialize the repository.
+
+        Args:
+            fallback_encoding (str, optional): The fallback encoding.
+        """
+        self.fallback_encoding = fallback_encoding
+
+
+def build_registry():
+    """
+    Build a registry of three fake backends, one of them unavailable.
+
+    Returns:
+        BackendRegistry: The registry.
+    """
+    registry = BackendRegistry()
+    registry.register("careful", FakeRepository, (STREAMING,))
+    registry.register("fast", FakeRepository, (STREAMING, BYTES_INPUT, PARALLEL))
+    registry.register("missing", FakeRepository, available=False)
+    return registry
+
+
+class TestBackendRegistry(unittest.TestCase):
+    """
+    Unit tests for the backend registry.
+    """
+
+    def test_register(self):
+        """Test looking up backends and their capabilities."""
+        registry = build_registry()
+        self.assertEqual(registry.names(), ["careful", "fast", "missing"])
+        self.assertEqual(
+            [backend.name for backend in registry.available()], ["careful", "fast"]
+        )
+        self.assertTrue(registry.get("fast").supports(STREAMING, PARALLEL))
+        self.assertFalse(registry.get("careful").supports(PARALLEL))
+        self.assertEqual(
+            registry.get("fast").to_dict(),
+            {
+                "name": "fast",
+                "capabilities": ["bytes_input", "parallel", "streaming"],
+                "available": True,
+            },
+        )
+        repository = registry.create("careful", fallback_encoding="cp1252")
+        self.assertEqual(repository.fallback_encoding, "cp1252")
+
+    def test_invalid_registrations(self):
+        """Test that names are unique and capabilities are known."""
+        registry = build_registry()
+        with self.assertRaises(ValueError):
+            registry.register("fast", FakeRepository)
+        with self.assertRaises(ValueError):
+            registry.register("new", FakeRepository, ("telepathy",))
+        with self.assertRaises(UnknownBackendError):
+            registry.get("nope")
+
+    def test_default_registry(self):
+        """Test the backends shipped with the service."""
+        registry = default_registry()
+        self.assertEqual(registry.names(), ["adif_io", "scanner"])
+        self.assertTrue(registry.get("scanner").supports(PARALLEL))
+        self.assertFalse(registry.get("adif_io").supports(PARALLEL))
+        self.assertIsInstance(registry.create("scanner"), CallsignScannerRepository)
+
+    def test_size_class(self):
+        """Test that each size class is four times larger than the previous one."""
+        self.assertEqual(size_class(0), 0)
+        self.assertEqual(size_class(4095), 0)
+        self.assertEqual(size_class(4096), 1)
+        self.assertEqual(size_class(16383), 1)
+        self.assertEqual(size_class(16384), 2)
+        self.assertEqual(size_class(64 * 1024 * 1024), 8)
+
+
+class TestBackendSelector(unittest.TestCase):
+    """
+    Unit tests for the backend selector.
+    """
+
+    def build_selector(self, explore=False, **kwargs):
+        """
+        Build a selector over the fake backends.
+
+        Args:
+            explore (bool): Whether every upload explores.
+            **kwargs: Options for the selector.
+
+        Returns:
+            BackendSelector: The selector.
+        """
+        return BackendSelector(
+            build_registry(),
+            ["fast", "careful", "missing"],
+            sampler=lambda: 0.0 if explore else 0.99,
+            **kwargs,
+        )
+
+    def test_candidates(self):
+        """Test that unavailable backends are left out."""
+        selector = self.build_selector()
+        self.assertEqual(selector.candidates, ["fast", "careful"])
+        with self.assertRaises(UnknownBackendError):
+            BackendSelector(build_registry(), ["missing"])
+        with self.assertRaises(UnknownBackendError):
+            BackendSelector(build_registry(), ["nope"])
+
+    def test_preferred_until_measured(self):
+        """Test that the first candidate is chosen until timings are trusted."""
+        selector = self.build_selector(min_samples=2)
+        self.assertEqual(selector.select(1000), "fast")
+        self.assertEqual(selector.select(None), "fast")
+        selector.observe("careful", 1000, 0.001)
+        self.assertEqual(selector.select(1000), "fast")
+        selector.observe("careful", 1000, 0.001)
+        # Only careful has enough timings for this size
+        self.assertEqual(selector.select(1000), "careful")
+
+    def test_fastest_per_size_class(self):
+        """Test that each size class goes to the backend fastest for it."""
+        selector = self.build_selector(min_samples=1)
+        selector.observe("fast", 1000, 0.002)
+        selector.observe("careful", 1000, 0.001)
+        selector.observe("fast", 1000000, 0.1)
+        selector.observe("careful", 1000000, 1.0)
+        self.assertEqual(selector.select(1000), "careful")
+        self.assertEqual(selector.select(1000000), "fast")
+
+    def test_moving_average(self):
+        """Test that recent timings change the choice."""
+        selector = self.build_selector(min_samples=1, smoothing=0.5)
+        selector.observe("fast", 1000, 0.002)
+        selector.observe("careful", 1000, 0.003)
+        self.assertEqual(selector.select(1000), "fast")
+        for _ in range(3):
+            selector.observe("fast", 1000, 0.005)
+        self.assertEqual(selector.select(1000), "careful")
+
+    def test_explore(self):
+        """Test that exploring uploads go to the least measured backend."""
+        selector = self.build_selector(explore=True)
+        self.assertEqual(selector.select(1000), "fast")
+        selector.observe("fast", 1000, 0.001)
+        self.assertEqual(selector.select(1000), "careful")
+
+    def test_prefer(self):
+        """Test choosing among the backends with some capabilities."""
+        selector = self.build_selector(min_samples=1)
+        selector.observe("fast", 1000, 0.002)
+        selector.observe("careful", 1000, 0.001)
+        self.assertEqual(selector.select(1000, prefer=(PARALLEL,)), "fast")
+        # Without a candidate having the capability, any may be chosen
+        selector = BackendSelector(build_registry(), ["careful"])
+        self.assertEqual(selector.select(1000, prefer=(PARALLEL,)), "careful")
+
+    def test_observe_parse(self):
+        """Test learning from the metrics observation of a parse."""
+        selector = self.build_selector(min_samples=1)
+        observation = {"seconds": {"parse": 0.001, "tier": 0.0}, "bytes": 5000}
+        selector.observe_parse(observation)
+        selector.observe_parse({**observation, "backend": "careful"})
+        selector.observe_parse({**observation, "backend": "unknown"})
+        stats = selector.stats()
+        self.assertEqual(stats["candidates"], ["fast", "careful"])
+        self.assertEqual(list(stats["timings"]), ["careful"])
+        timing = stats["timings"]["careful"]["4096"]
+        self.assertEqual(timing["samples"], 1)
+        self.assertAlmostEqual(timing["seconds_per_mb"], 0.2)
@@ -0,0 +1,247 @@
+"""
+Unit tests for the scanner repository.
+
+This module contains test cases that verify the byte scanner extracts CALL values
+correctly, including header handling, tag case and chunk boundaries.
+"""
+
+import os
+import tempfile
+import unittest
+from io import BytesIO
+from unittest.mock import patch
+
+from repositories.scanner_repository import (
+    CallsignScanner,
+    CallsignScannerRepository,
+    map_stream,
+)
+
+SAMPLE_ADIF = (
+    b"Generated by <some logger>\n<adif_ver:5>3.1.0 <call:5>NOPE1 <EOH>\n"
+    b"<call:5>AB1CD <band:3>20m <comment:12>has <eor> in <eor>\n"
+    b"<Call:5>EF2GH <MODE:3>FT8 <EOR>\n"
+    b"<band:3>40m <eor>\n"
+    b"<CALL:6:S>GH3IJK <qso_date:8>20220101 <eor>\n"
+)
+
+
+class TestCallsignScannerRepository(unittest.TestCase):
+    """
+    Unit tests for the callsign scanner repository.
+
+    This suite verifies that only CALL values are extracted and that the results
+    do not depend on how the input is chunked.
+    """
+
+    def setUp(self):
+        """Set up the repository under test."""
+        self.repository = CallsignScannerRepository()
+
+    def test_field_projection(self):
+        """Test that other fields are extracted only when asked for."""
+        records = list(
+            self.repository.read_from_stream(
+                BytesIO(SAMPLE_ADIF), chunk_size=7, fields=("call", "band", "mode")
+            )
+        )
+        self.assertEqual(
+            records,
+            [
+                {"call": "AB1CD", "band": "20m"},
+                {"call": "EF2GH", "mode": "FT8"},
+                {"band": "40m"},
+                {"call": "GH3IJK"},
+            ],
+        )
+
+    def test_read_from_bytes(self):
+        """Test that records are parsed with the header skipped."""
+        records = self.repository.read_from_bytes(SAMPLE_ADIF)
+        self.assertEqual(
+            records,
+            [{"call": "AB1CD"}, {"call": "EF2GH"}, {}, {"call": "GH3IJK"}],
+        )
+
+    def test_read_from_string(self):
+        """Test that string input is parsed the same as bytes."""
+        records = self.repository.read_from_string(SAMPLE_ADIF.decode("utf-8"))
+        self.assertEqual(len(records), 4)
+        self.assertEqual(records[0], {"call": "AB1CD"})
+
+    def test_read_from_stream_independent_of_chunk_size(self):
+        """Test that streaming in small chunks gives the same records as one pass."""
+        expected = self.repository.read_from_bytes(SAMPLE_ADIF)
+        for chunk_size in (1, 2, 3, 7, 64):
+            records = list(
+                self.repository.read_from_stream(BytesIO(SAMPLE_ADIF), chunk_size)
+            )
+            self.assertEqual(records, expected, f"chunk_size={chunk_size}")
+
+    def test_no_header(self):
+        """Test a file that starts directly with records."""
+        records = self.repository.read_from_bytes(b"  <call:5>AB1CD <eor>")
+        self.assertEqual(records, [{"call": "AB1CD"}])
+
+    def test_header_fields_without_header_text(self):
+        """Test that fields before <EOH> are not counted as a record."""
+        records = self.repository.read_from_bytes(
+            b"<adif_ver:5>3.1.0 <call:5>NOPE1 <eoh><call:5>AB1CD <eor>"
+        )
+        self.assertEqual(records, [{"call": "AB1CD"}])
+
+    def test_trailing_record_without_eor_is_discarded(self):
+        """Test that an unterminated final record is not returned."""
+        records = self.repository.read_from_bytes(b"<call:5>AB1CD <eor><call:5>EF2GH")
+        self.assertEqual(records, [{"call": "AB1CD"}])
+
+    def test_empty_input(self):
+        """Test that empty input yields no records."""
+        self.assertEqual(self.repository.read_from_bytes(b""), [])
+        self.assertEqual(list(self.repository.read_from_stream(BytesIO(b""))), [])
+
+    def test_invalid_utf8_call_raises(self):
+        """Test that an undecodable CALL value raises UnicodeDecodeError."""
+        with self.assertRaises(UnicodeDecodeError):
+            self.repository.read_from_bytes(b"<call:5>AB1C\xff <eor>")
+
+    def test_fallback_encoding_for_call(self):
+        """Test that an invalid UTF-8 CALL value uses the fallback encoding."""
+        repository = CallsignScannerRepository(fallback_encoding="latin-1")
+        records = repository.read_from_bytes(b"<call:5>AB1C\xc4 <eor>")
+        self.assertEqual(records, [{"call": "AB1C\u00c4"}])
+
+    def test_other_fields_are_not_decoded(self):
+        """Test that invalid UTF-8 outside CALL values is ignored."""
+        records = self.repository.read_from_bytes(
+            b"<call:5>AB1CD <comment:4>caf\xe9 <eor>"
+        )
+        self.assertEqual(records, [{"call": "AB1CD"}])
+
+    def test_long_values_are_not_buffered(self):
+        """Test that values of unneeded fields are skipped across chunks."""
+        scanner = CallsignScanner()
+        self.assertEqual(scanner.feed(b"<call:5>AB1CD <comment:1000>"), [])
+        for _ in range(9):
+            scanner.feed(b"x" * 100)
+            self.assertEqual(scanner.buffered, 0)
+        self.assertEqual(scanner.feed(b"x" * 100 + b"<eor>"), [{"call": "AB1CD"}])
+
+
+class TestScannerFileRanges(unittest.TestCase):
+    """
+    Unit tests for splitting an ADIF file into ranges and scanning each range.
+    """
+
+    def setUp(self):
+        """Write a log with a header and many records to a temporary file."""
+        records = b"".join(
+            b"<call:6>K%05d <band:3>20m <EOR>\n" % index for index in range(500)
+        )
+        handle, self.path = tempfile.mkstemp()
+        with os.fdopen(handle, "wb") as adif_file:
+            adif_file.write(b"Header <eor> text\n<adif_ver:5>3.1.0 <eoh>\n" + records)
+        self.repository = CallsignScannerRepository()
+
+    def tearDown(self):
+        """Remove the temporary file."""
+        os.unlink(self.path)
+
+    def test_ranges_hold_whole_records(self):
+        """Test that scanning every range finds every record exactly once."""
+        ranges = self.repository.split_file(self.path, 4)
+        self.assertEqual(len(ranges), 4)
+        records = []
+        for start, end in ranges:
+            records.extend(self.repository.read_from_file_range(self.path, start, end))
+        self.assertEqual(records, [{"call": f"K{index:05d}"} for index in range(500)])
+
+    def test_eor_in_comment_does_not_split_record(self):
+        """Test that ranges end after records, not at an <EOR> within a value."""
+        comment = b"see <eor> " * 20
+        with open(self.path, "wb") as adif_file:
+            adif_file.write(
+                b"".join(
+                    b"<comment:%d>%s<call:6>K%05d <eor>\n"
+                    % (len(comment), comment, index)
+                    for index in range(100)
+                )
+            )
+        ranges = self.repository.split_file(self.path, 4)
+        self.assertEqual(len(ranges), 4)
+        records = []
+        for start, end in ranges:
+            records.extend(self.repository.read_from_file_range(self.path, start, end))
+        self.assertEqual(records, [{"call": f"K{index:05d}"} for index in range(100)])
+
+    def test_more_parts_than_records(self):
+        """Test that splitting a small file yields no empty ranges."""
+        with open(self.path, "wb") as adif_file:
+            adif_file.write(b"<call:5>AB1CD <eor>")
+        ranges = self.repository.split_file(self.path, 8)
+        self.assertEqual(ranges, [(0, 19)])
+
+    def test_empty_and_header_only_files(self):
+        """Test that files without records yield no ranges."""
+        with open(self.path, "wb") as adif_file:
+            adif_file.write(b"Header only <eoh>")
+        self.assertEqual(self.repository.split_file(self.path, 4), [])
+
+
+class TestScannerMappedStreams(unittest.TestCase):
+    """
+    Unit tests for scanning streams backed by files on disk.
+
+    This suite verifies that file-backed streams are memory-mapped and parsed the
+    same as chunked reads, and that in-memory streams are left alone.
+    """
+
+    def setUp(self):
+        """Set up the repository and the expected records."""
+        self.repository = CallsignScannerRepository()
+        self.expected = self.repository.read_from_bytes(SAMPLE_ADIF)
+
+    def test_file_stream_is_mapped(self):
+        """Test that a file stream is scanned in place from its current position."""
+        with tempfile.TemporaryFile() as adif_file:
+            adif_file.write(b"<call:5>SKIP1 <eor>" + SAMPLE_ADIF)
+            adif_file.seek(19)
+            mapped = map_stream(adif_file)
+            self.assertIsNotNone(mapped)
+            mapped.close()
+            records = list(self.repository.read_from_stream(adif_file))
+        self.assertEqual(records, self.expected)
+
+    def test_in_memory_spooled_file_is_not_mapped(self):
+        """Test that an unrolled spooled file is read without touching the disk."""
+        with tempfile.SpooledTemporaryFile(max_size=1 << 20) as spooled:
+            spooled.write(SAMPLE_ADIF)
+            spooled.seek(0)
+            with patch.object(spooled, "rollover", wraps=spooled.rollover) as rollover:
+                self.assertIsNone(map_stream(spooled))
+                records = list(self.repository.read_from_stream(spooled, chunk_size=7))
+            rollover.assert_not_called()
+        self.assertEqual(records, self.expected)
+
+    def test_rolled_spooled_file_is_mapped(self):
+        """Test that a spooled file that has rolled over to disk is mapped."""
+        with tempfile.SpooledTemporaryFile(max_size=16) as spooled:
+            spooled.write(SAMPLE_ADIF)
+            spooled.seek(0)
+            mapped = map_stream(spooled)
+            self.assertIsNotNone(mapped)
+            mapped.close()
+            records = list(self.repository.read_from_stream(spooled))
+        self.assertEqual(records, self.expected)
+
+    def test_empty_file_is_not_mapped(self):
+        """Test that an empty file falls back to chunked reads."""
+        with tempfile.TemporaryFile() as adif_file:
+            self.assertIsNone(map_stream(adif_file))
+            self.assertEqual(list(self.repository.read_from_stream(adif_file)), [])
+
+    def test_scan_range_of_buffer(self):
+        """Test that scanning a buffer range only yields records inside it."""
+        data = b"<call:5>AB1CD <eor><call:5>EF2GH <eor><call:5>IJ3KL <eor>"
+        scanner = CallsignScanner(header=False)
+        self.assertEqual(list(scanner.scan(data, 19, 38)), [{"call": "EF2GH"}])
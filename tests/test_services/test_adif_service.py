@@ -5,10 +5,22 @@ This module contains test cases that verify the functionality of the ADIF servic
 including file validation and ADIF content processing.
 """
 
+import asyncio
 import unittest
-from unittest.mock import Mock
+from io import BytesIO
+from unittest.mock import ANY, AsyncMock, Mock
 
+from repositories.registry import (
+    PARALLEL,
+    STREAMING,
+    BackendRegistry,
+    BackendSelector,
+    UnknownBackendError,
+)
 from services.adif_service import AdifService
+from services.award_service import AwardService
+from services.counting import fold_callsign_data
+from services.result_cache import ResultCache
 
 
 class TestAdifService(unittest.TestCase):
@@ -29,6 +41,10 @@ class TestAdifService(unittest.TestCase):
         """Test validation of ADIF file names."""
         self.assertTrue(self.service.is_valid_adif_file("test.adi"))
         self.assertTrue(self.service.is_valid_adif_file("test.adif"))
+        self.assertTrue(self.service.is_valid_adif_file("test.adi.gz"))
+        self.assertTrue(self.service.is_valid_adif_file("test.ADIF.zst"))
+        self.assertTrue(self.service.is_valid_adif_file("test.adx"))
+        self.assertFalse(self.service.is_valid_adif_file("test.txt.gz"))
         self.assertFalse(self.service.is_valid_adif_file("test.txt"))
         self.assertFalse(self.service.is_valid_adif_file(None))
 
@@ -66,3 +82,160 @@ class TestAdifService(unittest.TestCase):
         self.assertEqual(result["unique_addresses"], 0)
         self.assertEqual(result["award_tier"], "Participant")
         self.assertEqual(result["callsign"], "Unknown")
+
+    def test_process_adif_stream(self):
+        """Test processing of an ADIF stream."""
+        stream = BytesIO(b"mock content")
+        self.mock_repository.read_from_stream.return_value = iter(
+            [{"call": "AB1CD"}, {"call": "EF2GH"}, {"call": "AB1CD"}]
+        )
+        self.mock_award_service.determine_award_tier.return_value = "Test Tier"
+
+        result = self.service.process_adif_stream(stream)
+
+        self.assertEqual(result["unique_addresses"], 2)
+        self.assertEqual(result["award_tier"], "Test Tier")
+        self.assertEqual(result["callsign"], "AB1CD")
+        self.mock_repository.read_from_stream.assert_called_once_with(
+            stream, memory_budget=None, fields=None, stage_timer=ANY
+        )
+        self.mock_award_service.determine_award_tier.assert_called_once_with(2)
+
+    def test_fold_callsign_data(self):
+        """Test folding records keeps only unique callsigns and the first callsign."""
+        records = iter(
+            [{"call": ""}, {"band": "20m"}, {"call": "EF2GH"}, {"call": "EF2GH"}]
+        )
+        self.assertEqual(fold_callsign_data(records), (1, ["EF2GH"]))
+        self.assertEqual(fold_callsign_data([]), (0, []))
+
+    def test_process_adif_stream_async_without_executor(self):
+        """Test that the async path parses inline when there is no executor."""
+        self.mock_repository.read_from_stream.return_value = iter([{"call": "AB1CD"}])
+        self.mock_award_service.determine_award_tier.return_value = "Participant"
+
+        result = asyncio.run(self.service.process_adif_stream_async(BytesIO(b"")))
+
+        self.assertEqual(result["callsign"], "AB1CD")
+
+    def test_process_adif_stream_async_uses_executor(self):
+        """Test that the async path hands the stream to the executor."""
+        executor = Mock()
+        executor.run_stream = AsyncMock(return_value={"unique_addresses": 3})
+        service = AdifService(self.mock_repository, self.mock_award_service, executor)
+        stream = BytesIO(b"")
+
+        result = asyncio.run(service.process_adif_stream_async(stream))
+
+        self.assertEqual(result, {"unique_addresses": 3})
+        process, passed_stream = executor.run_stream.await_args.args
+        self.assertEqual(process.func, service.process_adif_stream)
+        self.assertEqual(
+            process.keywords,
+            {
+                "counting_mode": "exact",
+                "compression": None,
+                "file_format": "adi",
+                "aggregates": (),
+                "backend": None,
+            },
+        )
+        self.assertIs(passed_stream, stream)
+
+    def test_pickled_service_drops_executor(self):
+        """Test that the executor is not sent along with the service."""
+        service = AdifService(None, None, executor=object())
+        self.assertIsNone(service.__getstate__()["executor"])
+
+
+class TestBackendSelection(unittest.TestCase):
+    """
+    Unit tests for parsing uploads with the backend they ask for or are given.
+    """
+
+    def setUp(self):
+        """Set up a service with two backends and a selector choosing between them."""
+        self.backends = {"careful": Mock(), "fast": Mock()}
+        for repository in self.backends.values():
+            repository.read_from_stream.side_effect = lambda *args, **kwargs: iter(
+                [{"call": "AB1CD"}]
+            )
+        registry = BackendRegistry()
+        registry.register("careful", Mock, (STREAMING,))
+        registry.register("fast", Mock, (STREAMING, PARALLEL))
+        self.selector = BackendSelector(
+            registry, ["fast", "careful"], min_samples=1, sampler=lambda: 0.99
+        )
+        self.service = AdifService(
+            self.backends["fast"],
+            AwardService(),
+            result_cache=ResultCache(1024 * 1024),
+            backends=self.backends,
+            backend_selector=self.selector,
+        )
+
+    def parse(self, data, **kwargs):
+        """
+        Parse an upload and tell which backends read it.
+
+        Args:
+            data (bytes): The upload.
+            **kwargs: Arguments for process_adif_stream_async.
+
+        Returns:
+            list: The names of the backends that read the upload.
+        """
+        for repository in self.backends.values():
+            repository.read_from_stream.reset_mock()
+        asyncio.run(self.service.process_adif_stream_async(BytesIO(data), **kwargs))
+        return [
+            name
+            for name, repository in self.backends.items()
+            if repository.read_from_stream.called
+        ]
+
+    def test_selected_backend(self):
+        """Test that the selector chooses the backend by the size of the upload."""
+        self.assertEqual(self.parse(b"<call:5>AB1CD <eor>"), ["fast"])
+        self.selector.observe("fast", 100, 0.002)
+        self.selector.observe("careful", 100, 0.001)
+        self.assertEqual(self.parse(b"<call:5>EF2GH <eor>"), ["careful"])
+
+    def test_requested_backend(self):
+        """Test that an upload may ask for a backend, and its result is its own."""
+        data = b"<call:5>AB1CD <eor>"
+        self.assertEqual(self.parse(data), ["fast"])
+        self.assertEqual(self.parse(data), [])
+        self.assertEqual(self.parse(data, backend="careful"), ["careful"])
+        with self.assertRaises(UnknownBackendError):
+            self.parse(data, backend="missing")
+
+    def test_prefer_parallel(self):
+        """Test that uploads that may be split go to a backend that splits them."""
+        selector = Mock()
+        selector.select.return_value = "careful"
+        executor = Mock(kind="process")
+        executor.run_stream = AsyncMock(return_value={"unique_addresses": 1})
+        service = AdifService(
+            self.backends["fast"],
+            AwardService(),
+            executor,
+            parallel_threshold=10,
+            backends={"careful": Mock(spec=["read_from_stream"])},
+            backend_selector=selector,
+        )
+        for data, kwargs, prefer in (
+            (b"x" * 100, {}, (PARALLEL,)),
+            (b"x" * 100, {"counting_mode": "approximate"}, ()),
+            (b"x" * 5, {}, ()),
+        ):
+            asyncio.run(service.process_adif_stream_async(BytesIO(data), **kwargs))
+            selector.select.assert_called_with(len(data), prefer)
+            process, _ = executor.run_stream.await_args.args
+            self.assertEqual(process.keywords["backend"], "careful")
+
+    def test_pickled_service_drops_selector(self):
+        """Test that the selector stays in the parent process."""
+        state = self.service.__getstate__()
+        self.assertIsNone(state["backend_selector"])
+        self.assertEqual(state["backends"], self.backends)
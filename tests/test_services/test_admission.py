@@ -0,0 +1,189 @@
+"""
+Unit tests for admission control.
+
+This module contains test cases that verify uploads are admitted against the
+concurrency limit, the in-flight byte budget and the per-upload size cap, and that
+the middleware turns uploads away before their bodies are read.
+"""
+
+import json
+import unittest
+
+from services.admission import (
+    MULTIPART_ALLOWANCE_BYTES,
+    AdmissionBusyError,
+    AdmissionController,
+    AdmissionMiddleware,
+    UploadTooLargeError,
+)
+
+
+class TestAdmissionController(unittest.TestCase):
+    """
+    Unit tests for the admission controller.
+    """
+
+    def test_concurrency_limit(self):
+        """Test that uploads beyond the concurrency limit are rejected."""
+        controller = AdmissionController(max_concurrent=2, retry_after=7)
+        with controller.admit(10), controller.admit(10):
+            self.assertTrue(controller.saturated)
+            with self.assertRaises(AdmissionBusyError) as context:
+                with controller.admit(10):
+                    pass
+            self.assertEqual(context.exception.retry_after, 7)
+        self.assertFalse(controller.saturated)
+        self.assertEqual(controller.stats()["active"], 0)
+        self.assertEqual(controller.stats()["rejected"], 1)
+
+    def test_byte_budget(self):
+        """Test that uploads beyond the in-flight byte budget are rejected."""
+        controller = AdmissionController(max_concurrent=0, max_inflight_bytes=100)
+        with controller.admit(60):
+            with self.assertRaises(AdmissionBusyError):
+                with controller.admit(50):
+                    pass
+            with controller.admit(40):
+                self.assertTrue(controller.saturated)
+                self.assertEqual(controller.stats()["inflight_bytes"], 100)
+        self.assertEqual(controller.stats()["inflight_bytes"], 0)
+
+    def test_upload_over_budget_admitted_when_idle(self):
+        """Test that a single upload larger than the byte budget still runs alone."""
+        controller = AdmissionController(max_inflight_bytes=100)
+        with controller.admit(150):
+            with self.assertRaises(AdmissionBusyError):
+                with controller.admit(1):
+                    pass
+
+    def test_size_cap(self):
+        """Test that uploads over the size cap are rejected."""
+        controller = AdmissionController(max_upload_bytes=100)
+        controller.check_size(100)
+        with self.assertRaises(UploadTooLargeError):
+            with controller.admit(101):
+                pass
+        self.assertEqual(controller.stats()["active"], 0)
+
+    def test_release_on_error(self):
+        """Test that an upload is released when parsing fails."""
+        controller = AdmissionController(max_concurrent=1)
+        with self.assertRaises(ValueError):
+            with controller.admit(10):
+                raise ValueError("bad log")
+        self.assertFalse(controller.saturated)
+
+    def test_precheck(self):
+        """Test the checks made before the body of an upload is read."""
+        controller = AdmissionController(max_concurrent=1, max_upload_bytes=100)
+        controller.precheck(100 + MULTIPART_ALLOWANCE_BYTES)
+        controller.precheck(None)
+        with self.assertRaises(UploadTooLargeError):
+            controller.precheck(101 + MULTIPART_ALLOWANCE_BYTES)
+        with controller.admit(10):
+            with self.assertRaises(AdmissionBusyError):
+                controller.precheck(None)
+        self.assertEqual(controller.stats()["rejected"], 2)
+
+
+def http_scope(path, content_length=None, method="POST"):
+    """
+    Build the ASGI scope of an HTTP request.
+
+    Args:
+        path (str): The path of the request.
+        content_length (int, optional): The ``Content-Length`` header, if any.
+        method (str): The HTTP method.
+
+    Returns:
+        dict: The scope.
+    """
+    headers = [(b"content-type", b"multipart/form-data; boundary=x")]
+    if content_length is not None:
+        headers.append((b"content-length", str(content_length).encode()))
+    return {"type": "http", "method": method, "path": path, "headers": headers}
+
+
+class TestAdmissionMiddleware(unittest.IsolatedAsyncioTestCase):
+    """
+    Unit tests for admission control applied before an upload is read.
+    """
+
+    def setUp(self):
+        """Set up a middleware around an application recording its requests."""
+        self.controller = AdmissionController(
+            max_concurrent=1, max_upload_bytes=1000, retry_after=3
+        )
+        self.requests = []
+
+        async def app(scope, receive, send):
+            self.requests.append(scope["path"])
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"{}"})
+
+        self.middleware = AdmissionMiddleware(
+            app,
+            lambda: self.controller,
+            parse_paths=("/upload_adif/",),
+            size_paths=("/jobs",),
+        )
+
+    async def request(self, scope):
+        """
+        Send a request through the middleware without a body.
+
+        Args:
+            scope (dict): The ASGI scope of the request.
+
+        Returns:
+            tuple: The status, the headers and the decoded JSON body sent.
+        """
+        messages = []
+
+        async def receive():
+            raise AssertionError("the body must not be read")
+
+        async def send(message):
+            messages.append(message)
+
+        await self.middleware(scope, receive, send)
+        return (
+            messages[0]["status"],
+            dict(messages[0]["headers"]),
+            json.loads(messages[1]["body"]),
+        )
+
+    async def test_admitted_request_reaches_app(self):
+        """Test that an upload that may be admitted is passed on."""
+        status, _, _ = await self.request(http_scope("/upload_adif/", 500))
+        self.assertEqual(status, 200)
+        self.assertEqual(self.requests, ["/upload_adif/"])
+
+    async def test_declared_size_over_cap(self):
+        """Test that an upload declaring too large a body is rejected unread."""
+        status, headers, body = await self.request(
+            http_scope("/jobs", 1001 + MULTIPART_ALLOWANCE_BYTES)
+        )
+        self.assertEqual(status, 413)
+        self.assertEqual(headers[b"retry-after"], b"3")
+        self.assertIn("too large", body["detail"])
+        self.assertEqual(self.requests, [])
+
+    async def test_saturated_replica(self):
+        """Test that an upload is shed unread while the replica is saturated."""
+        with self.controller.admit(10):
+            status, headers, _ = await self.request(http_scope("/upload_adif/"))
+            jobs_status, _, _ = await self.request(http_scope("/jobs"))
+        self.assertEqual(status, 503)
+        self.assertEqual(headers[b"retry-after"], b"3")
+        self.assertEqual(jobs_status, 200)
+        self.assertEqual(self.requests, ["/jobs"])
+
+    async def test_other_requests_pass(self):
+        """Test that requests other than uploads are never checked."""
+        with self.controller.admit(10):
+            status, _, _ = await self.request(http_scope("/upload_adif/", method="GET"))
+            other_status, _, _ = await self.request(
+                http_scope("/upload_adif/negotiate", 10**9)
+            )
+        self.assertEqual((status, other_status), (200, 200))
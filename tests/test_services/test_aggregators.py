@@ -0,0 +1,232 @@
+"""
+Unit tests for the upload statistics accumulators.
+
+This module contains test cases that verify each accumulator, the parsing of the
+requested statistics, and that the service computes them in the same pass as the
+unique callsign count.
+"""
+
+import unittest
+from io import BytesIO
+from unittest.mock import Mock
+
+from repositories.adx_repository import AdxRepository
+from repositories.scanner_repository import CallsignScannerRepository
+from services.adif_service import AdifService
+from services.aggregators import (
+    DUPLICATE_SAMPLE_SIZE,
+    DuplicateQsos,
+    QsoTotals,
+    UniqueCallsByField,
+    UnknownAggregateError,
+    accumulator_fields,
+    build_accumulators,
+    feed_accumulators,
+    parse_aggregates,
+)
+from services.award_service import AwardService
+from services.memory_budget import MemoryBudget, MemoryBudgetExceededError
+
+SAMPLE_ADIF = (
+    b"header <EOH>\n"
+    b"<call:5>AB1CD <band:3>20m <mode:3>FT8 <qso_date:8>20220101 <eor>\n"
+    b"<call:5>EF2GH <band:3>20M <mode:2>CW <qso_date:8>20220101 <eor>\n"
+    b"<call:5>AB1CD <band:3>40m <mode:3>FT8 <qso_date:8>20220102 <eor>\n"
+    b"<call:5>AB1CD <band:3>20m <mode:3>FT8 <qso_date:8>20220102 <eor>\n"
+    b"<band:3>20m <mode:3>FT8 <eor>\n"
+)
+
+EXPECTED_AGGREGATES = {
+    "band": {"20M": 2, "40M": 1},
+    "mode": {"CW": 1, "FT8": 1},
+    "date": {"20220101": 2, "20220102": 1},
+    "totals": {"qsos": 5, "with_call": 4, "without_call": 1},
+}
+
+
+class TestAccumulators(unittest.TestCase):
+    """
+    Unit tests for the accumulators and their selection.
+    """
+
+    def test_unique_calls_by_field(self):
+        """Test that callsigns are counted once per case-insensitive value."""
+        for packed in (True, False):
+            accumulator = UniqueCallsByField("band", packed)
+            for record in (
+                {"call": "AB1CD", "band": "20m"},
+                {"call": "AB1CD", "band": "20M"},
+                {"call": "EF2GH", "band": " 40m"},
+                {"band": "20m"},
+                {"call": "K1ZZ"},
+            ):
+                accumulator.add(record)
+            self.assertEqual(accumulator.result(), {"20M": 1, "40M": 1})
+            self.assertGreater(accumulator.nbytes, 0)
+
+    def test_qso_totals(self):
+        """Test that records are counted with and without a callsign."""
+        accumulator = QsoTotals()
+        for record in ({"call": "AB1CD"}, {}, {"call": "AB1CD"}):
+            accumulator.add(record)
+        self.assertEqual(
+            accumulator.result(), {"qsos": 3, "with_call": 2, "without_call": 1}
+        )
+
+    def test_duplicate_qsos(self):
+        """Test that repeats within the time window are counted as duplicates."""
+        accumulator = DuplicateQsos(window_minutes=10)
+        base = {"call": "AB1CD", "band": "20m", "mode": "FT8", "qso_date": "20220101"}
+        for time_on, other in (
+            ("1200", {}),
+            ("120530", {"call": "ab1cd", "band": "20M"}),  # duplicate
+            ("1200", {"mode": "CW"}),
+            ("1200", {"band": "40m"}),
+            ("1300", {}),
+            ("1200", {"qso_date": "20220102"}),
+            ("1200", {}),  # duplicate
+        ):
+            accumulator.add({**base, "time_on": time_on, **other})
+        result = accumulator.result()
+        self.assertEqual(result["duplicates"], 2)
+        self.assertEqual(result["window_minutes"], 10)
+        self.assertEqual(
+            [entry["time_on"] for entry in result["sample"]], ["120530", "1200"]
+        )
+        self.assertEqual(result["sample"][0]["call"], "ab1cd")
+
+    def test_duplicate_window_crosses_midnight(self):
+        """Test that the window spans the change of date."""
+        accumulator = DuplicateQsos(window_minutes=10)
+        accumulator.add({"call": "AB1CD", "qso_date": "20211231", "time_on": "2358"})
+        accumulator.add({"call": "AB1CD", "qso_date": "20220101", "time_on": "0003"})
+        self.assertEqual(accumulator.result()["duplicates"], 1)
+
+    def test_duplicates_by_date(self):
+        """Test comparing by date only, and records without a valid time."""
+        by_date = DuplicateQsos(window_minutes=0)
+        timed = DuplicateQsos(window_minutes=10)
+        for record in (
+            {"call": "AB1CD", "qso_date": "20220101", "time_on": "0000"},
+            {"call": "AB1CD", "qso_date": "20220101", "time_on": "2359"},
+            {"call": "AB1CD", "qso_date": "20220101"},
+            {"call": "AB1CD", "qso_date": "20220101", "time_on": "bad"},
+            {"qso_date": "20220101"},
+        ):
+            by_date.add(record)
+            timed.add(record)
+        self.assertEqual(by_date.result()["duplicates"], 3)
+        self.assertEqual(timed.result()["duplicates"], 1)
+
+    def test_duplicate_sample_is_capped(self):
+        """Test that the sample stays small however many duplicates there are."""
+        accumulator = DuplicateQsos()
+        for _ in range(DUPLICATE_SAMPLE_SIZE + 10):
+            accumulator.add({"call": "AB1CD"})
+        result = accumulator.result()
+        self.assertEqual(result["duplicates"], DUPLICATE_SAMPLE_SIZE + 9)
+        self.assertEqual(len(result["sample"]), DUPLICATE_SAMPLE_SIZE)
+        self.assertEqual(result["sample"][0], {"call": "AB1CD"})
+
+    def test_parse_aggregates(self):
+        """Test that names are deduplicated and put in a canonical order."""
+        self.assertEqual(parse_aggregates("Totals, band,band"), ("band", "totals"))
+        self.assertEqual(parse_aggregates(None), ())
+        self.assertEqual(parse_aggregates(""), ())
+        with self.assertRaises(UnknownAggregateError):
+            parse_aggregates("band,continent")
+
+    def test_accumulator_fields(self):
+        """Test that the fields to extract are collected once each."""
+        accumulators = build_accumulators(("band", "date", "totals"))
+        self.assertEqual(accumulator_fields(accumulators), ("call", "band", "qso_date"))
+
+    def test_feed_accumulators_checks_budget(self):
+        """Test that the accumulators are reported to the memory budget."""
+        accumulators = build_accumulators(("date",), packed_callsigns=False)
+        records = (
+            {"call": f"K{index}", "qso_date": f"2022{index:04d}"}
+            for index in range(10000)
+        )
+        with self.assertRaises(MemoryBudgetExceededError) as context:
+            for _ in feed_accumulators(records, accumulators, MemoryBudget(4096)):
+                pass
+        self.assertEqual(context.exception.component, "aggregates")
+
+
+class TestServiceAggregates(unittest.TestCase):
+    """
+    Unit tests for statistics computed by the ADIF service.
+    """
+
+    def test_scanner_aggregates(self):
+        """Test that the scanner extracts the fields the statistics need."""
+        service = AdifService(CallsignScannerRepository(), AwardService())
+        result = service.process_adif_stream(
+            BytesIO(SAMPLE_ADIF), aggregates=("band", "mode", "date", "totals")
+        )
+        self.assertEqual(result["unique_addresses"], 2)
+        self.assertEqual(result["aggregates"], EXPECTED_AGGREGATES)
+
+    def test_scanner_duplicates(self):
+        """Test that duplicates are found from the fields the scanner extracts."""
+        service = AdifService(
+            CallsignScannerRepository(), AwardService(), duplicate_window_minutes=0
+        )
+        data = SAMPLE_ADIF + (
+            b"<call:5>AB1CD <band:3>40M <mode:3>ft8 <qso_date:8>20220102 <eor>\n"
+        )
+        result = service.process_adif_stream(BytesIO(data), aggregates=("duplicates",))
+        self.assertEqual(
+            result["aggregates"]["duplicates"],
+            {
+                "duplicates": 1,
+                "window_minutes": 0,
+                "sample": [
+                    {
+                        "call": "AB1CD",
+                        "band": "40M",
+                        "mode": "ft8",
+                        "qso_date": "20220102",
+                    }
+                ],
+            },
+        )
+
+    def test_adx_aggregates(self):
+        """Test that the ADX repository extracts the fields the statistics need."""
+        adx = (
+            b"<ADX><RECORDS>"
+            b"<RECORD><CALL>AB1CD</CALL><BAND>20m</BAND><MODE>FT8</MODE></RECORD>"
+            b"<RECORD><CALL>EF2GH</CALL><BAND>20m</BAND><MODE>CW</MODE></RECORD>"
+            b"</RECORDS></ADX>"
+        )
+        service = AdifService(Mock(), AwardService(), adx_repository=AdxRepository())
+        result = service.process_adif_stream(
+            BytesIO(adx), file_format="adx", aggregates=("band", "mode")
+        )
+        self.assertEqual(
+            result["aggregates"],
+            {"band": {"20M": 2}, "mode": {"CW": 1, "FT8": 1}},
+        )
+
+    def test_aggregates_in_approximate_mode(self):
+        """Test that statistics are taken from the first pass only."""
+        service = AdifService(CallsignScannerRepository(), AwardService())
+        service.award_service.is_near_threshold = lambda *_: True
+        result = service.process_adif_stream(
+            BytesIO(SAMPLE_ADIF), counting_mode="approximate", aggregates=("totals",)
+        )
+        self.assertEqual(result["counting_mode"], "exact")
+        self.assertEqual(
+            result["aggregates"], {"totals": EXPECTED_AGGREGATES["totals"]}
+        )
+
+    def test_no_aggregates_by_default(self):
+        """Test that only the call field is extracted when nothing is requested."""
+        repository = Mock()
+        repository.read_from_stream.return_value = iter([{"call": "AB1CD"}])
+        service = AdifService(repository, AwardService())
+        result = service.process_adif_stream(BytesIO(b""))
+        self.assertNotIn("aggregates", result)
+        self.assertIsNone(repository.read_from_stream.call_args.kwargs["fields"])
@@ -63,3 +63,11 @@ class TestAwardService(unittest.TestCase):
             self.service.determine_award_tier(500000), AwardTier.VICTORIAN_VILLA
         )
         self.assertEqual(self.service.determine_award_tier(1000000), AwardTier.MANSION)
+
+    def test_is_near_threshold(self):
+        """Test detecting counts within a margin of a tier threshold."""
+        self.assertTrue(self.service.is_near_threshold(995, 10))
+        self.assertTrue(self.service.is_near_threshold(100, 0))
+        self.assertFalse(self.service.is_near_threshold(300, 50))
+        # The zero threshold never needs an exact recount
+        self.assertFalse(self.service.is_near_threshold(2, 5))
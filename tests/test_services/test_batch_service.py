@@ -0,0 +1,176 @@
+"""
+Unit tests for the batch service.
+
+This module contains test cases that verify how batches of ADIF files and ZIP
+archives are parsed, inline and on an executor, and how files that cannot be parsed
+batches over the file limit and ZIP bombs are reported.
+"""
+
+import gzip
+import unittest
+import zipfile
+from io import BytesIO
+
+from repositories.scanner_repository import CallsignScannerRepository
+from services.adif_service import AdifService
+from services.award_service import AwardService
+from services.batch_service import (
+    BatchService,
+    BatchTooLargeError,
+    fold_batch_member,
+)
+from services.decompression import DecompressionBombError
+from services.executor import ParseExecutor
+
+
+def build_zip(members):
+    """
+    Build a ZIP archive in memory.
+
+    Args:
+        members (dict): File contents keyed by member name.
+
+    Returns:
+        BytesIO: The archive, rewound.
+    """
+    archive = BytesIO()
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        for name, content in members.items():
+            zip_file.writestr(name, content)
+    archive.seek(0)
+    return archive
+
+
+class TestBatchUploads(unittest.IsolatedAsyncioTestCase):
+    """
+    Unit tests for processing batches of ADIF files and ZIP archives.
+    """
+
+    def setUp(self):
+        """Set up a batch service parsing with the scanner backend."""
+        self.adif_service = AdifService(CallsignScannerRepository(), AwardService())
+        self.service = BatchService(self.adif_service)
+
+    def uploads(self):
+        """Build a batch of one archive, one plain file and one broken archive."""
+        archive = build_zip(
+            {
+                "day1.adi": b"<call:5>AB1CD <eor><call:5>EF2GH <eor>",
+                "day2.ADIF": b"<call:5>EF2GH <eor><call:4>K1ZZ <eor>",
+                "notes.txt": b"not a log",
+            }
+        )
+        return [
+            ("club.zip", archive),
+            ("extra.adi", BytesIO(b"<call:4>W1AW <eor>")),
+            ("broken.zip", BytesIO(b"not an archive")),
+        ]
+
+    def assert_batch_result(self, result):
+        """Check the per-file and combined results of the batch from uploads."""
+        self.assertEqual(
+            [entry["filename"] for entry in result["files"]],
+            ["club.zip/day1.adi", "club.zip/day2.ADIF", "extra.adi", "broken.zip"],
+        )
+        self.assertEqual(
+            [entry.get("unique_addresses") for entry in result["files"]],
+            [2, 2, 1, None],
+        )
+        self.assertIn("error", result["files"][3])
+        self.assertEqual(
+            result["combined"],
+            {"unique_addresses": 4, "award_tier": "Participant", "callsign": "AB1CD"},
+        )
+
+    async def test_inline_batch(self):
+        """Test a batch parsed without an executor."""
+        self.assert_batch_result(await self.service.process_batch_async(self.uploads()))
+
+    async def test_batch_on_executor(self):
+        """Test a batch spread across a thread pool."""
+        executor = ParseExecutor(kind="thread", max_workers=2)
+        self.adif_service.executor = executor
+        try:
+            result = await self.service.process_batch_async(self.uploads())
+        finally:
+            executor.shutdown()
+        self.assert_batch_result(result)
+        self.assertEqual(executor.in_flight, 0)
+
+    async def test_failed_member_does_not_fail_batch(self):
+        """Test that a file that cannot be parsed is reported on its own."""
+        result = await self.service.process_batch_async(
+            [
+                ("bad.adi", BytesIO(b"<call:5>AB1C\xff <eor>")),
+                ("good.adi", BytesIO(b"<call:5>AB1CD <eor>")),
+            ]
+        )
+        self.assertIn("encoding", result["files"][0]["error"])
+        self.assertEqual(result["combined"]["unique_addresses"], 1)
+
+    async def test_file_limit(self):
+        """Test that a batch over the file limit is rejected."""
+        with self.assertRaises(BatchTooLargeError):
+            await BatchService(self.adif_service, max_files=3).process_batch_async(
+                self.uploads()
+            )
+
+
+class TestZipMemberGuards(unittest.IsolatedAsyncioTestCase):
+    """
+    Unit tests for the size and ratio guards on the files of ZIP archives.
+    """
+
+    def setUp(self):
+        """Set up an archive holding a small log and a highly compressible one."""
+        self.adif_service = AdifService(
+            CallsignScannerRepository(), AwardService(), max_decompression_ratio=50
+        )
+        self.archive = build_zip(
+            {
+                "small.adi": b"<call:5>AB1CD <eor>",
+                "bomb.adi": b"<call:5>AB1CD <eor>" + b" " * (8 * 1024 * 1024),
+            }
+        )
+
+    async def test_declared_ratio_is_rejected(self):
+        """Test that a file declaring too high a ratio is never opened."""
+        result = await BatchService(self.adif_service).process_batch_async(
+            [("club.zip", self.archive)]
+        )
+        self.assertEqual(result["files"][0]["unique_addresses"], 1)
+        self.assertEqual(
+            result["files"][1]["error"]["error"], "decompression_ratio_exceeded"
+        )
+        self.assertEqual(result["combined"]["unique_addresses"], 1)
+
+    async def test_declared_size_is_rejected(self):
+        """Test that a file declaring more bytes than an upload may hold is skipped."""
+        self.adif_service.max_decompression_ratio = 0
+        service = BatchService(self.adif_service, max_member_bytes=1024)
+        result = await service.process_batch_async([("club.zip", self.archive)])
+        self.assertEqual(result["files"][0]["unique_addresses"], 1)
+        self.assertIn("over the limit of 1024 bytes", result["files"][1]["error"])
+
+    def test_ratio_is_guarded_while_parsing(self):
+        """Test that a file is stopped once it expands past the ratio."""
+        with self.assertRaises(DecompressionBombError):
+            fold_batch_member(
+                CallsignScannerRepository(),
+                self.archive,
+                "bomb.adi",
+                max_decompression_ratio=50,
+            )
+
+    def test_gzip_within_archive(self):
+        """Test that a gzip file within an archive is guarded by both ratios."""
+        archive = build_zip({"log.adi.gz": gzip.compress(b"<call:4>W1AW <eor>")})
+        unique_callsigns, callsigns = fold_batch_member(
+            CallsignScannerRepository(),
+            archive,
+            "log.adi.gz",
+            "gzip",
+            max_decompression_ratio=50,
+        )
+        self.assertEqual(len(unique_callsigns), 1)
+        self.assertEqual(callsigns, ["W1AW"])
@@ -0,0 +1,102 @@
+"""
+Unit tests for the packed callsign set.
+
+This module contains test cases that verify callsigns are packed losslessly into
+64-bit integers and that the packed set behaves like a set of strings.
+"""
+
+import unittest
+
+from services.callsign_set import PackedCallsignSet, pack_callsign, unpack_callsign
+from services.counting import fold_callsign_data
+
+
+class TestPackCallsign(unittest.TestCase):
+    """
+    Unit tests for packing callsigns into integers.
+    """
+
+    def test_round_trip(self):
+        """Test that packable callsigns unpack to the original string."""
+        for callsign in ("A", "K1ABC", "ZZZZZZZZ", "VE3/AB1CD/P", "123456789012"):
+            packed = pack_callsign(callsign)
+            self.assertLess(packed, 2**64)
+            self.assertGreater(packed, 0)
+            self.assertEqual(unpack_callsign(packed), callsign)
+
+    def test_short_and_long_encodings_do_not_collide(self):
+        """Test that byte-packed and base-38 callsigns never share a value."""
+        self.assertNotEqual(pack_callsign("AAAAAAAA"), pack_callsign("AAAAAAAAA"))
+        self.assertNotEqual(pack_callsign("ZZZZZZZZ"), pack_callsign("000000000"))
+
+    def test_unpackable_callsigns(self):
+        """Test that callsigns outside the packable alphabet or length are rejected."""
+        for callsign in ("", "ab1cd", "A" * 13, "K1-ABC", "Ö1ABC"):
+            self.assertIsNone(pack_callsign(callsign), callsign)
+
+
+class TestPackedCallsignSet(unittest.TestCase):
+    """
+    Unit tests for the packed callsign set.
+    """
+
+    def test_matches_builtin_set(self):
+        """Test that the packed set counts the same distinct callsigns as a set."""
+        callsigns = [f"K{index % 3000}ABC" for index in range(10000)]
+        callsigns += ["ab1cd", "AB1CD", "VERYLONGCALLSIGN", "VERYLONGCALLSIGN"]
+        packed = PackedCallsignSet(capacity=8)
+        for callsign in callsigns:
+            packed.add(callsign)
+
+        self.assertEqual(len(packed), len(set(callsigns)))
+        for callsign in ("K0ABC", "K2999ABC", "ab1cd", "VERYLONGCALLSIGN"):
+            self.assertIn(callsign, packed)
+        self.assertNotIn("K3000ABC", packed)
+
+    def test_memory_use(self):
+        """Test that the hash table costs a few 8-byte slots per callsign."""
+        packed = PackedCallsignSet()
+        for index in range(50000):
+            packed.add(f"W{index}")
+        self.assertLessEqual(packed.nbytes, 50000 * 8 * 4)
+
+    def test_add_packed(self):
+        """Test that arbitrary 64-bit keys can be stored and looked up."""
+        packed = PackedCallsignSet(capacity=4)
+        keys = [(index * 0x9E3779B97F4A7C15) % (1 << 64) or 1 for index in range(1000)]
+        self.assertTrue(all(packed.add_packed(key) for key in keys))
+        self.assertFalse(packed.add_packed(keys[0]))
+        self.assertEqual(len(packed), 1000)
+        self.assertTrue(packed.contains_packed(keys[-1]))
+        self.assertFalse(packed.contains_packed(12345))
+
+    def test_update(self):
+        """Test merging packed sets and plain iterables."""
+        first = PackedCallsignSet()
+        second = PackedCallsignSet()
+        for index in range(100):
+            first.add(f"K{index}A")
+            second.add(f"K{index + 50}A")
+        second.add("lower")
+        first.update(second)
+        first.update(["K1A", "N0CALL"])
+        self.assertEqual(len(first), 152)
+        self.assertIn("lower", first)
+
+    def test_packed_values(self):
+        """Test listing the packed values and the callsigns kept as strings."""
+        packed = PackedCallsignSet()
+        for callsign in ("AB1CD", "EF2GH", "AB1CD", "lower"):
+            packed.add(callsign)
+        self.assertEqual(
+            sorted(unpack_callsign(value) for value in packed.packed_values()),
+            ["AB1CD", "EF2GH"],
+        )
+        self.assertEqual(packed.unpackable, {"lower"})
+        self.assertEqual(sorted(packed), ["AB1CD", "EF2GH", "lower"])
+
+    def test_fold_callsign_data_with_builtin_set(self):
+        """Test that fold_callsign_data accepts another set type."""
+        records = [{"call": "AB1CD"}, {"call": "AB1CD"}, {"call": "ab1cd"}]
+        self.assertEqual(fold_callsign_data(records), (2, ["AB1CD"]))
+        self.assertEqual(fold_callsign_data(records, set()), (2, ["AB1CD"]))
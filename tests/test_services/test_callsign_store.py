@@ -0,0 +1,149 @@
+"""
+Unit tests for the per-operator callsign store.
+
+This module contains test cases that verify the store accumulates unique callsigns
+per operator, and that a log which has only grown since its last upload is parsed
+from where the previous upload ended.
+"""
+
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+from io import BytesIO
+from unittest.mock import Mock, patch
+
+from repositories.registry import STREAMING, BackendRegistry, BackendSelector
+from repositories.scanner_repository import CallsignScannerRepository
+from services.adif_service import AdifService
+from services.award_service import AwardService
+from services.callsign_set import PackedCallsignSet
+from services.callsign_store import (
+    CallsignStore,
+    MissingOperatorError,
+    last_record_end,
+    plan_delta,
+)
+
+FIRST_WEEK = b"Log <eoh>\n<call:5>AB1CD <eor>\n<call:5>EF2GH <eor>\n"
+SECOND_WEEK = FIRST_WEEK + b"<call:5>IJ3KL <eor>\n<call:5>AB1CD <eor>\n"
+
+
+class TestPlanDelta(unittest.TestCase):
+    """
+    Unit tests for finding the new part of a log.
+    """
+
+    def test_last_record_end(self):
+        """Test that the end of the last record is found across read windows."""
+        data = b"<call:5>AB1CD <eor>\n<call:3>K1A"
+        for chunk_size in (1, 3, 7, 64):
+            self.assertEqual(last_record_end(BytesIO(data), chunk_size), 19)
+        self.assertEqual(last_record_end(BytesIO(b"no records")), 0)
+
+    def test_eor_in_comment_is_not_a_record_end(self):
+        """Test that an <EOR> within a field value does not end a record."""
+        data = b"<call:5>AB1CD <eor>\n<comment:9>ab<eor>xy<call:3>K1A"
+        for chunk_size in (1, 3, 7, 64):
+            self.assertEqual(last_record_end(BytesIO(data), chunk_size), 19)
+            _, checkpoint = plan_delta(BytesIO(data), chunk_size=chunk_size)
+            self.assertEqual(checkpoint, plan_delta(BytesIO(data[:19]))[1])
+
+    def test_fresh_log(self):
+        """Test that a log without a checkpoint is read from the start."""
+        stream = BytesIO(FIRST_WEEK)
+        start, checkpoint = plan_delta(stream)
+        self.assertEqual(start, 0)
+        self.assertEqual(checkpoint[0], len(FIRST_WEEK) - 1)
+        self.assertEqual(stream.tell(), 0)
+
+    def test_appended_log(self):
+        """Test that a log with an unchanged prefix is read after the checkpoint."""
+        _, checkpoint = plan_delta(BytesIO(FIRST_WEEK))
+        stream = BytesIO(SECOND_WEEK)
+        start, new_checkpoint = plan_delta(stream, checkpoint, chunk_size=4)
+        self.assertEqual(start, checkpoint[0])
+        self.assertEqual(stream.read(8), b"<call:5>")
+        self.assertEqual(new_checkpoint, plan_delta(BytesIO(SECOND_WEEK))[1])
+
+    def test_rewritten_log(self):
+        """Test that a log whose prefix changed is read from the start."""
+        _, checkpoint = plan_delta(BytesIO(FIRST_WEEK))
+        start, _ = plan_delta(
+            BytesIO(SECOND_WEEK.replace(b"EF2GH", b"EF2GX")), checkpoint
+        )
+        self.assertEqual(start, 0)
+
+
+class TestCumulativeUploads(unittest.TestCase):
+    """
+    Unit tests for cumulative uploads through the ADIF service.
+    """
+
+    def setUp(self):
+        """Set up a service with a callsign store in a temporary file."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.store = CallsignStore(os.path.join(directory, "callsigns.db"))
+        self.service = AdifService(
+            CallsignScannerRepository(), AwardService(), callsign_store=self.store
+        )
+
+    def test_weekly_uploads_accumulate(self):
+        """Test that a grown log only has its new records parsed."""
+        first = self.service.process_adif_delta(BytesIO(FIRST_WEEK))
+        self.assertEqual(first["callsign"], "AB1CD")
+        self.assertEqual(first["unique_addresses"], 2)
+        self.assertEqual(first["new_unique_addresses"], 2)
+
+        second = self.service.process_adif_delta(BytesIO(SECOND_WEEK))
+        self.assertEqual(second["unique_addresses"], 3)
+        self.assertEqual(second["new_unique_addresses"], 1)
+        self.assertEqual(second["parsed_bytes"], len(SECOND_WEEK) - len(FIRST_WEEK))
+        self.assertEqual(second["award_tier"], "Participant")
+
+        again = self.service.process_adif_delta(BytesIO(SECOND_WEEK))
+        self.assertEqual(again["unique_addresses"], 3)
+        self.assertEqual(again["parsed_bytes"], 0)
+
+    def test_operators_are_separate(self):
+        """Test that each operator has a separate set."""
+        self.service.process_adif_delta(BytesIO(FIRST_WEEK), operator="zz9zz")
+        self.service.process_adif_delta(BytesIO(b"<call:5>IJ3KL <eor>"), "QQ1QQ")
+        self.assertEqual(self.store.count("ZZ9ZZ"), 2)
+        self.assertEqual(self.store.count("QQ1QQ"), 1)
+        self.assertIsNone(self.store.checkpoint("AB1CD"))
+
+    def test_log_without_callsign(self):
+        """Test that a log without callsigns needs an explicit operator."""
+        with self.assertRaises(MissingOperatorError):
+            self.service.process_adif_delta(BytesIO(b"<band:3>20m <eor>"))
+
+    def test_without_store(self):
+        """Test that cumulative uploads need a callsign store."""
+        service = AdifService(CallsignScannerRepository(), AwardService())
+        with self.assertRaises(ValueError):
+            service.process_adif_delta(BytesIO(FIRST_WEEK))
+
+    def test_selected_backend_and_packed_set(self):
+        """Test that the new records are parsed as single uploads are."""
+        careful = Mock()
+        careful.read_from_stream.side_effect = lambda *args, **kwargs: iter(
+            [{"call": "AB1CD"}, {"call": "EF2GH"}]
+        )
+        registry = BackendRegistry()
+        registry.register("careful", Mock, (STREAMING,))
+        service = AdifService(
+            CallsignScannerRepository(),
+            AwardService(),
+            callsign_store=self.store,
+            backends={"careful": careful},
+            backend_selector=BackendSelector(registry, ["careful"]),
+        )
+        with patch.object(self.store, "merge", wraps=self.store.merge) as merge:
+            result = asyncio.run(service.process_adif_delta_async(BytesIO(FIRST_WEEK)))
+        careful.read_from_stream.assert_called_once()
+        self.assertIsInstance(merge.call_args.args[1], PackedCallsignSet)
+        self.assertEqual(result["unique_addresses"], 2)
+        self.assertEqual(sorted(merge.call_args.args[1]), ["AB1CD", "EF2GH"])
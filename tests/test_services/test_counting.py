@@ -0,0 +1,103 @@
+"""
+Unit tests for the counting engines.
+
+This module contains test cases that verify the HyperLogLog sketch stays within its
+documented error bound and that approximate counting in the ADIF service falls back
+to exact counting near tier thresholds.
+"""
+
+import unittest
+from io import BytesIO
+
+from repositories.scanner_repository import CallsignScannerRepository
+from services.adif_service import AdifService
+from services.award_service import AwardService
+from services.counting import HyperLogLog, estimate_callsign_data
+
+
+def build_log(callsign_count):
+    """
+    Build an ADIF log with the given number of distinct callsigns.
+
+    Args:
+        callsign_count (int): The number of distinct callsigns.
+
+    Returns:
+        bytes: The ADIF log.
+    """
+    records = []
+    for index in range(callsign_count):
+        call = f"K{index:06d}"
+        records.append(f"<call:{len(call)}>{call} <eor>")
+    return "".join(records).encode("utf-8")
+
+
+class TestHyperLogLog(unittest.TestCase):
+    """
+    Unit tests for the HyperLogLog sketch.
+    """
+
+    def test_estimate_within_error_bound(self):
+        """Test that estimates fall within the documented error margin."""
+        for count in (10, 1000, 20000):
+            sketch = HyperLogLog()
+            for index in range(count):
+                sketch.add(f"W{index}XYZ")
+                sketch.add(f"W{index}XYZ")
+            estimate = sketch.estimate()
+            self.assertLessEqual(abs(estimate - count), sketch.error_margin(estimate))
+
+    def test_empty_sketch(self):
+        """Test that an empty sketch estimates zero."""
+        self.assertEqual(HyperLogLog().estimate(), 0)
+
+    def test_relative_error(self):
+        """Test the documented relative error at the default precision."""
+        self.assertAlmostEqual(HyperLogLog().relative_error, 0.0081, places=4)
+
+    def test_invalid_precision(self):
+        """Test that out-of-range precisions are rejected."""
+        with self.assertRaises(ValueError):
+            HyperLogLog(precision=3)
+
+    def test_estimate_callsign_data(self):
+        """Test folding records into a sketch keeps the first callsign."""
+        sketch, callsigns = estimate_callsign_data(
+            [{}, {"call": "AB1CD"}, {"call": "EF2GH"}, {"call": "AB1CD"}]
+        )
+        self.assertEqual(callsigns, ["AB1CD"])
+        self.assertEqual(round(sketch.estimate()), 2)
+
+
+class TestApproximateCounting(unittest.TestCase):
+    """
+    Unit tests for approximate counting in the ADIF service.
+    """
+
+    def setUp(self):
+        """Set up a service with the scanner backend."""
+        self.service = AdifService(CallsignScannerRepository(), AwardService())
+
+    def test_far_from_threshold_uses_estimate(self):
+        """Test that an estimate away from every threshold is reported as such."""
+        result = self.service.process_adif_stream(
+            BytesIO(build_log(300)), counting_mode="approximate"
+        )
+        self.assertEqual(result["counting_mode"], "approximate")
+        self.assertEqual(result["award_tier"], "Bedsit")
+        self.assertEqual(result["callsign"], "K000000")
+
+    def test_near_threshold_falls_back_to_exact(self):
+        """Test that an estimate near a threshold is replaced by an exact count."""
+        result = self.service.process_adif_stream(
+            BytesIO(build_log(999)), counting_mode="approximate"
+        )
+        self.assertEqual(result["counting_mode"], "exact")
+        self.assertEqual(result["unique_addresses"], 999)
+        self.assertEqual(result["award_tier"], "Terraced House")
+
+    def test_exact_mode_does_not_report_mode(self):
+        """Test that the default exact mode keeps the original response."""
+        result = self.service.process_adif_stream(BytesIO(build_log(5)))
+        self.assertEqual(result["unique_addresses"], 5)
+        self.assertNotIn("counting_mode", result)
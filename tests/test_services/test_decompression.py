@@ -0,0 +1,150 @@
+"""
+Unit tests for streaming decompression of uploads.
+
+This module contains test cases that verify gzip and zstd uploads are detected and
+decompressed as they are parsed, and that decompression bombs and corrupt data are
+rejected with clear errors.
+"""
+
+import gzip
+import pickle
+import unittest
+from io import BytesIO
+
+from repositories.adif_repository import AdifIoRepository
+from repositories.scanner_repository import CallsignScannerRepository
+from services import decompression
+from services.adif_service import AdifService
+from services.award_service import AwardService
+from services.batch_service import BatchService
+from services.decompression import (
+    CorruptCompressedDataError,
+    DecompressionBombError,
+    UnsupportedCompressionError,
+    compression_for,
+    open_decompressed,
+    strip_compression_suffix,
+)
+
+LOG = b"<call:5>AB1CD <eor><call:5>EF2GH <eor><call:5>AB1CD <eor>"
+
+
+class TestCompressionDetection(unittest.TestCase):
+    """
+    Unit tests for working out how an upload is compressed.
+    """
+
+    def test_compression_from_suffix(self):
+        """Test that the file name suffix selects the compression."""
+        self.assertEqual(compression_for("log.adi.gz"), "gzip")
+        self.assertEqual(compression_for("LOG.ADIF.ZST"), "zstd")
+        self.assertIsNone(compression_for("log.adi"))
+
+    def test_content_encoding_takes_precedence(self):
+        """Test that the Content-Encoding overrides the file name."""
+        self.assertEqual(compression_for("log.adi", "gzip"), "gzip")
+        self.assertEqual(compression_for("log.adi", "x-gzip"), "gzip")
+        self.assertIsNone(compression_for("log.adi", "identity"))
+        with self.assertRaises(UnsupportedCompressionError):
+            compression_for("log.adi", "br")
+
+    def test_strip_compression_suffix(self):
+        """Test that only a compression suffix is removed."""
+        self.assertEqual(strip_compression_suffix("log.adif.gz"), "log.adif")
+        self.assertEqual(strip_compression_suffix("log.adi"), "log.adi")
+
+
+class TestOpenDecompressed(unittest.TestCase):
+    """
+    Unit tests for the ratio-guarded decompressing stream.
+    """
+
+    def test_gzip_round_trip(self):
+        """Test that a gzip stream yields the original bytes."""
+        with open_decompressed(BytesIO(gzip.compress(LOG)), "gzip") as stream:
+            self.assertEqual(stream.read(), LOG)
+
+    def test_stream_hides_file_descriptor(self):
+        """Test that the compressed file beneath is never memory-mapped."""
+        with open_decompressed(BytesIO(gzip.compress(LOG)), "gzip") as stream:
+            with self.assertRaises(OSError):
+                stream.fileno()
+
+    def test_ratio_guard_stops_bomb(self):
+        """Test that a highly compressible stream is stopped part way."""
+        bomb = gzip.compress(b"\0" * (8 * 1024 * 1024))
+        with open_decompressed(BytesIO(bomb), "gzip", max_ratio=50) as stream:
+            with self.assertRaises(DecompressionBombError) as context:
+                while stream.read(64 * 1024):
+                    pass
+        error = context.exception
+        self.assertLess(error.decompressed_bytes, 8 * 1024 * 1024)
+        self.assertEqual(error.to_dict()["error"], "decompression_ratio_exceeded")
+        self.assertEqual(pickle.loads(pickle.dumps(error)).max_ratio, 50)
+
+    def test_small_files_are_never_rejected(self):
+        """Test that output within the grace allowance passes any ratio."""
+        small = gzip.compress(b"\0" * 1024)
+        with open_decompressed(BytesIO(small), "gzip", max_ratio=2) as stream:
+            self.assertEqual(len(stream.read()), 1024)
+
+    def test_corrupt_data(self):
+        """Test that data that is not gzip is reported as corrupt."""
+        with open_decompressed(BytesIO(b"not gzip at all"), "gzip") as stream:
+            with self.assertRaises(CorruptCompressedDataError):
+                stream.read()
+
+    @unittest.skipIf(decompression.zstandard is not None, "zstandard is installed")
+    def test_zstd_without_zstandard(self):
+        """Test that zstd uploads are refused when zstandard is missing."""
+        with self.assertRaises(UnsupportedCompressionError):
+            open_decompressed(BytesIO(b""), "zstd")
+
+    @unittest.skipIf(decompression.zstandard is None, "zstandard is not installed")
+    def test_zstd_round_trip(self):
+        """Test that a zstd stream yields the original bytes."""
+        compressed = decompression.zstandard.ZstdCompressor().compress(LOG)
+        with open_decompressed(BytesIO(compressed), "zstd") as stream:
+            self.assertEqual(stream.read(), LOG)
+
+
+class TestCompressedUploads(unittest.IsolatedAsyncioTestCase):
+    """
+    Unit tests for parsing compressed uploads with each backend.
+    """
+
+    async def test_gzip_upload_with_each_backend(self):
+        """Test that a gzip upload gives the same result as the plain log."""
+        for repository in (AdifIoRepository(), CallsignScannerRepository()):
+            service = AdifService(repository, AwardService())
+            result = await service.process_adif_stream_async(
+                BytesIO(gzip.compress(LOG)), compression="gzip"
+            )
+            self.assertEqual(result["unique_addresses"], 2)
+            self.assertEqual(result["callsign"], "AB1CD")
+
+    async def test_approximate_recount_decompresses_again(self):
+        """Test that an approximate recount rewinds the compressed stream."""
+        service = AdifService(CallsignScannerRepository(), AwardService())
+        service.award_service.is_near_threshold = lambda *_: True
+        result = await service.process_adif_stream_async(
+            BytesIO(gzip.compress(LOG)),
+            counting_mode="approximate",
+            compression="gzip",
+        )
+        self.assertEqual(result["unique_addresses"], 2)
+        self.assertEqual(result["counting_mode"], "exact")
+
+    async def test_gzip_files_in_batch(self):
+        """Test that gzip files, plain or within an archive, are decompressed."""
+        service = BatchService(AdifService(CallsignScannerRepository(), AwardService()))
+        result = await service.process_batch_async(
+            [
+                ("a.adi.gz", BytesIO(gzip.compress(LOG))),
+                ("b.adi", BytesIO(b"<call:4>W1AW <eor>")),
+            ]
+        )
+        self.assertEqual(
+            [entry["unique_addresses"] for entry in result["files"]], [2, 1]
+        )
+        self.assertEqual(result["combined"]["unique_addresses"], 3)
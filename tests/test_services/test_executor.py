@@ -0,0 +1,281 @@
+"""
+Unit tests for the parse executor.
+
+This module contains test cases that verify parsing work runs on the worker pool,
+that the queue depth is bounded, that streams reach process workers intact, and
+that a pool whose worker dies is replaced.
+"""
+
+import asyncio
+import os
+import tempfile
+import threading
+import unittest
+from io import BytesIO
+from unittest.mock import patch
+
+from repositories.scanner_repository import CallsignScannerRepository
+from services.adif_service import AdifService
+from services.award_service import AwardService
+from services.executor import (
+    ExecutorBusyError,
+    ParseExecutor,
+    WorkerCrashedError,
+    available_cpus,
+)
+from services.memory_budget import MemoryBudgetExceededError
+from services.metrics import (
+    RECORDS_PARSED,
+    add_parse_listener,
+    remove_parse_listener,
+)
+
+
+def exit_worker(*_):
+    """Stop the process worker running this call, as a crash would."""
+    os._exit(1)  # pylint: disable=protected-access
+
+
+class TestParseExecutor(unittest.IsolatedAsyncioTestCase):
+    """
+    Unit tests for the parse executor.
+    """
+
+    def test_unknown_kind(self):
+        """Test that an unknown executor kind is rejected."""
+        with self.assertRaises(ValueError):
+            ParseExecutor(kind="fibre")
+
+    async def test_thread_run(self):
+        """Test running a function on a thread pool."""
+        executor = ParseExecutor(kind="thread", max_workers=2)
+        executor.start()
+        try:
+            result = await executor.run(sum, [1, 2, 3])
+            stream_result = await executor.run_stream(
+                lambda stream: stream.read(), BytesIO(b"data")
+            )
+        finally:
+            executor.shutdown()
+        self.assertEqual(result, 6)
+        self.assertEqual(stream_result, b"data")
+        self.assertEqual(executor.in_flight, 0)
+
+    async def test_queue_depth_is_bounded(self):
+        """Test that submissions beyond the queue depth fail fast."""
+        executor = ParseExecutor(kind="thread", max_workers=1, max_queue_depth=1)
+        release = threading.Event()
+        executor.start()
+        try:
+            running = [
+                asyncio.create_task(executor.run(release.wait)) for _ in range(2)
+            ]
+            await asyncio.sleep(0)
+            self.assertTrue(executor.saturated)
+            with self.assertRaises(ExecutorBusyError):
+                await executor.run(sum, [])
+            release.set()
+            await asyncio.gather(*running)
+        finally:
+            release.set()
+            executor.shutdown()
+        self.assertFalse(executor.saturated)
+
+    async def test_process_run_stream(self):
+        """Test that a service parses a spooled stream in a process worker."""
+        executor = ParseExecutor(kind="process", max_workers=1)
+        service = AdifService(CallsignScannerRepository(), AwardService(), executor)
+        executor.start()
+        try:
+            result = await service.process_adif_stream_async(
+                BytesIO(b"<call:5>AB1CD <eor><call:5>EF2GH <eor>")
+            )
+        finally:
+            executor.shutdown()
+        self.assertEqual(result["unique_addresses"], 2)
+        self.assertEqual(result["callsign"], "AB1CD")
+
+    async def test_process_worker_metrics(self):
+        """Test that metrics recorded in a process worker reach this process."""
+        executor = ParseExecutor(kind="process", max_workers=1)
+        service = AdifService(CallsignScannerRepository(), AwardService(), executor)
+        before = RECORDS_PARSED.value
+        executor.start()
+        try:
+            await service.process_adif_stream_async(
+                BytesIO(b"<call:5>AB1CD <eor><call:5>EF2GH <eor>")
+            )
+        finally:
+            executor.shutdown()
+        self.assertEqual(RECORDS_PARSED.value - before, 2)
+
+    async def test_process_parallel_chunks(self):
+        """Test that a large stream is split across process workers."""
+        executor = ParseExecutor(kind="process", max_workers=2)
+        service = AdifService(
+            CallsignScannerRepository(),
+            AwardService(),
+            executor,
+            parallel_threshold=1,
+            memory_budget=1024 * 1024,
+        )
+        log = b"Header <eoh>" + b"".join(
+            b"<call:6>K%05d <eor>" % (index % 150) for index in range(1000)
+        )
+        observations = []
+        add_parse_listener(observations.append)
+        executor.start()
+        try:
+            with patch.object(
+                executor, "run_many", wraps=executor.run_many
+            ) as run_many:
+                result = await service.process_adif_stream_async(BytesIO(log))
+        finally:
+            executor.shutdown()
+            remove_parse_listener(observations.append)
+        # Every chunk is one job of a single fan-out, recorded as a single parse
+        run_many.assert_called_once()
+        self.assertEqual(len(run_many.call_args.args[1]), 2)
+        # Each chunk may only use its share of the budget of the request
+        self.assertEqual(
+            run_many.call_args.args[0].keywords["memory_budget"], 512 * 1024
+        )
+        self.assertEqual(len(observations), 1)
+        observation = observations[0]
+        self.assertEqual(observation["bytes"], len(log))
+        self.assertEqual(observation["records"], 1000)
+        self.assertEqual(observation["unique_callsigns"], 150)
+        self.assertGreater(observation["seconds"]["parse"], 0)
+        self.assertEqual(result["unique_addresses"], 150)
+        self.assertEqual(result["award_tier"], "Bedsit")
+        self.assertEqual(result["callsign"], "K00000")
+
+    async def test_run_many(self):
+        """Test running a function over several argument lists."""
+        executor = ParseExecutor(kind="thread", max_workers=2)
+        try:
+            results = await executor.run_many(pow, [(2, 3), (3, 2)])
+        finally:
+            executor.shutdown()
+        self.assertEqual(results, [8, 9])
+        self.assertEqual(executor.in_flight, 0)
+
+    async def test_disk_file_is_not_spooled(self):
+        """Test that a stream opened from a file on disk is used in place."""
+        executor = ParseExecutor(kind="thread")
+        with tempfile.NamedTemporaryFile() as adif_file:
+            adif_file.write(b"<call:5>AB1CD <eor>")
+            adif_file.flush()
+            with open(adif_file.name, "rb") as stream:
+                async with executor.spooled(stream) as path:
+                    self.assertEqual(path, adif_file.name)
+            self.assertTrue(os.path.exists(adif_file.name))
+        async with executor.spooled(BytesIO(b"data")) as path:
+            self.assertNotEqual(path, adif_file.name)
+        self.assertFalse(os.path.exists(path))
+
+    @unittest.skipUnless(os.path.isdir("/proc/self/fd"), "needs /proc")
+    async def test_rolled_over_spool_is_not_copied(self):
+        """Test that an upload spooled to an unnamed file is read in place."""
+        executor = ParseExecutor(kind="process", max_workers=1)
+        service = AdifService(CallsignScannerRepository(), AwardService(), executor)
+        with tempfile.SpooledTemporaryFile(max_size=8) as upload:
+            upload.write(b"<call:5>AB1CD <eor><call:5>EF2GH <eor>")
+            upload.seek(0)
+            try:
+                with patch("services.executor._spool_to_path") as spool_to_path:
+                    result = await service.process_adif_stream_async(upload)
+            finally:
+                executor.shutdown()
+        spool_to_path.assert_not_called()
+        self.assertEqual(result["unique_addresses"], 2)
+
+        with tempfile.SpooledTemporaryFile(max_size=1024) as upload:
+            upload.write(b"<call:5>AB1CD <eor>")
+            upload.seek(0)
+            async with executor.spooled(upload) as path:
+                with open(path, "rb") as spooled:
+                    self.assertEqual(spooled.read(), b"<call:5>AB1CD <eor>")
+        self.assertFalse(os.path.exists(path))
+
+    async def test_memory_budget_error_from_process_worker(self):
+        """Test that a memory budget error reaches the caller from a process."""
+        executor = ParseExecutor(kind="process", max_workers=1)
+        service = AdifService(
+            CallsignScannerRepository(),
+            AwardService(),
+            executor,
+            packed_callsigns=False,
+            memory_budget=1024,
+        )
+        log = b"".join(b"<call:6>K%05d <eor>" % index for index in range(100))
+        try:
+            with self.assertRaises(MemoryBudgetExceededError) as context:
+                await service.process_adif_stream_async(BytesIO(log))
+        finally:
+            executor.shutdown()
+        self.assertEqual(context.exception.budget_bytes, 1024)
+
+    async def test_worker_crash_replaces_pool(self):
+        """Test that a job whose worker dies fails as busy and the pool recovers."""
+        executor = ParseExecutor(kind="process", max_workers=1)
+        try:
+            with self.assertRaises(WorkerCrashedError) as context:
+                await executor.run(exit_worker)
+            self.assertIsInstance(context.exception, ExecutorBusyError)
+            with self.assertRaises(WorkerCrashedError):
+                await executor.run_many(exit_worker, [(1,), (2,)], True)
+            self.assertEqual(await executor.run(pow, 2, 3), 8)
+        finally:
+            executor.shutdown()
+        self.assertEqual(executor.in_flight, 0)
+
+
+class TestAvailableCpus(unittest.TestCase):
+    """
+    Unit tests for counting the CPUs the default worker pool is sized by.
+    """
+
+    def cpus(self, affinity, cgroup_files):
+        """
+        Count the CPUs with a given affinity and cgroup files.
+
+        Args:
+            affinity (int): The number of CPUs the process is pinned to.
+            cgroup_files (dict): The contents of the readable cgroup files.
+
+        Returns:
+            int: The number of available CPUs.
+        """
+
+        def read_words(path):
+            content = cgroup_files.get(path)
+            return None if content is None else content.split()
+
+        with patch(
+            "services.executor.os.sched_getaffinity",
+            return_value=set(range(affinity)),
+            create=True,
+        ), patch("services.executor._read_words", side_effect=read_words):
+            return available_cpus()
+
+    def test_affinity_without_quota(self):
+        """Test that the pinned CPUs are counted when there is no quota."""
+        self.assertEqual(self.cpus(6, {}), 6)
+        self.assertEqual(self.cpus(6, {"/sys/fs/cgroup/cpu.max": "max 100000"}), 6)
+
+    def test_cgroup_v2_quota(self):
+        """Test that a fractional cgroup v2 quota is rounded up."""
+        cpu_max = {"/sys/fs/cgroup/cpu.max": "150000 100000"}
+        self.assertEqual(self.cpus(16, cpu_max), 2)
+        self.assertEqual(self.cpus(1, cpu_max), 1)
+
+    def test_cgroup_v1_quota(self):
+        """Test the quota and period files of cgroup v1."""
+        files = {
+            "/sys/fs/cgroup/cpu/cpu.cfs_quota_us": "300000",
+            "/sys/fs/cgroup/cpu/cpu.cfs_period_us": "100000",
+        }
+        self.assertEqual(self.cpus(16, files), 3)
+        files["/sys/fs/cgroup/cpu/cpu.cfs_quota_us"] = "-1"
+        self.assertEqual(self.cpus(16, files), 16)
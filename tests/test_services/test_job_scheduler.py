@@ -0,0 +1,184 @@
+"""
+Unit tests for the job scheduler.
+
+This module contains test cases that verify uploads are stored and processed in the
+background, smallest first, and that the queue and job history are bounded.
+"""
+
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+from io import BytesIO
+from unittest.mock import patch
+
+from services.executor import ExecutorBusyError, WorkerCrashedError
+from services.job_scheduler import DONE, FAILED, QUEUED, JobQueueFullError, JobScheduler
+
+
+class TestJobScheduler(unittest.IsolatedAsyncioTestCase):
+    """
+    Unit tests for the job scheduler.
+    """
+
+    def setUp(self):
+        """Set up a scheduler storing uploads in a temporary directory."""
+        self.storage = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.storage)
+        self.scheduler = JobScheduler(storage_dir=self.storage, max_workers=1)
+
+    async def asyncTearDown(self):
+        """Stop the scheduler."""
+        await self.scheduler.shutdown()
+
+    async def test_job_result(self):
+        """Test that a job is stored, processed and its upload removed."""
+
+        async def process(stream):
+            return {"content": stream.read().decode("utf-8")}
+
+        job = await self.scheduler.submit(BytesIO(b"<call:5>AB1CD <eor>"), process)
+        self.assertEqual(job.to_dict()["status"], QUEUED)
+        self.assertEqual(job.size, 19)
+        await self.scheduler.join()
+
+        self.assertIs(self.scheduler.get(job.id), job)
+        self.assertEqual(
+            job.to_dict(),
+            {
+                "job_id": job.id,
+                "status": DONE,
+                "size": 19,
+                "result": {"content": "<call:5>AB1CD <eor>"},
+            },
+        )
+        self.assertEqual(os.listdir(self.storage), [])
+
+    async def test_failed_job(self):
+        """Test that a processing error is reported on the job."""
+
+        async def process(_stream):
+            raise ValueError("bad log")
+
+        job = await self.scheduler.submit(BytesIO(b"x"), process)
+        await self.scheduler.join()
+        self.assertEqual(job.status, FAILED)
+        self.assertEqual(job.to_dict()["error"], "bad log")
+
+    async def test_smallest_job_first(self):
+        """Test that waiting jobs are processed smallest first."""
+        release = asyncio.Event()
+        order = []
+
+        async def process(stream):
+            order.append(len(stream.read()))
+            await release.wait()
+
+        await self.scheduler.submit(BytesIO(b"a" * 5), process)
+        await asyncio.sleep(0.01)
+        for size in (30, 10, 20, 10):
+            await self.scheduler.submit(BytesIO(b"a" * size), process)
+        release.set()
+        await self.scheduler.join()
+        self.assertEqual(order, [5, 10, 10, 20, 30])
+
+    async def test_queue_limit(self):
+        """Test that submissions beyond the queue limit fail fast."""
+        scheduler = JobScheduler(storage_dir=self.storage, max_queue=1)
+        release = asyncio.Event()
+
+        async def process(_stream):
+            await release.wait()
+
+        try:
+            await scheduler.submit(BytesIO(b"a"), process)
+            with self.assertRaises(JobQueueFullError):
+                await scheduler.submit(BytesIO(b"b"), process)
+            release.set()
+            await scheduler.join()
+        finally:
+            await scheduler.shutdown()
+
+    async def test_busy_executor_is_retried(self):
+        """Test that a job is retried while the parse executor is busy."""
+        attempts = []
+
+        async def process(_stream):
+            attempts.append(1)
+            if len(attempts) < 2:
+                raise ExecutorBusyError("busy")
+            return {}
+
+        job = await self.scheduler.submit(BytesIO(b"a"), process)
+        await self.scheduler.join()
+        self.assertEqual(job.status, DONE)
+        self.assertEqual(len(attempts), 2)
+
+    async def test_busy_retries_back_off_and_give_up(self):
+        """Test that retry delays double and the job fails once the timeout passes."""
+        scheduler = JobScheduler(storage_dir=self.storage, busy_timeout=1.0)
+        delays = []
+
+        async def sleep(delay):
+            delays.append(delay)
+
+        async def process(_stream):
+            raise ExecutorBusyError("busy")
+
+        try:
+            with patch("services.job_scheduler.asyncio.sleep", side_effect=sleep):
+                with patch(
+                    "services.job_scheduler.time.monotonic",
+                    side_effect=lambda: sum(delays),
+                ):
+                    job = await scheduler.submit(BytesIO(b"a"), process)
+                    await scheduler.join()
+        finally:
+            await scheduler.shutdown()
+        self.assertEqual(delays, [0.1, 0.2, 0.4])
+        self.assertEqual(job.status, FAILED)
+        self.assertEqual(job.error, "busy")
+
+    async def test_crashed_worker_is_not_retried(self):
+        """Test that a job whose worker died fails without being retried."""
+        attempts = []
+
+        async def process(_stream):
+            attempts.append(1)
+            raise WorkerCrashedError("worker died")
+
+        job = await self.scheduler.submit(BytesIO(b"a"), process)
+        await self.scheduler.join()
+        self.assertEqual(job.status, FAILED)
+        self.assertEqual(len(attempts), 1)
+
+    async def test_finished_jobs_expire(self):
+        """Test that only the most recent finished jobs are kept."""
+        scheduler = JobScheduler(storage_dir=self.storage, retention=2)
+
+        async def process(_stream):
+            return {}
+
+        try:
+            jobs = [await scheduler.submit(BytesIO(b"a"), process) for _ in range(3)]
+            await scheduler.join()
+        finally:
+            await scheduler.shutdown()
+        self.assertIsNone(scheduler.get(jobs[0].id))
+        self.assertIs(scheduler.get(jobs[2].id), jobs[2])
+
+    async def test_shutdown_fails_waiting_jobs(self):
+        """Test that shutdown fails waiting jobs and removes their uploads."""
+        release = asyncio.Event()
+
+        async def process(_stream):
+            await release.wait()
+
+        running = await self.scheduler.submit(BytesIO(b"a"), process)
+        await asyncio.sleep(0.01)
+        waiting = await self.scheduler.submit(BytesIO(b"b"), process)
+        await self.scheduler.shutdown()
+        self.assertEqual(running.status, FAILED)
+        self.assertEqual(waiting.status, FAILED)
+        self.assertEqual(os.listdir(self.storage), [])
@@ -0,0 +1,158 @@
+"""
+Unit tests for the per-request memory budget.
+
+This module contains test cases that verify memory use is tracked per component,
+that parsing aborts with a structured error once over budget, and that the budget
+is derived from the container limit.
+"""
+
+import asyncio
+import pickle
+import unittest
+from io import BytesIO
+from unittest.mock import Mock, patch
+
+from repositories.adif_repository import AdifIoRepository
+from repositories.scanner_repository import CallsignScannerRepository
+from services.adif_service import AdifService
+from services.award_service import AwardService
+from services.batch_service import BatchService
+from services.memory_budget import (
+    MemoryBudget,
+    MemoryBudgetExceededError,
+    callsign_set_nbytes,
+    derive_memory_budget,
+)
+
+
+class TestMemoryBudget(unittest.TestCase):
+    """
+    Unit tests for the memory budget and its error.
+    """
+
+    def test_components_are_replaced(self):
+        """Test that reporting a component again replaces its previous size."""
+        budget = MemoryBudget(100)
+        budget.set("buffered", 60)
+        budget.set("buffered", 10)
+        budget.set("unique_callsigns", 50)
+        self.assertEqual(budget.used, 60)
+        self.assertEqual(budget.usage(), {"buffered": 10, "unique_callsigns": 50})
+
+    def test_over_budget_raises(self):
+        """Test that going over the limit raises a structured error."""
+        budget = MemoryBudget(100)
+        budget.set("buffered", 60)
+        with self.assertRaises(MemoryBudgetExceededError) as context:
+            budget.set("unique_callsigns", 50)
+        self.assertEqual(
+            context.exception.to_dict(),
+            {
+                "error": "memory_budget_exceeded",
+                "message": str(context.exception),
+                "component": "unique_callsigns",
+                "used_bytes": 110,
+                "budget_bytes": 100,
+            },
+        )
+
+    def test_error_survives_pickling(self):
+        """Test that the error can be sent back from a process worker."""
+        error = pickle.loads(pickle.dumps(MemoryBudgetExceededError("records", 2, 1)))
+        self.assertEqual(error.to_dict()["component"], "records")
+        self.assertEqual(error.used_bytes, 2)
+
+    def test_callsign_set_nbytes(self):
+        """Test that set sizes grow with the number of callsigns."""
+        small = callsign_set_nbytes({"AB1CD"})
+        large = callsign_set_nbytes({f"K{index}" for index in range(1000)})
+        self.assertLess(small, large)
+        self.assertEqual(callsign_set_nbytes(Mock(nbytes=123)), 123)
+
+    def test_derive_memory_budget(self):
+        """Test the explicit, derived and disabled budgets."""
+        self.assertEqual(derive_memory_budget({"ADIF_MEMORY_BUDGET_BYTES": "500"}), 500)
+        self.assertEqual(derive_memory_budget({"ADIF_MEMORY_BUDGET_BYTES": "0"}), 0)
+        with patch("services.memory_budget.container_memory_limit", return_value=1000):
+            self.assertEqual(derive_memory_budget({}, concurrency=2), 250)
+            self.assertEqual(
+                derive_memory_budget({"ADIF_MEMORY_BUDGET_FRACTION": "0.8"}), 800
+            )
+        with patch("services.memory_budget.container_memory_limit", return_value=0):
+            self.assertEqual(derive_memory_budget({}), 0)
+
+
+class TestAdifServiceMemoryBudget(unittest.TestCase):
+    """
+    Unit tests for memory budget enforcement while parsing.
+    """
+
+    def test_many_unique_callsigns(self):
+        """Test that a set of unique callsigns outgrowing the budget aborts."""
+        service = AdifService(
+            CallsignScannerRepository(),
+            AwardService(),
+            packed_callsigns=False,
+            memory_budget=64 * 1024,
+        )
+        log = b"".join(b"<call:6>K%05d <eor>" % index for index in range(10000))
+        with self.assertRaises(MemoryBudgetExceededError) as context:
+            service.process_adif_stream(BytesIO(log))
+        self.assertEqual(context.exception.component, "unique_callsigns")
+
+    def test_giant_field_is_not_buffered_past_budget(self):
+        """Test that an unterminated giant record aborts while it is buffered."""
+        service = AdifService(
+            AdifIoRepository(), AwardService(), memory_budget=1024 * 1024
+        )
+        log = b"<call:5>AB1CD <comment:4000000>" + b"x" * 4000000 + b" <eor>"
+        with self.assertRaises(MemoryBudgetExceededError) as context:
+            service.process_adif_stream(BytesIO(log))
+        self.assertEqual(context.exception.component, "buffered")
+
+    def test_content_records_are_estimated_before_parsing(self):
+        """Test that a log with too many records is rejected before parsing."""
+        repository = Mock()
+        service = AdifService(repository, AwardService(), memory_budget=100 * 1024)
+        with self.assertRaises(MemoryBudgetExceededError) as context:
+            service.process_adif_content("<call:5>AB1CD <eor>" * 1000)
+        self.assertEqual(context.exception.component, "records")
+        repository.read_from_string.assert_not_called()
+
+    def test_batch_files_share_the_budget(self):
+        """Test that the files of a batch together stay within the budget."""
+        service = BatchService(
+            AdifService(
+                CallsignScannerRepository(),
+                AwardService(),
+                packed_callsigns=False,
+                memory_budget=150 * 1024,
+            )
+        )
+
+        def upload(prefix, count):
+            log = b"".join(b"<call:6>%s%05d <eor>" % (prefix, i) for i in range(count))
+            return BytesIO(log)
+
+        result = asyncio.run(
+            service.process_batch_async(
+                [("a.adi", upload(b"K", 10)), ("b.adi", upload(b"W", 10))]
+            )
+        )
+        self.assertEqual(result["combined"]["unique_addresses"], 20)
+        # Either file fits the whole budget, but not its half of it
+        result = asyncio.run(
+            service.process_batch_async(
+                [("a.adi", upload(b"K", 1000)), ("b.adi", upload(b"W", 1000))]
+            )
+        )
+        for file_result in result["files"]:
+            self.assertEqual(file_result["error"]["component"], "unique_callsigns")
+
+    def test_within_budget(self):
+        """Test that a normal log parses under a budget."""
+        service = AdifService(
+            CallsignScannerRepository(), AwardService(), memory_budget=1024 * 1024
+        )
+        result = service.process_adif_stream(BytesIO(b"<call:5>AB1CD <eor>"))
+        self.assertEqual(result["unique_addresses"], 1)
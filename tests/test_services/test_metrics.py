@@ -0,0 +1,169 @@
+"""
+Unit tests for the service metrics.
+
+This module contains test cases that verify the Prometheus text rendering, the
+exclusive timing of parse stages, and that a parse records the time spent in each
+stage, what it parsed and with which backend.
+"""
+
+import unittest
+from io import BytesIO
+from unittest.mock import patch
+
+from repositories.adif_repository import AdifIoRepository
+from repositories.adx_repository import AdxRepository
+from repositories.scanner_repository import CallsignScannerRepository
+from services.adif_service import AdifService
+from services.award_service import AwardService
+from services.metrics import (
+    Counter,
+    Gauge,
+    Histogram,
+    MetricsRegistry,
+    StageTimer,
+    add_parse_listener,
+    apply_observations,
+    call_collecting,
+    record_parse,
+    remove_parse_listener,
+)
+
+SAMPLE_ADIF = b"header <eoh><call:5>AB1CD <eor><call:5>EF2GH <eor><call:5>AB1CD <eor>"
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    """
+    Unit tests for the metric types and their rendering.
+    """
+
+    def test_render(self):
+        """Test that every metric is rendered in the text exposition format."""
+        registry = MetricsRegistry()
+        counter = registry.register(Counter("test_bytes_total", "Bytes."))
+        registry.register(Gauge("test_in_flight", "In flight.", lambda: 3))
+        histogram = registry.register(
+            Histogram("test_seconds", "Seconds.", "stage", ("read", "parse"), (0.1, 1))
+        )
+        counter.inc(10)
+        histogram.observe("read", 0.05)
+        histogram.observe("read", 0.5)
+        histogram.observe("read", 5)
+
+        lines = registry.render().splitlines()
+        self.assertIn("# TYPE test_bytes_total counter", lines)
+        self.assertIn("test_bytes_total 10", lines)
+        self.assertIn("# HELP test_in_flight In flight.", lines)
+        self.assertIn("test_in_flight 3", lines)
+        self.assertIn("# TYPE test_seconds histogram", lines)
+        self.assertIn('test_seconds_bucket{stage="read",le="0.1"} 1', lines)
+        self.assertIn('test_seconds_bucket{stage="read",le="1"} 2', lines)
+        self.assertIn('test_seconds_bucket{stage="read",le="+Inf"} 3', lines)
+        self.assertIn('test_seconds_sum{stage="read"} 5.55', lines)
+        self.assertIn('test_seconds_count{stage="read"} 3', lines)
+        self.assertIn('test_seconds_count{stage="parse"} 0', lines)
+
+    def test_stage_timer_is_exclusive(self):
+        """Test that time in a nested stage is not counted in the outer one."""
+        timer = StageTimer()
+        with patch("services.metrics.time.perf_counter", side_effect=[0, 1, 3, 10]):
+            with timer.stage("extract"):
+                with timer.stage("read"):
+                    pass
+        self.assertEqual(timer.seconds["read"], 2)
+        self.assertEqual(timer.seconds["extract"], 8)
+
+    def test_call_collecting(self):
+        """Test that parses recorded in a worker are returned, not applied."""
+        timer = StageTimer()
+        timer.records = 7
+        with patch("services.metrics.apply_observations") as applied:
+            result, observations = call_collecting(record_parse, timer)
+            self.assertIsNone(result)
+            self.assertEqual(observations[0]["records"], 7)
+            applied.assert_not_called()
+            record_parse(timer)
+            applied.assert_called_once()
+
+
+class TestParseMetrics(unittest.TestCase):
+    """
+    Unit tests for the metrics recorded by a parse.
+    """
+
+    def parse(self, repository, data, **kwargs):
+        """
+        Parse data and capture the observations recorded.
+
+        Args:
+            repository: The repository for ADI files.
+            data (bytes): The upload.
+            **kwargs: Arguments for process_adif_stream.
+
+        Returns:
+            dict: The snapshot of the stage timer of the parse.
+        """
+        service = AdifService(repository, AwardService())
+        with patch("services.metrics.apply_observations") as applied:
+            service.process_adif_stream(BytesIO(data), **kwargs)
+        (observations,), _ = applied.call_args
+        self.assertEqual(len(observations), 1)
+        return observations[0]
+
+    def test_scanner_stages(self):
+        """Test the stages and counts of a scanner parse."""
+        observation = self.parse(CallsignScannerRepository(), SAMPLE_ADIF)
+        self.assertEqual(observation["bytes"], len(SAMPLE_ADIF))
+        self.assertEqual(observation["records"], 3)
+        self.assertEqual(observation["unique_callsigns"], 2)
+        seconds = observation["seconds"]
+        for stage in ("read", "parse", "extract", "tier"):
+            self.assertGreater(seconds[stage], 0, stage)
+        self.assertEqual(seconds["decode"], 0)
+
+    def test_adif_io_stages(self):
+        """Test that the adif_io backend decodes batches as a stage of its own."""
+        observation = self.parse(AdifIoRepository(), SAMPLE_ADIF)
+        self.assertEqual(observation["bytes"], len(SAMPLE_ADIF))
+        for stage in ("read", "decode", "parse", "extract", "tier"):
+            self.assertGreater(observation["seconds"][stage], 0, stage)
+
+    def test_adx_stages(self):
+        """Test the counts of an ADX parse."""
+        data = (
+            b"<ADX><RECORDS><RECORD><CALL>AB1CD</CALL></RECORD>"
+            b"<RECORD><CALL>EF2GH</CALL></RECORD></RECORDS></ADX>"
+        )
+        service = AdifService(None, AwardService(), adx_repository=AdxRepository())
+        with patch("services.metrics.apply_observations") as applied:
+            service.process_adif_stream(BytesIO(data), file_format="adx")
+        (observations,), _ = applied.call_args
+        self.assertEqual(observations[0]["bytes"], len(data))
+        self.assertEqual(observations[0]["records"], 2)
+        self.assertGreater(observations[0]["seconds"]["parse"], 0)
+
+    def test_backend(self):
+        """Test that the backend of an uncompressed ADI parse is recorded."""
+        service = AdifService(
+            None,
+            AwardService(),
+            backends={"scanner": CallsignScannerRepository()},
+        )
+        with patch("services.metrics.apply_observations") as applied:
+            service.process_adif_stream(BytesIO(SAMPLE_ADIF), backend="scanner")
+        (observations,), _ = applied.call_args
+        self.assertEqual(observations[0]["backend"], "scanner")
+        self.assertEqual(observations[0]["unique_callsigns"], 2)
+
+    def test_parse_listener(self):
+        """Test that listeners are called with the observations of each parse."""
+        observed = []
+        add_parse_listener(observed.append)
+        try:
+            timer = StageTimer()
+            timer.backend = "scanner"
+            apply_observations([timer.snapshot()])
+        finally:
+            remove_parse_listener(observed.append)
+        apply_observations([timer.snapshot()])
+        self.assertEqual(len(observed), 1)
+        self.assertEqual(observed[0]["backend"], "scanner")
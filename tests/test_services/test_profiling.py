@@ -0,0 +1,198 @@
+"""
+Unit tests for the profiling of uploads.
+
+This module contains test cases that verify who may ask for a profile, which
+uploads are profiled, what a recording holds, and that parses run in thread and
+process workers are profiled for the upload they belong to.
+"""
+
+import time
+import unittest
+from io import BytesIO
+
+from repositories.scanner_repository import CallsignScannerRepository
+from services.adif_service import AdifService
+from services.award_service import AwardService
+from services.executor import ParseExecutor
+from services.profiling import (
+    ALLOCATIONS,
+    SAMPLED,
+    STACKS,
+    Profile,
+    ProfileAuthError,
+    Profiler,
+    profiling,
+    recording,
+)
+from services.result_cache import ResultCache
+
+SAMPLE_ADIF = b"header <eoh><call:5>AB1CD <eor><call:5>EF2GH <eor>"
+
+
+def busy_wait(seconds):
+    """
+    Keep the CPU busy for a while, so that the stack sampler sees this function.
+
+    Args:
+        seconds (float): How long to run.
+    """
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+class TestProfiler(unittest.TestCase):
+    """
+    Unit tests for the profiler and the profiles it keeps.
+    """
+
+    def test_authorize(self):
+        """Test that only the configured token is accepted."""
+        with self.assertRaises(ProfileAuthError):
+            Profiler("").authorize("")
+        with self.assertRaises(ProfileAuthError):
+            Profiler("s3cret").authorize("guess")
+        Profiler("s3cret").authorize("s3cret")
+
+    def test_session(self):
+        """Test which uploads are profiled, and how."""
+        profiler = Profiler("s3cret", sample_rate=0.5, sampler=lambda: 0.5)
+        with profiler.session() as profile:
+            self.assertIsNone(profile)
+            self.assertIsNone(profiling())
+        with profiler.session(requested=True, filename="log.adi") as profile:
+            self.assertEqual(profiling(), ALLOCATIONS)
+        self.assertIsNone(profiling())
+        self.assertEqual(profiler.get(profile.id), profile)
+        self.assertEqual(profile.filename, "log.adi")
+
+        profiler = Profiler("s3cret", sample_rate=0.5, sampler=lambda: 0.4)
+        with profiler.session() as profile:
+            self.assertEqual(profiling(), STACKS)
+        self.assertEqual(profile.trigger, SAMPLED)
+
+        # Random profiling needs profiling to be enabled
+        with Profiler("", sample_rate=1.0).session() as profile:
+            self.assertIsNone(profile)
+
+    def test_retention(self):
+        """Test that only the most recent profiles are kept."""
+        profiler = Profiler("s3cret", retention=2)
+        for _ in range(3):
+            with profiler.session(requested=True) as profile:
+                pass
+        kept = profiler.profiles()
+        self.assertEqual(len(kept), 2)
+        self.assertEqual(kept[0], profile)
+
+    def test_profile(self):
+        """Test that recordings from several workers are merged into one profile."""
+        profile = Profile("requested")
+        profile.add(
+            {
+                "seconds": 1.0,
+                "stacks": {"a;b": 2, "a;c": 1},
+                "allocations": [{"location": "x.py:1", "size": 10, "count": 1}],
+                "peak_traced_bytes": 100,
+            }
+        )
+        profile.add(
+            {
+                "seconds": 0.5,
+                "stacks": {"a;c": 3},
+                "allocations": [{"location": "y.py:2", "size": 20, "count": 2}],
+                "peak_traced_bytes": 50,
+            }
+        )
+        self.assertEqual(profile.collapsed(), "a;c 4\na;b 2\n")
+        summary = profile.to_dict()
+        self.assertEqual(summary["seconds"], 1.5)
+        self.assertEqual(summary["samples"], 6)
+        self.assertEqual(summary["peak_traced_bytes"], 100)
+        self.assertEqual(
+            [allocation["location"] for allocation in summary["allocations"]],
+            ["y.py:2", "x.py:1"],
+        )
+        self.assertNotIn("allocations", profile.to_dict(detail=False))
+
+
+class TestRecording(unittest.TestCase):
+    """
+    Unit tests for what a worker records.
+    """
+
+    def test_not_profiling(self):
+        """Test that nothing is recorded without a mode."""
+        with recording(None) as recordings:
+            pass
+        self.assertEqual(recordings, [])
+
+    def test_stacks(self):
+        """Test that stacks are sampled from the frame that started recording."""
+        with recording(STACKS) as recordings:
+            busy_wait(0.1)
+        self.assertEqual(len(recordings), 1)
+        item = recordings[0]
+        self.assertGreater(item["seconds"], 0)
+        self.assertEqual(item["allocations"], [])
+        self.assertTrue(item["stacks"])
+        for stack in item["stacks"]:
+            self.assertTrue(stack.startswith(f"{__name__}:test_stacks"), stack)
+        self.assertTrue(any(stack.endswith(":busy_wait") for stack in item["stacks"]))
+
+    def test_allocations(self):
+        """Test that the lines holding the most memory are reported."""
+        with recording(ALLOCATIONS) as recordings:
+            held = [bytes(1024) for _ in range(1000)]
+        self.assertEqual(len(recordings), 1)
+        item = recordings[0]
+        self.assertGreaterEqual(item["peak_traced_bytes"], 1024 * 1000)
+        self.assertIn(__file__, item["allocations"][0]["location"])
+        del held
+
+
+class TestWorkerProfiling(unittest.IsolatedAsyncioTestCase):
+    """
+    Unit tests for profiling parses run on the parse executor.
+    """
+
+    async def profile_upload(self, kind):
+        """
+        Parse SAMPLE_ADIF twice, the second time as a profiled upload.
+
+        Args:
+            kind (str): The executor kind.
+
+        Returns:
+            Profile: The profile of the second parse.
+        """
+        executor = ParseExecutor(kind=kind, max_workers=1)
+        service = AdifService(
+            CallsignScannerRepository(),
+            AwardService(),
+            executor,
+            result_cache=ResultCache(1024 * 1024),
+        )
+        profiler = Profiler("s3cret")
+        executor.start()
+        try:
+            await service.process_adif_stream_async(BytesIO(SAMPLE_ADIF))
+            # The result is cached, but a profiled upload is parsed again
+            with profiler.session(requested=True) as profile:
+                result = await service.process_adif_stream_async(BytesIO(SAMPLE_ADIF))
+        finally:
+            executor.shutdown()
+        self.assertEqual(result["unique_addresses"], 2)
+        return profile
+
+    async def test_thread_worker(self):
+        """Test that a parse in a thread worker is profiled."""
+        profile = await self.profile_upload("thread")
+        self.assertGreater(profile.seconds, 0)
+        self.assertGreater(profile.peak_traced_bytes, 0)
+
+    async def test_process_worker(self):
+        """Test that a parse in a process worker is profiled in the worker."""
+        profile = await self.profile_upload("process")
+        self.assertGreater(profile.seconds, 0)
+        self.assertGreater(profile.peak_traced_bytes, 0)
@@ -0,0 +1,231 @@
+"""
+Unit tests for the result cache.
+
+This module contains test cases that verify the in-process and on-disk cache tiers,
+their counters, and how the ADIF service uses the cache.
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from io import BytesIO
+from unittest.mock import Mock, patch
+
+from services.adif_service import AdifService
+from services.result_cache import (
+    DigestMismatchError,
+    LruResultCache,
+    ResultCache,
+    SqliteResultCache,
+    hash_stream,
+    is_sha256_digest,
+)
+
+RESULT = {"unique_addresses": 2, "award_tier": "Participant", "callsign": "AB1CD"}
+
+
+class TestLruResultCache(unittest.TestCase):
+    """
+    Unit tests for the in-process LRU tier.
+    """
+
+    def test_evicts_least_recently_used_by_size(self):
+        """Test that entries are evicted oldest-first once the byte budget is full."""
+        entry_size = len("a") + len(json.dumps(RESULT))
+        cache = LruResultCache(max_bytes=entry_size * 2)
+        cache.put("a", RESULT)
+        cache.put("b", RESULT)
+        cache.get("a")
+        cache.put("c", RESULT)
+
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("c"))
+        self.assertEqual(cache.evictions, 1)
+        self.assertEqual(cache.current_bytes, entry_size * 2)
+
+    def test_oversized_entry_is_not_cached(self):
+        """Test that an entry larger than the whole budget is skipped."""
+        cache = LruResultCache(max_bytes=10)
+        cache.put("a", RESULT)
+        self.assertEqual(len(cache), 0)
+
+    def test_returns_copies(self):
+        """Test that changing a returned result does not change the cache."""
+        cache = LruResultCache(max_bytes=1024)
+        cache.put("a", RESULT)
+        cache.get("a")["callsign"] = "CHANGED"
+        self.assertEqual(cache.get("a")["callsign"], "AB1CD")
+
+
+class TestResultCache(unittest.TestCase):
+    """
+    Unit tests for the two-tier result cache.
+    """
+
+    def setUp(self):
+        """Create a temporary directory for the disk tier."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, "results.sqlite")
+
+    def test_counters(self):
+        """Test that hits and misses are counted."""
+        cache = ResultCache(max_bytes=1024)
+        self.assertIsNone(cache.get("digest"))
+        cache.put("digest", RESULT)
+        self.assertEqual(cache.get("digest"), RESULT)
+
+        stats = cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["evictions"], 0)
+        self.assertEqual(stats["entries"], 1)
+
+    def test_disk_tier_is_shared(self):
+        """Test that a result stored by one worker is found by another."""
+        ResultCache(max_bytes=1024, disk_path=self.path).put("digest", RESULT)
+
+        other_worker = ResultCache(max_bytes=1024, disk_path=self.path)
+        self.assertEqual(other_worker.get("digest"), RESULT)
+        # The disk hit is promoted to the memory tier
+        self.assertEqual(len(other_worker.memory), 1)
+
+    def test_disk_tier_evicts_least_recently_used(self):
+        """Test that the disk tier stays within its budget, dropping stale entries."""
+        entry_size = len("a") + len(json.dumps(RESULT))
+        disk = SqliteResultCache(self.path, max_bytes=2 * entry_size)
+        with patch("services.result_cache.time.time", side_effect=range(1, 100)):
+            disk.put("a", RESULT)
+            disk.put("b", RESULT)
+            self.assertEqual(disk.get("a"), RESULT)
+            disk.put("c", RESULT)
+
+        self.assertIsNone(disk.get("b"))
+        self.assertEqual(disk.get("a"), RESULT)
+        self.assertEqual(disk.get("c"), RESULT)
+        self.assertEqual(disk.evictions, 1)
+        self.assertEqual(disk.total_bytes(), 2 * entry_size)
+
+    def test_disk_tier_from_before_size_cap(self):
+        """Test that a database written without entry sizes is still read."""
+        connection = sqlite3.connect(self.path)
+        with connection:
+            connection.execute(
+                "CREATE TABLE results (digest TEXT PRIMARY KEY, result TEXT NOT NULL)"
+            )
+            connection.execute(
+                "INSERT INTO results VALUES (?, ?)", ("digest", json.dumps(RESULT))
+            )
+        connection.close()
+
+        disk = SqliteResultCache(self.path, max_bytes=1024)
+        self.assertEqual(disk.get("digest"), RESULT)
+        self.assertEqual(disk.total_bytes(), len("digest") + len(json.dumps(RESULT)))
+
+    def test_async_access_runs_off_the_event_loop(self):
+        """Test that the disk tier is only used from a worker thread."""
+        cache = ResultCache(max_bytes=1024, disk_path=self.path)
+
+        async def round_trip():
+            await cache.put_async("digest", RESULT)
+            return await cache.get_async("digest")
+
+        with patch(
+            "services.result_cache.asyncio.to_thread", wraps=asyncio.to_thread
+        ) as to_thread:
+            self.assertEqual(asyncio.run(round_trip()), RESULT)
+        self.assertEqual(to_thread.call_count, 2)
+        self.assertEqual(cache.stats()["disk_evictions"], 0)
+
+    def test_hash_stream_rewinds(self):
+        """Test that hashing leaves the stream ready to be parsed."""
+        stream = BytesIO(b"<call:5>AB1CD <eor>")
+        digest = hash_stream(stream, chunk_size=4)
+        self.assertEqual(len(digest), 64)
+        self.assertEqual(stream.read(), b"<call:5>AB1CD <eor>")
+
+
+class TestAdifServiceCaching(unittest.TestCase):
+    """
+    Unit tests for result caching in the ADIF service.
+    """
+
+    def setUp(self):
+        """Set up a service with mocked dependencies and a result cache."""
+        self.mock_repository = Mock()
+        self.mock_repository.read_from_stream.side_effect = lambda stream, **_: iter(
+            [{"call": "AB1CD"}]
+        )
+        self.mock_repository.read_from_string.return_value = [{"call": "AB1CD"}]
+        self.mock_award_service = Mock()
+        self.mock_award_service.determine_award_tier.return_value = "Participant"
+        self.cache = ResultCache(max_bytes=1024)
+        self.service = AdifService(
+            self.mock_repository, self.mock_award_service, result_cache=self.cache
+        )
+
+    def test_repeated_stream_is_parsed_once(self):
+        """Test that a repeated upload is answered from the cache."""
+        first = asyncio.run(self.service.process_adif_stream_async(BytesIO(b"log")))
+        second = asyncio.run(self.service.process_adif_stream_async(BytesIO(b"log")))
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.mock_repository.read_from_stream.call_count, 1)
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+    def test_different_stream_is_parsed(self):
+        """Test that different bytes are not served from the cache."""
+        asyncio.run(self.service.process_adif_stream_async(BytesIO(b"log")))
+        asyncio.run(self.service.process_adif_stream_async(BytesIO(b"other log")))
+        self.assertEqual(self.mock_repository.read_from_stream.call_count, 2)
+
+    def test_repeated_content_is_parsed_once(self):
+        """Test that process_adif_content also uses the cache."""
+        self.service.process_adif_content("log")
+        self.service.process_adif_content("log")
+        self.assertEqual(self.mock_repository.read_from_string.call_count, 1)
+
+    def test_lookup_result(self):
+        """Test looking up a result by the digest of a previous upload."""
+        stream = BytesIO(b"log")
+        digest = hash_stream(stream)
+        self.assertIsNone(self.service.lookup_result(digest))
+        asyncio.run(self.service.process_adif_stream_async(stream))
+        self.assertEqual(
+            self.service.lookup_result(digest.upper())["callsign"], "AB1CD"
+        )
+
+    def test_expected_digest_is_verified(self):
+        """Test that an upload not matching the announced digest is rejected."""
+        with self.assertRaises(DigestMismatchError):
+            asyncio.run(
+                self.service.process_adif_stream_async(
+                    BytesIO(b"log"), expected_digest="0" * 64
+                )
+            )
+        self.mock_repository.read_from_stream.assert_not_called()
+        self.assertEqual(len(self.cache.memory), 0)
+
+        digest = hash_stream(BytesIO(b"log"))
+        result = asyncio.run(
+            self.service.process_adif_stream_async(
+                BytesIO(b"log"), expected_digest=digest
+            )
+        )
+        self.assertEqual(result["callsign"], "AB1CD")
+
+    def test_is_sha256_digest(self):
+        """Test recognising SHA-256 digests."""
+        self.assertTrue(is_sha256_digest("AB" * 32))
+        self.assertFalse(is_sha256_digest("ab" * 31))
+        self.assertFalse(is_sha256_digest("zz" * 32))
+        self.assertFalse(is_sha256_digest(None))
+
+    def test_cache_is_not_pickled(self):
+        """Test that the cache stays in the parent process."""
+        self.assertIsNone(self.service.__getstate__()["result_cache"])
@@ -0,0 +1,265 @@
+"""
+Unit tests for the tracing of uploads.
+
+This module contains test cases that verify sampling, that spans nest and are
+exported as OTLP JSON, that uploads that are not sampled record nothing, and that
+spans started in a process worker are exported with the rest of their trace.
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from io import BytesIO
+
+from repositories.scanner_repository import CallsignScannerRepository
+from services.adif_service import AdifService
+from services.award_service import AwardService
+from services.executor import ParseExecutor
+from services.tracing import (
+    NOOP_SPAN,
+    JsonSpanExporter,
+    Tracer,
+    adopt_spans,
+    continued,
+    current_context,
+    current_span,
+    span,
+    traced,
+)
+
+SAMPLE_ADIF = b"header <eoh><call:5>AB1CD <eor><call:5>EF2GH <eor>"
+
+
+class ListExporter:
+    """
+    An exporter that keeps the traces it is given.
+    """
+
+    def __init__(self):
+        """Initialize the exporter with no traces."""
+        self.traces = []
+
+    def export(self, spans):
+        """
+        Keep the spans of one trace.
+
+        Args:
+            spans (list): The spans in OTLP JSON form.
+        """
+        self.traces.append(list(spans))
+
+    def close(self):
+        """Do nothing."""
+
+
+def attributes(otlp_span):
+    """
+    Get the attributes of a span in OTLP JSON form.
+
+    Args:
+        otlp_span (dict): The span.
+
+    Returns:
+        dict: The OTLP values of the attributes by name.
+    """
+    return {item["key"]: item["value"] for item in otlp_span["attributes"]}
+
+
+class TestTracer(unittest.TestCase):
+    """
+    Unit tests for the tracer and its spans.
+    """
+
+    def test_sampling(self):
+        """Test that a trace is started only when the sampler falls under the rate."""
+        exporter = ListExporter()
+        self.assertIs(Tracer(exporter, 0.5, lambda: 0.5).trace("upload"), NOOP_SPAN)
+        self.assertIs(Tracer(None, 1.0, lambda: 0.0).trace("upload"), NOOP_SPAN)
+        self.assertIsNot(Tracer(exporter, 0.5, lambda: 0.4).trace("upload"), NOOP_SPAN)
+
+    def test_unsampled_records_nothing(self):
+        """Test that spans outside a sampled trace are no-ops."""
+        with Tracer(ListExporter(), 0.0).trace("upload"):
+            self.assertIs(span("read"), NOOP_SPAN)
+            self.assertIs(current_span(), NOOP_SPAN)
+            self.assertIsNone(current_context())
+
+    def test_nested_spans(self):
+        """Test that child spans share the trace and are exported with the root."""
+        exporter = ListExporter()
+        tracer = Tracer(exporter, 1.0)
+        with tracer.trace("upload", {"adif.upload_bytes": 10}) as root:
+            with span("read", {"adif.backend": "scanner"}) as child:
+                child.set_attribute("adif.records", 2)
+                child.set_attribute("adif.callsign", None)
+                self.assertIs(current_span(), child)
+            root.set_attribute("adif.cache_hit", False)
+        self.assertIs(current_span(), NOOP_SPAN)
+
+        self.assertEqual(len(exporter.traces), 1)
+        spans = exporter.traces[0]
+        read, upload = spans
+        self.assertEqual(read["traceId"], upload["traceId"])
+        self.assertEqual(read["parentSpanId"], upload["spanId"])
+        self.assertNotIn("parentSpanId", upload)
+        self.assertEqual(
+            attributes(read),
+            {
+                "adif.backend": {"stringValue": "scanner"},
+                "adif.records": {"intValue": "2"},
+            },
+        )
+        self.assertEqual(attributes(upload)["adif.cache_hit"], {"boolValue": False})
+        self.assertLessEqual(
+            int(upload["startTimeUnixNano"]), int(read["startTimeUnixNano"])
+        )
+
+    def test_error_status(self):
+        """Test that an exception ending a span is recorded as its status."""
+        exporter = ListExporter()
+        error = ValueError("bad file")
+        error.status_code = 400
+        with self.assertRaises(ValueError):
+            with Tracer(exporter, 1.0).trace("upload"):
+                raise error
+        (upload,) = exporter.traces[0]
+        self.assertEqual(upload["status"]["code"], 2)
+        self.assertEqual(upload["status"]["message"], "ValueError: bad file")
+        self.assertEqual(attributes(upload)["http.status_code"], {"intValue": "400"})
+
+    def test_traced(self):
+        """Test that a decorated coroutine function is traced per call."""
+        exporter = ListExporter()
+        tracer = Tracer(exporter, 1.0)
+
+        @traced("upload", lambda: tracer)
+        async def upload(value):
+            """Upload a value."""
+            current_span().set_attribute("value", value)
+            return value
+
+        self.assertEqual(upload.__name__, "upload")
+        self.assertEqual(asyncio.run(upload(3)), 3)
+        self.assertEqual(attributes(exporter.traces[0][0])["value"], {"intValue": "3"})
+
+    def test_continued(self):
+        """Test that spans from another process join the trace they continue."""
+        exporter = ListExporter()
+        with Tracer(exporter, 1.0).trace("upload") as root:
+            context = current_context()
+            with continued(context) as worker_spans:
+                with span("worker"):
+                    pass
+            self.assertIs(current_span(), root)
+            adopt_spans(worker_spans)
+
+        worker, upload = exporter.traces[0]
+        self.assertEqual(context[1], upload["spanId"])
+        self.assertEqual(worker["name"], "worker")
+        self.assertEqual(worker["traceId"], upload["traceId"])
+        self.assertEqual(worker["parentSpanId"], upload["spanId"])
+
+    def test_continued_without_trace(self):
+        """Test that a call outside a sampled trace records no spans."""
+        with continued(None) as worker_spans:
+            self.assertIs(span("worker"), NOOP_SPAN)
+        self.assertEqual(worker_spans, [])
+
+
+class TestJsonSpanExporter(unittest.TestCase):
+    """
+    Unit tests for the OTLP JSON file sink.
+    """
+
+    def test_file_sink(self):
+        """Test that each trace is appended to the file as one JSON line."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "traces.jsonl")
+            exporter = JsonSpanExporter(path)
+            tracer = Tracer(exporter, 1.0)
+            for _ in range(2):
+                with tracer.trace("upload"):
+                    with span("read"):
+                        pass
+            tracer.close()
+            with open(path, encoding="utf-8") as sink:
+                lines = [json.loads(line) for line in sink]
+
+        self.assertEqual(len(lines), 2)
+        (resource_spans,) = lines[0]["resourceSpans"]
+        self.assertEqual(
+            resource_spans["resource"]["attributes"],
+            [
+                {
+                    "key": "service.name",
+                    "value": {"stringValue": "adif-parser-service"},
+                }
+            ],
+        )
+        (scope_spans,) = resource_spans["scopeSpans"]
+        self.assertEqual(
+            [item["name"] for item in scope_spans["spans"]], ["read", "upload"]
+        )
+
+
+class TestServiceSpans(unittest.IsolatedAsyncioTestCase):
+    """
+    Unit tests for the spans recorded while an upload is parsed.
+    """
+
+    def assert_parse_spans(self, spans):
+        """
+        Check the spans of a parse of SAMPLE_ADIF.
+
+        Args:
+            spans (list): The exported spans of the trace.
+        """
+        by_name = {item["name"]: item for item in spans}
+        upload = by_name["upload"]
+        process = by_name["AdifService.process_adif_stream"]
+        read = by_name["repository.read"]
+        tier = by_name["AwardService.determine_award_tier"]
+        self.assertEqual(len({item["traceId"] for item in spans}), 1)
+        self.assertEqual(process["parentSpanId"], upload["spanId"])
+        self.assertEqual(read["parentSpanId"], process["spanId"])
+        self.assertEqual(tier["parentSpanId"], process["spanId"])
+        self.assertEqual(
+            attributes(read)["adif.backend"],
+            {"stringValue": "CallsignScannerRepository"},
+        )
+        self.assertEqual(attributes(read)["adif.records"], {"intValue": "2"})
+        self.assertEqual(
+            attributes(process)["adif.unique_callsigns"], {"intValue": "2"}
+        )
+
+    async def test_thread_executor(self):
+        """Test that spans in a thread worker belong to the trace of the upload."""
+        exporter = ListExporter()
+        executor = ParseExecutor(kind="thread", max_workers=1)
+        service = AdifService(CallsignScannerRepository(), AwardService(), executor)
+        executor.start()
+        try:
+            with Tracer(exporter, 1.0).trace("upload"):
+                await service.process_adif_stream_async(BytesIO(SAMPLE_ADIF))
+        finally:
+            executor.shutdown()
+        self.assertEqual(len(exporter.traces), 1)
+        spans = exporter.traces[0]
+        self.assert_parse_spans(spans)
+
+    async def test_process_executor(self):
+        """Test that spans in a process worker are exported with their trace."""
+        exporter = ListExporter()
+        executor = ParseExecutor(kind="process", max_workers=1)
+        service = AdifService(CallsignScannerRepository(), AwardService(), executor)
+        executor.start()
+        try:
+            with Tracer(exporter, 1.0).trace("upload"):
+                await service.process_adif_stream_async(BytesIO(SAMPLE_ADIF))
+        finally:
+            executor.shutdown()
+        self.assertEqual(len(exporter.traces), 1)
+        spans = exporter.traces[0]
+        self.assert_parse_spans(spans)